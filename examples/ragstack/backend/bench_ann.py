@@ -0,0 +1,250 @@
+"""
+Approximate Nearest-Neighbour Benchmark
+
+Measures recall@k against exact search and per-query latency for the
+vector backends in vector_backends.py, so index settings can be chosen per
+collection:
+- Chroma HNSW over a grid of M, construction_ef and search_ef
+- NumPy flat and IVF over a grid of nlist and nprobe, with float32,
+  float16 or int8 storage (compressed scans are re-ranked exactly)
+
+Embeddings are read from existing Chroma collections (the backend's
+chroma_db and the ragbench corpora under ragbench/deep_eval/.vector_db),
+or generated synthetically with --synthetic to test at a larger scale.
+Queries are corpus vectors perturbed with Gaussian noise; ground truth is
+exact cosine search with NumPy. For the NumPy configurations the memory
+column is measured with tracemalloc: the peak allocated while loading the
+scanned array (compressed codes for float16/int8) and IVF lists and running
+MEMORY_QUERIES searches. The float32 vectors used for re-ranking are not
+counted, since the store memory-maps them and pages in only the shortlisted
+rows. Chroma allocates outside Python, so its column is the vector payload,
+a lower bound that leaves out the HNSW graph.
+
+Usage:
+    python bench_ann.py --db chroma_db ../../../ragbench/deep_eval/.vector_db/paul
+    python bench_ann.py --synthetic 100000 --dim 1536 --hnsw-m 16 32 --nprobe 4 8 16
+    python bench_ann.py --synthetic 200000 --storage float32 float16 int8 --rerank-factor 2 4
+"""
+
+import argparse
+import csv
+import itertools
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import chromadb
+import numpy as np
+
+from vector_backends import NumpyIndex, chroma_hnsw_metadata, kmeans, normalize, quantize
+
+CHROMA_ADD_BATCH = 5000
+MEMORY_QUERIES = 10  # Searches run under tracemalloc per NumPy configuration
+
+
+def load_chroma_embeddings(db_path: str) -> Dict[str, np.ndarray]:
+    """Embeddings of every non-empty collection in a persistent Chroma directory"""
+    client = chromadb.PersistentClient(path=db_path)
+    corpora = {}
+    for collection in client.list_collections():
+        collection = client.get_collection(collection.name)
+        if collection.count() == 0:
+            continue
+        embeddings = collection.get(include=["embeddings"])["embeddings"]
+        corpora[f"{Path(db_path).name}/{collection.name}"] = normalize(embeddings)
+    return corpora
+
+
+def make_queries(vectors: np.ndarray, num_queries: int, noise: float, seed: int = 0) -> np.ndarray:
+    """Perturbed copies of randomly chosen corpus vectors"""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=num_queries, replace=len(vectors) < num_queries)
+    queries = vectors[picks] + rng.normal(scale=noise, size=(num_queries, vectors.shape[1]))
+    return normalize(queries)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    """Ground-truth top-k row ids for each query"""
+    index = NumpyIndex(vectors)
+    return [set(index.search(query, k)[0].tolist()) for query in queries]
+
+
+def summarize_run(found: List[Sequence[int]], truth: List[set],
+                  latencies: List[float], k: int) -> Dict[str, float]:
+    """Recall@k and latency percentiles for one configuration"""
+    recall = np.mean([len(set(ids) & expected) / min(k, len(expected))
+                      for ids, expected in zip(found, truth)])
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "recall": float(recall),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "qps": len(latencies) / float(np.sum(latencies))
+    }
+
+
+def traced_memory_mb(build: Callable[[], NumpyIndex], queries: np.ndarray, k: int) -> float:
+    """Peak memory allocated while building an index and searching it, in MB"""
+    tracemalloc.start()
+    try:
+        index = build()
+        for query in queries[:MEMORY_QUERIES]:
+            index.search(query, k)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def bench_numpy(vectors: np.ndarray, queries: np.ndarray, truth: List[set], k: int,
+                nlists: Sequence[int], nprobes: Sequence[int], storages: Sequence[str],
+                rerank_factors: Sequence[int]) -> List[Dict]:
+    """Flat search plus every IVF (nlist, nprobe) combination, for each storage mode"""
+    layouts: List[Tuple[str, Dict, float]] = [("flat", {}, 0.0)]
+    for nlist in nlists:
+        if len(vectors) < nlist * 4:
+            continue
+        start = time.perf_counter()
+        centroids = kmeans(vectors, nlist)
+        build_s = time.perf_counter() - start
+        for nprobe in nprobes:
+            if nprobe <= nlist:
+                layouts.append((
+                    f"ivf nlist={nlist} nprobe={nprobe}",
+                    {"index_type": "ivf", "nlist": nlist, "nprobe": nprobe, "centroids": centroids},
+                    build_s
+                ))
+
+    configs: List[Tuple[str, Callable[[], NumpyIndex], float]] = []
+    for storage in storages:
+        codes, scale = (None, None) if storage == "float32" else quantize(vectors, storage)
+        for layout, params, build_s in layouts:
+            factors = [1] if codes is None else rerank_factors
+            for factor in factors:
+                # Copies of the scanned array, so that tracemalloc counts them
+                def build(codes=codes, scale=scale, factor=factor, params=params) -> NumpyIndex:
+                    if codes is None:
+                        return NumpyIndex(vectors.copy(), **params)
+                    return NumpyIndex(vectors, codes=codes.copy(), scale=scale,
+                                      rerank_factor=factor, **params)
+                name = f"numpy-{layout} {storage}" + (f" rerank={factor}" if codes is not None else "")
+                configs.append((name, build, build_s))
+
+    rows = []
+    for name, build, build_s in configs:
+        index = build()
+        found, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            ids, _ = index.search(query, k)
+            latencies.append(time.perf_counter() - start)
+            found.append(ids.tolist())
+        rows.append({
+            "config": name,
+            "build_s": build_s,
+            "memory_mb": traced_memory_mb(build, queries, k),
+            **summarize_run(found, truth, latencies, k)
+        })
+    return rows
+
+
+def bench_chroma(vectors: np.ndarray, queries: np.ndarray, truth: List[set], k: int,
+                 space: str, ms: Sequence[int], construction_efs: Sequence[int],
+                 search_efs: Sequence[int]) -> List[Dict]:
+    """Every HNSW (M, construction_ef, search_ef) combination in ephemeral collections"""
+    client = chromadb.EphemeralClient()
+    ids = [str(i) for i in range(len(vectors))]
+    rows = []
+    for run, (m, construction_ef, search_ef) in enumerate(itertools.product(ms, construction_efs, search_efs)):
+        collection = client.create_collection(
+            f"bench_{run}",
+            metadata=chroma_hnsw_metadata(space, m, construction_ef, search_ef)
+        )
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), CHROMA_ADD_BATCH):
+            collection.add(
+                ids=ids[offset:offset + CHROMA_ADD_BATCH],
+                embeddings=vectors[offset:offset + CHROMA_ADD_BATCH]
+            )
+        build_s = time.perf_counter() - start
+
+        found, latencies = [], []
+        for query in queries:
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query], n_results=min(k, len(vectors)), include=[])
+            latencies.append(time.perf_counter() - start)
+            found.append([int(i) for i in result["ids"][0]])
+        client.delete_collection(f"bench_{run}")
+
+        rows.append({
+            "config": f"chroma-hnsw M={m} ef_c={construction_ef} ef_s={search_ef}",
+            "build_s": build_s,
+            "memory_mb": vectors.nbytes / 2**20,  # Vector payload only; the HNSW graph adds to this
+            **summarize_run(found, truth, latencies, k)
+        })
+    return rows
+
+
+def print_table(corpus: str, size: int, rows: List[Dict]) -> None:
+    print(f"\n{corpus} ({size} vectors)")
+    print(f"{'config':<52} {'recall':>7} {'p50_ms':>8} {'p95_ms':>8} {'qps':>9} "
+          f"{'mem_mb':>8} {'build_s':>8}")
+    for row in sorted(rows, key=lambda r: (-r["recall"], r["p50_ms"])):
+        print(f"{row['config']:<52} {row['recall']:>7.3f} {row['p50_ms']:>8.3f} "
+              f"{row['p95_ms']:>8.3f} {row['qps']:>9.1f} {row['memory_mb']:>8.1f} {row['build_s']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency benchmark for vector backends")
+    parser.add_argument("--db", nargs="*", default=[], help="Persistent Chroma directories to read corpora from")
+    parser.add_argument("--synthetic", type=int, default=0, help="Also benchmark N random vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension of synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Number of queries per corpus")
+    parser.add_argument("--noise", type=float, default=0.05, help="Std-dev of query perturbation")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--space", default="cosine", choices=["cosine", "ip", "l2"], help="HNSW distance")
+    parser.add_argument("--hnsw-m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--nlist", type=int, nargs="+", default=[64, 256])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--storage", nargs="+", default=["float32"],
+                        choices=["float32", "float16", "int8"], help="NumPy vector storage modes")
+    parser.add_argument("--rerank-factor", type=int, nargs="+", default=[4],
+                        help="Candidates re-ranked exactly, as a multiple of k (quantized storage)")
+    parser.add_argument("--skip-chroma", action="store_true", help="Only benchmark the NumPy backend")
+    parser.add_argument("--output", help="Optional CSV file for all results")
+    args = parser.parse_args()
+
+    corpora: Dict[str, np.ndarray] = {}
+    for db_path in args.db:
+        corpora.update(load_chroma_embeddings(db_path))
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        corpora[f"synthetic-{args.synthetic}"] = normalize(rng.normal(size=(args.synthetic, args.dim)))
+    if not corpora:
+        parser.error("no corpora: pass --db and/or --synthetic")
+
+    all_rows = []
+    for corpus, vectors in corpora.items():
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        queries = make_queries(vectors, args.queries, args.noise)
+        truth = exact_neighbours(vectors, queries, args.k)
+        rows = bench_numpy(vectors, queries, truth, args.k, args.nlist, args.nprobe,
+                           args.storage, args.rerank_factor)
+        if not args.skip_chroma:
+            rows += bench_chroma(vectors, queries, truth, args.k, args.space,
+                                 args.hnsw_m, args.construction_ef, args.search_ef)
+        print_table(corpus, len(vectors), rows)
+        all_rows.extend({"corpus": corpus, "size": len(vectors), **row} for row in rows)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(all_rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(all_rows)
+        print(f"\nResults saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
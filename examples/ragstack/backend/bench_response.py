@@ -0,0 +1,131 @@
+"""
+Query Response Size and Serialization Benchmark
+
+Builds /api/query responses for synthetic source nodes carrying the
+metadata SimpleDirectoryReader and the upload metadata add, and measures
+per response:
+- bytes of the JSON body for verbose (full metadata), compact
+  (file_name and score) and the RagClient default fields
+- serialization time with FastAPI's previous path (jsonable_encoder plus
+  the standard JSONResponse) and with FastJSONResponse (orjson when
+  installed, no jsonable_encoder pass)
+- compressed bytes and compression time for gzip and brotli (when the
+  brotli package is installed)
+
+Usage:
+    python bench_response.py --top-k 10 50 --repeats 200
+"""
+
+import argparse
+import csv
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from llama_index.core.schema import NodeWithScore, TextNode
+from starlette.responses import JSONResponse
+
+from responses import (
+    COMPACT_FIELDS, VERBOSE_FIELDS, FastJSONResponse, compress, format_contexts, orjson, supported_encodings
+)
+
+MODES = {
+    "verbose": VERBOSE_FIELDS,
+    "client": ("file_name", "score", "text_preview"),
+    "compact": COMPACT_FIELDS
+}
+CHUNK_CHARS = 1500  # About one default 1024-token chunk of English text
+
+
+def synthetic_nodes(count: int) -> List[NodeWithScore]:
+    """Source nodes with realistic file and upload metadata"""
+    nodes = []
+    for i in range(count):
+        file_name = f"report_{i % 7:02d}.txt"
+        metadata = {
+            "file_path": f"/srv/ragstack/backend/data/{file_name}",
+            "file_name": file_name,
+            "file_type": "text/plain",
+            "file_size": 48213 + i,
+            "creation_date": "2025-03-05",
+            "last_modified_date": "2025-03-07",
+            "upload_ts": 1741347496.0 + i,
+            "uploaded_at": "2025-03-07T11:38:16",
+            "tag_finance": 1
+        }
+        text = (f"Chunk {i}: " + "Quarterly revenue grew while operating costs stayed flat. " * 30)[:CHUNK_CHARS]
+        nodes.append(NodeWithScore(node=TextNode(text=text, metadata=metadata), score=0.9 - i * 0.001))
+    return nodes
+
+
+def time_ms(func: Callable[[], Any], repeats: int) -> float:
+    """Median wall time of a call in milliseconds"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def bench(top_k: int, repeats: int) -> List[Dict[str, Any]]:
+    nodes = synthetic_nodes(top_k)
+    timings = {"embed_ms": 12.5, "retrieve_ms": 3.1, "synthesize_ms": 850.0, "total_ms": 866.0}
+    rows = []
+    for mode, fields in MODES.items():
+        content = {
+            "response": "Revenue grew 12% quarter over quarter. " * 4,
+            "contexts": format_contexts(nodes, fields=fields),
+            "timings": timings
+        }
+        body = FastJSONResponse(content).body
+        row = {
+            "top_k": top_k,
+            "mode": mode,
+            "bytes": len(body),
+            "stdlib_ms": time_ms(lambda: JSONResponse(jsonable_encoder(content)), repeats),
+            "fast_ms": time_ms(lambda: FastJSONResponse(content), repeats),
+            "format_ms": time_ms(lambda: format_contexts(nodes, fields=fields), repeats)
+        }
+        for encoding in supported_encodings():
+            row[f"{encoding}_bytes"] = len(compress(body, encoding))
+            row[f"{encoding}_ms"] = time_ms(lambda: compress(body, encoding), repeats)
+        rows.append(row)
+    return rows
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    encodings = supported_encodings()
+    header = f"{'top_k':>5} {'mode':<8} {'bytes':>8} {'stdlib_ms':>10} {'fast_ms':>8} {'format_ms':>10}"
+    header += "".join(f" {e + '_bytes':>11} {e + '_ms':>8}" for e in encodings)
+    print(header)
+    for row in rows:
+        line = (f"{row['top_k']:>5} {row['mode']:<8} {row['bytes']:>8} {row['stdlib_ms']:>10.3f} "
+                f"{row['fast_ms']:>8.3f} {row['format_ms']:>10.3f}")
+        line += "".join(f" {row[e + '_bytes']:>11} {row[e + '_ms']:>8.3f}" for e in encodings)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response size and serialization time per /api/query request")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[10, 50], help="Source nodes per response")
+    parser.add_argument("--repeats", type=int, default=200, help="Timed repetitions per measurement")
+    parser.add_argument("--output", help="Optional CSV file for all results")
+    args = parser.parse_args()
+
+    print(f"Fast encoder: {'orjson' if orjson else 'json (install orjson for the fast path)'}; "
+          f"compression: {', '.join(supported_encodings())}")
+    rows = [row for top_k in args.top_k for row in bench(top_k, args.repeats)]
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nResults saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
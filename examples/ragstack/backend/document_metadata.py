@@ -0,0 +1,160 @@
+"""
+Upload metadata and retrieval filters for the documents in the data directory.
+
+/api/upload records when a file was uploaded and the tags given with it in
+a hidden file in the data directory (.document_metadata.json, which
+SimpleDirectoryReader skips). ``load_documents`` adds them to the metadata
+of every document, so every node carries them:
+- upload_ts: upload time as Unix timestamp (the modification time for files
+  that were not uploaded through the API)
+- uploaded_at: the same time in ISO format
+- tag_<name>: 1 for each tag (vector store metadata must be flat, and
+  filters cannot compare booleans)
+
+``metadata_filters`` turns the /api/query filter parameters into
+llama-index MetadataFilters, which the vector stores apply before the
+similarity search.
+"""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from llama_index.core import SimpleDirectoryReader
+from llama_index.core.readers.file.base import default_file_metadata_func
+from llama_index.core.schema import Document
+from llama_index.core.vector_stores.types import FilterOperator, MetadataFilter, MetadataFilters
+
+METADATA_FILE = ".document_metadata.json"
+TAG_PREFIX = "tag_"
+
+
+def parse_tags(tags: Optional[str]) -> List[str]:
+    """Distinct lower-case tags from a comma-separated string"""
+    return list(dict.fromkeys(tag.strip().lower() for tag in (tags or "").split(",") if tag.strip()))
+
+
+def parse_time(value: str) -> float:
+    """Unix timestamp of an ISO date or datetime (naive values are local time)"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value} (expected ISO format, e.g. 2025-03-05 or 2025-03-05T12:00)")
+
+
+def _load(data_dir: str) -> Dict[str, Dict[str, Any]]:
+    path = os.path.join(data_dir, METADATA_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(data_dir: str, entries: Dict[str, Dict[str, Any]]):
+    path = os.path.join(data_dir, METADATA_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def record_upload(data_dir: str, file_name: str, tags: List[str]):
+    """Record the upload time and tags of a file"""
+    entries = _load(data_dir)
+    entries[file_name] = {"upload_ts": datetime.now().timestamp(), "tags": tags}
+    _save(data_dir, entries)
+
+
+def forget_upload(data_dir: str, file_name: str):
+    """Drop the upload metadata of a deleted file"""
+    entries = _load(data_dir)
+    if entries.pop(file_name, None) is not None:
+        _save(data_dir, entries)
+
+
+def upload_entries(data_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Recorded upload time and tags per file name"""
+    return _load(data_dir)
+
+
+def restore_uploads(data_dir: str, entries: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Record upload entries, e.g. from an index snapshot, for files that have none.
+
+    Returns:
+        Names of the files whose entry was restored
+    """
+    current = _load(data_dir)
+    restored = [name for name in entries if name not in current]
+    if restored:
+        current.update({name: entries[name] for name in restored})
+        _save(data_dir, current)
+    return restored
+
+
+def upload_metadata(data_dir: str, file_name: str,
+                    entries: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Flat node metadata with the upload time and tags of a file"""
+    entries = _load(data_dir) if entries is None else entries
+    entry = entries.get(file_name, {})
+    upload_ts = entry.get("upload_ts") or os.path.getmtime(os.path.join(data_dir, file_name))
+    metadata = {
+        "upload_ts": upload_ts,
+        "uploaded_at": datetime.fromtimestamp(upload_ts).isoformat(timespec="seconds")
+    }
+    metadata.update({f"{TAG_PREFIX}{tag}": 1 for tag in entry.get("tags", [])})
+    return metadata
+
+
+def file_metadata_func(data_dir: str) -> Callable[[str], Dict[str, Any]]:
+    """SimpleDirectoryReader file_metadata callback adding upload metadata"""
+    entries = _load(data_dir)
+
+    def file_metadata(file_path: str) -> Dict[str, Any]:
+        metadata = default_file_metadata_func(file_path)
+        metadata.update(upload_metadata(data_dir, os.path.basename(file_path), entries))
+        return metadata
+
+    return file_metadata
+
+
+def load_documents(data_dir: str) -> List[Document]:
+    """Documents of the data directory with upload metadata (empty list if there are none)"""
+    try:
+        documents = SimpleDirectoryReader(data_dir, file_metadata=file_metadata_func(data_dir)).load_data()
+    except ValueError:
+        return []
+    for document in documents:
+        # Filter-only metadata, kept out of the embedded and LLM text
+        keys = [key for key in document.metadata if key in ("upload_ts", "uploaded_at") or key.startswith(TAG_PREFIX)]
+        document.excluded_embed_metadata_keys.extend(keys)
+        document.excluded_llm_metadata_keys.extend(keys)
+    return documents
+
+
+def metadata_filters(file_names: Optional[List[str]] = None,
+                     uploaded_after: Optional[str] = None,
+                     uploaded_before: Optional[str] = None,
+                     tags: Optional[List[str]] = None) -> Optional[MetadataFilters]:
+    """Retrieval pre-filters; all given conditions must hold.
+
+    Args:
+        file_names: Restrict to these files
+        uploaded_after: Uploaded at or after this ISO date/datetime
+        uploaded_before: Uploaded before this ISO date/datetime
+        tags: Restrict to files carrying all of these tags
+
+    Returns:
+        MetadataFilters, or None when no filter is given
+    """
+    filters = []
+    if file_names:
+        filters.append(MetadataFilter(key="file_name", value=file_names[0]) if len(file_names) == 1
+                       else MetadataFilter(key="file_name", value=file_names, operator=FilterOperator.IN))
+    if uploaded_after:
+        filters.append(MetadataFilter(key="upload_ts", value=parse_time(uploaded_after), operator=FilterOperator.GTE))
+    if uploaded_before:
+        filters.append(MetadataFilter(key="upload_ts", value=parse_time(uploaded_before), operator=FilterOperator.LT))
+    for tag in parse_tags(",".join(tags or [])):
+        filters.append(MetadataFilter(key=f"{TAG_PREFIX}{tag}", value=1))
+    return MetadataFilters(filters=filters) if filters else None
@@ -0,0 +1,507 @@
+"""
+Blue/green index generations for the RAG backend.
+
+Every rebuild writes a new generation into its own collection
+("documents_g<N>") while the current generation keeps serving queries. The
+new index must pass a smoke check (a document's own text has to retrieve
+that document) before it is promoted by swapping a single reference, so a
+request sees either the old or the new index, never a half-built one. The
+previous generation is kept for instant rollback; older ones are retired
+and deleted once RETIRE_GRACE_SECONDS have passed, since a worker that has
+not synced yet may still be serving them.
+A failed build is discarded and the current generation stays live, and
+generation collections left behind by an interrupted build are deleted.
+
+Generations are recorded in index_generations.json so a restart attaches
+to the current collection instead of re-embedding the corpus.
+
+The registry file is also the state shared by worker processes (uvicorn
+--workers / gunicorn). Builds, rollbacks and maintenance take an advisory
+lock on index_generations.lock, so the corpus is embedded by one worker
+only; the others attach to the persisted collection. ``sync()`` re-reads
+the registry when the file changed and attaches to a generation promoted
+by another worker. Collections are never changed once promoted: document
+deletes and compaction copy the remaining nodes into a new generation, so
+no worker keeps serving a stale view of a modified collection (Chroma
+caches its client, and the segments it loaded, per path).
+Listeners registered with ``add_listener`` run in every worker whenever the
+serving generation changes, to invalidate per-worker caches.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from llama_index.core import SimpleDirectoryReader, StorageContext, VectorStoreIndex
+from llama_index.core.schema import BaseNode, Document
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQuery
+
+from vector_backends import create_vector_store, delete_vector_store, list_vector_stores
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_PATH = os.path.join(BASE_DIR, "index_generations.json")
+COLLECTION_PREFIX = "documents_g"
+SMOKE_CHECK_TOP_K = 3
+SMOKE_PROBE_CHARS = 300
+COPY_BATCH_SIZE = 1000
+# Seconds a retired collection is kept for workers that have not synced yet
+RETIRE_GRACE_SECONDS = float(os.getenv("GENERATION_RETIRE_GRACE_SECONDS", "300"))
+
+# Node id, embedding and label of a node that has to retrieve itself after a copy
+Probe = Tuple[str, Sequence[float], str]
+
+
+class GenerationError(Exception):
+    """A generation could not be built, promoted or rolled back."""
+
+
+class RebuildInProgressError(GenerationError):
+    """Another rebuild or rollback holds the build lock."""
+
+
+@dataclass
+class Generation:
+    """One index build and its vector store collection."""
+    id: int
+    collection: str
+    created_at: float
+    documents: int = 0
+    build_ms: float = 0.0
+    smoke_check: str = ""
+
+
+class ProcessLock:
+    """Advisory exclusive lock on a file, shared by all worker processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        if fcntl is None:
+            return True
+        lock_file = open(self.path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class IndexGenerations:
+    """Builds, promotes, rolls back and garbage-collects index generations.
+
+    ``index`` is the serving index. Rebuilds, rollbacks and maintenance
+    (``exclusive()``) are serialized across threads and worker processes;
+    one requested while another is running fails with RebuildInProgressError.
+    """
+
+    def __init__(self, registry_path: str = REGISTRY_PATH,
+                 load_documents: Optional[Callable[[str], List[Document]]] = None,
+                 retire_grace: float = RETIRE_GRACE_SECONDS):
+        self.registry_path = registry_path
+        self.retire_grace = retire_grace
+        self._load_documents = load_documents or self._read_documents
+        self._build_lock = threading.Lock()
+        self._process_lock = ProcessLock(os.path.splitext(registry_path)[0] + ".lock")
+        self._sync_lock = threading.Lock()
+        self._registry_signature: Optional[Tuple[int, int, int]] = None
+        self._listeners: List[Callable[[], None]] = []
+        # (generation, index) pairs; each is replaced as a whole on promote/rollback
+        self._active: Optional[Tuple[Generation, VectorStoreIndex]] = None
+        self._previous: Optional[Tuple[Generation, Optional[VectorStoreIndex]]] = None
+        # Collections replaced or retired from rollback, with the time they stopped serving
+        self._retired: List[Dict[str, Any]] = []
+        self._next_id = 1
+
+    @property
+    def index(self) -> Optional[VectorStoreIndex]:
+        active = self._active
+        return active[1] if active else None
+
+    @property
+    def current(self) -> Optional[Generation]:
+        active = self._active
+        return active[0] if active else None
+
+    @property
+    def previous(self) -> Optional[Generation]:
+        previous = self._previous
+        return previous[0] if previous else None
+
+    @property
+    def retired(self) -> List[str]:
+        """Collections waiting for their grace period to end before they are deleted"""
+        return [entry["collection"] for entry in self._retired]
+
+    def add_listener(self, listener: Callable[[], None]):
+        """Call ``listener`` whenever the serving generation of this process changes."""
+        self._listeners.append(listener)
+
+    def _notify(self):
+        for listener in self._listeners:
+            listener()
+
+    # Registry
+
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.registry_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load_registry(self) -> Dict[str, Any]:
+        if not os.path.exists(self.registry_path):
+            return {}
+        with open(self.registry_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_registry(self):
+        registry = {
+            "next_id": self._next_id,
+            "current": asdict(self.current) if self.current else None,
+            "previous": asdict(self.previous) if self.previous else None,
+            "retired": self._retired
+        }
+        tmp_path = f"{self.registry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(registry, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+        # Our own write is not a change made by another worker
+        self._registry_signature = self._signature()
+
+    def _loaded_index(self, generation: Generation) -> Optional[VectorStoreIndex]:
+        """Index of a generation this process already holds, if any."""
+        for pair in (self._active, self._previous):
+            if pair and pair[0] == generation:
+                return pair[1]
+        return None
+
+    def _apply_registry(self, registry: Dict[str, Any]) -> bool:
+        """Adopt the generations recorded in the registry.
+
+        Returns:
+            True if the serving generation changed
+        """
+        self._next_id = max(self._next_id, registry.get("next_id", 1))
+        self._retired = list(registry.get("retired", []))
+        current = Generation(**registry["current"]) if registry.get("current") else None
+        previous = Generation(**registry["previous"]) if registry.get("previous") else None
+        changed = current is not None and current != self.current
+        active = (current, self._loaded_index(current) or self._attach(current)) if changed else self._active
+        if previous != self.previous:
+            self._previous = (previous, self._loaded_index(previous)) if previous else None
+        self._active = active
+        if changed:
+            self._notify()
+        return changed
+
+    def registry_changed(self) -> bool:
+        """Whether the registry file was written since this process last read or wrote it."""
+        return self._signature() != self._registry_signature
+
+    def sync(self) -> bool:
+        """Attach to generations promoted by other worker processes.
+
+        Only stats the registry file unless it changed.
+
+        Returns:
+            True if the serving generation changed
+        """
+        if not self.registry_changed():
+            return False
+        with self._sync_lock:
+            signature = self._signature()
+            if signature == self._registry_signature:
+                return False
+            registry = self._load_registry()
+            self._registry_signature = signature
+            changed = self._apply_registry(registry)
+        if changed:
+            print(f"Attached to index generation {self.current.id} ({self.current.collection})")
+        return changed
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "current": asdict(self.current) if self.current else None,
+            "previous": asdict(self.previous) if self.previous else None,
+            "retired": self.retired,
+            "rebuilding": self._build_lock.locked(),
+            "pid": os.getpid()
+        }
+
+    # Building
+
+    @staticmethod
+    def _attach(generation: Generation) -> VectorStoreIndex:
+        return VectorStoreIndex.from_vector_store(create_vector_store(generation.collection))
+
+    @staticmethod
+    def _read_documents(documents_dir: str) -> List[Document]:
+        try:
+            return SimpleDirectoryReader(documents_dir).load_data()
+        except ValueError:
+            return []
+
+    @staticmethod
+    def _smoke_check(index: VectorStoreIndex, documents: List[Document]) -> str:
+        """Check that the start of a document retrieves that document."""
+        if not documents:
+            return "skipped (no documents)"
+        probe = next((doc for doc in documents if doc.text.strip()), None)
+        if probe is None:
+            return "skipped (empty documents)"
+        nodes = index.as_retriever(similarity_top_k=SMOKE_CHECK_TOP_K).retrieve(probe.text[:SMOKE_PROBE_CHARS])
+        if not nodes:
+            raise GenerationError("Smoke check failed: retrieval returned no nodes")
+        if probe.doc_id not in {node.node.ref_doc_id for node in nodes}:
+            raise GenerationError(
+                f"Smoke check failed: {probe.metadata.get('file_name', probe.doc_id)} "
+                f"not retrieved by its own text"
+            )
+        return f"passed ({probe.metadata.get('file_name', probe.doc_id)})"
+
+    def _allocate(self) -> Generation:
+        generation = Generation(
+            id=self._next_id,
+            collection=f"{COLLECTION_PREFIX}{self._next_id}",
+            created_at=time.time()
+        )
+        self._next_id += 1
+        return generation
+
+    def _build(self, documents_dir: str) -> Tuple[Generation, VectorStoreIndex]:
+        generation = self._allocate()
+        start = time.perf_counter()
+        try:
+            documents = self._load_documents(documents_dir)
+            storage_context = StorageContext.from_defaults(
+                vector_store=create_vector_store(generation.collection)
+            )
+            index = VectorStoreIndex.from_documents(documents, storage_context=storage_context)
+            generation.smoke_check = self._smoke_check(index, documents)
+        except Exception:
+            delete_vector_store(generation.collection)
+            self._save_registry()  # Never reuse the failed generation's id
+            raise
+        generation.documents = len(documents)
+        generation.build_ms = (time.perf_counter() - start) * 1000
+        return generation, index
+
+    def build_from_nodes(self, nodes: List[BaseNode]) -> Tuple[Generation, VectorStoreIndex]:
+        """Copy embedded nodes into a new generation collection without re-embedding.
+
+        The caller must hold ``exclusive()`` and promote the result with
+        ``replace_current``.
+        """
+        def copy(vector_store: BasePydanticVectorStore) -> Tuple[int, Optional[Probe]]:
+            for offset in range(0, len(nodes), COPY_BATCH_SIZE):
+                vector_store.add(nodes[offset:offset + COPY_BATCH_SIZE])
+            probe = None
+            if nodes:
+                probe = (nodes[0].node_id, nodes[0].embedding, nodes[0].metadata.get("file_name", nodes[0].node_id))
+            return len({node.ref_doc_id for node in nodes}), probe
+
+        return self.build_loaded(copy)
+
+    def build_loaded(self, load: Callable[[BasePydanticVectorStore], Tuple[int, Optional[Probe]]]
+                     ) -> Tuple[Generation, VectorStoreIndex]:
+        """Fill a new generation collection with already embedded nodes.
+
+        Args:
+            load: Loads the nodes into the empty vector store and returns the
+                number of documents and a probe (node id, embedding, label)
+
+        The collection is checked by querying it with the probe's embedding,
+        which has to retrieve the probe node. The caller must hold
+        ``exclusive()`` and promote the result with ``promote`` or
+        ``replace_current``.
+        """
+        generation = self._allocate()
+        start = time.perf_counter()
+        try:
+            vector_store = create_vector_store(generation.collection)
+            documents, probe = load(vector_store)
+            if probe:
+                node_id, embedding, label = probe
+                result = vector_store.query(VectorStoreQuery(query_embedding=list(embedding),
+                                                             similarity_top_k=SMOKE_CHECK_TOP_K))
+                if node_id not in (result.ids or []):
+                    raise GenerationError("Smoke check failed: loaded node not retrieved by its own embedding")
+                generation.smoke_check = f"passed ({label})"
+            else:
+                generation.smoke_check = "skipped (no nodes)"
+        except Exception:
+            delete_vector_store(generation.collection)
+            self._save_registry()
+            raise
+        generation.documents = documents
+        generation.build_ms = (time.perf_counter() - start) * 1000
+        return generation, VectorStoreIndex.from_vector_store(vector_store)
+
+    def replace_current(self, generation: Generation, index: VectorStoreIndex):
+        """Swap in a generation equivalent to the current one, which is retired.
+
+        The previous generation stays the rollback target. The caller must
+        hold ``exclusive()``.
+        """
+        replaced = self._active
+        self._active = (generation, index)
+        if replaced:
+            self._retire(replaced[0])
+        self._save_registry()
+        self._notify()
+        if replaced:
+            print(f"Replaced index generation {replaced[0].id} with {generation.id}")
+        self.drop_retired()
+
+    def promote(self, generation: Generation, index: VectorStoreIndex):
+        """Promote a generation from ``build_loaded``; the current one becomes the rollback target.
+
+        The caller must hold ``exclusive()``.
+        """
+        self._promote(generation, index)
+        print(f"Promoted index generation {generation.id} "
+              f"({generation.documents} documents, {generation.build_ms:.0f} ms)")
+
+    def _promote(self, generation: Generation, index: VectorStoreIndex):
+        """Swap in a new generation, keep the old one for rollback and delete older ones."""
+        retired = self._previous
+        self._previous = self._active
+        self._active = (generation, index)
+        if retired:
+            self._retire(retired[0])
+        self._save_registry()
+        self._notify()
+        self.drop_retired()
+
+    def _retire(self, generation: Generation):
+        self._retired.append({"collection": generation.collection, "retired_at": time.time()})
+
+    def drop_retired(self, force: bool = False) -> List[str]:
+        """Delete retired collections whose grace period is over.
+
+        Workers sync before serving each request, so after the grace period
+        no worker is still querying them. The caller must hold ``exclusive()``.
+
+        Args:
+            force: Delete all retired collections, e.g. with the other workers stopped
+
+        Returns:
+            Names of the deleted collections
+        """
+        now = time.time()
+        expired = [entry for entry in self._retired
+                   if force or now - entry["retired_at"] >= self.retire_grace]
+        if not expired:
+            return []
+        self._retired = [entry for entry in self._retired if entry not in expired]
+        self._save_registry()
+        for entry in expired:
+            delete_vector_store(entry["collection"])
+            print(f"Deleted retired index collection {entry['collection']}")
+        return [entry["collection"] for entry in expired]
+
+    def collect_garbage(self) -> List[str]:
+        """Delete generation collections that are neither current, previous nor retired.
+
+        Must run under the process lock, since another worker's shadow
+        collection looks like garbage until it is promoted. Retired
+        collections are left to ``drop_retired``.
+        """
+        live = {g.collection for g in (self.current, self.previous) if g}
+        live.update(entry["collection"] for entry in self._retired)
+        orphans = [
+            name for name in list_vector_stores()
+            if name.startswith(COLLECTION_PREFIX) and name[len(COLLECTION_PREFIX):].isdigit()
+            and name not in live
+        ]
+        for name in orphans:
+            delete_vector_store(name)
+            print(f"Deleted orphaned index collection {name}")
+        return orphans
+
+    @contextmanager
+    def _locked(self, blocking: bool) -> Iterator[None]:
+        """Hold the build lock of this process and the lock shared by all workers."""
+        if not self._build_lock.acquire(blocking=blocking):
+            raise RebuildInProgressError("A rebuild or maintenance job is already in progress")
+        try:
+            if not self._process_lock.acquire(blocking=blocking):
+                raise RebuildInProgressError("A rebuild or maintenance job is in progress in another worker")
+            try:
+                # Build on top of whatever another worker promoted last
+                self.sync()
+                yield
+            finally:
+                self._process_lock.release()
+        finally:
+            self._build_lock.release()
+
+    def exclusive(self):
+        """Hold the build lock, so no rebuild, rollback or maintenance runs concurrently.
+
+        Raises:
+            RebuildInProgressError: The lock is already held, in this or another worker
+        """
+        return self._locked(blocking=False)
+
+    def load_or_build(self, documents_dir: str) -> Generation:
+        """Attach to the recorded current generation, or build the first one.
+
+        Workers starting together wait for the lock, so only the first one
+        builds; the others attach to its generation.
+        """
+        with self._locked(blocking=True):
+            generation = self.current or self._rebuild(documents_dir)
+            self.collect_garbage()
+            self.drop_retired()
+        return generation
+
+    def _rebuild(self, documents_dir: str) -> Generation:
+        generation, index = self._build(documents_dir)
+        self.promote(generation, index)
+        return generation
+
+    def rebuild(self, documents_dir: str) -> Generation:
+        """Build a new generation in a shadow collection and promote it.
+
+        Raises:
+            RebuildInProgressError: Another rebuild is running
+            GenerationError: The smoke check failed
+        """
+        with self.exclusive():
+            return self._rebuild(documents_dir)
+
+    def rollback(self) -> Generation:
+        """Make the previous generation current again (and the current one previous)."""
+        with self.exclusive():
+            if not self._previous:
+                raise GenerationError("No previous generation to roll back to")
+            generation, index = self._previous
+            if index is None:
+                index = self._attach(generation)
+            self._previous = self._active
+            self._active = (generation, index)
+            self._save_registry()
+            self._notify()
+            print(f"Rolled back to index generation {generation.id}")
+            return generation
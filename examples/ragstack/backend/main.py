@@ -1,20 +1,53 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Document, StorageContext
+from llama_index.core import VectorStoreIndex, SimpleDirectoryReader, Document, StorageContext, get_response_synthesizer
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from llama_index.core.settings import Settings
-from llama_index.core.node_parser import SimpleNodeParser
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser.text.sentence import SENTENCE_CHUNK_OVERLAP
+from llama_index.core.constants import DEFAULT_CHUNK_SIZE
+from llama_index.core.constants import DEFAULT_SIMILARITY_TOP_K
+from llama_index.core.schema import QueryBundle
+from pydantic import BaseModel
 import openai
 import chromadb
+import asyncio
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from typing import List
+from typing import Dict, List, Optional, Tuple
 import shutil
+import sys
+from pathlib import Path
+
+from reranker import CrossEncoderRerank, DEFAULT_CANDIDATE_K, DEFAULT_RERANK_TOP_N
+from document_metadata import TAG_PREFIX, load_documents, metadata_filters, parse_tags, record_upload, upload_metadata
+from generations import GenerationError, IndexGenerations, RebuildInProgressError
+from maintenance import compact, delete_document
+from snapshots import SNAPSHOT_DIR, SnapshotError, export_snapshot, import_snapshot, list_snapshots, snapshot_name, snapshot_path
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+# LLM and embedding provider shared with ragbench (RAGOPS_PROVIDER=fake runs offline)
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent / "ragbench"))
+from providers import configure_settings, embedding_model_id
+configure_settings()
+
+from query_cache import aembed_queries, check_precomputed, query_embedding_cache
+from responses import CompressionMiddleware, FastJSONResponse, context_fields, format_contexts, DEFAULT_MINIMUM_SIZE
+from profile_sessions import ProfileBusyError, ProfileSessions
+
+# Chunking of the main index (defaults match llama-index; tune with ragbench's chunking_sweep.py)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", SENTENCE_CHUNK_OVERLAP))
+Settings.node_parser = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configure CORS
 app.add_middleware(
@@ -25,10 +58,21 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# Compress responses (brotli or gzip, negotiated) from RESPONSE_COMPRESSION_MIN_BYTES up
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", DEFAULT_MINIMUM_SIZE))
+)
+
 # Set up paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 CHROMA_DIR = os.path.join(BASE_DIR, "chroma_db")
+PROFILE_DIR = os.path.join(BASE_DIR, "profiles")
+
+# Admin profiling endpoints are disabled unless ENABLE_PROFILING is set
+PROFILING_ENABLED = os.getenv("ENABLE_PROFILING", "").lower() in ("1", "true", "yes")
+profile_sessions = ProfileSessions(PROFILE_DIR)
 
 # Create directories if they don't exist
 os.makedirs(DATA_DIR, exist_ok=True)
@@ -40,101 +84,431 @@ chroma_collection = chroma_client.get_or_create_collection("ragops")
 vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
 storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
-# Global variable to store the index
-index = None
+# Blue/green index generations; generations.index is the serving index
+generations = IndexGenerations(load_documents=load_documents)
+
+# In-memory indexes re-chunked with non-default settings, keyed by (chunk_size, chunk_overlap);
+# only the CHUNKED_INDEX_CACHE_SIZE most recently used are kept (each holds a full corpus embedding)
+CHUNKED_INDEX_CACHE_SIZE = max(1, int(os.getenv("CHUNKED_INDEX_CACHE_SIZE", "4")))
+chunked_indexes: "OrderedDict[Tuple[int, int], VectorStoreIndex]" = OrderedDict()
+# Builds in progress, so concurrent requests for one configuration embed the corpus once
+chunked_index_builds: Dict[Tuple[int, int], Future] = {}
+chunked_indexes_lock = threading.Lock()
+chunked_indexes_epoch = 0  # Bumped on every clear; builds started before it are not cached
+
+def clear_chunked_indexes():
+    global chunked_indexes_epoch
+    with chunked_indexes_lock:
+        chunked_indexes.clear()
+        chunked_index_builds.clear()
+        chunked_indexes_epoch += 1
+
+# Re-chunked variants are rebuilt on demand whenever the serving generation changes
+# (here or in another worker); the query embedding cache does not depend on the index
+generations.add_listener(clear_chunked_indexes)
+
+# Answers synthesized at the same time by /api/query/batch
+BATCH_SYNTHESIS_CONCURRENCY = int(os.getenv("BATCH_SYNTHESIS_CONCURRENCY", "8"))
 
 def initialize_index():
-    """Initialize or reload the index from documents in the data directory"""
-    global index
-    try:
-        # Initialize ChromaDB
-        chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-        chroma_collection = chroma_client.get_or_create_collection("documents")
-        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    """Rebuild the index from the data directory as a new generation and promote it.
 
-        # Try to load documents from the data directory
-        try:
-            documents = SimpleDirectoryReader(DATA_DIR).load_data()
-            index = VectorStoreIndex.from_documents(
-                documents,
-                storage_context=storage_context
-            )
-        except ValueError as e:
-            # If no documents found, create an empty index
-            index = VectorStoreIndex([], storage_context=storage_context)
-            print("Created empty index - no documents found.")
+    The current generation keeps serving until the new one passes its smoke
+    check; on failure it stays current and the error is raised.
+    """
+    try:
+        return generations.rebuild(DATA_DIR)
     except Exception as e:
         print(f"Error initializing index: {str(e)}")
         raise e
 
-# Initialize the index on startup
-initialize_index()
+# Attach to the current index generation on startup (built by the first worker on first start)
+generations.load_or_build(DATA_DIR)
+
+@app.middleware("http")
+async def sync_index_generation(request, call_next):
+    """Attach to index generations promoted by other worker processes before serving a request"""
+    if generations.registry_changed():
+        await asyncio.to_thread(generations.sync)
+    return await call_next(request)
+
+@app.middleware("http")
+async def profile_queries(request, call_next):
+    """Count query requests towards a running /api/admin/profile/queries session"""
+    profile = profile_sessions.query_profile
+    if not profile_sessions.is_profiled(request.url.path):
+        return await call_next(request)
+    profile.request_started()
+    try:
+        return await call_next(request)
+    finally:
+        profile.request_finished()
 
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload a file to the data directory and update the index"""
+async def upload_file(file: UploadFile = File(...), tags: str = Form("")):
+    """Upload a file to the data directory and update the index.
+
+    Comma-separated tags are stored with the upload time and can be used
+    as query filters.
+    """
     try:
         # Save the file to the data directory
         file_path = os.path.join(DATA_DIR, file.filename)
         with open(file_path, "wb") as f:
             shutil.copyfileobj(file.file, f)
+        record_upload(DATA_DIR, file.filename, parse_tags(tags))
         
-        # Reload the index
-        initialize_index()
+        # Reload the index in the background of the event loop; queries keep being served
+        generation = await asyncio.to_thread(initialize_index)
         
-        return {"message": f"Successfully uploaded {file.filename} and updated index"}
+        return {
+            "message": f"Successfully uploaded {file.filename} and updated index",
+            "generation": generation.id
+        }
+    except RebuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/reload")
 async def reload_index():
-    """Reload the index with all documents in the data directory"""
+    """Reload the index with all documents in the data directory.
+
+    The new generation is built while the current one keeps serving and is
+    promoted only if it passes its smoke check.
+    """
     try:
-        initialize_index()
-        return {"message": "Index reloaded successfully"}
+        generation = await asyncio.to_thread(initialize_index)
+        return {"message": "Index reloaded successfully", "generation": generation.id}
+    except RebuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/reload/rollback")
+async def rollback_index():
+    """Serve the previous index generation again"""
+    try:
+        generation = await asyncio.to_thread(generations.rollback)
+        return {"message": f"Rolled back to generation {generation.id}", "generation": generation.id}
+    except RebuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except GenerationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/generations")
+async def list_generations():
+    """Current and previous index generations"""
+    return generations.describe()
+
 @app.get("/api/query")
-async def query_index(query_text: str):
-    """Query the index"""
+async def query_index(query_text: str, rerank: bool = False,
+                      candidate_k: int = DEFAULT_CANDIDATE_K,
+                      rerank_top_n: int = DEFAULT_RERANK_TOP_N,
+                      file_name: Optional[List[str]] = Query(None),
+                      uploaded_after: Optional[str] = None,
+                      uploaded_before: Optional[str] = None,
+                      tag: Optional[List[str]] = Query(None),
+                      verbose: bool = True,
+                      fields: Optional[str] = None):
+    """Query the index.
+
+    With rerank=true, candidate_k nodes are retrieved and rescored with a
+    local cross-encoder, and only the best rerank_top_n are passed to the LLM.
+    The query embedding comes from the query embedding cache when possible.
+    Retrieval and reranking run in worker threads and the answer is
+    synthesized asynchronously, so other requests are served meanwhile.
+    The response includes server-side stage timings in milliseconds.
+
+    file_name (repeatable), uploaded_after / uploaded_before (ISO dates) and
+    tag (repeatable, all required) restrict the search to matching nodes.
+    They are applied by the vector store before the similarity search, so
+    all top-k slots go to matching nodes.
+
+    Each context carries file_name, score, text_preview and the full node
+    metadata; verbose=false returns only file_name and score, and fields
+    (comma-separated, see responses.CONTEXT_FIELDS) picks any subset.
+    """
     try:
+        index = generations.index
         if not index:
             raise HTTPException(status_code=500, detail="Index not initialized")
+        if rerank and not 0 < rerank_top_n <= candidate_k:
+            raise HTTPException(status_code=400, detail="rerank_top_n must be between 1 and candidate_k")
+        try:
+            filters = metadata_filters(file_name, uploaded_after, uploaded_before, tag)
+            selected_fields = context_fields(fields, verbose)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Query the index
-        query_engine = index.as_query_engine()
-        response = query_engine.query(query_text)
+        # Query the index: embed (cached), retrieve, optionally rerank, synthesize
+        start = time.perf_counter()
+        embeddings, _ = await aembed_queries(Settings.embed_model, [query_text])
+        timings = {"embed_ms": (time.perf_counter() - start) * 1000}
         
-        # Extract context metadata with text preview
-        source_nodes = response.source_nodes
-        contexts = []
+        retrieve_start = time.perf_counter()
+        query_bundle = QueryBundle(query_str=query_text, embedding=embeddings[0])
+        retriever = index.as_retriever(
+            similarity_top_k=candidate_k if rerank else DEFAULT_SIMILARITY_TOP_K,
+            filters=filters
+        )
+        # Retrieval and the cross-encoder block, so they run in worker threads
+        nodes = await asyncio.to_thread(retriever.retrieve, query_bundle)
+        timings["retrieve_ms"] = (time.perf_counter() - retrieve_start) * 1000
         
-        for node in source_nodes:
-            # Get first 100 characters of text as preview
-            text_preview = node.node.text[:100] + "..." if len(node.node.text) > 100 else node.node.text
-            
-            # Get all metadata and filter out None values
-            metadata = {
-                k: v for k, v in node.node.metadata.items() 
-                if v is not None
-            }
-            
-            # Add node info
-            node_info = {
-                "file_name": metadata.get("file_name", "Unknown"),
-                "score": float(node.score) if node.score else None,
-                "text_preview": text_preview,
-                "metadata": metadata
-            }
-            
-            contexts.append(node_info)
+        reranker = None
+        if rerank:
+            reranker = CrossEncoderRerank(top_n=rerank_top_n)
+            nodes = await asyncio.to_thread(reranker.postprocess_nodes, nodes, query_bundle)
+            timings["rerank_ms"] = reranker.rerank_ms
         
-        return {
+        synthesize_start = time.perf_counter()
+        response = await get_response_synthesizer().asynthesize(query_bundle, nodes=nodes)
+        timings["synthesize_ms"] = (time.perf_counter() - synthesize_start) * 1000
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+        
+        contexts = format_contexts(response.source_nodes, reranker, candidate_k, selected_fields)
+        
+        return FastJSONResponse({
             "response": str(response),
-            "contexts": contexts
-        }
+            "contexts": contexts,
+            "timings": timings
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BatchQueryRequest(BaseModel):
+    """Questions and retrieval options for /api/query/batch"""
+    queries: List[str]
+    similarity_top_k: int = DEFAULT_SIMILARITY_TOP_K
+    rerank: bool = False
+    candidate_k: int = DEFAULT_CANDIDATE_K
+    rerank_top_n: int = DEFAULT_RERANK_TOP_N
+    # Optional precomputed query embeddings (None entries are embedded by the server)
+    embeddings: Optional[List[Optional[List[float]]]] = None
+    embedding_model: Optional[str] = None
+    # Metadata pre-filters applied to every question, as for /api/query
+    file_name: Optional[List[str]] = None
+    uploaded_after: Optional[str] = None
+    uploaded_before: Optional[str] = None
+    tag: Optional[List[str]] = None
+    # Context fields of each result, as for /api/query
+    verbose: bool = True
+    fields: Optional[str] = None
+
+@app.get("/api/embedding")
+async def embedding_info():
+    """Embedding model id (to match precomputed embeddings) and query cache statistics"""
+    return {
+        "model": embedding_model_id(Settings.embed_model),
+        "cache": query_embedding_cache.stats
+    }
+
+@app.post("/api/query/batch")
+async def query_batch(request: BatchQueryRequest):
+    """Answer a list of questions in one request.
+
+    Questions are embedded concurrently with the same query embeddings as
+    /api/query, the vector searches run together in worker threads, and
+    answers are synthesized concurrently
+    (at most BATCH_SYNTHESIS_CONCURRENCY at a time). Results are returned in
+    input order; a failing question gets an "error" entry instead of failing
+    the whole batch. Each result carries its stage timings (queue_ms is the
+    wait for a synthesis slot) and the shared embedding time is in embed_ms.
+    
+    Questions whose embeddings are cached or sent in ``embeddings`` (query
+    embeddings from the model named in ``embedding_model``, see GET
+    /api/embedding) are not embedded again; ``embedded`` counts the ones that
+    were. Sent embeddings of another model, count or dimension are rejected
+    with 422 and are never cached.
+    
+    file_name, uploaded_after, uploaded_before and tag restrict every
+    question's search to matching nodes, as for /api/query.
+    """
+    try:
+        index = generations.index
+        if not index:
+            raise HTTPException(status_code=500, detail="Index not initialized")
+        if request.rerank and not 0 < request.rerank_top_n <= request.candidate_k:
+            raise HTTPException(status_code=400, detail="rerank_top_n must be between 1 and candidate_k")
+        try:
+            filters = metadata_filters(request.file_name, request.uploaded_after,
+                                       request.uploaded_before, request.tag)
+            selected_fields = context_fields(request.fields, request.verbose)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if request.embeddings is not None:
+            model = embedding_model_id(Settings.embed_model)
+            if request.embedding_model != model:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"embeddings were computed with {request.embedding_model}, index uses {model}"
+                )
+            try:
+                await check_precomputed(Settings.embed_model, request.queries, request.embeddings)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        if not request.queries:
+            return {"results": []}
+        
+        embed_start = time.perf_counter()
+        embeddings, embedded = await aembed_queries(Settings.embed_model, request.queries, request.embeddings)
+        embed_ms = (time.perf_counter() - embed_start) * 1000
+        
+        retriever = index.as_retriever(
+            similarity_top_k=request.candidate_k if request.rerank else request.similarity_top_k,
+            filters=filters
+        )
+        synthesizer = get_response_synthesizer()
+        semaphore = asyncio.Semaphore(BATCH_SYNTHESIS_CONCURRENCY)
+        
+        async def answer(query_text: str, embedding: List[float]) -> dict:
+            try:
+                start = time.perf_counter()
+                query_bundle = QueryBundle(query_str=query_text, embedding=embedding)
+                # Chroma's async query blocks, so searches run in worker threads
+                nodes = await asyncio.to_thread(retriever.retrieve, query_bundle)
+                timings = {"retrieve_ms": (time.perf_counter() - start) * 1000}
+                reranker = None
+                if request.rerank:
+                    reranker = CrossEncoderRerank(top_n=request.rerank_top_n)
+                    nodes = await asyncio.to_thread(reranker.postprocess_nodes, nodes, query_bundle)
+                    timings["rerank_ms"] = reranker.rerank_ms
+                queued = time.perf_counter()
+                async with semaphore:
+                    synthesize_start = time.perf_counter()
+                    response = await synthesizer.asynthesize(query_bundle, nodes=nodes)
+                timings["queue_ms"] = (synthesize_start - queued) * 1000
+                timings["synthesize_ms"] = (time.perf_counter() - synthesize_start) * 1000
+                timings["total_ms"] = (time.perf_counter() - start) * 1000
+                return {
+                    "response": str(response),
+                    "contexts": format_contexts(response.source_nodes, reranker, request.candidate_k,
+                                                selected_fields),
+                    "timings": timings
+                }
+            except Exception as e:
+                return {"error": str(e)}
+        
+        results = await asyncio.gather(*(
+            answer(query_text, embedding)
+            for query_text, embedding in zip(request.queries, embeddings)
+        ))
+        return FastJSONResponse({"results": results, "embed_ms": embed_ms, "embedded": embedded})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def get_chunked_index(chunk_size: int, chunk_overlap: int) -> VectorStoreIndex:
+    """Return an in-memory index of the data directory split with the given chunk settings.
+
+    Building one embeds the whole corpus, so call this from a worker thread.
+    Builds run outside the cache lock, so cached configurations are served
+    while another one is built; concurrent requests for the configuration
+    being built wait for that build. The least recently used index is
+    dropped once more than CHUNKED_INDEX_CACHE_SIZE are held.
+    """
+    key = (chunk_size, chunk_overlap)
+    with chunked_indexes_lock:
+        if key in chunked_indexes:
+            chunked_indexes.move_to_end(key)
+            return chunked_indexes[key]
+        build = chunked_index_builds.get(key)
+        if build is None:
+            build = chunked_index_builds[key] = Future()
+            epoch = chunked_indexes_epoch
+            building = True
+        else:
+            building = False
+    if not building:
+        return build.result()
+    
+    try:
+        documents = load_documents(DATA_DIR)
+        splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        index = VectorStoreIndex.from_documents(
+            documents,
+            transformations=[splitter]
+        )
+    except Exception as e:
+        with chunked_indexes_lock:
+            if chunked_index_builds.get(key) is build:
+                del chunked_index_builds[key]
+        build.set_exception(e)
+        raise
+    with chunked_indexes_lock:
+        if chunked_index_builds.get(key) is build:
+            del chunked_index_builds[key]
+        # An index built from a corpus that changed meanwhile is returned but not cached
+        if epoch == chunked_indexes_epoch:
+            chunked_indexes[key] = index
+            while len(chunked_indexes) > CHUNKED_INDEX_CACHE_SIZE:
+                chunked_indexes.popitem(last=False)
+    build.set_result(index)
+    return index
+
+@app.get("/api/retrieve")
+async def retrieve(query_text: str, similarity_top_k: int = 2,
+                   chunk_size: Optional[int] = None,
+                   chunk_overlap: Optional[int] = None,
+                   file_name: Optional[List[str]] = Query(None),
+                   uploaded_after: Optional[str] = None,
+                   uploaded_before: Optional[str] = None,
+                   tag: Optional[List[str]] = Query(None)):
+    """Retrieve the top-k nodes for a query without LLM synthesis.
+
+    When chunk_size is given, retrieval runs against an in-memory index of the
+    data directory re-chunked with that size, so chunking settings can be
+    compared without rebuilding the main index. chunk_overlap defaults to
+    the main index's CHUNK_OVERLAP, capped at half the chunk size, so only
+    the chunk size differs from the serving index. The first request for a
+    chunk configuration embeds the corpus; it runs in a worker thread, as
+    does the retrieval itself, so other requests are not held up. Metadata
+    filters work as for /api/query.
+    """
+    try:
+        index = generations.index
+        if not index:
+            raise HTTPException(status_code=500, detail="Index not initialized")
+        if chunk_size is not None and chunk_overlap is None:
+            chunk_overlap = min(CHUNK_OVERLAP, chunk_size // 2)
+        if chunk_size is not None and not 0 <= chunk_overlap < chunk_size:
+            raise HTTPException(status_code=400, detail="chunk_overlap must be between 0 and chunk_size - 1")
+        try:
+            filters = metadata_filters(file_name, uploaded_after, uploaded_before, tag)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if chunk_size:
+            target_index = await asyncio.to_thread(get_chunked_index, chunk_size, chunk_overlap)
+        else:
+            target_index = index
+        
+        start = time.perf_counter()
+        retriever = target_index.as_retriever(similarity_top_k=similarity_top_k, filters=filters)
+        # Chroma's async query is synchronous underneath, so aretrieve would block the loop too
+        nodes = await asyncio.to_thread(retriever.retrieve, query_text)
+        retrieve_ms = (time.perf_counter() - start) * 1000
+        
+        return FastJSONResponse({
+            "nodes": [
+                {
+                    "node_id": node.node.node_id,
+                    "file_name": node.node.metadata.get("file_name", "Unknown"),
+                    "score": float(node.score) if node.score else None,
+                    "text": node.node.get_content()
+                }
+                for node in nodes
+            ],
+            "retrieve_ms": retrieve_ms
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -145,16 +519,166 @@ async def list_documents():
         documents = []
         for filename in os.listdir(DATA_DIR):
             file_path = os.path.join(DATA_DIR, filename)
-            if os.path.isfile(file_path):
+            if os.path.isfile(file_path) and not filename.startswith("."):
+                metadata = upload_metadata(DATA_DIR, filename)
                 documents.append({
                     "name": filename,
                     "size": os.path.getsize(file_path),
-                    "last_modified": os.path.getmtime(file_path)
+                    "last_modified": os.path.getmtime(file_path),
+                    "uploaded_at": metadata["uploaded_at"],
+                    "tags": sorted(key[len(TAG_PREFIX):] for key in metadata if key.startswith(TAG_PREFIX))
                 })
         return {"documents": documents}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.delete("/api/documents/{name}")
+async def remove_document(name: str):
+    """Delete a document from the data directory and its nodes from the index"""
+    try:
+        result = await asyncio.to_thread(delete_document, generations, DATA_DIR, name)
+        if not result["found"]:
+            raise HTTPException(status_code=404, detail=f"Document not found: {name}")
+        return {"message": f"Deleted {name}", **result}
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RebuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/maintenance/compact")
+async def compact_index(dry_run: bool = False, force: bool = False):
+    """Remove orphaned and duplicate vectors from the index and compact its store.
+
+    Reports the nodes removed, the bytes reclaimed and the vector query
+    latency before and after compaction.
+    """
+    try:
+        return await asyncio.to_thread(compact, generations, DATA_DIR, dry_run, force)
+    except RebuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/maintenance/snapshots")
+async def create_snapshot():
+    """Export the index nodes with their embeddings and the document manifest to a snapshot.
+
+    Another backend node imports the snapshot instead of re-embedding the corpus.
+    """
+    name = snapshot_name()
+    try:
+        manifest = await asyncio.to_thread(
+            export_snapshot, generations, DATA_DIR, os.path.join(SNAPSHOT_DIR, name),
+            embedding_model_id(Settings.embed_model)
+        )
+        return {"name": name, **{key: value for key, value in manifest.items() if key != "documents"},
+                "documents": len(manifest["documents"])}
+    except RebuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/maintenance/snapshots")
+async def get_snapshots():
+    """Snapshots in the snapshots directory, newest first"""
+    return {"snapshots": list_snapshots(SNAPSHOT_DIR)}
+
+@app.post("/api/maintenance/snapshots/{name}/import")
+async def restore_snapshot(name: str, force: bool = False):
+    """Load a snapshot into a new index generation and promote it, without embedding calls.
+
+    The previous generation stays available for rollback. Snapshots of another
+    embedding model are refused unless force is set.
+    """
+    path = snapshot_path(SNAPSHOT_DIR, name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Snapshot not found: {name}")
+    try:
+        return await asyncio.to_thread(
+            import_snapshot, generations, DATA_DIR, path, embedding_model_id(Settings.embed_model), force
+        )
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RebuildInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def require_profiling():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (set ENABLE_PROFILING=1)")
+
+def collapsed_response(collapsed: str, summary: dict) -> PlainTextResponse:
+    """Collapsed stacks as a downloadable file, with the profile summary in headers"""
+    headers = {
+        "Content-Disposition": f'attachment; filename="{summary["name"]}.collapsed"',
+        "X-Profile-Samples": str(summary["samples"]),
+        "X-Profile-Duration-S": f"{summary['duration_s']:.3f}"
+    }
+    if "requests" in summary:
+        headers["X-Profile-Requests"] = str(summary["requests"])
+        headers["X-Profile-Timed-Out"] = str(summary["timed_out"]).lower()
+    for key, value in summary.get("memory", {}).items():
+        headers[f"X-Memory-{key.replace('_', '-').title()}"] = str(value)
+    return PlainTextResponse(collapsed, headers=headers)
+
+@app.post("/api/admin/profile/queries")
+async def profile_next_queries(count: int = Query(10, ge=1), interval_ms: float = Query(5.0, gt=0),
+                               timeout_s: float = Query(300.0, gt=0)):
+    """Sample-profile the next `count` query requests served by this worker.
+
+    Waits until they finished (or the timeout passed) and returns their
+    collapsed stacks, which flamegraph.pl, speedscope and inferno read.
+    """
+    require_profiling()
+    try:
+        collapsed, summary = await profile_sessions.profile_queries(count, interval_ms / 1000, timeout_s)
+        return collapsed_response(collapsed, summary)
+    except ProfileBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/admin/profile/reload")
+async def profile_reload(memory: bool = True, interval_ms: float = Query(5.0, gt=0)):
+    """Reload the index under the sampling profiler.
+
+    Returns the collapsed stacks of the reload; with memory=true the
+    tracemalloc diff around the ingestion is written next to them (see
+    /api/admin/profiles) and summarized in the X-Memory-* headers.
+    """
+    require_profiling()
+    try:
+        collapsed, summary = await profile_sessions.profile_call(
+            initialize_index, "reload", interval_ms / 1000, memory=memory
+        )
+        return collapsed_response(collapsed, summary)
+    except (ProfileBusyError, RebuildInProgressError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/admin/profiles")
+async def list_profiles():
+    """Profile artifacts written by the admin profiling endpoints"""
+    require_profiling()
+    return {"profiles": profile_sessions.list_artifacts()}
+
+@app.get("/api/admin/profiles/{name}")
+async def download_profile(name: str):
+    """Download a profile artifact"""
+    require_profiling()
+    path = profile_sessions.artifact_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {name}")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # Several workers need the app as an import string; they share the index through index_generations.json
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=8000, workers=workers)
@@ -0,0 +1,245 @@
+"""
+Vector store maintenance for the RAG backend.
+
+- ``delete_document`` removes a data file and copies the nodes of all other
+  files, with their stored embeddings, into a new generation that replaces
+  the serving one.
+- ``compact`` finds garbage in the serving generation and writes the
+  remaining nodes, with their stored embeddings, into a fresh collection that
+  replaces it. Garbage is:
+  - orphans: nodes whose source file is no longer in the data directory
+  - duplicates: nodes with the same source file (and page), content hash
+    as a node of an earlier document (left behind when a document was
+    ingested more than once); identical chunks within one document are kept
+  Rewriting the collection also drops deleted entries from Chroma's HNSW
+  segment; afterwards the segment directories of deleted collections are
+  removed and Chroma's SQLite file is vacuumed. The replaced collection is
+  kept for the generations' retire grace period, since other workers may
+  still be serving it, so its space is reclaimed by a later run unless
+  ``drop_now`` is set (the command line does, as the backend is stopped).
+  The report includes the bytes reclaimed and the vector query latency
+  before and after. The new collection can take more space than the one it
+  replaces (e.g. with other HNSW settings); ``bytes_reclaimed`` is then 0
+  and ``bytes_after`` shows the growth.
+
+Both run under the generations' build lock, so they never race a rebuild.
+
+Usage (with the backend stopped):
+    python maintenance.py --dry-run
+    python maintenance.py
+"""
+
+import argparse
+import hashlib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQuery
+
+from document_metadata import forget_upload, load_documents
+from generations import GenerationError, IndexGenerations
+from vector_backends import delete_vector_store, export_nodes, list_vector_stores, store_bytes, vacuum_store
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+LEGACY_COLLECTIONS = ("documents",)  # Written by reloads before index generations
+LATENCY_PROBES = 20
+LATENCY_REPEATS = 3
+LATENCY_TOP_K = 5
+
+
+def content_hash(node: BaseNode) -> str:
+    """SHA-256 of a node's text"""
+    return hashlib.sha256(node.get_content().encode("utf-8")).hexdigest()
+
+
+def data_files(documents_dir: str) -> Set[str]:
+    """File names in the data directory (hidden files are not indexed)"""
+    if not os.path.isdir(documents_dir):
+        return set()
+    return {
+        name for name in os.listdir(documents_dir)
+        if not name.startswith(".") and os.path.isfile(os.path.join(documents_dir, name))
+    }
+
+
+def find_garbage(nodes: Sequence[BaseNode], live_files: Set[str]) -> Tuple[List[str], List[str]]:
+    """Orphaned and duplicate node ids.
+
+    Args:
+        nodes: Stored nodes
+        live_files: File names still in the data directory
+
+    Returns:
+        Tuple of (orphan ids, duplicate ids); a node is a duplicate when a
+        node of another ref doc came first with the same file name, page
+        label and content hash
+    """
+    orphans, duplicates = [], []
+    owners: Dict[Tuple[str, Optional[str], str], Optional[str]] = {}
+    for node in nodes:
+        file_name = node.metadata.get("file_name")
+        if file_name not in live_files:
+            orphans.append(node.node_id)
+            continue
+        # PDFs are read as one document per page, which may share chunks (e.g. headers)
+        key = (file_name, node.metadata.get("page_label"), content_hash(node))
+        owner = owners.setdefault(key, node.ref_doc_id)
+        if owner != node.ref_doc_id:
+            duplicates.append(node.node_id)
+    return orphans, duplicates
+
+
+def query_latency_ms(vector_store: BasePydanticVectorStore, probes: Sequence[List[float]],
+                     top_k: int = LATENCY_TOP_K) -> Optional[float]:
+    """Median latency of vector store queries with the given embeddings"""
+    if not probes:
+        return None
+    latencies = []
+    for _ in range(LATENCY_REPEATS):
+        for embedding in probes:
+            start = time.perf_counter()
+            vector_store.query(VectorStoreQuery(query_embedding=embedding, similarity_top_k=top_k))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def delete_document(generations: IndexGenerations, documents_dir: str, file_name: str) -> Dict[str, Any]:
+    """Delete a data file and all nodes ingested from it.
+
+    The nodes of the other files are copied into a new generation that
+    replaces the current one; the previous generation stays the rollback
+    target.
+
+    Args:
+        generations: Index generations of the backend
+        documents_dir: Data directory
+        file_name: Name of the file in the data directory
+
+    Returns:
+        Dict with the deleted ref doc ids and node count and the serving
+        generation; ``found`` is False when neither the file nor any node
+        existed
+    """
+    if os.path.basename(file_name) != file_name or file_name in ("", ".", ".."):
+        raise ValueError(f"Invalid document name: {file_name}")
+    with generations.exclusive():
+        index = generations.index
+        nodes = export_nodes(index.vector_store) if index else []
+        deleted = [node for node in nodes if node.metadata.get("file_name") == file_name]
+        ref_doc_ids = sorted({node.ref_doc_id for node in deleted if node.ref_doc_id})
+        if deleted:
+            # Other workers attach to the new collection instead of a stale view of this one
+            kept = [node for node in nodes if node.metadata.get("file_name") != file_name]
+            generation, replacement = generations.build_from_nodes(kept)
+            generations.replace_current(generation, replacement)
+            vacuum_store()
+
+        file_path = os.path.join(documents_dir, file_name)
+        file_deleted = os.path.isfile(file_path)
+        if file_deleted:
+            os.remove(file_path)
+        forget_upload(documents_dir, file_name)
+        current = generations.current
+    return {
+        "found": file_deleted or bool(deleted),
+        "file_deleted": file_deleted,
+        "ref_doc_ids": ref_doc_ids,
+        "deleted_nodes": len(deleted),
+        "generation": current.id if current else None
+    }
+
+
+def compact(generations: IndexGenerations, documents_dir: str,
+            dry_run: bool = False, force: bool = False, drop_now: bool = False) -> Dict[str, Any]:
+    """Remove orphaned and duplicate vectors and compact the serving collection.
+
+    Args:
+        generations: Index generations of the backend
+        documents_dir: Data directory
+        dry_run: Only report what would be removed
+        force: Rewrite the collection even when there is no garbage
+        drop_now: Delete replaced and retired collections without waiting for
+            their grace period (only with no other worker serving)
+
+    Returns:
+        Dict[str, Any]: Maintenance report
+    """
+    with generations.exclusive():
+        current, index = generations.current, generations.index
+        if index is None:
+            raise GenerationError("No index generation to compact")
+        nodes = export_nodes(index.vector_store)
+        orphans, duplicates = find_garbage(nodes, data_files(documents_dir))
+        garbage = set(orphans) | set(duplicates)
+        kept = [node for node in nodes if node.node_id not in garbage]
+        legacy = [name for name in LEGACY_COLLECTIONS if name in list_vector_stores()]
+        report = {
+            "generation": current.id,
+            "nodes_before": len(nodes),
+            "nodes_after": len(kept),
+            "orphans": len(orphans),
+            "duplicates": len(duplicates),
+            "legacy_collections": legacy,
+            "dry_run": dry_run,
+            "compacted": False
+        }
+        if dry_run or not (garbage or legacy or force):
+            return report
+
+        probes = [node.embedding for node in kept[:LATENCY_PROBES]]
+        bytes_before = store_bytes()
+        query_ms_before = query_latency_ms(index.vector_store, probes)
+
+        generation, compacted = generations.build_from_nodes(kept)
+        query_ms_after = query_latency_ms(compacted.vector_store, probes)
+        generations.replace_current(generation, compacted)
+        if drop_now:
+            generations.drop_retired(force=True)
+        for name in legacy:
+            delete_vector_store(name)
+        removed_segments = vacuum_store()
+        bytes_after = store_bytes()
+
+    report.update({
+        "generation": generation.id,
+        "compacted": True,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": max(0, bytes_before - bytes_after),
+        "removed_segments": len(removed_segments),
+        "retired_collections": generations.retired,
+        "query_ms_before": query_ms_before,
+        "query_ms_after": query_ms_after,
+        "query_ms_change": (query_ms_after - query_ms_before) if probes else None
+    })
+    return report
+
+
+def main():
+    """Compact the current index generation from the command line."""
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Remove orphaned and duplicate vectors and compact the index")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    parser.add_argument("--force", action="store_true", help="Rewrite the collection even without garbage")
+    args = parser.parse_args()
+    load_dotenv()
+    # Same provider as the backend, in case the first generation has to be built
+    sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent / "ragbench"))
+    from providers import configure_settings
+    configure_settings()
+
+    generations = IndexGenerations(load_documents=load_documents)
+    generations.load_or_build(DATA_DIR)
+    # The backend is stopped, so no worker is still serving a retired collection
+    report = compact(generations, DATA_DIR, dry_run=args.dry_run, force=args.force, drop_now=True)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
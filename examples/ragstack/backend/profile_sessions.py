@@ -0,0 +1,152 @@
+"""
+On-demand profiling sessions for the RAG backend admin endpoints.
+
+- ``QueryProfile`` samples the backend while its next N query requests
+  (/api/query, /api/query/batch, /api/retrieve) run. The profiler starts with
+  the first of them and stops when the Nth finishes; other requests served
+  in between are sampled too. With several workers only the queries served
+  by the worker that received the admin request are profiled.
+- ``profile_call`` samples a blocking call (an index reload) and diffs
+  tracemalloc snapshots around it.
+
+Artifacts are written to the profiles directory as ``<name>.collapsed``
+(flamegraph-compatible collapsed stacks) and ``<name>.tracemalloc.txt``.
+"""
+
+import asyncio
+import os
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from profiling import MemoryTrace, SamplingProfiler, profile_name, write_artifacts
+
+PROFILED_PATHS = ("/api/query", "/api/query/batch", "/api/retrieve")
+
+
+class ProfileBusyError(RuntimeError):
+    """Another profiling session is running in this worker."""
+
+
+class QueryProfile:
+    """Sampling profile of the next ``count`` query requests."""
+
+    def __init__(self, count: int, interval: float):
+        self.count = count
+        self.started = 0
+        self.completed = 0
+        self.profiler = SamplingProfiler(interval=interval)
+        self.done = asyncio.Event()
+
+    def request_started(self):
+        if self.started == 0:
+            self.profiler.start()
+        self.started += 1
+
+    def request_finished(self):
+        self.completed += 1
+        if self.completed >= self.count:
+            self.profiler.stop()
+            self.done.set()
+
+    async def wait(self, timeout_s: float) -> bool:
+        """Wait until the profiled requests finished; False on timeout"""
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout_s)
+            return True
+        except asyncio.TimeoutError:
+            self.profiler.stop()
+            return False
+
+
+class ProfileSessions:
+    """The profiling session of a backend worker (one at a time)."""
+
+    def __init__(self, profile_dir: str):
+        self.profile_dir = profile_dir
+        self.query_profile: Optional[QueryProfile] = None
+        self._busy = False
+
+    def _claim(self):
+        if self._busy:
+            raise ProfileBusyError("A profiling session is already running")
+        self._busy = True
+
+    def is_profiled(self, path: str) -> bool:
+        """Whether a request counts towards the running query profile"""
+        profile = self.query_profile
+        return profile is not None and path in PROFILED_PATHS and profile.started < profile.count
+
+    async def profile_queries(self, count: int, interval: float, timeout_s: float) -> Tuple[str, Dict[str, Any]]:
+        """Profile the next ``count`` query requests.
+
+        Returns:
+            Tuple of (collapsed stacks, profile summary)
+        """
+        self._claim()
+        profile = QueryProfile(count, interval)
+        self.query_profile = profile
+        try:
+            finished = await profile.wait(timeout_s)
+        finally:
+            self.query_profile = None
+            self._busy = False
+        name = profile_name("queries")
+        paths = write_artifacts(self.profile_dir, name, profile.profiler)
+        return profile.profiler.collapsed(), {
+            "name": name,
+            "requests": profile.completed,
+            "timed_out": not finished,
+            "samples": profile.profiler.samples,
+            "duration_s": profile.profiler.duration_s,
+            "artifacts": paths
+        }
+
+    async def profile_call(self, func: Callable[[], Any], prefix: str, interval: float,
+                           memory: bool = True) -> Tuple[str, Dict[str, Any]]:
+        """Profile a blocking call run in a worker thread.
+
+        Errors of the call are raised after its artifacts were written.
+        """
+        self._claim()
+        profiler = SamplingProfiler(interval=interval)
+        trace = MemoryTrace() if memory else None
+
+        def run():
+            with trace or nullcontext(), profiler:
+                func()
+
+        error = None
+        try:
+            await asyncio.to_thread(run)
+        except Exception as e:
+            error = e
+        finally:
+            self._busy = False
+        name = profile_name(prefix)
+        paths = write_artifacts(self.profile_dir, name, profiler, trace)
+        if error is not None:
+            raise error
+        summary = {
+            "name": name,
+            "samples": profiler.samples,
+            "duration_s": profiler.duration_s,
+            "artifacts": paths
+        }
+        if trace is not None:
+            summary["memory"] = trace.summary()
+        return profiler.collapsed(), summary
+
+    def list_artifacts(self) -> List[Dict[str, Any]]:
+        """Artifacts in the profiles directory, newest first"""
+        if not os.path.isdir(self.profile_dir):
+            return []
+        entries = [entry for entry in os.scandir(self.profile_dir) if entry.is_file()]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        return [{"name": entry.name, "size": entry.stat().st_size} for entry in entries]
+
+    def artifact_path(self, name: str) -> Optional[str]:
+        """Path of an artifact, or None if there is no such file"""
+        if os.path.basename(name) != name or name.startswith("."):
+            return None
+        path = os.path.join(self.profile_dir, name)
+        return path if os.path.isfile(path) else None
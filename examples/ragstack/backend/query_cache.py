@@ -0,0 +1,175 @@
+"""
+Query embedding cache for the RAG backend.
+
+Evaluation suites send the same questions on every run, so query
+embeddings are kept in an in-process LRU cache keyed by embedding model and
+normalized query text. The cache is bounded by memory
+(QUERY_EMBEDDING_CACHE_MB, 0 disables it); the least recently used entries
+are evicted first. Clients may also send precomputed embeddings; they are
+checked against the embedding model (``check_precomputed``) and used for
+their request only, never cached, so a bad vector cannot reach other
+requests.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from providers import embedding_model_id
+from question_embeddings import normalize_query
+
+DEFAULT_CACHE_MB = 64
+ENTRY_OVERHEAD_BYTES = 200  # Rough per-entry cost of the key, array header and dict slot
+QUERY_EMBED_CONCURRENCY = int(os.getenv("QUERY_EMBED_CONCURRENCY", "8"))  # Query embedding calls at a time
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of query embeddings bounded by total bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _size(key: Tuple[str, str], vector: np.ndarray) -> int:
+        return vector.nbytes + len(key[1]) + ENTRY_OVERHEAD_BYTES
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        key = (model, normalize_query(query))
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector.tolist()
+
+    def put(self, model: str, query: str, embedding: Sequence[float]):
+        if self.max_bytes <= 0:
+            return
+        key = (model, normalize_query(query))
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._size(key, self._entries.pop(key))
+            self._entries[key] = vector
+            self._bytes += self._size(key, vector)
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._size(old_key, old_vector)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    int(float(os.getenv("QUERY_EMBEDDING_CACHE_MB", DEFAULT_CACHE_MB)) * 1024 * 1024)
+)
+
+
+_dimensions: Dict[str, int] = {}
+
+
+async def aembedding_dimension(embed_model: BaseEmbedding) -> int:
+    """Output dimension of an embedding model (probed once per model)"""
+    model = embedding_model_id(embed_model)
+    if model not in _dimensions:
+        _dimensions[model] = len(await embed_model.aget_query_embedding("dimension probe"))
+    return _dimensions[model]
+
+
+async def check_precomputed(embed_model: BaseEmbedding, queries: Sequence[str],
+                            precomputed: Sequence[Optional[List[float]]]) -> None:
+    """Reject precomputed embeddings that cannot come from the embedding model.
+
+    Args:
+        embed_model: Embedding model of the index
+        queries: Query texts
+        precomputed: Vector (or None) per query
+
+    Raises:
+        ValueError: If the count does not match the queries, or a vector has
+            the wrong dimension or non-finite values
+    """
+    if len(precomputed) != len(queries):
+        raise ValueError(f"embeddings must have one entry per query ({len(precomputed)} for {len(queries)})")
+    if all(vector is None for vector in precomputed):
+        return
+    dimension = await aembedding_dimension(embed_model)
+    for i, vector in enumerate(precomputed):
+        if vector is None:
+            continue
+        if len(vector) != dimension:
+            raise ValueError(f"embeddings[{i}] has {len(vector)} dimensions, the model produces {dimension}")
+        if not np.all(np.isfinite(vector)):
+            raise ValueError(f"embeddings[{i}] has non-finite values")
+
+
+async def aembed_queries(embed_model: BaseEmbedding, queries: Sequence[str],
+                         precomputed: Optional[Sequence[Optional[List[float]]]] = None
+                         ) -> Tuple[List[List[float]], int]:
+    """Embeddings for queries, using precomputed vectors and the cache first.
+
+    The remaining queries are embedded concurrently (at most
+    QUERY_EMBED_CONCURRENCY at a time) and cached. They get query embeddings,
+    like single queries, since some models embed queries and documents
+    differently and the batched text embedding API would not match.
+
+    Args:
+        embed_model: Embedding model of the index
+        queries: Query texts
+        precomputed: Optional vector (or None) per query, from the same model
+            and validated with ``check_precomputed``; these are not cached
+
+    Returns:
+        Tuple of (one embedding per query, number of queries embedded now)
+    """
+    model = embedding_model_id(embed_model)
+    embeddings: List[Optional[List[float]]] = []
+    for i, query in enumerate(queries):
+        vector = precomputed[i] if precomputed else None
+        if vector is None:
+            vector = query_embedding_cache.get(model, query)
+        embeddings.append(vector)
+
+    missing = [i for i, vector in enumerate(embeddings) if vector is None]
+    if missing:
+        semaphore = asyncio.Semaphore(QUERY_EMBED_CONCURRENCY)
+
+        async def embed(query: str) -> List[float]:
+            async with semaphore:
+                return await embed_model.aget_query_embedding(query)
+
+        computed = await asyncio.gather(*(embed(queries[i]) for i in missing))
+        for i, vector in zip(missing, computed):
+            query_embedding_cache.put(model, queries[i], vector)
+            embeddings[i] = vector
+    return embeddings, len(missing)
@@ -0,0 +1,86 @@
+"""
+Cross-encoder reranking for the RAG backend.
+
+A node postprocessor that rescores a larger candidate set from the vector
+store with a small local cross-encoder (batched CPU inference through
+sentence-transformers) and keeps only the best few nodes for synthesis.
+The model is chosen with RERANK_MODEL and loaded once per process.
+"""
+
+import os
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+DEFAULT_RERANK_BATCH_SIZE = 32
+DEFAULT_CANDIDATE_K = 20
+DEFAULT_RERANK_TOP_N = 3
+
+
+@lru_cache(maxsize=None)
+def get_cross_encoder(model_name: str) -> Any:
+    """Load a cross-encoder on CPU, shared by all requests"""
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        raise ImportError("Reranking requires `pip install sentence-transformers`")
+    return CrossEncoder(model_name, max_length=512, device="cpu")
+
+
+class CrossEncoderRerank(BaseNodePostprocessor):
+    """Rescores candidate nodes with a cross-encoder and keeps the top_n.
+
+    A new instance is cheap (the model is cached), so one is created per
+    request; after postprocessing, ``rerank_ms`` and ``retrieval_scores``
+    describe that request.
+    """
+
+    model: str = Field(default_factory=lambda: os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL))
+    top_n: int = Field(default=DEFAULT_RERANK_TOP_N)
+    batch_size: int = Field(default=DEFAULT_RERANK_BATCH_SIZE)
+
+    _rerank_ms: float = PrivateAttr(default=0.0)
+    _retrieval_scores: Dict[str, Optional[float]] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CrossEncoderRerank"
+
+    @property
+    def rerank_ms(self) -> float:
+        return self._rerank_ms
+
+    @property
+    def retrieval_scores(self) -> Dict[str, Optional[float]]:
+        return self._retrieval_scores
+
+    def _postprocess_nodes(
+        self,
+        nodes: List[NodeWithScore],
+        query_bundle: Optional[QueryBundle] = None,
+    ) -> List[NodeWithScore]:
+        if query_bundle is None:
+            raise ValueError("Missing query bundle for reranking")
+        if not nodes:
+            return []
+
+        start = time.perf_counter()
+        pairs = [
+            (query_bundle.query_str, node.node.get_content(metadata_mode=MetadataMode.EMBED))
+            for node in nodes
+        ]
+        scores = get_cross_encoder(self.model).predict(pairs, batch_size=self.batch_size)
+
+        self._retrieval_scores = {node.node.node_id: node.score for node in nodes}
+        reranked = [
+            NodeWithScore(node=node.node, score=float(score))
+            for node, score in zip(nodes, scores)
+        ]
+        reranked.sort(key=lambda node: node.score, reverse=True)
+        self._rerank_ms = (time.perf_counter() - start) * 1000
+        return reranked[:self.top_n]
@@ -0,0 +1,181 @@
+"""
+Query response formatting, serialization and compression for the RAG backend.
+
+- ``context_fields`` selects what each context of a query response carries:
+  verbose responses (the default) include the full node metadata, compact
+  ones (verbose=false) only file_name and score, and ``fields`` picks any
+  subset of CONTEXT_FIELDS.
+- ``FastJSONResponse`` serializes with orjson when it is installed (standard
+  library json otherwise). Endpoints that return it directly also skip
+  FastAPI's jsonable_encoder pass.
+- ``CompressionMiddleware`` compresses responses with brotli (when the
+  brotli package is installed) or gzip, negotiated from Accept-Encoding.
+"""
+
+import gzip
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from llama_index.core.schema import NodeWithScore
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CONTEXT_FIELDS = ("node_id", "file_name", "score", "text_preview", "text", "metadata")
+VERBOSE_FIELDS = ("file_name", "score", "text_preview", "metadata")
+COMPACT_FIELDS = ("file_name", "score")
+TEXT_PREVIEW_CHARS = 100
+DEFAULT_MINIMUM_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # Close to gzip's speed with smaller output; 11 is far slower
+
+
+def context_fields(fields: Optional[str] = None, verbose: bool = True) -> Tuple[str, ...]:
+    """Context fields of a response.
+
+    Args:
+        fields: Comma-separated subset of CONTEXT_FIELDS; overrides verbose
+        verbose: Full metadata (True) or only file_name and score (False)
+
+    Raises:
+        ValueError: An unknown field was requested
+    """
+    if not fields:
+        return VERBOSE_FIELDS if verbose else COMPACT_FIELDS
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in CONTEXT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown context fields {unknown}, expected a subset of {list(CONTEXT_FIELDS)}")
+    return selected
+
+
+def format_contexts(source_nodes: List[NodeWithScore], reranker: Optional[Any] = None,
+                    candidate_k: Optional[int] = None,
+                    fields: Sequence[str] = VERBOSE_FIELDS) -> List[dict]:
+    """Requested fields of each source node of a response"""
+    contexts = []
+    for node in source_nodes:
+        context = {}
+        for field in fields:
+            if field == "node_id":
+                context["node_id"] = node.node.node_id
+            elif field == "file_name":
+                context["file_name"] = node.node.metadata.get("file_name", "Unknown")
+            elif field == "score":
+                context["score"] = float(node.score) if node.score else None
+            elif field == "text_preview":
+                text = node.node.text
+                context["text_preview"] = text[:TEXT_PREVIEW_CHARS] + "..." if len(text) > TEXT_PREVIEW_CHARS else text
+            elif field == "text":
+                context["text"] = node.node.text
+            elif field == "metadata":
+                metadata = {k: v for k, v in node.node.metadata.items() if v is not None}
+                # Report rerank timing and the original vector score alongside each context
+                if reranker:
+                    metadata["rerank_ms"] = reranker.rerank_ms
+                    metadata["retrieval_score"] = reranker.retrieval_scores.get(node.node.node_id)
+                    metadata["candidate_k"] = candidate_k
+                context["metadata"] = metadata
+        contexts.append(context)
+    return contexts
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes of a response, with orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized with ``dumps``."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported content coding for an Accept-Encoding header (br preferred on ties)"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        weights[coding.strip().lower()] = quality
+    candidates = [
+        (weights.get(coding, weights.get("*", 0.0)), -rank, coding)
+        for rank, coding in enumerate(supported_encodings())
+    ]
+    quality, _, coding = max(candidates)
+    return coding if quality > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses of at least ``minimum_size`` bytes.
+
+    Streaming responses and responses that already have a Content-Encoding
+    are passed through unchanged.
+    """
+
+    def __init__(self, app: Any, minimum_size: int = DEFAULT_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+
+        async def send_compressed(message: Dict[str, Any]):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if start_message is None:
+                await send(message)
+                return
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (message["type"] == "http.response.body" and not message.get("more_body")
+                    and "content-encoding" not in headers and len(body) >= self.minimum_size):
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {"type": "http.response.body", "body": body}
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,352 @@
+"""
+Portable index snapshots for the RAG backend.
+
+A snapshot holds the nodes of the serving index generation with their stored
+embeddings, so a new backend node (or the same one after losing its vector
+store) loads the index without re-embedding the corpus. A snapshot is a
+directory with:
+- nodes.parquet: one row per node with node_id, ref_doc_id, file_name, text,
+  metadata (llama-index node metadata as JSON, without the text) and
+  embedding (float32 fixed-size list), zstd-compressed in row groups of
+  SNAPSHOT_BATCH_ROWS
+- manifest.json: format version, embedding model, row count, dimensions,
+  source generation and the document manifest: size, SHA-256, node count
+  and upload metadata of every file in the data directory. It is written
+  last, so a directory without it is an incomplete export.
+
+``export_snapshot`` streams the rows out of either vector backend.
+``import_snapshot`` streams them into a new generation of the backend
+selected by VECTOR_BACKEND (batched Chroma inserts, or the numpy store's
+memory-mapped vectors written once), smoke-checks it like a rebuild and
+promotes it; the replaced generation stays available for rollback. Imports
+refuse snapshots of a different embedding model than the configured one,
+whose vectors would not match the query embeddings.
+
+Snapshots need pyarrow (pip install pyarrow).
+
+Usage (with the backend stopped):
+    python snapshots.py export /backups/ragstack-2025-03-07
+    python snapshots.py import /backups/ragstack-2025-03-07
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from document_metadata import load_documents, restore_uploads, upload_entries
+from generations import GenerationError, IndexGenerations
+from maintenance import DATA_DIR, data_files
+from vector_backends import RowBatch, count_rows, iter_row_batches, load_row_batches
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "snapshots")
+SNAPSHOT_VERSION = 1
+NODES_FILE = "nodes.parquet"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_BATCH_ROWS = 5000
+PARQUET_COMPRESSION = "zstd"
+HASH_CHUNK_BYTES = 1 << 20
+
+
+class SnapshotError(Exception):
+    """A snapshot is missing, incomplete or does not fit the backend."""
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Index snapshots need pyarrow (pip install pyarrow)")
+
+
+def snapshot_schema(dim: int) -> "pa.Schema":
+    return pa.schema([
+        ("node_id", pa.string()),
+        ("ref_doc_id", pa.string()),
+        ("file_name", pa.string()),
+        ("text", pa.large_string()),
+        ("metadata", pa.large_string()),
+        ("embedding", pa.list_(pa.float32(), dim))
+    ])
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def document_manifest(documents_dir: str, node_counts: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    """Size, SHA-256, node count and upload metadata of every data file"""
+    uploads = upload_entries(documents_dir)
+    documents = {}
+    for name in sorted(data_files(documents_dir)):
+        path = os.path.join(documents_dir, name)
+        documents[name] = {
+            "size": os.path.getsize(path),
+            "sha256": file_sha256(path),
+            "nodes": node_counts.get(name, 0),
+            "upload": uploads.get(name)
+        }
+    return documents
+
+
+def _ref_doc_id(metadata: Dict[str, Any]) -> Optional[str]:
+    ref_doc_id = metadata.get("ref_doc_id")
+    return None if ref_doc_id in (None, "None") else ref_doc_id
+
+
+def _record_batch(batch: RowBatch, dim: int) -> "pa.RecordBatch":
+    embeddings = np.ascontiguousarray(batch.embeddings, dtype=np.float32).reshape(-1)
+    return pa.RecordBatch.from_arrays([
+        pa.array(batch.ids, pa.string()),
+        pa.array([_ref_doc_id(metadata) for metadata in batch.metadatas], pa.string()),
+        pa.array([metadata.get("file_name") for metadata in batch.metadatas], pa.string()),
+        pa.array(batch.texts, pa.large_string()),
+        pa.array([json.dumps(metadata, ensure_ascii=False) for metadata in batch.metadatas], pa.large_string()),
+        pa.FixedSizeListArray.from_arrays(pa.array(embeddings, pa.float32()), dim)
+    ], schema=snapshot_schema(dim))
+
+
+def _row_batch(record_batch: "pa.RecordBatch", dim: int) -> RowBatch:
+    embeddings = record_batch.column("embedding").flatten().to_numpy(zero_copy_only=False)
+    return RowBatch(
+        ids=record_batch.column("node_id").to_pylist(),
+        texts=record_batch.column("text").to_pylist(),
+        metadatas=[json.loads(metadata) for metadata in record_batch.column("metadata").to_pylist()],
+        embeddings=embeddings.reshape(-1, dim)
+    )
+
+
+def read_manifest(snapshot_dir: str) -> Dict[str, Any]:
+    """Manifest of a complete snapshot"""
+    path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        raise SnapshotError(f"No snapshot manifest in {snapshot_dir}")
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')}, expected {SNAPSHOT_VERSION}")
+    return manifest
+
+
+def export_snapshot(generations: IndexGenerations, documents_dir: str, snapshot_dir: str,
+                    embedding_model: Optional[str] = None,
+                    batch_size: int = SNAPSHOT_BATCH_ROWS) -> Dict[str, Any]:
+    """Write the serving generation's nodes and embeddings to a snapshot directory.
+
+    Args:
+        generations: Index generations of the backend
+        documents_dir: Data directory, described in the document manifest
+        snapshot_dir: Output directory; must not hold a snapshot yet
+        embedding_model: Id of the model that embedded the nodes
+        batch_size: Rows read from the vector store and written per row group
+
+    Returns:
+        The snapshot manifest
+    """
+    _require_pyarrow()
+    if os.path.exists(os.path.join(snapshot_dir, MANIFEST_FILE)):
+        raise SnapshotError(f"{snapshot_dir} already holds a snapshot")
+    os.makedirs(snapshot_dir, exist_ok=True)
+    nodes_path = os.path.join(snapshot_dir, NODES_FILE)
+    tmp_path = f"{nodes_path}.tmp"
+    with generations.exclusive():
+        current, index = generations.current, generations.index
+        if index is None:
+            raise GenerationError("No index generation to export")
+        rows, dim, writer = 0, 0, None
+        node_counts: Counter = Counter()
+        try:
+            for batch in iter_row_batches(index.vector_store, batch_size):
+                if writer is None:
+                    dim = batch.embeddings.shape[1]
+                    writer = pq.ParquetWriter(tmp_path, snapshot_schema(dim), compression=PARQUET_COMPRESSION)
+                writer.write_batch(_record_batch(batch, dim), row_group_size=batch_size)
+                node_counts.update(metadata.get("file_name") for metadata in batch.metadatas)
+                rows += len(batch.ids)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, snapshot_schema(dim), compression=PARQUET_COMPRESSION)
+        finally:
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, nodes_path)
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "embedding_model": embedding_model,
+            "rows": rows,
+            "dimensions": dim,
+            "source": {
+                "backend": os.getenv("VECTOR_BACKEND", "chroma"),
+                "collection": current.collection,
+                "generation": current.id
+            },
+            "documents": document_manifest(documents_dir, node_counts)
+        }
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+
+def compare_documents(documents_dir: str, documents: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Snapshot documents that are missing from or differ in the data directory.
+
+    Nodes of missing files count as orphans for compaction, so the files
+    should be copied over before the next ``compact``.
+    """
+    present = data_files(documents_dir)
+    missing = sorted(name for name in documents if name not in present)
+    changed = sorted(
+        name for name, entry in documents.items()
+        if name in present and entry.get("sha256") != file_sha256(os.path.join(documents_dir, name))
+    )
+    return {"missing_documents": missing, "changed_documents": changed}
+
+
+def import_snapshot(generations: IndexGenerations, documents_dir: str, snapshot_dir: str,
+                    embedding_model: Optional[str] = None, force: bool = False,
+                    batch_size: int = SNAPSHOT_BATCH_ROWS) -> Dict[str, Any]:
+    """Load a snapshot into a new index generation and promote it.
+
+    Args:
+        generations: Index generations of the backend
+        documents_dir: Data directory, compared with the document manifest;
+            upload metadata missing there is restored from the snapshot
+        snapshot_dir: Snapshot directory
+        embedding_model: Id of the configured embedding model
+        force: Import even if the snapshot was embedded with another model
+        batch_size: Rows read from the snapshot per batch
+
+    Returns:
+        Import report
+    """
+    _require_pyarrow()
+    manifest = read_manifest(snapshot_dir)
+    if embedding_model and manifest.get("embedding_model") not in (None, embedding_model) and not force:
+        raise SnapshotError(
+            f"Snapshot was embedded with {manifest['embedding_model']}, the backend uses {embedding_model}"
+        )
+    nodes_file = pq.ParquetFile(os.path.join(snapshot_dir, NODES_FILE))
+    rows, dim = nodes_file.metadata.num_rows, manifest["dimensions"]
+    if rows != manifest["rows"]:
+        raise SnapshotError(f"Snapshot has {rows} rows, its manifest {manifest['rows']}")
+
+    def load(vector_store):
+        ref_doc_ids = set()
+        probe = None
+
+        def batches() -> Iterator[RowBatch]:
+            nonlocal probe
+            for record_batch in nodes_file.iter_batches(batch_size=batch_size):
+                batch = _row_batch(record_batch, dim)
+                if probe is None and batch.ids:
+                    probe = (batch.ids[0], batch.embeddings[0].tolist(),
+                             batch.metadatas[0].get("file_name", batch.ids[0]))
+                ref_doc_ids.update(record_batch.column("ref_doc_id").to_pylist())
+                yield batch
+
+        loaded = load_row_batches(vector_store, batches(), rows, dim)
+        ref_doc_ids.discard(None)
+        if loaded != rows or count_rows(vector_store) != rows:
+            raise SnapshotError(f"Loaded {count_rows(vector_store)} of {rows} snapshot rows")
+        return len(ref_doc_ids), probe
+
+    with generations.exclusive():
+        generation, index = generations.build_loaded(load)
+        generations.promote(generation, index)
+
+    documents = manifest.get("documents", {})
+    uploads = {name: entry["upload"] for name, entry in documents.items() if entry.get("upload")}
+    report = {
+        "generation": generation.id,
+        "rows": rows,
+        "dimensions": dim,
+        "embedding_model": manifest.get("embedding_model"),
+        "load_ms": generation.build_ms,
+        "smoke_check": generation.smoke_check,
+        "restored_uploads": restore_uploads(documents_dir, uploads) if os.path.isdir(documents_dir) else []
+    }
+    report.update(compare_documents(documents_dir, documents))
+    return report
+
+
+def snapshot_name() -> str:
+    return f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+def snapshot_path(root: str, name: str) -> Optional[str]:
+    """Path of a snapshot below root, or None if there is no such snapshot"""
+    if os.path.basename(name) != name or name.startswith("."):
+        return None
+    path = os.path.join(root, name)
+    return path if os.path.isfile(os.path.join(path, MANIFEST_FILE)) else None
+
+
+def list_snapshots(root: str) -> List[Dict[str, Any]]:
+    """Complete snapshots below root, newest first"""
+    if not os.path.isdir(root):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(root), reverse=True):
+        path = snapshot_path(root, name)
+        if path is None:
+            continue
+        manifest = read_manifest(path)
+        snapshots.append({
+            "name": name,
+            "created_at": manifest["created_at"],
+            "rows": manifest["rows"],
+            "embedding_model": manifest.get("embedding_model"),
+            "documents": len(manifest.get("documents", {})),
+            "bytes": os.path.getsize(os.path.join(path, NODES_FILE))
+        })
+    return snapshots
+
+
+def main():
+    """Export or import an index snapshot from the command line."""
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Export or import the index with its embeddings")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("snapshot_dir", help="Snapshot directory")
+    parser.add_argument("--force", action="store_true",
+                        help="Import a snapshot embedded with a different model than the configured one")
+    args = parser.parse_args()
+    load_dotenv()
+    # Same provider as the backend, whose embedding model the snapshot has to match
+    sys.path.append(str(Path(__file__).resolve().parent.parent.parent.parent / "ragbench"))
+    from llama_index.core.settings import Settings
+    from providers import configure_settings, embedding_model_id
+    configure_settings()
+    embedding_model = embedding_model_id(Settings.embed_model)
+
+    generations = IndexGenerations(load_documents=load_documents)
+    if args.command == "export":
+        manifest = export_snapshot(generations, DATA_DIR, args.snapshot_dir, embedding_model)
+        report = {key: value for key, value in manifest.items() if key != "documents"}
+        report["documents"] = len(manifest["documents"])
+    else:
+        report = import_snapshot(generations, DATA_DIR, args.snapshot_dir, embedding_model, force=args.force)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
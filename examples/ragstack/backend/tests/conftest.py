@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Backend modules use flat imports; providers and question_embeddings come from ragbench
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.append(str(Path(__file__).resolve().parents[4] / "ragbench"))
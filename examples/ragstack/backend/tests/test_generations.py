@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from llama_index.core import Settings
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import TextNode
+
+import vector_backends
+from generations import IndexGenerations
+
+DIM = 8
+
+
+@pytest.fixture(autouse=True)
+def numpy_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(vector_backends, "NUMPY_INDEX_DIR", str(tmp_path / "numpy_index"))
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=DIM))
+
+
+def make_nodes(count):
+    rng = np.random.default_rng(0)
+    return [TextNode(text=f"text {i}", id_=f"node-{i}", embedding=rng.normal(size=DIM).tolist(),
+                     metadata={"file_name": "notes.txt"})
+            for i in range(count)]
+
+
+def promote_new(generations):
+    with generations.exclusive():
+        generation, index = generations.build_from_nodes(make_nodes(3))
+        generations.promote(generation, index)
+    return generation
+
+
+def test_retired_collections_outlive_the_grace_period_of_other_workers(tmp_path):
+    registry = str(tmp_path / "generations.json")
+    generations = IndexGenerations(registry, retire_grace=3600)
+    first = promote_new(generations)
+    promote_new(generations)
+    other = IndexGenerations(registry)
+    other.sync()
+    promote_new(generations)
+
+    # The other worker has not synced yet and still serves the retired collection
+    assert generations.retired == [first.collection]
+    assert first.collection in vector_backends.list_vector_stores()
+    assert other.index.vector_store.get_nodes(None)
+    with generations.exclusive():
+        assert generations.collect_garbage() == []
+        assert generations.drop_retired() == []
+        assert generations.drop_retired(force=True) == [first.collection]
+    assert first.collection not in vector_backends.list_vector_stores()
+
+
+def test_retired_collections_are_dropped_after_the_grace_period(tmp_path):
+    generations = IndexGenerations(str(tmp_path / "generations.json"), retire_grace=0)
+    first = promote_new(generations)
+    second = promote_new(generations)
+    with generations.exclusive():
+        generation, index = generations.build_from_nodes(make_nodes(2))
+        generations.replace_current(generation, index)
+    promote_new(generations)
+    stores = vector_backends.list_vector_stores()
+    assert first.collection not in stores and second.collection not in stores
+    assert generations.retired == []
+    # Retirements are recorded in the registry shared by the workers
+    other = IndexGenerations(str(tmp_path / "generations.json"))
+    other.sync()
+    assert other.retired == []
@@ -0,0 +1,24 @@
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+
+from maintenance import find_garbage
+
+
+def make_node(node_id: str, text: str, ref_doc_id: str, file_name: str = "notes.txt") -> TextNode:
+    node = TextNode(id_=node_id, text=text, metadata={"file_name": file_name})
+    node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=ref_doc_id)
+    return node
+
+
+def test_identical_chunks_within_one_document_are_kept():
+    nodes = [make_node("a", "Same header", "doc-1"), make_node("b", "Same header", "doc-1")]
+    assert find_garbage(nodes, {"notes.txt"}) == ([], [])
+
+
+def test_chunks_of_a_reingested_document_are_duplicates():
+    nodes = [
+        make_node("a", "First chunk", "doc-1"),
+        make_node("b", "First chunk", "doc-2"),
+        make_node("c", "Second chunk", "doc-2"),
+        make_node("d", "Gone", "doc-3", file_name="removed.txt"),
+    ]
+    assert find_garbage(nodes, {"notes.txt"}) == (["d"], ["b"])
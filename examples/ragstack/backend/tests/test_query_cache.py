@@ -0,0 +1,91 @@
+import asyncio
+from typing import List
+
+import numpy as np
+import pytest
+
+import query_cache
+from providers import StubEmbedding, hashed_embedding
+from query_cache import QueryEmbeddingCache, aembed_queries, check_precomputed
+
+DIM = 8
+
+
+class QueryPrefixEmbedding(StubEmbedding):
+    """Stub whose query embeddings differ from its text embeddings, counting calls"""
+
+    def __init__(self):
+        super().__init__(dim=DIM, model_name="query-prefix")
+        self._calls = {"query": 0, "text": 0}
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        self._calls["query"] += 1
+        return hashed_embedding(f"query: {query}", self.dim)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self._calls["text"] += 1
+        return [hashed_embedding(text, self.dim) for text in texts]
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = QueryEmbeddingCache(max_bytes=1 << 20)
+    monkeypatch.setattr(query_cache, "query_embedding_cache", cache)
+    monkeypatch.setattr(query_cache, "_dimensions", {})
+    return cache
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    cache = QueryEmbeddingCache(max_bytes=3 * (DIM * 4 + 1 + query_cache.ENTRY_OVERHEAD_BYTES))
+    for name in "abc":
+        cache.put("m", name, [1.0] * DIM)
+    assert cache.get("m", "a") is not None
+    cache.put("m", "d", [1.0] * DIM)
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", " a ") is not None
+    assert cache.get("other", "a") is None
+    assert cache.stats["evictions"] == 1
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_batch_uses_query_embeddings_and_caches_them(cache):
+    model = QueryPrefixEmbedding()
+    queries = ["What is Jupiter?", "Who launched Chandrayaan?", "Largest planet?"]
+
+    embeddings, embedded = asyncio.run(aembed_queries(model, queries))
+    assert embedded == 3
+    assert model._calls == {"query": 3, "text": 0}
+    assert embeddings[0] == pytest.approx(asyncio.run(model.aget_query_embedding(queries[0])))
+
+    _, embedded = asyncio.run(aembed_queries(model, queries))
+    assert embedded == 0
+    assert cache.stats["entries"] == 3
+
+
+def test_precomputed_vectors_are_used_but_not_cached(cache):
+    model = QueryPrefixEmbedding()
+    sent = [0.5] * DIM
+
+    embeddings, embedded = asyncio.run(aembed_queries(model, ["q1", "q2"], [sent, None]))
+    assert embeddings[0] == sent
+    assert embedded == 1
+    assert cache.get("StubEmbedding:query-prefix", "q1") is None
+    assert cache.get("StubEmbedding:query-prefix", "q2") is not None
+
+
+@pytest.mark.parametrize("precomputed, message", [
+    ([[0.1] * DIM], "one entry per query"),
+    ([[0.1] * 3, None], "has 3 dimensions"),
+    ([None, [float("nan")] * DIM], "non-finite"),
+])
+def test_check_precomputed_rejects_mismatches(cache, precomputed, message):
+    with pytest.raises(ValueError, match=message):
+        asyncio.run(check_precomputed(QueryPrefixEmbedding(), ["q1", "q2"], precomputed))
+
+
+def test_check_precomputed_accepts_model_vectors(cache):
+    model = QueryPrefixEmbedding()
+    vector = np.ones(DIM).tolist()
+    asyncio.run(check_precomputed(model, ["q1", "q2"], [vector, None]))
+    asyncio.run(check_precomputed(model, ["q1"], [None]))
@@ -0,0 +1,101 @@
+import chromadb
+import numpy as np
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import MetadataFilter, MetadataFilters, VectorStoreQuery
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+from vector_backends import NumpyIndex, NumpyVectorStore, export_nodes, normalize, quantize
+
+DIM = 16
+
+
+def make_nodes(start, count, seed=0):
+    rng = np.random.default_rng(seed + start)
+    return [
+        TextNode(text=f"text {i}", id_=f"node-{i}", embedding=rng.normal(size=DIM).tolist(),
+                 metadata={"group": i % 5})
+        for i in range(start, start + count)
+    ]
+
+
+def open_store(path, **kwargs):
+    return NumpyVectorStore(str(path), index_type="ivf", nlist=4, nprobe=4, **kwargs)
+
+
+def test_add_appends_into_spare_rows(tmp_path):
+    store = open_store(tmp_path)
+    store.add(make_nodes(0, 10))
+    store.add(make_nodes(10, 10))
+    store.add(make_nodes(20, 5))
+
+    # Capacity doubles instead of the file being rewritten at the exact size
+    assert len(np.load(tmp_path / "embeddings.npy", mmap_mode="r")) == 40
+    reopened = open_store(tmp_path)
+    assert [record["id"] for record in reopened._records] == [f"node-{i}" for i in range(25)]
+    np.testing.assert_allclose(np.asarray(reopened._vectors), np.asarray(store._vectors))
+
+
+def test_added_rows_use_trained_centroids_until_drift(tmp_path):
+    store = open_store(tmp_path, storage="int8", retrain_drift=0.5)
+    store.add(make_nodes(0, 40))
+    centroids, scale = store._index.centroids.copy(), store._scale.copy()
+
+    store.add(make_nodes(40, 20))
+    assert (store._trained_rows, store._drift_rows) == (40, 20)
+    np.testing.assert_array_equal(store._index.centroids, centroids)
+    np.testing.assert_array_equal(store._scale, scale)
+    assert sorted(np.concatenate(store._index.lists).tolist()) == list(range(60))
+
+    store.add(make_nodes(60, 1))
+    assert (store._trained_rows, store._drift_rows) == (61, 0)
+
+
+def test_query_after_appends_and_delete_matches_exact_search(tmp_path):
+    store = open_store(tmp_path, storage="float16")
+    for start in range(0, 100, 20):
+        store.add(make_nodes(start, 20))
+    store.delete_nodes(node_ids=[f"node-{i}" for i in range(0, 100, 3)])
+
+    query = np.random.default_rng(7).normal(size=DIM)
+    filters = MetadataFilters(filters=[MetadataFilter(key="group", value=2)])
+    result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5,
+                                          filters=filters))
+
+    vectors = np.asarray(store._vectors)
+    rows = [row for row, record in enumerate(store._records) if record["node"]["group"] == 2]
+    scores = vectors[rows] @ (query / np.linalg.norm(query))
+    expected = [store._records[rows[i]]["id"] for i in np.argsort(-scores)[:5]]
+    assert result.ids == expected
+    assert open_store(tmp_path, storage="float16").query(
+        VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=5, filters=filters)).ids == expected
+
+
+def test_quantized_scan_scores_match_float32():
+    rng = np.random.default_rng(3)
+    vectors = normalize(rng.normal(size=(600, DIM)))
+    query = normalize(rng.normal(size=DIM))
+    exact = vectors @ query
+    for storage, tolerance in (("float16", 1e-3), ("int8", 5e-2)):
+        codes, scale = quantize(vectors, storage)
+        index = NumpyIndex(vectors, codes=codes, scale=scale)
+        np.testing.assert_allclose(index._approximate_scores(query, None), exact, atol=tolerance)
+        rows = np.arange(1, 600, 7)
+        np.testing.assert_allclose(index._approximate_scores(query, rows), exact[rows], atol=tolerance)
+
+
+def test_export_nodes_pages_chroma_by_id(monkeypatch):
+    collection = chromadb.EphemeralClient().get_or_create_collection("export_test")
+    store = ChromaVectorStore(chroma_collection=collection)
+    nodes = make_nodes(0, 7)
+    store.add(nodes)
+    calls = []
+    get = collection.get
+    monkeypatch.setattr(collection, "get", lambda **kwargs: calls.append(kwargs) or get(**kwargs))
+
+    exported = {node.node_id: node for node in export_nodes(store)}
+    assert sorted(exported) == sorted(node.node_id for node in nodes)
+    for node in nodes:
+        assert exported[node.node_id].get_content() == node.get_content()
+        assert np.allclose(exported[node.node_id].embedding, node.embedding, atol=1e-6)
+    assert calls and all("offset" not in kwargs for kwargs in calls)
+    assert any(kwargs.get("ids") for kwargs in calls)
@@ -0,0 +1,938 @@
+"""
+Vector store backends for the RAG backend.
+
+The backend is selected with the VECTOR_BACKEND environment variable:
+- "chroma" (default): persistent Chroma collection with HNSW parameters
+  taken from CHROMA_HNSW_SPACE, CHROMA_HNSW_M, CHROMA_HNSW_CONSTRUCTION_EF
+  and CHROMA_HNSW_SEARCH_EF. They only apply to collections created after
+  they are set; a build (a new index generation) picks them up. With CHROMA_HOST (and CHROMA_PORT) set, a
+  Chroma server is used instead of the local chroma_db directory, which is
+  the safe setup when several backend workers share the collections.
+- "numpy": in-process flat or IVF index whose vectors are persisted as
+  memory-mapped .npy files (NUMPY_INDEX_TYPE, NUMPY_IVF_NLIST, NUMPY_IVF_NPROBE).
+  New vectors are appended in place and filed into the trained IVF lists; the
+  centroids are retrained once the rows added or deleted since training exceed
+  NUMPY_RETRAIN_DRIFT (default 0.5) times the rows trained on.
+  NUMPY_STORAGE=float16 or int8 scans a compressed copy of the vectors (widened
+  to float32 block by block) and re-ranks the best NUMPY_RERANK_FACTOR * k
+  candidates with exact float32 scores. The float32 vectors stay on disk for
+  the re-ranking, so quantization saves memory, not disk space.
+  Metadata filters are answered from an in-memory metadata index first, and
+  only the matching rows are scored.
+
+``iter_row_batches`` and ``load_row_batches`` move stored rows (id, text,
+node metadata, embedding) between collections of either backend in batches,
+e.g. for index snapshots; nothing is re-embedded.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import chromadb
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilter,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node, node_to_metadata_dict
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHROMA_DIR = os.path.join(BASE_DIR, "chroma_db")
+NUMPY_INDEX_DIR = os.path.join(BASE_DIR, "numpy_index")
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def chroma_hnsw_metadata(space: Optional[str] = None, m: Optional[int] = None,
+                         construction_ef: Optional[int] = None,
+                         search_ef: Optional[int] = None) -> Dict[str, Any]:
+    """Collection metadata carrying HNSW settings (unset values use Chroma defaults).
+
+    Chroma reads them only when it creates a collection; existing collections
+    keep the settings they were created with until they are rebuilt.
+    """
+    settings = {
+        "hnsw:space": space or os.getenv("CHROMA_HNSW_SPACE"),
+        "hnsw:M": m or _env_int("CHROMA_HNSW_M"),
+        "hnsw:construction_ef": construction_ef or _env_int("CHROMA_HNSW_CONSTRUCTION_EF"),
+        "hnsw:search_ef": search_ef or _env_int("CHROMA_HNSW_SEARCH_EF"),
+    }
+    return {key: value for key, value in settings.items() if value is not None}
+
+
+def kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids for an IVF coarse quantizer"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = vectors[assignments == c]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    return centroids
+
+
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+SCAN_BLOCK_ROWS = 256  # Rows widened to float32 at a time when scanning quantized vectors
+# float16 bits shifted left by 13 are the float32 bits of the value times 2**-112;
+# the mask keeps the sign bit and drops the rest of the int16 sign extension
+FLOAT16_EXPONENT_SCALE = np.float32(2.0 ** 112)
+FLOAT16_WIDEN_MASK = np.int32(-0x70000001)  # 0x8FFFFFFF
+
+
+def widen(block: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """float32 copy of a block of float16 or int8 codes, written into ``out``.
+
+    NumPy's float16 casts are not vectorized, so float16 codes are widened
+    with integer operations instead; the result is the true value times
+    2**-112 (see FLOAT16_EXPONENT_SCALE), which callers fold into the query.
+    """
+    out = out[:len(block)]
+    if block.dtype != np.float16:
+        np.copyto(out, block)
+        return out
+    bits = out.view(np.int32)
+    np.copyto(bits, block.view(np.int16))
+    np.left_shift(bits, 13, out=bits)
+    np.bitwise_and(bits, FLOAT16_WIDEN_MASK, out=bits)
+    return out
+
+
+def quantize(vectors: np.ndarray, storage: str,
+             scale: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Compress vectors for candidate search.
+
+    Args:
+        vectors: float32 matrix of normalized vectors
+        storage: "float16" or "int8" (symmetric per-dimension scalar quantization)
+        scale: int8 scale to reuse; fitted on ``vectors`` when None
+
+    Returns:
+        Tuple of (codes, per-dimension scale); scale is None for float16
+    """
+    if storage == "float16":
+        return np.asarray(vectors, dtype=np.float16), None
+    if storage == "int8":
+        if scale is None:
+            scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.ones(vectors.shape[1])
+            scale = np.maximum(scale, 1e-12).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+        return codes, scale
+    raise ValueError(f"Unknown storage: {storage}")
+
+
+class NumpyIndex:
+    """Exact (flat) or inverted-file (IVF) inner-product search over normalized vectors.
+
+    When ``codes`` are given, candidates are scored on the compressed vectors
+    and the best ``rerank_factor * k`` are re-scored exactly against ``vectors``.
+    """
+
+    def __init__(self, vectors: np.ndarray, index_type: str = "flat",
+                 nlist: int = 64, nprobe: int = 8,
+                 centroids: Optional[np.ndarray] = None,
+                 codes: Optional[np.ndarray] = None, scale: Optional[np.ndarray] = None,
+                 rerank_factor: int = 4):
+        self.vectors = vectors
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.codes = codes
+        self.scale = scale
+        self.rerank_factor = rerank_factor
+        self.centroids = None
+        self.lists: List[np.ndarray] = []
+        # IVF only pays off once each list holds a reasonable number of vectors
+        if index_type == "ivf" and len(vectors) >= nlist * 4:
+            self.centroids = centroids if centroids is not None else kmeans(np.asarray(vectors), nlist)
+            assignments = np.argmax(vectors @ self.centroids.T, axis=1)
+            self.lists = [np.flatnonzero(assignments == c) for c in range(len(self.centroids))]
+
+    def extend(self, vectors: np.ndarray, codes: Optional[np.ndarray] = None) -> None:
+        """Switch to grown arrays, filing the appended rows into the existing IVF lists"""
+        start = len(self.vectors)
+        self.vectors, self.codes = vectors, codes
+        if self.centroids is None or len(vectors) == start:
+            return
+        assignments = np.argmax(np.asarray(vectors[start:]) @ self.centroids.T, axis=1)
+        for c in np.unique(assignments):
+            self.lists[c] = np.concatenate([self.lists[c], start + np.flatnonzero(assignments == c)])
+
+    def candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows in the nprobe closest IVF lists (None means all rows)"""
+        if self.centroids is None:
+            return None
+        probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        return np.concatenate([self.lists[c] for c in probes])
+
+    def search(self, query: np.ndarray, k: int,
+               rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k rows and scores for a normalized query, optionally within a row subset"""
+        if rows is None:
+            rows = self.candidates(query)
+        if self.codes is not None:
+            approx = self._approximate_scores(query, rows)
+            shortlist = _top_k(approx, k * self.rerank_factor)
+            rows = shortlist if rows is None else rows[shortlist]
+            # Exact re-rank only touches the shortlisted float32 rows
+            rows = np.sort(rows)
+        matrix = self.vectors if rows is None else self.vectors[rows]
+        if len(matrix) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.asarray(matrix @ query, dtype=np.float32)
+        top = _top_k(scores, k)
+        found = top if rows is None else rows[top]
+        return found, scores[top]
+
+    def _approximate_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Inner products against the compressed vectors, widened to float32 block by block"""
+        # Dequantization is folded into the query: the per-dimension int8
+        # scale, or the exponent offset of widened float16 codes
+        if self.scale is not None:
+            weights = query * self.scale
+        elif self.codes.dtype == np.float16:
+            weights = query * FLOAT16_EXPONENT_SCALE
+        else:
+            weights = query
+        weights = np.asarray(weights, dtype=np.float32)
+        total = len(self.codes) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        buffer = np.empty((min(SCAN_BLOCK_ROWS, total), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, total, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, total)
+            block = self.codes[start:stop] if rows is None else self.codes[rows[start:stop]]
+            scores[start:stop] = widen(block, buffer) @ weights
+        return scores
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so inner product equals cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class MetadataIndex:
+    """Inverted index over scalar node metadata, used to pre-filter rows.
+
+    Equality and membership filters read posting lists; range filters
+    binary-search the sorted values of numeric keys. Results are sorted row
+    numbers.
+    """
+
+    def __init__(self, metadatas: List[Dict[str, Any]], offset: int = 0):
+        self.size = offset + len(metadatas)
+        postings: Dict[str, Dict[Any, List[int]]] = {}
+        numeric: Dict[str, List[Tuple[float, int]]] = {}
+        for row, metadata in enumerate(metadatas, offset):
+            for key, value in metadata.items():
+                # Skip llama-index's serialized node and non-scalar values
+                if key.startswith("_") or not isinstance(value, (str, int, float, bool)):
+                    continue
+                postings.setdefault(key, {}).setdefault(value, []).append(row)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    numeric.setdefault(key, []).append((value, row))
+        self.postings = {
+            key: {value: np.array(rows, dtype=np.int64) for value, rows in values.items()}
+            for key, values in postings.items()
+        }
+        self.ranges = {}
+        for key, pairs in numeric.items():
+            pairs.sort()
+            self.ranges[key] = (np.array([value for value, _ in pairs]),
+                                np.array([row for _, row in pairs], dtype=np.int64))
+
+    def extend(self, metadatas: List[Dict[str, Any]]) -> None:
+        """Index rows appended after the current ones"""
+        added = MetadataIndex(metadatas, offset=self.size)
+        self.size = added.size
+        for key, values in added.postings.items():
+            current = self.postings.setdefault(key, {})
+            for value, rows in values.items():
+                current[value] = np.concatenate([current[value], rows]) if value in current else rows
+        for key, (values, rows) in added.ranges.items():
+            if key in self.ranges:
+                values = np.concatenate([self.ranges[key][0], values])
+                rows = np.concatenate([self.ranges[key][1], rows])
+                # Stable, so equal values stay in row order
+                order = np.argsort(values, kind="stable")
+                values, rows = values[order], rows[order]
+            self.ranges[key] = (values, rows)
+
+    def rows(self, filters: MetadataFilters) -> np.ndarray:
+        """Rows matching (possibly nested) metadata filters"""
+        matches = [
+            self.rows(f) if isinstance(f, MetadataFilters) else self._match(f)
+            for f in filters.filters
+        ]
+        if not matches:
+            return np.arange(self.size)
+        condition = filters.condition or FilterCondition.AND
+        if condition == FilterCondition.AND:
+            # Narrow the smallest match with a row mask of each other one
+            matches.sort(key=len)
+            rows = matches[0]
+            for other in matches[1:]:
+                mask = np.zeros(self.size, dtype=bool)
+                mask[other] = True
+                rows = rows[mask[rows]]
+            return rows
+        if condition == FilterCondition.OR:
+            return self._union(matches)
+        raise NotImplementedError(f"Filter condition {condition} not supported by NumpyVectorStore")
+
+    def _union(self, matches: List[np.ndarray]) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        for rows in matches:
+            mask[rows] = True
+        return np.flatnonzero(mask)
+
+    def _match(self, f: MetadataFilter) -> np.ndarray:
+        values = self.postings.get(f.key, {})
+        empty = np.empty(0, dtype=np.int64)
+        operator = f.operator
+        if operator == FilterOperator.EQ:
+            return values.get(f.value, empty)
+        if operator == FilterOperator.IN:
+            return self._union([values.get(v, empty) for v in f.value])
+        if operator == FilterOperator.NE:
+            return np.setdiff1d(np.arange(self.size), values.get(f.value, empty), assume_unique=True)
+        if operator == FilterOperator.NIN:
+            return np.setdiff1d(np.arange(self.size), self._match(MetadataFilter(
+                key=f.key, value=f.value, operator=FilterOperator.IN)), assume_unique=True)
+        if operator in (FilterOperator.GT, FilterOperator.GTE, FilterOperator.LT, FilterOperator.LTE):
+            keys, rows = self.ranges.get(f.key, (np.empty(0), empty))
+            side = "right" if operator in (FilterOperator.GT, FilterOperator.LTE) else "left"
+            cut = np.searchsorted(keys, f.value, side=side)
+            selected = rows[cut:] if operator in (FilterOperator.GT, FilterOperator.GTE) else rows[:cut]
+            return np.sort(selected)
+        raise NotImplementedError(f"Filter operator {operator} not supported by NumpyVectorStore")
+
+
+def _write_array(path: Path, array: np.ndarray) -> np.ndarray:
+    """Atomically replace a .npy file and reopen it memory-mapped"""
+    tmp_path = path.with_suffix(".tmp.npy")
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+def _append_rows(path: Path, rows: np.ndarray, count: int) -> np.ndarray:
+    """Write rows after the first ``count`` rows of a .npy file, in place.
+
+    The file keeps spare rows at its end. When they run out, the valid rows
+    are copied once into a file of twice the size, so appending costs O(rows)
+    amortized instead of rewriting the whole array.
+
+    Args:
+        path: .npy file; rows past ``count`` are free
+        rows: Rows to append
+        count: Number of valid rows in the file
+
+    Returns:
+        The first count + len(rows) rows, memory-mapped read-only
+    """
+    total = count + len(rows)
+    stored = np.load(path, mmap_mode="r") if path.exists() else None
+    if stored is None or len(stored) < total:
+        capacity = max(total, 2 * len(stored) if stored is not None else 0)
+        tmp_path = path.with_suffix(".tmp.npy")
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=rows.dtype,
+                                          shape=(capacity,) + rows.shape[1:])
+        if count:
+            grown[:count] = stored[:count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, path)
+    del stored
+    target = np.load(path, mmap_mode="r+")
+    target[count:total] = rows
+    target.flush()
+    del target
+    return np.load(path, mmap_mode="r")[:total]
+
+
+class NumpyVectorStore(BasePydanticVectorStore):
+    """In-process vector store persisted as memory-mapped NumPy arrays.
+
+    Layout of ``persist_dir``:
+    - embeddings.npy: float32 matrix of L2-normalized vectors (memory-mapped on
+      load); it keeps spare rows at its end so ``add`` writes new vectors in
+      place, and only the first len(nodes) rows are valid. It is kept with
+      quantized storage as well: re-ranking reads the shortlisted rows from
+      it, and only those pages are loaded
+    - nodes.jsonl: node id, ref doc id and serialized node of each row, one
+      JSON line per row in row order; ``add`` appends to it
+    - ivf.npz: IVF centroids, when the IVF index has been trained
+    - codes.npy / scale.npy: float16 or int8 copy of the vectors scanned for
+      candidates when ``storage`` is not "float32" (memory-mapped on load,
+      with spare rows like embeddings.npy)
+    - training.json: rows the centroids and int8 scale were fitted on, and
+      rows added or deleted since
+
+    Added vectors are filed into the existing IVF lists and quantized with
+    the existing int8 scale. ``retrain`` fits both again; it runs by itself
+    once the rows added or deleted since the last training exceed
+    ``retrain_drift`` times the rows trained on. Deletes rewrite the files.
+    """
+
+    stores_text: bool = True
+    flat_metadata: bool = False
+
+    persist_dir: str
+    index_type: str = "flat"
+    nlist: int = 64
+    nprobe: int = 8
+    storage: str = "float32"
+    rerank_factor: int = 4
+    retrain_drift: float = 0.5
+
+    _vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _records: List[Dict[str, Any]] = PrivateAttr(default_factory=list)
+    _codes: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scale: Optional[np.ndarray] = PrivateAttr(default=None)
+    _index: Optional[NumpyIndex] = PrivateAttr(default=None)
+    _metadata_index: Optional[MetadataIndex] = PrivateAttr(default=None)
+    _trained_rows: int = PrivateAttr(default=0)
+    _drift_rows: int = PrivateAttr(default=0)
+
+    def __init__(self, persist_dir: str, index_type: str = "flat",
+                 nlist: int = 64, nprobe: int = 8, storage: str = "float32",
+                 rerank_factor: int = 4, retrain_drift: float = 0.5, **kwargs: Any):
+        if storage not in STORAGE_DTYPES:
+            raise ValueError(f"Unknown storage: {storage}")
+        super().__init__(persist_dir=persist_dir, index_type=index_type,
+                         nlist=nlist, nprobe=nprobe, storage=storage,
+                         rerank_factor=rerank_factor, retrain_drift=retrain_drift, **kwargs)
+        Path(persist_dir).mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NumpyVectorStore"
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    @property
+    def _paths(self) -> Tuple[Path, Path, Path]:
+        root = Path(self.persist_dir)
+        return root / "embeddings.npy", root / "nodes.jsonl", root / "ivf.npz"
+
+    @property
+    def _training_path(self) -> Path:
+        return Path(self.persist_dir) / "training.json"
+
+    def _load(self) -> None:
+        vectors_path, nodes_path, ivf_path = self._paths
+        if vectors_path.exists() and nodes_path.exists():
+            with open(nodes_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Interrupted append: the rows after it were never committed
+                        break
+            self._vectors = np.load(vectors_path, mmap_mode="r")[:len(self._records)]
+            self._load_codes()
+        if self._training_path.exists():
+            training = json.loads(self._training_path.read_text(encoding="utf-8"))
+            self._trained_rows, self._drift_rows = training["trained_rows"], training["drift_rows"]
+        else:
+            self._trained_rows = len(self._records)
+        centroids = np.load(ivf_path)["centroids"] if ivf_path.exists() else None
+        if centroids is None and self.index_type == "ivf" and self._vectors is not None:
+            # Persist the centroids, so that added rows are filed against them
+            self.retrain()
+        else:
+            self._build_index(centroids)
+
+    def _build_index(self, centroids: Optional[np.ndarray] = None) -> None:
+        self._index = None
+        self._metadata_index = MetadataIndex([record["node"] for record in self._records])
+        if self._vectors is not None and len(self._vectors):
+            self._index = NumpyIndex(self._vectors, self.index_type,
+                                     self.nlist, self.nprobe, centroids,
+                                     self._codes, self._scale, self.rerank_factor)
+
+    @property
+    def _codes_paths(self) -> Tuple[Path, Path]:
+        root = Path(self.persist_dir)
+        return root / "codes.npy", root / "scale.npy"
+
+    def _load_codes(self, rebuild: bool = False) -> None:
+        """Open the compressed vectors, (re)building them from float32 when needed"""
+        self._codes, self._scale = None, None
+        codes_path, scale_path = self._codes_paths
+        if self.storage == "float32":
+            for path in (codes_path, scale_path):
+                if path.exists():
+                    path.unlink()
+            return
+        count = len(self._records)
+        if not rebuild and codes_path.exists():
+            codes = np.load(codes_path, mmap_mode="r")
+            rebuild = (codes.dtype != STORAGE_DTYPES[self.storage] or len(codes) < count
+                       or (self.storage == "int8") != scale_path.exists())
+            del codes
+        if rebuild or not codes_path.exists():
+            codes, scale = quantize(np.asarray(self._vectors), self.storage)
+            _write_array(codes_path, codes)
+            if scale is not None:
+                np.save(scale_path, scale)
+            elif scale_path.exists():
+                scale_path.unlink()
+        self._codes = np.load(codes_path, mmap_mode="r")[:count]
+        self._scale = np.load(scale_path) if scale_path.exists() else None
+
+    def _write_records(self) -> None:
+        nodes_path = self._paths[1]
+        tmp_path = nodes_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in self._records)
+        os.replace(tmp_path, nodes_path)
+
+    def _save_drift(self) -> None:
+        self._training_path.write_text(json.dumps({
+            "trained_rows": self._trained_rows,
+            "drift_rows": self._drift_rows
+        }), encoding="utf-8")
+
+    def _needs_training(self) -> bool:
+        if self._vectors is None or not len(self._vectors):
+            return False
+        if self._index is None or (self.storage != "float32" and self._codes is None):
+            return True
+        if self.index_type == "ivf" and self._index.centroids is None:
+            # Train the IVF quantizer as soon as there are enough rows for it
+            return len(self._vectors) >= self.nlist * 4
+        if self.index_type != "ivf" and self.storage != "int8":
+            return False
+        return self._drift_rows > self.retrain_drift * max(self._trained_rows, 1)
+
+    def retrain(self) -> None:
+        """Fit the IVF centroids and int8 scale on all stored rows again.
+
+        Runs by itself when the drift since the last training passes
+        ``retrain_drift``; call it directly after a large ingest or delete.
+        """
+        ivf_path = self._paths[2]
+        if self._vectors is not None:
+            self._load_codes(rebuild=True)
+        self._build_index()
+        if self._index is not None and self._index.centroids is not None:
+            np.savez(ivf_path, centroids=self._index.centroids)
+        elif ivf_path.exists():
+            ivf_path.unlink()
+        self._trained_rows, self._drift_rows = len(self._records), 0
+        self._save_drift()
+
+    def _apply_changes(self, rows: int, rebuild: bool) -> None:
+        """Count rows added or deleted towards the drift and retrain past the threshold.
+
+        Args:
+            rows: Number of rows added or deleted
+            rebuild: Rebuild the indexes on the current centroids (after a delete)
+        """
+        self._drift_rows += rows
+        if self._needs_training():
+            self.retrain()
+            return
+        if rebuild:
+            self._build_index(self._index.centroids if self._index is not None else None)
+        self._save_drift()
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        new_vectors = normalize([node.get_embedding() for node in nodes])
+        records = [{
+            "id": node.node_id,
+            "ref_doc_id": node.ref_doc_id,
+            "node": node_to_metadata_dict(node, remove_text=False, flat_metadata=False)
+        } for node in nodes]
+        vectors_path, nodes_path, _ = self._paths
+        count = len(self._records)
+        # Rows past the last committed record are ignored on load, so the
+        # records are appended last
+        self._vectors = _append_rows(vectors_path, new_vectors, count)
+        if self._codes is not None:
+            codes, _ = quantize(new_vectors, self.storage, self._scale)
+            self._codes = _append_rows(self._codes_paths[0], codes, count)
+        with open(nodes_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        self._records.extend(records)
+        if self._index is not None:
+            self._metadata_index.extend([record["node"] for record in records])
+            self._index.extend(self._vectors, self._codes)
+        self._apply_changes(len(records), rebuild=False)
+        return [node.node_id for node in nodes]
+
+    def bulk_load(self, batches: Iterable["RowBatch"], count: int, dim: int) -> int:
+        """Replace the contents of the store with already embedded rows.
+
+        The vectors are streamed into a memory-mapped .npy file, and the
+        codes and indexes are trained once at the end.
+
+        Args:
+            batches: Rows to load
+            count: Total number of rows in the batches
+            dim: Embedding dimensions
+
+        Returns:
+            Number of rows loaded
+        """
+        vectors_path = self._paths[0]
+        tmp_vectors = vectors_path.with_suffix(".tmp.npy")
+        vectors = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype=np.float32, shape=(count, dim))
+        records: List[Dict[str, Any]] = []
+        try:
+            for batch in batches:
+                if len(records) + len(batch.ids) > count:
+                    raise ValueError(f"More than the announced {count} rows")
+                vectors[len(records):len(records) + len(batch.ids)] = normalize(batch.embeddings)
+                for node_id, text, metadata in zip(batch.ids, batch.texts, batch.metadatas):
+                    node = metadata_dict_to_node(metadata, text=text)
+                    records.append({
+                        "id": node_id,
+                        "ref_doc_id": node.ref_doc_id,
+                        "node": node_to_metadata_dict(node, remove_text=False, flat_metadata=False)
+                    })
+            if len(records) != count:
+                raise ValueError(f"Expected {count} rows, got {len(records)}")
+            vectors.flush()
+        except Exception:
+            del vectors
+            tmp_vectors.unlink()
+            raise
+        del vectors
+        os.replace(tmp_vectors, vectors_path)
+        self._records = records
+        self._write_records()
+        self._vectors = np.load(vectors_path, mmap_mode="r")
+        self.retrain()
+        return count
+
+    def row_batches(self, batch_size: int) -> Iterator["RowBatch"]:
+        """Stored rows in row order, with node metadata as Chroma stores it"""
+        for start in range(0, len(self._records), batch_size):
+            records = self._records[start:start + batch_size]
+            nodes = [metadata_dict_to_node(record["node"]) for record in records]
+            yield RowBatch(
+                ids=[record["id"] for record in records],
+                texts=[node.get_content() for node in nodes],
+                metadatas=[node_to_metadata_dict(node, remove_text=True, flat_metadata=False) for node in nodes],
+                embeddings=np.asarray(self._vectors[start:start + len(records)], dtype=np.float32)
+            )
+
+    def _keep_rows(self, keep: List[int]) -> None:
+        """Rewrite the store with only the given rows"""
+        if len(keep) == len(self._records):
+            return
+        removed = len(self._records) - len(keep)
+        rows = np.asarray(keep, dtype=np.int64)
+        self._records = [self._records[i] for i in keep]
+        self._vectors = _write_array(self._paths[0], np.asarray(self._vectors[rows]))
+        if self._codes is not None:
+            # Kept rows keep their codes; the int8 scale is refitted on retraining
+            self._codes = _write_array(self._codes_paths[0], np.asarray(self._codes[rows]))
+        self._write_records()
+        self._apply_changes(removed, rebuild=True)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._keep_rows([i for i, record in enumerate(self._records) if record["ref_doc_id"] != ref_doc_id])
+
+    def _select_rows(self, node_ids: Optional[List[str]],
+                     filters: Optional[MetadataFilters]) -> List[int]:
+        """Rows with the given ids (all when None) that match the filters"""
+        wanted = set(node_ids) if node_ids else None
+        rows = range(len(self._records)) if filters is None else self._metadata_index.rows(filters).tolist()
+        return [row for row in rows if wanted is None or self._records[row]["id"] in wanted]
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None,
+                     filters: Optional[MetadataFilters] = None, **delete_kwargs: Any) -> None:
+        if not node_ids and not filters:
+            return
+        deleted = set(self._select_rows(node_ids, filters))
+        self._keep_rows([i for i in range(len(self._records)) if i not in deleted])
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None,
+                  filters: Optional[MetadataFilters] = None, **kwargs: Any) -> List[BaseNode]:
+        """Stored nodes with their (normalized) embeddings, all of them when node_ids is None"""
+        nodes = []
+        for row in self._select_rows(node_ids, filters):
+            node = metadata_dict_to_node(self._records[row]["node"])
+            node.embedding = self._vectors[row].tolist()
+            nodes.append(node)
+        return nodes
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if self._index is None or query.query_embedding is None:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        # Pre-filter: only rows matching the metadata filters are scored
+        candidates = self._metadata_index.rows(query.filters) if query.filters else None
+        if candidates is not None and len(candidates) == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        rows, scores = self._index.search(normalize(query.query_embedding), query.similarity_top_k, candidates)
+        nodes = [metadata_dict_to_node(self._records[row]["node"]) for row in rows]
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=[float(score) for score in scores],
+            ids=[self._records[row]["id"] for row in rows]
+        )
+
+
+def chroma_client() -> Any:
+    """Client of the Chroma server at CHROMA_HOST, or of the local persistent store"""
+    host = os.getenv("CHROMA_HOST")
+    if host:
+        return chromadb.HttpClient(host=host, port=int(os.getenv("CHROMA_PORT", "8000")))
+    return chromadb.PersistentClient(path=CHROMA_DIR)
+
+
+def create_vector_store(collection_name: str) -> BasePydanticVectorStore:
+    """Create the vector store selected by VECTOR_BACKEND for a collection"""
+    backend = os.getenv("VECTOR_BACKEND", "chroma")
+    if backend == "numpy":
+        return NumpyVectorStore(
+            persist_dir=os.path.join(NUMPY_INDEX_DIR, collection_name),
+            index_type=os.getenv("NUMPY_INDEX_TYPE", "flat"),
+            nlist=_env_int("NUMPY_IVF_NLIST") or 64,
+            nprobe=_env_int("NUMPY_IVF_NPROBE") or 8,
+            storage=os.getenv("NUMPY_STORAGE", "float32"),
+            rerank_factor=_env_int("NUMPY_RERANK_FACTOR") or 4,
+            retrain_drift=float(os.getenv("NUMPY_RETRAIN_DRIFT", "0.5"))
+        )
+    if backend == "chroma":
+        metadata = chroma_hnsw_metadata()
+        chroma_collection = chroma_client().get_or_create_collection(
+            collection_name, metadata=metadata or None
+        )
+        # Chroma fixes the HNSW settings when a collection is created and
+        # ignores the metadata for an existing one
+        stale = {key: value for key, value in metadata.items()
+                 if (chroma_collection.metadata or {}).get(key) != value}
+        if stale:
+            print(f"Collection {collection_name} keeps its HNSW settings; {stale} apply "
+                  f"to new collections only (rebuild the index to use them)")
+        return ChromaVectorStore(chroma_collection=chroma_collection)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
+
+def list_vector_stores() -> List[str]:
+    """Names of the collections of the backend selected by VECTOR_BACKEND"""
+    backend = os.getenv("VECTOR_BACKEND", "chroma")
+    if backend == "numpy":
+        if not os.path.isdir(NUMPY_INDEX_DIR):
+            return []
+        return sorted(name for name in os.listdir(NUMPY_INDEX_DIR)
+                      if os.path.isdir(os.path.join(NUMPY_INDEX_DIR, name)))
+    if backend == "chroma":
+        return sorted(getattr(c, "name", c) for c in chroma_client().list_collections())
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
+
+def delete_vector_store(collection_name: str) -> None:
+    """Delete a collection of the backend selected by VECTOR_BACKEND (no-op if missing)"""
+    backend = os.getenv("VECTOR_BACKEND", "chroma")
+    if backend == "numpy":
+        shutil.rmtree(os.path.join(NUMPY_INDEX_DIR, collection_name), ignore_errors=True)
+    elif backend == "chroma":
+        if collection_name in list_vector_stores():
+            chroma_client().delete_collection(collection_name)
+    else:
+        raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
+
+CHROMA_EXPORT_BATCH = 1000
+CHROMA_ADD_BATCH = 5000  # Below Chroma's default maximum batch size (5461)
+
+
+@dataclass
+class RowBatch:
+    """Stored rows of a collection, in the form Chroma stores them.
+
+    ``metadatas`` are llama-index node metadata dicts without the node text
+    (``node_to_metadata_dict(node, remove_text=True)``); the text is in
+    ``texts``. ``embeddings`` is a float32 matrix with one row per node.
+    """
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+    embeddings: np.ndarray
+
+
+def count_rows(vector_store: BasePydanticVectorStore) -> int:
+    """Number of nodes in a vector store"""
+    if isinstance(vector_store, NumpyVectorStore):
+        return len(vector_store._records)
+    if isinstance(vector_store, ChromaVectorStore):
+        return vector_store.client.count()
+    raise ValueError(f"Unsupported vector store: {vector_store.class_name()}")
+
+
+def iter_row_batches(vector_store: BasePydanticVectorStore,
+                     batch_size: int = CHROMA_EXPORT_BATCH) -> Iterator[RowBatch]:
+    """All rows of a vector store, with their stored embeddings, in batches"""
+    if isinstance(vector_store, NumpyVectorStore):
+        yield from vector_store.row_batches(batch_size)
+        return
+    if isinstance(vector_store, ChromaVectorStore):
+        collection = vector_store.client
+        # Fetching by id avoids OFFSET scans, which get slower with every page
+        ids = collection.get(include=[])["ids"]
+        for offset in range(0, len(ids), batch_size):
+            result = collection.get(ids=ids[offset:offset + batch_size],
+                                    include=["embeddings", "metadatas", "documents"])
+            yield RowBatch(
+                ids=list(result["ids"]),
+                texts=list(result["documents"]),
+                metadatas=list(result["metadatas"]),
+                embeddings=np.asarray(result["embeddings"], dtype=np.float32)
+            )
+        return
+    raise ValueError(f"Unsupported vector store: {vector_store.class_name()}")
+
+
+def load_row_batches(vector_store: BasePydanticVectorStore, batches: Iterable[RowBatch],
+                     count: int, dim: int) -> int:
+    """Bulk-load embedded rows into an empty vector store.
+
+    Args:
+        vector_store: Target store
+        batches: Rows to load
+        count: Total number of rows in the batches
+        dim: Embedding dimensions
+
+    Returns:
+        Number of rows loaded
+    """
+    if isinstance(vector_store, NumpyVectorStore):
+        return vector_store.bulk_load(batches, count, dim)
+    if isinstance(vector_store, ChromaVectorStore):
+        collection = vector_store.client
+        loaded = 0
+        for batch in batches:
+            for offset in range(0, len(batch.ids), CHROMA_ADD_BATCH):
+                end = offset + CHROMA_ADD_BATCH
+                collection.add(ids=batch.ids[offset:end], embeddings=batch.embeddings[offset:end],
+                               metadatas=batch.metadatas[offset:end], documents=batch.texts[offset:end])
+            loaded += len(batch.ids)
+        return loaded
+    raise ValueError(f"Unsupported vector store: {vector_store.class_name()}")
+
+
+def export_nodes(vector_store: BasePydanticVectorStore) -> List[BaseNode]:
+    """All nodes of a vector store, with their embeddings"""
+    if isinstance(vector_store, NumpyVectorStore):
+        return vector_store.get_nodes()
+    if isinstance(vector_store, ChromaVectorStore):
+        nodes = []
+        for batch in iter_row_batches(vector_store):
+            for text, metadata, embedding in zip(batch.texts, batch.metadatas, batch.embeddings):
+                node = metadata_dict_to_node(metadata, text=text)
+                node.embedding = embedding.tolist()
+                nodes.append(node)
+        return nodes
+    raise ValueError(f"Unsupported vector store: {vector_store.class_name()}")
+
+
+def store_bytes() -> int:
+    """Bytes on disk used by the backend selected by VECTOR_BACKEND (0 for a Chroma server)"""
+    backend = os.getenv("VECTOR_BACKEND", "chroma")
+    if backend == "chroma" and os.getenv("CHROMA_HOST"):
+        return 0
+    root = Path(NUMPY_INDEX_DIR if backend == "numpy" else CHROMA_DIR)
+    if not root.exists():
+        return 0
+    return sum(path.stat().st_size for path in root.rglob("*") if path.is_file())
+
+
+def remove_orphaned_segments() -> List[str]:
+    """Delete the segment directories of deleted Chroma collections.
+
+    Chroma removes a deleted collection from its SQLite file but leaves the
+    collection's HNSW segment directory on disk, so every rebuild or
+    compaction would otherwise add one. Directories are listed before the
+    live segments are read, so a collection created meanwhile is never
+    mistaken for a deleted one.
+
+    Returns:
+        Names of the removed directories
+    """
+    if os.getenv("VECTOR_BACKEND", "chroma") != "chroma" or os.getenv("CHROMA_HOST"):
+        return []
+    sqlite_path = os.path.join(CHROMA_DIR, "chroma.sqlite3")
+    if not os.path.exists(sqlite_path):
+        return []
+    directories = [path for path in Path(CHROMA_DIR).iterdir() if path.is_dir() and _is_uuid(path.name)]
+    connection = sqlite3.connect(sqlite_path)
+    try:
+        live = {row[0] for row in connection.execute("SELECT id FROM segments")}
+    finally:
+        connection.close()
+    removed = [path.name for path in directories if path.name not in live]
+    for name in removed:
+        shutil.rmtree(os.path.join(CHROMA_DIR, name), ignore_errors=True)
+    return removed
+
+
+def _is_uuid(name: str) -> bool:
+    try:
+        return str(uuid.UUID(name)) == name
+    except ValueError:
+        return False
+
+
+def vacuum_store() -> List[str]:
+    """Reclaim the disk space of deleted Chroma records and collections.
+
+    Removes orphaned segment directories, then returns free pages of
+    Chroma's SQLite file to the filesystem. VACUUM runs on a connection of
+    its own while the serving client stays open; it waits up to 30 s for
+    Chroma's write transactions to finish. The numpy backend rewrites its
+    files on every delete and needs no vacuum.
+
+    Returns:
+        Names of the removed segment directories
+    """
+    if os.getenv("VECTOR_BACKEND", "chroma") != "chroma" or os.getenv("CHROMA_HOST"):
+        return []
+    removed = remove_orphaned_segments()
+    sqlite_path = os.path.join(CHROMA_DIR, "chroma.sqlite3")
+    if not os.path.exists(sqlite_path):
+        return removed
+    connection = sqlite3.connect(sqlite_path, timeout=30)
+    try:
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    return removed
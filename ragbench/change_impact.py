@@ -0,0 +1,290 @@
+"""
+Change-Impact Test Selection
+
+Re-evaluates only the dataset items whose source documents changed since a
+previous run and carries that run's results over for all other items.
+
+- ``corpus_manifest`` hashes the documents of the corpus the RAG system
+  serves (the backend's data directory by default). Evaluators write it
+  next to every detailed results file as ``<results file>.corpus.json``.
+- ``ContextIndex`` maps an item's reference contexts to the documents that
+  contain them. Documents are fingerprinted by hashed word shingles, of
+  which only a hash-selected fraction is kept, so a context is compared
+  only with the documents sharing one of its fingerprints. Whitespace and
+  case are normalized, and the first and last word of a context are
+  ignored since chunk boundaries may split them. Contexts too short to
+  keep a full shingle after that must be found as a whole, so a phrase of
+  a few common words never maps a context to a document.
+- ``ImpactSelector`` diffs the current manifest against the previous run's.
+  An item is re-evaluated when a context lies in an added or modified
+  document, when a context is no longer found in the corpus (its text was
+  edited or its document removed), when it has no contexts, or when the
+  previous run has no result for it.
+
+Retrieval is not isolated per document: a new document can change the
+answers to questions about other documents as well. The selection only
+covers questions grounded in changed text, so keep running the full suite
+periodically, and whenever the RAG or judge configuration changes.
+"""
+
+import argparse
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from results_store import query_key
+
+MANIFEST_SUFFIX = ".corpus.json"
+SHINGLE_WORDS = 8   # Words per fingerprinted shingle
+SHINGLE_SAMPLE = 4  # Keep the shingles whose hash is divisible by this
+TEXT_SUFFIXES = ('.txt', '.md', '.csv', '.json', '.html')
+
+# Reasons an item is re-evaluated
+NEW = "new"
+CHANGED = "changed"
+UNMAPPED = "unmapped"
+NO_CONTEXT = "no_context"
+
+
+def _words(text: str) -> List[str]:
+    return text.lower().split()
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _corpus_files(corpus_dir: str) -> Iterator[Tuple[str, Path]]:
+    root = Path(corpus_dir)
+    for path in sorted(root.rglob("*")):
+        name = path.relative_to(root).as_posix()
+        if path.is_file() and not any(part.startswith(".") for part in name.split("/")):
+            yield name, path
+
+
+def corpus_manifest(corpus_dir: str) -> Dict[str, str]:
+    """Content hash of every document in a corpus directory.
+
+    Args:
+        corpus_dir: Directory of the documents; hidden files are skipped
+
+    Returns:
+        Dict of document path (relative to corpus_dir) to SHA-256
+    """
+    if not Path(corpus_dir).is_dir():
+        raise FileNotFoundError(f"Corpus directory not found: {corpus_dir}")
+    return {name: _file_sha256(path) for name, path in _corpus_files(corpus_dir)}
+
+
+def diff_manifests(previous: Dict[str, str], current: Dict[str, str]) -> Dict[str, List[str]]:
+    """Documents added, removed and modified between two manifests"""
+    return {
+        "added": sorted(current.keys() - previous.keys()),
+        "removed": sorted(previous.keys() - current.keys()),
+        "modified": sorted(name for name in current.keys() & previous.keys()
+                           if current[name] != previous[name])
+    }
+
+
+def manifest_path(results_file: Path) -> Path:
+    return Path(results_file).with_suffix(MANIFEST_SUFFIX)
+
+
+def write_corpus_manifest(results_file: Path, corpus_dir: str,
+                          documents: Optional[Dict[str, str]] = None) -> Optional[Path]:
+    """Record the corpus a results file was produced against.
+
+    Args:
+        results_file: Detailed results file of the run
+        corpus_dir: Corpus directory of the RAG system
+        documents: Manifest taken when the run started; computed now if None
+
+    Returns:
+        Path of the manifest, or None if the corpus directory does not exist
+    """
+    if documents is None:
+        if not Path(corpus_dir).is_dir():
+            return None
+        documents = corpus_manifest(corpus_dir)
+    path = manifest_path(results_file)
+    path.write_text(json.dumps({
+        "corpus_dir": str(Path(corpus_dir).resolve()),
+        "documents": documents
+    }, indent=2), encoding="utf-8")
+    return path
+
+
+def read_corpus_manifest(results_file: Path) -> Optional[Dict[str, str]]:
+    """Corpus manifest recorded with a results file (None if there is none)"""
+    path = manifest_path(results_file)
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))["documents"]
+
+
+def find_baseline(results_dir: str, pattern: str) -> Optional[Path]:
+    """Most recent results file in results_dir that has a corpus manifest.
+
+    Args:
+        results_dir: Directory of the evaluator's results
+        pattern: Glob of its detailed results files
+
+    Returns:
+        Path of the results file, or None
+    """
+    candidates = [path for path in Path(results_dir).glob(pattern) if manifest_path(path).is_file()]
+    return max(candidates, key=lambda path: path.stat().st_mtime, default=None)
+
+
+def read_document(path: Path) -> str:
+    """Text of a corpus document, read the way the RAG backend reads it."""
+    if path.suffix.lower() in TEXT_SUFFIXES:
+        return path.read_text(encoding="utf-8", errors="ignore")
+    try:
+        from llama_index.core import SimpleDirectoryReader
+        documents = SimpleDirectoryReader(input_files=[str(path)]).load_data()
+        return "\n".join(document.text for document in documents)
+    except Exception as e:
+        print(f"Could not read {path} ({e}); its contexts will not be mapped")
+        return ""
+
+
+class ContextIndex:
+    """Maps reference contexts to the corpus documents containing them.
+
+    Args:
+        corpus_dir: Directory of the corpus documents
+    """
+
+    def __init__(self, corpus_dir: str):
+        self.documents: Dict[str, str] = {}
+        self.fingerprints: Dict[int, Tuple[str, ...]] = {}
+        self._sources: Dict[str, Set[str]] = {}
+        for name, path in _corpus_files(corpus_dir):
+            words = _words(read_document(path))
+            self.documents[name] = f" {' '.join(words)} "
+            for h in self._shingle_hashes(words):
+                owners = self.fingerprints.get(h, ())
+                if name not in owners:
+                    self.fingerprints[h] = owners + (name,)
+
+    @staticmethod
+    def _shingle_hashes(words: List[str]) -> Iterator[int]:
+        for i in range(len(words) - SHINGLE_WORDS + 1):
+            h = hash(tuple(words[i:i + SHINGLE_WORDS]))
+            if h % SHINGLE_SAMPLE == 0:
+                yield h
+
+    def sources(self, context: str) -> Set[str]:
+        """Documents containing a context (empty if none does)"""
+        words = _words(context)
+        # Trimming the boundary words must leave at least one full shingle
+        core = words[1:-1] if len(words) >= SHINGLE_WORDS + 2 else words
+        text = " ".join(core)
+        key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        if key not in self._sources:
+            hashes = list(self._shingle_hashes(core))
+            if hashes:
+                candidates = set().union(*(self.fingerprints.get(h, ()) for h in hashes))
+            else:
+                candidates = self.documents.keys()
+            self._sources[key] = {
+                name for name in candidates if f" {text} " in self.documents[name]
+            }
+        return self._sources[key]
+
+
+class ImpactSelector:
+    """Selects the dataset items affected by corpus changes since a previous run.
+
+    Args:
+        corpus_dir: Current corpus directory of the RAG system
+        previous_documents: Corpus manifest of the previous run
+        previous_rows: Result rows of the previous run
+        query_field: Item key holding the question
+        contexts_field: Item key holding the reference contexts
+        result_query_field: Result column holding the question (default: query_field)
+    """
+
+    def __init__(self, corpus_dir: str, previous_documents: Dict[str, str],
+                 previous_rows: Iterable[Dict[str, Any]],
+                 query_field: str, contexts_field: str, result_query_field: Optional[str] = None):
+        self.documents = corpus_manifest(corpus_dir)
+        self.changes = diff_manifests(previous_documents, self.documents)
+        self.changed = set(self.changes["added"]) | set(self.changes["modified"])
+        self.index = ContextIndex(corpus_dir)
+        self.query_field = query_field
+        self.contexts_field = contexts_field
+        result_query_field = result_query_field or query_field
+        self.previous = {query_key(str(row[result_query_field])): row for row in previous_rows}
+        self.reasons: Counter = Counter()
+        self.carried: List[Tuple[Any, Dict[str, Any]]] = []
+
+    def reason(self, item: Dict[str, Any]) -> Optional[str]:
+        """Why an item has to be re-evaluated (None if its result carries over)"""
+        if query_key(item[self.query_field]) not in self.previous:
+            return NEW
+        contexts = [context for context in item.get(self.contexts_field) or [] if context.strip()]
+        if not contexts:
+            return NO_CONTEXT
+        sources = [self.index.sources(context) for context in contexts]
+        if not all(sources):
+            return UNMAPPED
+        if any(source & self.changed for source in sources):
+            return CHANGED
+        return None
+
+    def select(self, entries: Iterable[Tuple[Any, Dict[str, Any]]]) -> Iterator[Tuple[Any, Dict[str, Any]]]:
+        """Yield the impacted items and collect the carried-over results.
+
+        Args:
+            entries: (tag, item) pairs, e.g. (test case id, golden)
+
+        Returns:
+            Iterator of the (tag, item) pairs to re-evaluate; the previous
+            result of every other item is appended to ``carried`` as (tag, row)
+        """
+        for tag, item in entries:
+            reason = self.reason(item)
+            if reason:
+                self.reasons[reason] += 1
+                yield tag, item
+            else:
+                self.carried.append((tag, self.previous[query_key(item[self.query_field])]))
+
+    def describe(self) -> str:
+        """One-line account of the corpus changes"""
+        changes = ", ".join(f"{len(names)} {kind}" for kind, names in self.changes.items())
+        return f"Corpus changes since the previous run: {changes}"
+
+    def summary(self, sep: str = " ") -> Dict[str, Any]:
+        """Impacted and carried-over item counts with the changed documents."""
+        def key(*words: str) -> str:
+            return sep.join(words)
+
+        changed = self.changes["added"] + self.changes["modified"] + self.changes["removed"]
+        summary = {
+            key("Changed", "Documents"): ";".join(changed),
+            key("Impacted", "Items"): sum(self.reasons.values()),
+            key("Carried", "Over", "Items"): len(self.carried)
+        }
+        for reason in (NEW, CHANGED, UNMAPPED, NO_CONTEXT):
+            label = reason.replace("_", " ").title().split()
+            summary[key("Impacted", *label)] = self.reasons[reason]
+        return summary
+
+
+def add_impact_arguments(parser: argparse.ArgumentParser, corpus_dir: str) -> None:
+    """Register the shared change-impact options on a CLI parser."""
+    parser.add_argument("--impacted", action="store_true",
+                        help="Re-evaluate only items affected by corpus changes since the previous run")
+    parser.add_argument("--baseline", default=None,
+                        help="Detailed results file of the previous run (default: the latest one)")
+    parser.add_argument("--corpus", default=corpus_dir,
+                        help="Document directory of the RAG system")
@@ -0,0 +1,168 @@
+"""
+Streaming Dataset Loader
+
+Iterates over evaluation datasets one record at a time instead of loading the
+whole file with ``json.load``. Supports both the JSON array files written by
+the QA generators and a line-delimited JSONL format, keeps only the fields a
+caller asks for and can split a dataset into shards for parallel workers.
+"""
+
+import argparse
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+READ_CHUNK_SIZE = 1 << 16  # Characters read per chunk from JSON array files
+
+Shard = Tuple[int, int]
+
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def parse_shard(value: Optional[str]) -> Optional[Shard]:
+    """Parse a shard spec of the form ``i/n`` (zero based index).
+
+    Args:
+        value: Shard specification, e.g. ``"0/4"``. ``None`` disables sharding.
+
+    Returns:
+        Tuple of (index, count) or None
+    """
+    if value is None:
+        return None
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected the form i/n")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}', index must be in [0, {count})")
+    return index, count
+
+
+def _iter_json_array(path: Path) -> Iterator[Dict[str, Any]]:
+    """Incrementally decode the elements of a top-level JSON array.
+
+    Elements are decoded in place from an offset into the buffer. When one
+    spans past the buffer, at least as much again as is buffered is read
+    before the next attempt, so a large element is decoded a logarithmic
+    number of times rather than once per chunk.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(READ_CHUNK_SIZE).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"Expected a JSON array in {path}")
+        pos = 1
+        eof = False
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if buffer.startswith(']', pos):
+                return
+            try:
+                if pos == len(buffer):
+                    raise json.JSONDecodeError("Unterminated JSON array", buffer, pos)
+                item, end = decoder.raw_decode(buffer, pos)
+                # A number at the end of the buffer may continue in the next chunk
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                buffer = buffer[pos:]
+                pos = 0
+                chunk = f.read(max(READ_CHUNK_SIZE, len(buffer)))
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            pos = end
+
+
+def _iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Decode one JSON object per non-empty line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_records(path: str, fields: Optional[Sequence[str]] = None,
+                 shard: Optional[Shard] = None,
+                 with_index: bool = False) -> Iterator[Any]:
+    """Lazily yield dataset records from a JSON array or JSONL file.
+
+    Args:
+        path: Path to a ``.json`` array file or a ``.jsonl`` file
+        fields: Keys to keep from each record. Records missing any of them
+            are skipped, and their number is printed at the end. ``None``
+            keeps the full record.
+        shard: Optional (index, count) tuple; only records whose position
+            modulo ``count`` equals ``index`` are yielded
+        with_index: Yield ``(position, record)`` tuples instead of records
+
+    Returns:
+        Iterator over records (or (position, record) tuples)
+    """
+    dataset_path = Path(path)
+    if not dataset_path.exists():
+        raise FileNotFoundError(f"Dataset file not found: {path}")
+
+    reader = _iter_jsonl if dataset_path.suffix == '.jsonl' else _iter_json_array
+    incomplete = 0
+    for position, record in enumerate(reader(dataset_path)):
+        if shard and position % shard[1] != shard[0]:
+            continue
+        if fields is not None:
+            if not all(key in record for key in fields):
+                incomplete += 1
+                continue
+            record = {key: record[key] for key in fields}
+        yield (position, record) if with_index else record
+    if incomplete:
+        print(f"Skipped {incomplete} records of {path} missing any of the fields {', '.join(fields)}")
+
+
+def convert_to_jsonl(src: str, dst: str) -> int:
+    """Rewrite a JSON array dataset as JSONL so it can be streamed line by line.
+
+    Args:
+        src: Source JSON array file
+        dst: Destination JSONL file
+
+    Returns:
+        Number of records written
+    """
+    count = 0
+    with open(dst, 'w', encoding='utf-8') as f:
+        for record in iter_records(src):
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write('\n')
+            count += 1
+    return count
+
+
+def add_shard_argument(parser: argparse.ArgumentParser) -> None:
+    """Register the shared ``--shard i/n`` option on a CLI parser."""
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help="Only process shard i of n (zero based), e.g. --shard 0/4"
+    )
+
+
+def main():
+    """Convert a JSON array dataset to JSONL."""
+    parser = argparse.ArgumentParser(description="Convert a JSON dataset to JSONL")
+    parser.add_argument("src", help="JSON array dataset")
+    parser.add_argument("dst", help="Output JSONL file")
+    args = parser.parse_args()
+
+    count = convert_to_jsonl(args.src, args.dst)
+    print(f"Wrote {count} records to {args.dst}")
+
+if __name__ == "__main__":
+    main()
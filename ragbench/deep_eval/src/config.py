@@ -1,3 +1,5 @@
+from pathlib import Path
+
 class Config:
     """Configuration settings for DeepEval implementation."""
     
@@ -14,3 +16,34 @@ class Config:
     
     # Generation settings
     INCLUDE_EXPECTED_OUTPUT = True
+    PRECOMPUTE_QUESTION_EMBEDDINGS = True  # Write <golden file>.embeddings.npz for the evaluators
+    
+    # LLM rate limits (shared by GEval and the Synthesizer, per process)
+    LLM_REQUESTS_PER_MINUTE = 500
+    LLM_TOKENS_PER_MINUTE = 200000
+    MAX_CONCURRENT = 8
+    
+    # Evaluation settings
+    EVAL_BATCH_SIZE = 8       # Goldens queried and pre-filtered together
+    PREFILTER_ENABLED = True  # Skip GEval for empty or obviously (mis)matching answers
+    RESULTS_STORE_ENABLED = True  # Also record runs in the SQLite results store (ragbench/results_store.py)
+    THRESHOLDS = {
+        "correctness": 0.7
+    }
+    
+    # Judge cascade: GEval with CASCADE_CHEAP_MODEL first; the OPENAI_MODEL judge only gets
+    # cases whose cheap score falls into the [low, high) band around the threshold
+    JUDGE_CASCADE_ENABLED = False
+    CASCADE_CHEAP_MODEL = "gpt-4o-mini"
+    CASCADE_BANDS = {
+        "correctness": (0.5, 0.85)
+    }
+    CASCADE_CALIBRATION_RATE = 0.1  # Cases judged by both tiers to measure their agreement
+    
+    # Sequential sampling (--sequential): stop once every THRESHOLDS decision is settled
+    SEQUENTIAL_CONFIDENCE = 0.95  # Joint confidence over all metrics
+    SEQUENTIAL_MIN_ITEMS = 30     # Never stop before this many judged test cases
+    SEQUENTIAL_CI_METHOD = "auto"  # wilson, bootstrap, or auto (Wilson for 0/1 scores)
+    
+    # Change-impact selection (--impacted): re-evaluate only goldens grounded in changed documents
+    CORPUS_DIR = str(Path(__file__).resolve().parents[3] / "examples" / "ragstack" / "backend" / "data")
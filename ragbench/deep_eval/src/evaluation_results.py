@@ -7,12 +7,32 @@ Author: Anand Ramkumar
 Date: 2025-03-07
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 import csv
+import sys
 from datetime import datetime
 import statistics
 
+from config import Config
+
+# Add ragbench directory to Python path to enable shared imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from change_impact import write_corpus_manifest
+from percentiles import percentile
+from results_store import record_run
+from judge_cascade import JudgeCascade
+
+# Per-query performance columns aggregated into the summary
+LATENCY_COLUMNS = ('RAG_Latency_ms', 'Server_Total_ms', 'Judge_Latency_ms')
+USAGE_COLUMNS = ('Judge_Calls', 'Judge_Prompt_Tokens', 'Judge_Completion_Tokens', 'Judge_Cost_USD')
+
+# Column types restored when reading a detailed results CSV back (other columns stay strings)
+INT_COLUMNS = ('Test_Case_ID', 'Judge_Calls', 'Judge_Prompt_Tokens', 'Judge_Completion_Tokens')
+FLOAT_COLUMNS = ('Score', 'Cheap_Score', 'RAG_Latency_ms', 'Server_Retrieve_ms', 'Server_Synthesize_ms',
+                 'Server_Total_ms', 'Judge_Latency_ms', 'Judge_Cost_USD')
+BOOL_COLUMNS = ('Calibration', 'Carried_Over')
+
 class EvaluationResults:
     """Class to handle evaluation results and CSV generation."""
     
@@ -30,12 +50,17 @@ class EvaluationResults:
         self.detailed_results: List[Dict] = []
         self.success_threshold = success_threshold
         
-    def add_result(self, test_case_id: int, input_query: str, 
-                  expected_output: str, actual_output: str,
-                  score: float, reason: str,
-                  contexts: List[Dict] = None):
-        """Add a single test case result."""
-        self.detailed_results.append({
+    def build_result(self, test_case_id: int, input_query: str,
+                     expected_output: str, actual_output: str,
+                     score: float, reason: str,
+                     contexts: List[Dict] = None,
+                     extra: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Build a detailed result row without storing it.
+        
+        Args:
+            extra: Additional columns appended to the row
+        """
+        row = {
             'Test_Case_ID': test_case_id,
             'Input_Query': input_query,
             'Expected_Output': expected_output,
@@ -44,33 +69,127 @@ class EvaluationResults:
             'Status': 'PASS' if score >= self.success_threshold else 'FAIL',
             'Evaluation_Reason': reason,
             'Context_Files': ';'.join([ctx['file_name'] for ctx in (contexts or [])])
-        })
+        }
+        row.update(extra or {})
+        return row
         
-    def save_results(self):
-        """Save both summary and detailed results to CSV files."""
-        # Save detailed results
-        detailed_file = self.results_dir / f"detailed_results_{self.timestamp}.csv"
-        with open(detailed_file, 'w', newline='', encoding='utf-8') as f:
-            if self.detailed_results:
-                writer = csv.DictWriter(f, fieldnames=self.detailed_results[0].keys())
-                writer.writeheader()
-                writer.writerows(self.detailed_results)
+    def add_result(self, test_case_id: int, input_query: str, 
+                  expected_output: str, actual_output: str,
+                  score: float, reason: str,
+                  contexts: List[Dict] = None):
+        """Add a single test case result."""
+        self.detailed_results.append(self.build_result(
+            test_case_id, input_query, expected_output, actual_output,
+            score, reason, contexts
+        ))
+        
+    def add_rows(self, rows: List[Dict[str, Any]]):
+        """Add result rows that were built elsewhere, e.g. by worker processes."""
+        self.detailed_results.extend(rows)
+        
+    @staticmethod
+    def load_rows(detailed_file: Path) -> List[Dict[str, Any]]:
+        """Read the rows of a detailed results CSV with their column types restored."""
+        def convert(column: str, value: str) -> Any:
+            if column in BOOL_COLUMNS:
+                return value == 'True'
+            if column not in INT_COLUMNS + FLOAT_COLUMNS:
+                return value
+            if value == '':
+                return None
+            return int(float(value)) if column in INT_COLUMNS else float(value)
         
-        # Calculate summary statistics
+        with open(detailed_file, newline='', encoding='utf-8') as f:
+            return [{column: convert(column, value) for column, value in row.items()}
+                    for row in csv.DictReader(f)]
+        
+    def summarize(self) -> Dict[str, Any]:
+        """Calculate summary statistics over all stored results."""
         scores = [r['Score'] for r in self.detailed_results]
         passed_cases = len([r for r in self.detailed_results if r['Status'] == 'PASS'])
         total_cases = len(self.detailed_results)
         
-        summary_data = {
+        return {
             'Timestamp': self.timestamp,
             'Total_Test_Cases': total_cases,
             'Average_Score': round(statistics.mean(scores) if scores else 0, 2),
             'Success_Rate': round((passed_cases / total_cases * 100) if total_cases else 0, 2),
             'Failed_Queries': len([r for r in self.detailed_results if not r['Actual_Output']]),
             'Passed_Cases': passed_cases,
-            'Failed_Cases': total_cases - passed_cases
+            'Failed_Cases': total_cases - passed_cases,
+            'Judge_Calls_Avoided': len([
+                r for r in self.detailed_results
+                if r.get('Prefilter_Verdict', 'judge') != 'judge'
+            ]),
+            **self.summarize_tiers(),
+            **self.summarize_cascade(),
+            **self.summarize_performance()
         }
         
+    def summarize_tiers(self) -> Dict[str, int]:
+        """Test cases decided by each judge tier of the cascade."""
+        tiers = [r['Judge_Tier'] for r in self.detailed_results if r.get('Judge_Tier')]
+        if not tiers:
+            return {}
+        return {f'{tier.title()}_Tier_Verdicts': tiers.count(tier) for tier in ('prefilter', 'cheap', 'strong')}
+        
+    def summarize_cascade(self) -> Dict[str, Any]:
+        """Escalation and tier agreement rates of the judge cascade over stored results."""
+        if not Config.JUDGE_CASCADE_ENABLED:
+            return {}
+        cascade = JudgeCascade(Config.THRESHOLDS, Config.CASCADE_BANDS)
+        for r in self.detailed_results:
+            if r.get('Judge_Tier'):
+                cascade.observe('correctness', r['Judge_Tier'], r.get('Cheap_Score'), r['Score'],
+                                r.get('Calibration', False))
+        return cascade.summary(sep='_')
+        
+    def summarize_performance(self) -> Dict[str, Any]:
+        """Latency percentiles and judge token/cost totals over stored results."""
+        summary = {}
+        for column in LATENCY_COLUMNS:
+            values = sorted(r[column] for r in self.detailed_results if r.get(column) is not None)
+            if values:
+                summary[f'Mean_{column}'] = round(statistics.mean(values), 2)
+                summary[f'P50_{column}'] = round(percentile(values, 0.5), 2)
+                summary[f'P95_{column}'] = round(percentile(values, 0.95), 2)
+        for column in USAGE_COLUMNS:
+            summary[f'Total_{column}'] = sum(r.get(column) or 0 for r in self.detailed_results)
+        return summary
+        
+    def save_results(self, dataset: Optional[str] = None,
+                     backend_config: Optional[Dict[str, Any]] = None,
+                     extra_summary: Optional[Dict[str, Any]] = None,
+                     corpus_dir: str = Config.CORPUS_DIR,
+                     corpus: Optional[Dict[str, str]] = None):
+        """Save both summary and detailed results to CSV files and the run store.
+        
+        Args:
+            dataset (str): Golden dataset the results were produced from
+            backend_config (dict): Settings of the evaluated system and judge
+            extra_summary (dict): Additional summary statistics, e.g. of sequential sampling
+            corpus_dir (str): Document directory of the RAG backend
+            corpus (dict): Corpus manifest taken when the run started, recorded
+                next to the detailed results for change-impact selection
+        """
+        # Save detailed results; carried-over rows may come from runs with fewer columns
+        detailed_file = self.results_dir / f"detailed_results_{self.timestamp}.csv"
+        with open(detailed_file, 'w', newline='', encoding='utf-8') as f:
+            if self.detailed_results:
+                fieldnames = list(dict.fromkeys(key for row in self.detailed_results for key in row))
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(self.detailed_results)
+        write_corpus_manifest(detailed_file, corpus_dir, corpus)
+        
+        # Calculate summary statistics and record the run for cross-run comparison
+        summary_data = self.summarize()
+        summary_data.update(extra_summary or {})
+        if Config.RESULTS_STORE_ENABLED:
+            summary_data['Run_ID'] = record_run(
+                "deep_eval", self.detailed_results, summary_data, dataset, backend_config
+            )
+        
         # Save summary results
         summary_file = self.results_dir / f"summary_results_{self.timestamp}.csv"
         with open(summary_file, 'w', newline='', encoding='utf-8') as f:
@@ -7,7 +7,7 @@ of outputs against expected answers.
 Author: Anand Ramkumar
 Date: 2025-03-07
 """
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from deepeval.metrics import GEval
 from deepeval.test_case import LLMTestCase, LLMTestCaseParams
 import os
@@ -15,35 +15,55 @@ from dotenv import load_dotenv
 from pathlib import Path
 import openai
 import asyncio
+import argparse
 import sys
-import time
+import itertools
 
 # Add parent directory to Python path to enable imports
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from rag_query import RagClient
+from change_impact import (ImpactSelector, add_impact_arguments, corpus_manifest, find_baseline,
+                           read_corpus_manifest)
+from dataset_stream import add_shard_argument
+from profiling import add_profile_argument, profile_run
+from sequential_sampling import SequentialEvaluation, add_sequential_arguments
+from prefilter import FAIL, JUDGE, LocalPrefilter
+from judge_cascade import PREFILTER, STRONG, CascadeVerdict, JudgeCascade
+from llm_usage import Usage, track_usage
+from providers import require_api_key
+from question_embeddings import load_question_embeddings
+from config import Config
 from evaluation_results import EvaluationResults
+from limited_model import create_model
 
 # Load environment variables
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 # Configure OpenAI
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_API_KEY = require_api_key()  # Optional with RAGOPS_PROVIDER=fake
 MODEL_NAME = os.getenv('OPENAI_MODEL', 'gpt-4')
 
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables")
-
 # Set OpenAI API key globally
 openai.api_key = OPENAI_API_KEY
 
 class CorrectnessEvaluator:
     """Evaluator class for assessing factual correctness using GEval."""
 
-    def __init__(self):
-        """Initialize the correctness evaluator with GEval metric."""
-        self.metric = GEval(
+    def __init__(self, model_name: str = MODEL_NAME):
+        """Initialize the correctness evaluator with GEval metric.
+
+        Args:
+            model_name (str): Judge model (MODEL_NAME by default)
+        """
+        self.model = create_model(model_name)
+        self.metric = self._build_metric()
+
+    def _build_metric(self) -> GEval:
+        """Create a GEval correctness metric instance."""
+        return GEval(
             name="Correctness",
+            model=self.model,
             criteria="Determine whether the actual output is factually correct based on the expected output.",
             evaluation_steps=[
                 "Check whether the facts in 'actual output' contradicts any facts in 'expected output'",
@@ -83,63 +103,296 @@ class CorrectnessEvaluator:
             "reason": self.metric.reason
         }
 
-async def main():
-    """Run evaluation on test cases using RAG responses."""
-    # Initialize evaluator, RAG client, and results handler
+    async def aevaluate(self, input_text: str, actual_output: str, expected_output: str) -> Dict[str, Any]:
+        """
+        Asynchronously evaluate correctness of the actual output.
+
+        A fresh metric instance is used per call because GEval stores the
+        score and reason on the metric, which is unsafe under concurrency.
+
+        Args:
+            input_text (str): The input query or prompt
+            actual_output (str): The output to evaluate
+            expected_output (str): The ground truth or expected answer
+
+        Returns:
+            Dict[str, Any]: Dictionary containing score and reason for the evaluation
+        """
+        test_case = LLMTestCase(
+            input=input_text,
+            actual_output=actual_output,
+            expected_output=expected_output
+        )
+
+        metric = self._build_metric()
+        await metric.a_measure(test_case)
+
+        return {
+            "score": metric.score,
+            "reason": metric.reason
+        }
+
+DEFAULT_DATASET = Path(__file__).parent.parent / "synthetic_data" / "20250305_120256.json"
+DEFAULT_RESULTS_DIR = Path(__file__).parent.parent / "evaluation_results"
+
+async def evaluate_test_cases(evaluator: CorrectnessEvaluator, rag_client: RagClient,
+                              results_handler: EvaluationResults,
+                              test_cases: List[Tuple[int, Any]],
+                              prefilter: Optional[LocalPrefilter] = None,
+                              cascade: Optional[JudgeCascade] = None,
+                              cheap_evaluator: Optional[CorrectnessEvaluator] = None) -> List[Dict[str, Any]]:
+    """
+    Query the RAG application for a batch of test cases and evaluate them.
+
+    RAG queries go to the backend in one batch request, the local pre-filter
+    scores the whole batch at once, and only ambiguous answers are sent to
+    the GEval judge.
+
+    Args:
+        evaluator: Correctness evaluator used for ambiguous cases
+        rag_client: Client for the RAG application
+        results_handler: Builds the detailed result rows
+        test_cases: (test case id, test case) pairs
+        prefilter: Optional local pre-filter
+        cascade: Optional judge cascade; cases are judged by cheap_evaluator
+            first and by evaluator only when the cheap score is uncertain
+        cheap_evaluator: Cheap judge of the cascade
+
+    Returns:
+        List[Dict[str, Any]]: One detailed result row per test case
+    """
+    responses = await rag_client.query_many([case.input for _, case in test_cases])
+    actual_outputs = [response['response'] if response else "" for response in responses]
+
+    decisions = [None] * len(test_cases)
+    if prefilter:
+        decisions = prefilter.classify_batch(
+            actual_outputs, [case.expected_output for _, case in test_cases]
+        )
+
+    async def judge(case, actual_output, decision) -> Tuple[Dict[str, Any], Optional[Usage], Optional[CascadeVerdict]]:
+        if decision and decision.verdict != JUDGE:
+            return {"score": 0.0 if decision.verdict == FAIL else 1.0, "reason": decision.reason}, None, None
+
+        def evaluate(judge_evaluator: CorrectnessEvaluator):
+            return judge_evaluator.aevaluate(
+                input_text=case.input,
+                actual_output=actual_output,
+                expected_output=case.expected_output
+            )
+
+        with track_usage() as usage:
+            if cascade is None:
+                verdict = CascadeVerdict(await evaluate(evaluator), STRONG, None)
+            else:
+                verdict = await cascade.judge(
+                    'correctness',
+                    cheap=lambda: evaluate(cheap_evaluator),
+                    strong=lambda: evaluate(evaluator),
+                    score_of=lambda result: result['score']
+                )
+        return verdict.result, usage, verdict
+
+    judged = await asyncio.gather(*(
+        judge(case, actual_output, decision)
+        for (_, case), actual_output, decision in zip(test_cases, actual_outputs, decisions)
+    ))
+
+    rows = []
+    for (case_id, case), response, actual_output, decision, (result, usage, verdict) in zip(
+            test_cases, responses, actual_outputs, decisions, judged):
+        rows.append(results_handler.build_result(
+            test_case_id=case_id,
+            input_query=case.input,
+            expected_output=case.expected_output,
+            actual_output=actual_output,
+            score=result['score'],
+            reason=result['reason'],
+            contexts=response.get('contexts', []) if response else [],
+            extra={
+                'Prefilter_Verdict': decision.verdict if decision else JUDGE,
+                'Judge_Tier': verdict.tier if verdict else PREFILTER,
+                'Cheap_Score': verdict.cheap_score if verdict else None,
+                'Calibration': verdict.calibration if verdict else False,
+                **performance_columns(response, usage)
+            }
+        ))
+    return rows
+
+def performance_columns(response: Optional[Dict[str, Any]], usage: Optional[Usage]) -> Dict[str, Any]:
+    """RAG latency, backend stage timings and judge usage for a result row.
+
+    Args:
+        response: RAG response (None if the query failed)
+        usage: Judge usage (None if the pre-filter skipped the judge)
+
+    Returns:
+        Dict[str, Any]: Columns with the same keys for every row
+    """
+    timings = (response or {}).get('timings') or {}
+    return {
+        'RAG_Latency_ms': (response or {}).get('latency_ms'),
+        'Server_Retrieve_ms': timings.get('retrieve_ms'),
+        'Server_Synthesize_ms': timings.get('synthesize_ms'),
+        'Server_Total_ms': timings.get('total_ms'),
+        'Judge_Latency_ms': usage.latency_ms if usage else None,
+        'Judge_Calls': usage.calls if usage else 0,
+        'Judge_Prompt_Tokens': usage.prompt_tokens if usage else 0,
+        'Judge_Completion_Tokens': usage.completion_tokens if usage else 0,
+        'Judge_Cost_USD': usage.cost_usd if usage else 0.0
+    }
+
+def impact_selector(results_dir, baseline: Optional[str], corpus_dir: str) -> Optional[ImpactSelector]:
+    """Selector of the test cases affected by corpus changes since a previous run.
+
+    Args:
+        results_dir: Directory of the previous runs' detailed results
+        baseline: Detailed results file of the previous run; defaults to the
+            latest one in results_dir with a corpus manifest
+        corpus_dir: Document directory of the RAG backend
+
+    Returns:
+        Optional[ImpactSelector]: None if there is no previous run to compare with
+    """
+    baseline_file = Path(baseline) if baseline else find_baseline(results_dir, "detailed_results_*.csv")
+    if baseline_file is None:
+        return None
+    documents = read_corpus_manifest(baseline_file)
+    if documents is None:
+        raise FileNotFoundError(f"No corpus manifest recorded with {baseline_file}")
+    print(f"Comparing the corpus with the run of {baseline_file}")
+    # Test cases whose RAG query failed last time are evaluated again
+    previous_rows = [row for row in EvaluationResults.load_rows(baseline_file) if row['Actual_Output']]
+    return ImpactSelector(corpus_dir, documents, previous_rows, 'input', 'context',
+                          result_query_field='Input_Query')
+
+async def main(json_path=DEFAULT_DATASET, results_dir=DEFAULT_RESULTS_DIR, shard=None,
+               sequential: Optional[SequentialEvaluation] = None, stratify=False, seed=None,
+               impacted=False, baseline=None, corpus_dir=Config.CORPUS_DIR):
+    """Run evaluation on test cases using RAG responses.
+
+    Args:
+        json_path: Golden dataset to evaluate (JSON or JSONL)
+        results_dir: Directory for the detailed and summary CSV files
+        shard: Optional (index, count) tuple to evaluate a single dataset shard
+        sequential: Judge the test cases in random order and stop once the
+            correctness decision (Config.THRESHOLDS) is settled
+        stratify: Stratify the sequential sampling order by source file
+        seed: Seed of the sequential sampling order
+        impacted: Evaluate only the test cases affected by corpus changes since
+            the baseline run and carry its results over for the others
+        baseline: Detailed results file of the baseline run (default: latest)
+        corpus_dir: Document directory of the RAG backend
+    """
+    # Initialize evaluator, RAG client, pre-filter and results handler
     evaluator = CorrectnessEvaluator()
-    rag_client = RagClient()
-    results_handler = EvaluationResults("D:/RAGOps-Workspace/RAGOps-Suite/ragbench/deep_eval/evaluation_results")
+    rag_client = RagClient(question_embeddings=load_question_embeddings(str(json_path)))
+    prefilter = LocalPrefilter() if Config.PREFILTER_ENABLED else None
+    cascade, cheap_evaluator = None, None
+    if Config.JUDGE_CASCADE_ENABLED:
+        cascade = JudgeCascade(Config.THRESHOLDS, Config.CASCADE_BANDS,
+                               calibration_rate=Config.CASCADE_CALIBRATION_RATE)
+        cheap_evaluator = CorrectnessEvaluator(Config.CASCADE_CHEAP_MODEL)
+    results_handler = EvaluationResults(str(results_dir), success_threshold=Config.THRESHOLDS['correctness'])
+    selector = impact_selector(results_dir, baseline, corpus_dir) if impacted else None
+    if selector:
+        corpus = selector.documents
+    else:
+        corpus = corpus_manifest(corpus_dir) if Path(corpus_dir).is_dir() else None
     
     # Load test cases
-    json_path = Path(__file__).parent.parent / "synthetic_data" / "20250305_120256.json"
     from test_extractor import TestExtractor
     test_extractor = TestExtractor(str(json_path))
-    test_cases = test_extractor.load_test_cases()
     
-    # Evaluate each test case
-    print(f"\nEvaluating {len(test_cases)} test cases:")
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"\nTest Case {i}:")
-        print(f"Input: {test_case.input}")
-        print(f"Expected: {test_case.expected_output[:100]}...")
-        
-        # Get RAG response
-        response = await rag_client.query(test_case.input)
-        if not response:
-            print("Error: Failed to get response from RAG")
-            actual_output = ""
-            contexts = []
-        else:
-            actual_output = response['response']
-            contexts = response.get('contexts', [])
-            print(f"Actual: {actual_output[:1000]}...")
+    # Evaluate test cases in batches as they are streamed from the dataset
+    print("\nEvaluating test cases:")
+    if sequential:
+        # A random order needs the whole (sharded) dataset up front
+        sampled = test_extractor.sampled_test_cases(shard=shard, stratify=stratify, seed=seed)
+        test_cases = iter(sampled)
+    elif selector:
+        print(selector.describe())
+        test_cases = test_extractor.impacted_test_cases(selector, shard=shard)
+    else:
+        if impacted:
+            print("No previous run with a corpus manifest; evaluating all test cases")
+        test_cases = enumerate(test_extractor.iter_test_cases(shard=shard), 1)
+    drawn = 0
+    while True:
+        batch = list(itertools.islice(test_cases, Config.EVAL_BATCH_SIZE))
+        if not batch:
+            break
+        drawn += len(batch)
         
-        # Evaluate response
-        result = evaluator.evaluate(
-            input_text=test_case.input,
-            actual_output=actual_output,
-            expected_output=test_case.expected_output
-        )
+        rows = await evaluate_test_cases(evaluator, rag_client, results_handler, batch, prefilter,
+                                         cascade=cascade, cheap_evaluator=cheap_evaluator)
+        results_handler.add_rows(rows)
         
-        # Add result to handler
-        results_handler.add_result(
-            test_case_id=i,
-            input_query=test_case.input,
-            expected_output=test_case.expected_output,
-            actual_output=actual_output,
-            score=result['score'],
-            reason=result['reason'],
-            contexts=contexts
-        )
+        for row in rows:
+            print(f"\nTest Case {row['Test_Case_ID']}:")
+            print(f"Input: {row['Input_Query']}")
+            print(f"Expected: {row['Expected_Output'][:100]}...")
+            if not row['Actual_Output']:
+                print("Error: Failed to get response from RAG")
+            else:
+                print(f"Actual: {row['Actual_Output'][:1000]}...")
+            print(f"Score: {row['Score']}")
+            print(f"Reason: {row['Evaluation_Reason']}")
         
-        print(f"Score: {result['score']}")
-        print(f"Reason: {result['reason']}")
+        if sequential:
+            for row in rows:
+                sequential.add({'correctness': row['Score']})
+            print(f"\nSequential sampling after {sequential.items} test cases: {sequential.progress()}")
+            if sequential.resolved():
+                print(f"All decisions settled; skipping the remaining {len(sampled) - drawn} test cases")
+                break
+    
+    # Merge the carried-over results of unaffected test cases into the report
+    extra_summary = {}
+    if selector:
+        for row in results_handler.detailed_results:
+            row['Carried_Over'] = False
+        results_handler.add_rows([
+            {**row, 'Test_Case_ID': case_id, 'Carried_Over': True} for case_id, row in selector.carried
+        ])
+        results_handler.detailed_results.sort(key=lambda row: row['Test_Case_ID'])
+        extra_summary.update(selector.summary(sep="_"))
     
     # Save all results
-    detailed_file, summary_file = results_handler.save_results()
+    if sequential:
+        judge_calls = sum(row.get('Judge_Calls') or 0 for row in results_handler.detailed_results)
+        extra_summary.update(sequential.summary(len(sampled) - drawn, judge_calls, sep="_"))
+    backend_config = {'judge_model': MODEL_NAME}
+    if cascade:
+        backend_config['cheap_judge_model'] = Config.CASCADE_CHEAP_MODEL
+    detailed_file, summary_file = results_handler.save_results(
+        dataset=str(json_path), backend_config=backend_config, extra_summary=extra_summary,
+        corpus_dir=corpus_dir, corpus=corpus
+    )
+    print(f"\nJudge calls avoided by pre-filter: {results_handler.summarize()['Judge_Calls_Avoided']}")
     print(f"\nResults saved to:")
     print(f"Summary: {summary_file}")
     print(f"Detailed: {detailed_file}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="GEval correctness evaluation")
+    parser.add_argument("--dataset", default=str(DEFAULT_DATASET),
+                        help="Golden dataset (JSON or JSONL)")
+    parser.add_argument("--results-dir", default=str(DEFAULT_RESULTS_DIR),
+                        help="Directory for result CSV files")
+    add_shard_argument(parser)
+    add_sequential_arguments(parser, confidence=Config.SEQUENTIAL_CONFIDENCE,
+                             min_items=Config.SEQUENTIAL_MIN_ITEMS, method=Config.SEQUENTIAL_CI_METHOD)
+    add_impact_arguments(parser, Config.CORPUS_DIR)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.impacted and args.sequential:
+        parser.error("--impacted cannot be combined with --sequential")
+    sequential = None
+    if args.sequential:
+        sequential = SequentialEvaluation(Config.THRESHOLDS, confidence=args.confidence,
+                                          min_items=args.min_items, method=args.ci_method, seed=args.seed)
+    with profile_run(args.profile, "geval_metrics", memory=not args.profile_no_memory):
+        asyncio.run(main(json_path=args.dataset, results_dir=args.results_dir, shard=args.shard,
+                         sequential=sequential, stratify=args.stratify, seed=args.seed,
+                         impacted=args.impacted, baseline=args.baseline, corpus_dir=args.corpus))
\ No newline at end of file
@@ -5,14 +5,22 @@ This module provides functionality to generate question-answer pairs
 from documents using the DeepEval framework.
 """
 
-import os
+import argparse
 import json
 import logging
+import sys
 from typing import List, Dict, Any
 from pathlib import Path
 from dotenv import load_dotenv
 from deepeval.synthesizer import Synthesizer
 from config import Config
+from limited_model import create_model
+
+# Add ragbench directory to Python path to enable shared imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from providers import require_api_key
+from question_embeddings import precompute_for_dataset
+from profiling import add_profile_argument, profile_run
 
 # Configure logging
 logging.basicConfig(
@@ -39,9 +47,7 @@ class QAGenerator:
         """Initialize environment variables and validate API key."""
         try:
             load_dotenv()
-            api_key = os.getenv('OPENAI_API_KEY')
-            if not api_key:
-                raise ValueError("OpenAI API key not found in environment variables")
+            require_api_key()  # Not needed with RAGOPS_PROVIDER=fake
         except Exception as e:
             logger.error(f"Error initializing environment: {str(e)}")
             raise
@@ -50,7 +56,10 @@ class QAGenerator:
         """Initialize the DeepEval Synthesizer."""
         try:
             if not self.synthesizer:
-                self.synthesizer = Synthesizer(model=self.model)
+                self.synthesizer = Synthesizer(
+                    model=create_model(self.model),
+                    max_concurrent=Config.MAX_CONCURRENT
+                )
                 logger.info(f"Initialized Synthesizer with model: {self.model}")
         except Exception as e:
             logger.error(f"Error initializing synthesizer: {str(e)}")
@@ -86,6 +95,10 @@ class QAGenerator:
             )
             logger.info(f"Saved QA pairs to {output_path}")
             
+            # Precompute question embeddings so evaluation runs skip query embedding
+            if Config.PRECOMPUTE_QUESTION_EMBEDDINGS and str(output_path).endswith('.json'):
+                precompute_for_dataset(str(output_path), 'input')
+            
             return {
                 "status": "success",
                 "output_path": output_path
@@ -135,4 +148,8 @@ def main():
         logger.error(f"Error in main: {str(e)}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate goldens from the test documents")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profile_run(args.profile, "golden_synthesizer", memory=not args.profile_no_memory):
+        main()
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""
+Rate-limited DeepEval Model
+
+GPT model for DeepEval whose generate calls go through the shared ragbench
+``RateLimiter``. Used for both the GEval judge and the golden Synthesizer so
+they share one request/token budget per process. GEval with fixed
+evaluation steps scores through ``a_generate_raw_response`` (for the token
+log-probabilities), so the raw-response calls are throttled too. Each call's
+cost (as reported by DeepEval) and token counts (exact for raw responses,
+estimated otherwise) are recorded for ``llm_usage`` tracking scopes.
+
+With RAGOPS_PROVIDER=fake, ``create_model`` returns an offline stub judge
+instead, whatever model name is requested.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+from deepeval.models import DeepEvalBaseLLM, GPTModel
+from config import Config
+
+# Add ragbench directory to Python path to enable shared imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from llm_usage import record_usage
+from providers import is_fake, stub_completion, stub_structured
+from rate_limiter import RateLimiter, estimate_tokens, get_limiter
+
+
+def get_llm_limiter(name: str = "llm") -> RateLimiter:
+    """Shared limiter configured from the deep_eval rate limit settings."""
+    return get_limiter(
+        name,
+        requests_per_minute=Config.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=Config.LLM_TOKENS_PER_MINUTE,
+        max_concurrency=Config.MAX_CONCURRENT
+    )
+
+
+class RateLimitedGPTModel(GPTModel):
+    """GPTModel whose generate and raw-response calls are throttled and retried on 429s."""
+
+    def __init__(self, *args: Any, limiter: RateLimiter = None, **kwargs: Any):
+        self.limiter = limiter or get_llm_limiter()
+        super().__init__(*args, **kwargs)
+
+    def _record(self, prompt: str, result: Any) -> Any:
+        """Record a call; GPTModel returns (output, cost), raw responses with their token usage."""
+        output, cost = result if isinstance(result, tuple) else (result, None)
+        usage = getattr(output, "usage", None)
+        if usage is not None:
+            prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        else:
+            prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(output)
+        record_usage(prompt_tokens, completion_tokens, model=self.name, cost=cost)
+        return result
+
+    def generate(self, prompt: str, *args: Any, **kwargs: Any) -> Any:
+        return self._record(prompt, self.limiter.run_sync(
+            super().generate, prompt, *args,
+            estimated_tokens=estimate_tokens(prompt), **kwargs
+        ))
+
+    async def a_generate(self, prompt: str, *args: Any, **kwargs: Any) -> Any:
+        return self._record(prompt, await self.limiter.run(
+            super().a_generate, prompt, *args,
+            estimated_tokens=estimate_tokens(prompt), **kwargs
+        ))
+
+    def generate_raw_response(self, prompt: str, *args: Any, **kwargs: Any) -> Any:
+        return self._record(prompt, self.limiter.run_sync(
+            super().generate_raw_response, prompt, *args,
+            estimated_tokens=estimate_tokens(prompt), **kwargs
+        ))
+
+    async def a_generate_raw_response(self, prompt: str, *args: Any, **kwargs: Any) -> Any:
+        return self._record(prompt, await self.limiter.run(
+            super().a_generate_raw_response, prompt, *args,
+            estimated_tokens=estimate_tokens(prompt), **kwargs
+        ))
+
+
+class StubJudgeModel(DeepEvalBaseLLM):
+    """Offline DeepEval model with deterministic outputs (RAGOPS_PROVIDER=fake).
+
+    When DeepEval asks for a schema, an instance filled with prompt-seeded
+    values is returned (e.g. GEval scores in [0, 10]); otherwise the
+    ``providers.stub_completion`` text. Calls share the rate limiter.
+    """
+
+    def __init__(self, model_name: str = "stub", limiter: RateLimiter = None):
+        self.limiter = limiter or get_llm_limiter()
+        super().__init__(model_name)
+
+    def load_model(self) -> "StubJudgeModel":
+        return self
+
+    def get_model_name(self) -> str:
+        return self.name
+
+    def _respond(self, prompt: str, schema: Optional[Any]) -> Any:
+        output = stub_structured(schema, prompt) if schema else stub_completion(prompt, model=self.name)
+        text = output.model_dump_json() if schema else output
+        record_usage(estimate_tokens(prompt), estimate_tokens(text), model=self.name, cost=0.0)
+        return output
+
+    def generate(self, prompt: str, schema: Optional[Any] = None) -> Any:
+        return self.limiter.run_sync(self._respond, prompt, schema,
+                                     estimated_tokens=estimate_tokens(prompt))
+
+    async def a_generate(self, prompt: str, schema: Optional[Any] = None) -> Any:
+        async def respond() -> Any:
+            return self._respond(prompt, schema)
+        return await self.limiter.run(respond, estimated_tokens=estimate_tokens(prompt))
+
+
+def create_model(model_name: str) -> DeepEvalBaseLLM:
+    """Rate-limited DeepEval model of the selected provider.
+
+    Args:
+        model_name: OpenAI model to judge with; ignored when RAGOPS_PROVIDER=fake,
+            where every model is the same offline ``StubJudgeModel``
+    """
+    if is_fake():
+        return StubJudgeModel()
+    return RateLimitedGPTModel(model=model_name)
@@ -4,12 +4,20 @@ Test Case Extractor
 Extracts input questions and expected outputs from JSON test cases.
 """
 
-import json
-from typing import List, Dict, Any
+import sys
+from typing import Any, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 from pathlib import Path
 
-@dataclass
+# Add parent directory to Python path to enable imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from change_impact import ImpactSelector
+from dataset_stream import iter_records
+from sequential_sampling import sampling_order, source_document
+
+TEST_CASE_FIELDS = ('input', 'expected_output')
+
+@dataclass(slots=True)
 class TestCase:
     """Structure for a test case."""
     input: str
@@ -27,26 +35,84 @@ class TestExtractor:
         """
         self.json_path = Path(json_path)
     
-    def load_test_cases(self) -> List[TestCase]:
+    def iter_test_cases(self, shard: Optional[Tuple[int, int]] = None) -> Iterator[TestCase]:
+        """
+        Lazily yield test cases from a JSON or JSONL file.
+        
+        Only the input and expected output are materialized; context chunks
+        and other fields are discarded as each record is parsed.
+        
+        Args:
+            shard: Optional (index, count) tuple to process a single shard
+            
+        Returns:
+            Iterator of TestCase objects
+        """
+        for item in iter_records(str(self.json_path), fields=TEST_CASE_FIELDS, shard=shard):
+            yield TestCase(
+                input=item['input'],
+                expected_output=item['expected_output']
+            )
+    
+    def load_test_cases(self, shard: Optional[Tuple[int, int]] = None) -> List[TestCase]:
         """
         Load and parse test cases from JSON file.
         
+        Args:
+            shard: Optional (index, count) tuple to process a single shard
+        
         Returns:
             List of TestCase objects
         """
-        with open(self.json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            
-        test_cases = []
-        for item in data:
-            if 'input' in item and 'expected_output' in item:
-                test_case = TestCase(
-                    input=item['input'],
-                    expected_output=item['expected_output']
-                )
-                test_cases.append(test_case)
-                
-        return test_cases
+        return list(self.iter_test_cases(shard=shard))
+    
+    def sampled_test_cases(self, shard: Optional[Tuple[int, int]] = None, stratify: bool = False,
+                           seed: Optional[int] = None) -> List[Tuple[int, TestCase]]:
+        """
+        Load test cases in random order for sequential sampling.
+        
+        Args:
+            shard: Optional (index, count) tuple to process a single shard
+            stratify: Spread the test cases of each source file evenly over the order
+            seed: Seed for a reproducible order
+        
+        Returns:
+            (test case id, TestCase) pairs in sampling order; ids are the same
+            1-based positions the streaming evaluation assigns
+        """
+        records = [
+            (case_id, item) for case_id, item in enumerate(iter_records(str(self.json_path), shard=shard), 1)
+            if all(key in item for key in TEST_CASE_FIELDS)
+        ]
+        stratum = (lambda entry: source_document(entry[1])) if stratify else None
+        return [
+            (case_id, TestCase(input=item['input'], expected_output=item['expected_output']))
+            for case_id, item in sampling_order(records, stratum=stratum, seed=seed)
+        ]
+
+    def impacted_test_cases(self, selector: ImpactSelector,
+                            shard: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[int, TestCase]]:
+        """
+        Lazily yield the test cases affected by corpus changes.
+        
+        The golden's context chunks are kept until the selector has mapped
+        them to their source documents; the previous results of unaffected
+        test cases are collected in ``selector.carried``.
+        
+        Args:
+            selector: Change-impact selector comparing with a previous run
+            shard: Optional (index, count) tuple to process a single shard
+        
+        Returns:
+            Iterator of (test case id, TestCase) pairs; ids are the same
+            1-based positions the streaming evaluation assigns
+        """
+        records: Iterator[Any] = (
+            item for item in iter_records(str(self.json_path), shard=shard)
+            if all(key in item for key in TEST_CASE_FIELDS)
+        )
+        for case_id, item in selector.select(enumerate(records, 1)):
+            yield case_id, TestCase(input=item['input'], expected_output=item['expected_output'])
 
 def main():
     """Example usage of test extractor."""
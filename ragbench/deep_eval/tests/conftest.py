@@ -0,0 +1,7 @@
+import os
+import sys
+from pathlib import Path
+
+# deep_eval modules use flat imports from src (and add the ragbench root themselves)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+os.environ.setdefault("DEEPEVAL_TELEMETRY_OPT_OUT", "YES")
@@ -0,0 +1,94 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from deepeval.metrics import GEval
+from deepeval.models import GPTModel
+from deepeval.test_case import LLMTestCase, LLMTestCaseParams
+
+from limited_model import RateLimitedGPTModel, StubJudgeModel
+from llm_usage import track_usage
+from rate_limiter import RateLimiter
+
+
+def drain(limiter: RateLimiter):
+    """Use up the request burst so every following call waits its turn."""
+    limiter.request_bucket.tokens = 0
+    limiter.request_bucket.updated = time.monotonic()
+
+
+def raw_completion(content: str) -> SimpleNamespace:
+    """Minimal stand-in for an OpenAI ChatCompletion with token usage."""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=120, completion_tokens=12)
+    )
+
+
+def test_geval_raw_response_calls_go_through_the_limiter(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    prompts = []
+
+    async def fake_raw_response(self, prompt, top_logprobs=5):
+        prompts.append(prompt)
+        return raw_completion('{"score": 8, "reason": "Matches the expected output."}'), 0.002
+
+    monkeypatch.setattr(GPTModel, "a_generate_raw_response", fake_raw_response)
+    limiter = RateLimiter("test", requests_per_minute=600)  # One call per 0.1s
+    model = RateLimitedGPTModel(model="gpt-4o-mini", limiter=limiter)
+
+    async def judge(metric: GEval):
+        await metric.a_measure(LLMTestCase(input="What is the Sun?", actual_output="A star.",
+                                           expected_output="The Sun is a star."))
+        return metric.score
+
+    def metric() -> GEval:
+        # Fixed evaluation steps: GEval scores with a single raw-response call
+        return GEval(name="Correctness", model=model, evaluation_steps=["Compare the facts"],
+                     evaluation_params=[LLMTestCaseParams.ACTUAL_OUTPUT, LLMTestCaseParams.EXPECTED_OUTPUT])
+
+    async def run():
+        return await asyncio.gather(*(judge(metric()) for _ in range(3)))
+
+    drain(limiter)
+    start = time.monotonic()
+    with track_usage() as usage:
+        scores = asyncio.run(run())
+
+    assert time.monotonic() - start >= 0.25
+    assert len(prompts) == 3
+    assert limiter.stats["calls"] == 3
+    assert scores == [0.8, 0.8, 0.8]
+    assert (usage.calls, usage.prompt_tokens, usage.completion_tokens) == (3, 360, 36)
+    assert abs(usage.cost_usd - 0.006) < 1e-9
+
+
+def test_sync_raw_response_is_throttled(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(GPTModel, "generate_raw_response",
+                        lambda self, prompt, top_logprobs=5: (raw_completion("{}"), 0.0))
+    limiter = RateLimiter("test", requests_per_minute=1200)  # One call per 0.05s
+    model = RateLimitedGPTModel(model="gpt-4o-mini", limiter=limiter)
+
+    drain(limiter)
+    start = time.monotonic()
+    for _ in range(4):
+        model.generate_raw_response("prompt", top_logprobs=5)
+    assert time.monotonic() - start >= 0.18
+    assert limiter.stats["calls"] == 4
+
+
+def test_correctness_evaluator_scores_with_the_stub_judge(monkeypatch):
+    monkeypatch.setenv("RAGOPS_PROVIDER", "fake")
+    from geval_metrics import CorrectnessEvaluator
+
+    evaluator = CorrectnessEvaluator()
+    assert isinstance(evaluator.model, StubJudgeModel)
+    assert evaluator.model.get_model_name() == "stub"
+    with track_usage() as usage:
+        result = asyncio.run(evaluator.aevaluate("What is the Sun?", "A star.", "The Sun is a star."))
+
+    assert 0.0 <= result["score"] <= 1.0
+    assert result["reason"]
+    assert usage.calls >= 1
+    assert usage.prompt_tokens > 0 and usage.cost_usd == 0.0
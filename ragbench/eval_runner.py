@@ -0,0 +1,432 @@
+"""
+Distributed Evaluation Runner
+
+Partitions a llama_eval QA dataset or a deep_eval golden dataset across
+several worker processes. Each worker evaluates items with its own async
+concurrency and judge rate limit and streams result rows to a JSONL file.
+Work is handed out through a file-based queue so chunks claimed by a worker
+that crashes or stops making progress are put back and picked up by another
+worker. A worker heart-beats whenever it claims a chunk or finishes an item,
+so one stuck on a hung judge call is detected as well as a frozen one. Once the queue is drained, the streamed rows are merged into one
+detailed results file and one summary computed over all rows.
+
+Usage:
+    python eval_runner.py llama --dataset llama_eval/generated_qa_pairs.json --workers 4
+    python eval_runner.py deep --dataset deep_eval/synthetic_data/20250305_120256.json --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from dataset_stream import iter_records
+from rate_limiter import get_limiter
+
+RAGBENCH_DIR = Path(__file__).parent
+LLAMA_SRC = RAGBENCH_DIR / "llama_eval" / "src"
+DEEP_SRC = RAGBENCH_DIR / "deep_eval" / "src"
+
+CHUNK_SIZE = 20               # Dataset items per work queue chunk
+HEARTBEAT_TIMEOUT = 120.0     # Seconds without a finished item before a worker is considered stuck
+POLL_INTERVAL = 1.0           # Seconds between supervisor checks
+MAX_RESTARTS = 5              # Replacement workers started after crashes
+
+
+class FileWorkQueue:
+    """Work queue backed by a directory tree on the local filesystem.
+
+    Chunks move between ``pending/``, ``claimed/`` and ``done/`` with atomic
+    renames, so concurrent workers never claim the same chunk. Claimed chunk
+    files are prefixed with the worker id, which lets the supervisor return
+    them to ``pending/`` when that worker dies.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.pending_dir = self.root / "pending"
+        self.claimed_dir = self.root / "claimed"
+        self.done_dir = self.root / "done"
+        self.heartbeat_dir = self.root / "heartbeats"
+        for directory in (self.pending_dir, self.claimed_dir, self.done_dir, self.heartbeat_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+    def populate(self, records: Iterable[Tuple[int, Dict[str, Any]]],
+                 chunk_size: int = CHUNK_SIZE) -> int:
+        """Split (index, record) pairs into chunk files in ``pending/``.
+
+        Returns:
+            Number of items enqueued
+        """
+        count = 0
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+        chunk_id = 0
+
+        def flush():
+            nonlocal chunk, chunk_id
+            if chunk:
+                target = self.pending_dir / f"chunk-{chunk_id:06d}.json"
+                tmp = target.with_suffix(".tmp")
+                tmp.write_text(json.dumps({"items": chunk}, ensure_ascii=False), encoding="utf-8")
+                os.replace(tmp, target)
+                chunk_id += 1
+                chunk = []
+
+        for index, record in records:
+            chunk.append((index, record))
+            count += 1
+            if len(chunk) >= chunk_size:
+                flush()
+        flush()
+        return count
+
+    def claim(self, worker_id: str) -> Optional[Path]:
+        """Atomically claim the next pending chunk for a worker."""
+        for path in sorted(self.pending_dir.glob("chunk-*.json")):
+            target = self.claimed_dir / f"{worker_id}__{path.name}"
+            try:
+                os.rename(path, target)
+                return target
+            except FileNotFoundError:
+                continue  # Claimed by another worker first
+        return None
+
+    def complete(self, claimed_path: Path) -> None:
+        """Mark a claimed chunk as finished."""
+        chunk_name = claimed_path.name.split("__", 1)[1]
+        os.replace(claimed_path, self.done_dir / chunk_name)
+
+    def release_worker(self, worker_id: str) -> int:
+        """Return every chunk claimed by a worker to ``pending/``.
+
+        Returns:
+            Number of chunks requeued
+        """
+        released = 0
+        for path in self.claimed_dir.glob(f"{worker_id}__*"):
+            chunk_name = path.name.split("__", 1)[1]
+            try:
+                os.rename(path, self.pending_dir / chunk_name)
+                released += 1
+            except FileNotFoundError:
+                continue
+        return released
+
+    def release_all(self) -> int:
+        """Return all claimed chunks to ``pending/``, e.g. when resuming a run."""
+        workers = {path.name.split("__", 1)[0] for path in self.claimed_dir.glob("*__*")}
+        return sum(self.release_worker(worker_id) for worker_id in workers)
+
+    def heartbeat(self, worker_id: str) -> None:
+        """Record that a worker made progress."""
+        (self.heartbeat_dir / worker_id).write_text(str(time.time()))
+
+    def stale_workers(self, timeout: float = HEARTBEAT_TIMEOUT) -> List[str]:
+        """Return ids of workers whose last heartbeat is older than ``timeout``."""
+        now = time.time()
+        return [
+            path.name for path in self.heartbeat_dir.iterdir()
+            if now - path.stat().st_mtime > timeout
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        """Number of chunks in each state."""
+        return {
+            "pending": len(list(self.pending_dir.glob("chunk-*.json"))),
+            "claimed": len(list(self.claimed_dir.glob("*__*"))),
+            "done": len(list(self.done_dir.glob("chunk-*.json")))
+        }
+
+    def is_drained(self) -> bool:
+        """True when no chunk is pending or claimed."""
+        counts = self.counts()
+        return counts["pending"] == 0 and counts["claimed"] == 0
+
+
+class LlamaEvalAdapter:
+    """Evaluates llama_eval QA pairs with BatchRagEvaluator."""
+
+    fields = ('query', 'reference_answer', 'reference_contexts')
+
+    def __init__(self, output_dir: Path, dataset: Optional[str] = None):
+        sys.path.insert(0, str(LLAMA_SRC))
+        from batch_evaluator import BatchRagEvaluator
+        from question_embeddings import load_question_embeddings
+        self.evaluator = BatchRagEvaluator()
+        self.evaluator.rag_client.question_embeddings = load_question_embeddings(dataset)
+
+    async def evaluate(self, index: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self.evaluator.evaluate_pair(
+            record['query'], record['reference_contexts'], record['reference_answer']
+        )
+
+    @staticmethod
+    def write_report(rows: List[Dict[str, Any]], output_dir: Path,
+                     dataset: Optional[str] = None) -> Tuple[Path, Path]:
+        sys.path.insert(0, str(LLAMA_SRC))
+        import pandas as pd
+        from batch_evaluator import save_results
+        results_file, summary_file, _ = save_results(pd.DataFrame(rows), str(output_dir), dataset=dataset)
+        return results_file, summary_file
+
+
+class DeepEvalAdapter:
+    """Evaluates deep_eval goldens with the GEval correctness metric."""
+
+    fields = ('input', 'expected_output')
+
+    def __init__(self, output_dir: Path, dataset: Optional[str] = None):
+        sys.path.insert(0, str(DEEP_SRC))
+        from config import Config
+        from geval_metrics import CorrectnessEvaluator, evaluate_test_cases
+        from evaluation_results import EvaluationResults
+        from prefilter import LocalPrefilter
+        from judge_cascade import JudgeCascade
+        from question_embeddings import load_question_embeddings
+        from rag_query import RagClient
+        self.evaluate_test_cases = evaluate_test_cases
+        self.evaluator = CorrectnessEvaluator()
+        self.rag_client = RagClient(question_embeddings=load_question_embeddings(dataset))
+        self.prefilter = LocalPrefilter() if Config.PREFILTER_ENABLED else None
+        self.cascade, self.cheap_evaluator = None, None
+        if Config.JUDGE_CASCADE_ENABLED:
+            self.cascade = JudgeCascade(Config.THRESHOLDS, Config.CASCADE_BANDS,
+                                        calibration_rate=Config.CASCADE_CALIBRATION_RATE)
+            self.cheap_evaluator = CorrectnessEvaluator(Config.CASCADE_CHEAP_MODEL)
+        self.results = EvaluationResults(str(output_dir))
+
+    async def evaluate(self, index: int, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        rows = await self.evaluate_test_cases(
+            self.evaluator, self.rag_client, self.results,
+            [(index + 1, SimpleNamespace(**record))], self.prefilter,
+            cascade=self.cascade, cheap_evaluator=self.cheap_evaluator
+        )
+        return rows[0]
+
+    @staticmethod
+    def write_report(rows: List[Dict[str, Any]], output_dir: Path,
+                     dataset: Optional[str] = None) -> Tuple[Path, Path]:
+        sys.path.insert(0, str(DEEP_SRC))
+        from config import Config
+        from evaluation_results import EvaluationResults
+        results = EvaluationResults(str(output_dir))
+        results.add_rows(rows)
+        # Same default judge model as geval_metrics, without importing deepeval here
+        backend_config = {'judge_model': os.getenv('OPENAI_MODEL', 'gpt-4')}
+        if Config.JUDGE_CASCADE_ENABLED:
+            backend_config['cheap_judge_model'] = Config.CASCADE_CHEAP_MODEL
+        return results.save_results(dataset=dataset, backend_config=backend_config)
+
+
+ADAPTERS = {
+    "llama": LlamaEvalAdapter,
+    "deep": DeepEvalAdapter
+}
+
+
+async def _run_worker(kind: str, worker_id: str, output_dir: Path,
+                      concurrency: int, judge_rpm: Optional[float],
+                      dataset: Optional[str] = None) -> None:
+    """Claim and evaluate chunks until the queue has no pending work.
+
+    The heartbeat is touched from the evaluation itself, never from a
+    timer, so it stops when the worker stops making progress.
+    """
+    queue = FileWorkQueue(output_dir / "queue")
+    # Configure the shared LLM limiter before the evaluators look it up
+    if judge_rpm:
+        get_limiter("llm", requests_per_minute=judge_rpm, max_concurrency=concurrency)
+    adapter = ADAPTERS[kind](output_dir, dataset)
+    queue.heartbeat(worker_id)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    results_path = output_dir / "results" / f"{worker_id}.jsonl"
+    with open(results_path, 'a', encoding='utf-8') as out:
+
+        async def run_item(index: int, record: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    row = await adapter.evaluate(index, record)
+                except Exception as e:
+                    print(f"[{worker_id}] Error evaluating item {index}: {str(e)}")
+                    return
+                finally:
+                    queue.heartbeat(worker_id)
+                if row:
+                    row['_index'] = index
+                    out.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+                    out.flush()
+
+        while True:
+            chunk_path = queue.claim(worker_id)
+            if chunk_path is None:
+                break
+            queue.heartbeat(worker_id)
+            items = json.loads(chunk_path.read_text(encoding="utf-8"))["items"]
+            await asyncio.gather(*(run_item(index, record) for index, record in items))
+            queue.complete(chunk_path)
+            print(f"[{worker_id}] Finished {chunk_path.name.split('__', 1)[1]}")
+
+
+def _worker_main(kind: str, worker_id: str, output_dir: str,
+                 concurrency: int, judge_rpm: Optional[float],
+                 dataset: Optional[str] = None) -> None:
+    """Process entry point for a worker."""
+    asyncio.run(_run_worker(kind, worker_id, Path(output_dir), concurrency, judge_rpm, dataset))
+
+
+def merge_results(kind: str, output_dir: Path, dataset: Optional[str] = None) -> Tuple[Path, Path]:
+    """Merge worker result streams into one detailed file and one summary.
+
+    Items re-run after a crash may appear more than once; the last row per
+    dataset index wins. A truncated final line from a killed worker is ignored.
+
+    Returns:
+        Tuple of (detailed results path, summary path)
+    """
+    rows: Dict[int, Dict[str, Any]] = {}
+    for path in sorted((output_dir / "results").glob("*.jsonl")):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                rows[row.pop('_index')] = row
+
+    ordered = [rows[index] for index in sorted(rows)]
+    return ADAPTERS[kind].write_report(ordered, output_dir, dataset)
+
+
+def run(kind: str, dataset: str, output_dir: Path, workers: int = 4,
+        concurrency: int = 4, judge_rpm: Optional[float] = None,
+        chunk_size: int = CHUNK_SIZE, heartbeat_timeout: float = HEARTBEAT_TIMEOUT,
+        max_restarts: int = MAX_RESTARTS) -> Tuple[Path, Path]:
+    """Evaluate a dataset with a pool of worker processes.
+
+    Args:
+        kind: ``llama`` or ``deep``
+        dataset: QA pairs or golden dataset (JSON or JSONL)
+        output_dir: Run directory holding the queue, streamed results and reports
+        workers: Number of worker processes
+        concurrency: Concurrent items per worker
+        judge_rpm: Judge requests per minute per worker (None for unlimited)
+        chunk_size: Items per work queue chunk
+        heartbeat_timeout: Seconds without a finished item before a worker's chunks are requeued
+        max_restarts: Replacement workers allowed after crashes
+
+    Returns:
+        Tuple of (detailed results path, summary path)
+    """
+    output_dir = Path(output_dir)
+    (output_dir / "results").mkdir(parents=True, exist_ok=True)
+    queue = FileWorkQueue(output_dir / "queue")
+
+    counts = queue.counts()
+    if any(counts.values()):
+        requeued = queue.release_all()
+        print(f"Resuming run in {output_dir} ({requeued} claimed chunks requeued)")
+    else:
+        records = iter_records(dataset, fields=ADAPTERS[kind].fields, with_index=True)
+        total = queue.populate(records, chunk_size)
+        print(f"Enqueued {total} items from {dataset}")
+
+    ctx = mp.get_context("spawn")
+    processes: Dict[str, Any] = {}
+    spawned = 0
+    restarts = 0
+
+    def spawn():
+        nonlocal spawned
+        worker_id = f"w{spawned}"
+        spawned += 1
+        queue.heartbeat(worker_id)  # Fresh heartbeat so startup is not mistaken for a hang
+        process = ctx.Process(
+            target=_worker_main,
+            args=(kind, worker_id, str(output_dir), concurrency, judge_rpm, dataset),
+            name=worker_id
+        )
+        process.start()
+        processes[worker_id] = process
+
+    for _ in range(workers):
+        spawn()
+
+    while True:
+        time.sleep(POLL_INTERVAL)
+
+        # Terminate workers that stopped making progress
+        for worker_id in queue.stale_workers(heartbeat_timeout):
+            process = processes.get(worker_id)
+            if process and process.is_alive():
+                print(f"Worker {worker_id} finished no item for {heartbeat_timeout:.0f}s, terminating")
+                process.terminate()
+                process.join()
+
+        # Reassign chunks held by workers that have exited
+        for worker_id, process in list(processes.items()):
+            if process.is_alive():
+                continue
+            released = queue.release_worker(worker_id)
+            if process.exitcode != 0 or released:
+                print(f"Worker {worker_id} exited with code {process.exitcode}, "
+                      f"requeued {released} chunks")
+            del processes[worker_id]
+
+        if queue.is_drained():
+            break
+
+        pending = queue.counts()["pending"]
+        while pending and len(processes) < workers and restarts < max_restarts:
+            restarts += 1
+            spawn()
+        if not processes:
+            print("No workers left and restart budget exhausted; merging partial results")
+            break
+
+    for process in processes.values():
+        process.join()
+
+    return merge_results(kind, output_dir, dataset)
+
+
+def main():
+    """Entry point for the distributed evaluation runner."""
+    parser = argparse.ArgumentParser(description="Multi-process RAG evaluation runner")
+    parser.add_argument("kind", choices=sorted(ADAPTERS), help="Evaluation suite to run")
+    parser.add_argument("--dataset", required=True, help="QA pairs or golden dataset (JSON or JSONL)")
+    parser.add_argument("--output-dir", default=None,
+                        help="Run directory; reuse an existing one to resume (default: runs/<timestamp>)")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent items per worker")
+    parser.add_argument("--judge-rpm", type=float, default=None,
+                        help="Judge requests per minute per worker")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Items per queue chunk")
+    parser.add_argument("--heartbeat-timeout", type=float, default=HEARTBEAT_TIMEOUT,
+                        help="Seconds without a finished item before a worker's chunks are reassigned")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output_dir or Path("runs") / datetime.now().strftime("%Y%m%d_%H%M%S"))
+    detailed_file, summary_file = run(
+        kind=args.kind,
+        dataset=args.dataset,
+        output_dir=output_dir,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        judge_rpm=args.judge_rpm,
+        chunk_size=args.chunk_size,
+        heartbeat_timeout=args.heartbeat_timeout
+    )
+    print(f"\nResults saved to:")
+    print(f"Detailed results: {detailed_file}")
+    print(f"Summary: {summary_file}")
+
+if __name__ == "__main__":
+    main()
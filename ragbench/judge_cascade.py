@@ -0,0 +1,176 @@
+"""
+Judge Model Cascade
+
+Scores each case with a cheap judge first and escalates to the strong judge
+only when the cheap score falls into the metric's uncertainty band, i.e.
+close enough to the threshold that the cheaper model's verdict is not
+trusted. Together with the local pre-filter this gives three tiers:
+
+    prefilter -> cheap -> strong
+
+A band is a half-open score range ``[low, high)``. For judges with
+continuous scores it sits around the threshold, e.g. (0.5, 0.85) for a 0.7
+threshold; for binary judges (0/1 scores) a band of (0.0, 1.0) escalates
+every cheap "fail" and trusts the cheap "pass".
+
+A random calibration sample of cases is scored by both judges whatever the
+cheap score was (the strong score decides those cases). The agreement
+between tiers on that sample, in particular on the cases the cascade would
+not have escalated, shows whether the bands are wide enough. Evaluators
+record the tier, cheap score and calibration flag in their result rows, and
+``observe`` rebuilds the statistics from those rows, so the summary also
+covers results merged from several worker processes.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+PREFILTER = "prefilter"
+CHEAP = "cheap"
+STRONG = "strong"
+
+
+def _missing(score: Optional[float]) -> bool:
+    return score is None or score != score
+
+
+@dataclass
+class TierComparison:
+    """Cheap and strong score of a case that both judges scored."""
+    cheap: float
+    strong: float
+    in_band: bool
+    calibration: bool
+
+
+@dataclass
+class MetricStats:
+    cases: int = 0
+    escalated: int = 0
+    comparisons: List[TierComparison] = field(default_factory=list)
+
+
+@dataclass
+class CascadeVerdict:
+    """Result of a cascaded judgement."""
+    result: Any                  # Result of the deciding judge
+    tier: str                    # CHEAP or STRONG
+    cheap_score: Optional[float]
+    calibration: bool = False
+
+
+class JudgeCascade:
+    """Cheap-then-strong judge cascade with per-metric uncertainty bands.
+
+    Args:
+        thresholds: Metric name to the passing score
+        bands: Metric name to the (low, high) cheap scores that escalate;
+            metrics without a band always go to the strong judge
+        calibration_rate: Fraction of cases scored by both judges
+        seed: Seed of the calibration sample
+    """
+
+    def __init__(self, thresholds: Dict[str, float], bands: Dict[str, Tuple[float, float]],
+                 calibration_rate: float = 0.0, seed: Optional[int] = None):
+        if not 0 <= calibration_rate <= 1:
+            raise ValueError(f"Calibration rate must be between 0 and 1, got {calibration_rate}")
+        self.thresholds = dict(thresholds)
+        self.bands = {metric: tuple(band) for metric, band in bands.items()}
+        self.calibration_rate = calibration_rate
+        self.stats: Dict[str, MetricStats] = {}
+        self._rng = random.Random(seed)
+
+    def in_band(self, metric: str, score: Optional[float]) -> bool:
+        """Whether a cheap score is too uncertain to decide the case"""
+        if metric not in self.bands or _missing(score):
+            return True
+        low, high = self.bands[metric]
+        return low <= score < high
+
+    def passing(self, metric: str, score: Optional[float]) -> bool:
+        return not _missing(score) and score >= self.thresholds.get(metric, 0.0)
+
+    async def judge(self, metric: str,
+                    cheap: Callable[[], Awaitable[Any]],
+                    strong: Callable[[], Awaitable[Any]],
+                    score_of: Callable[[Any], Optional[float]]) -> CascadeVerdict:
+        """Judge one case.
+
+        Args:
+            metric: Metric being judged
+            cheap: Runs the cheap judge
+            strong: Runs the strong judge
+            score_of: Score of a judge result
+
+        Returns:
+            CascadeVerdict with the deciding result and tier
+        """
+        if metric not in self.bands:
+            return CascadeVerdict(await strong(), STRONG, None)
+
+        cheap_result = await cheap()
+        cheap_score = score_of(cheap_result)
+        uncertain = self.in_band(metric, cheap_score)
+        calibration = self._rng.random() < self.calibration_rate
+        if not (uncertain or calibration):
+            return CascadeVerdict(cheap_result, CHEAP, cheap_score)
+
+        return CascadeVerdict(await strong(), STRONG, cheap_score, calibration)
+
+    def observe(self, metric: str, tier: str, cheap_score: Optional[float],
+                score: Optional[float], calibration: bool = False):
+        """Add a judged case to the escalation and agreement statistics.
+
+        Args:
+            metric: Metric of the case
+            tier: Tier that decided it; pre-filtered cases and metrics
+                without a band (not cascaded) are ignored
+            cheap_score: Score of the cheap judge (None if it did not run)
+            score: Final score, i.e. the strong score of escalated cases
+            calibration: Whether the case was in the calibration sample
+        """
+        if tier not in (CHEAP, STRONG) or metric not in self.bands:
+            return
+        stats = self.stats.setdefault(metric, MetricStats())
+        stats.cases += 1
+        if tier != STRONG:
+            return
+        uncertain = self.in_band(metric, cheap_score)
+        stats.escalated += uncertain
+        if not (_missing(cheap_score) or _missing(score)):
+            stats.comparisons.append(TierComparison(cheap_score, score, uncertain, bool(calibration)))
+
+    def agreement(self, metric: str, comparisons: List[TierComparison]) -> Optional[float]:
+        """Fraction of cases where both tiers reach the same pass/fail verdict"""
+        if not comparisons:
+            return None
+        agreeing = sum(
+            self.passing(metric, c.cheap) == self.passing(metric, c.strong) for c in comparisons
+        )
+        return agreeing / len(comparisons)
+
+    def summary(self, sep: str = " ") -> Dict[str, Any]:
+        """Escalation and tier agreement rates per metric.
+
+        Agreement is reported on the calibration sample, on the part of it
+        the cascade would have left to the cheap judge (the cases where
+        trusting it could be wrong) and on the escalated cases.
+        """
+        def key(*words: str) -> str:
+            return sep.join(words)
+
+        summary: Dict[str, Any] = {}
+        for metric, stats in self.stats.items():
+            name = metric.replace("_", " ").title().replace(" ", sep)
+            calibration = [c for c in stats.comparisons if c.calibration]
+            summary[key(name, "Escalation", "Rate")] = stats.escalated / stats.cases if stats.cases else None
+            summary[key(name, "Calibration", "Cases")] = len(calibration)
+            summary[key(name, "Tier", "Agreement")] = self.agreement(metric, calibration)
+            summary[key(name, "Confident", "Agreement")] = self.agreement(
+                metric, [c for c in calibration if not c.in_band]
+            )
+            summary[key(name, "Escalated", "Agreement")] = self.agreement(
+                metric, [c for c in stats.comparisons if c.in_band]
+            )
+        return summary
@@ -8,22 +8,65 @@ This module implements batch evaluation of RAG responses using multiple evaluato
 """
 
 import json
-import aiohttp
-from typing import Dict, List, Any
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import sys
 import asyncio
+import argparse
+import itertools
 import nest_asyncio
 import pandas as pd
 from datetime import datetime
-from llama_index.llms.openai import OpenAI
 from llama_index.core.evaluation import (
     FaithfulnessEvaluator,
-    RelevancyEvaluator,
-    BatchEvalRunner
+    RelevancyEvaluator
 )
 from config import Config
+from limited_llm import create_llm
+from context_relevancy import BatchContextRelevancyEvaluator
+
+# Add ragbench directory to Python path to enable shared imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from change_impact import (ImpactSelector, add_impact_arguments, corpus_manifest, find_baseline,
+                           read_corpus_manifest, write_corpus_manifest)
+from dataset_stream import add_shard_argument, iter_records
+from profiling import add_profile_argument, profile_run
+from prefilter import FAIL, JUDGE, PASS, LocalPrefilter, PrefilterDecision
+from judge_cascade import CHEAP, PREFILTER, STRONG, CascadeVerdict, JudgeCascade
+from llm_usage import Usage, track_usage
+from providers import get_embed_model
+from question_embeddings import load_question_embeddings
+from rag_query import RagClient
+from results_store import record_run
+from sequential_sampling import SequentialEvaluation, add_sequential_arguments, sampling_order, source_document
+
+# Fields of a QA pair used by the evaluation loop
+QA_EVAL_FIELDS = ('query', 'reference_answer', 'reference_contexts')
+
+# Backend stage timings copied from the RAG response
+SERVER_STAGES = ('retrieve_ms', 'rerank_ms', 'synthesize_ms', 'total_ms')
+
+# Judge calls the pre-filter saves here: none, unlike deep_eval's correctness metric
+JUDGE_CALLS_AVOIDED = 0
+JUDGE_CALLS_AVOIDED_REASON = ("Pre-filter verdicts compare answers with the reference answer and "
+                              "cannot decide faithfulness or relevancy, so every answer is judged")
+
+# Metrics whose judge latency is recorded per query
+JUDGE_METRICS = ('faithfulness', 'relevancy', 'context_relevancy')
+
+# Latency columns aggregated into the summary as mean / p50 / p95
+LATENCY_COLUMNS = {
+    'rag_latency_ms': 'RAG Latency',
+    'server_retrieve_ms': 'Server Retrieve',
+    'server_rerank_ms': 'Server Rerank',
+    'server_synthesize_ms': 'Server Synthesize',
+    'server_total_ms': 'Server Total',
+    'faithfulness_judge_ms': 'Faithfulness Judge',
+    'relevancy_judge_ms': 'Answer Relevancy Judge',
+    'context_relevancy_judge_ms': 'Context Relevancy Judge'
+}
 
 # Apply nest_asyncio to handle nested event loops
 nest_asyncio.apply()
@@ -40,29 +83,59 @@ class BatchRagEvaluator:
         # Load environment variables
         load_dotenv()
         
-        # Initialize OpenAI configuration
-        self.llm = OpenAI(
+        # Initialize the judge LLM (OpenAI or the offline stub); all judge calls share one rate limiter
+        self.llm = create_llm(
             model=Config.OPENAI_MODEL,
             temperature=Config.TEMPERATURE,
             api_key=os.getenv("OPENAI_API_KEY")
         )
         
         self.api_endpoint = api_endpoint or Config.API_ENDPOINT
+        self.rag_client = RagClient(self.api_endpoint)
         
         # Initialize evaluators
         self.faithfulness_evaluator = FaithfulnessEvaluator(llm=self.llm)
         self.relevancy_evaluator = RelevancyEvaluator(llm=self.llm)
         self.context_relevancy_evaluator = RelevancyEvaluator(llm=self.llm)
-        
-        # Initialize batch runner
-        self.batch_runner = BatchEvalRunner(
-            evaluators={
-                "faithfulness": self.faithfulness_evaluator,
-                "relevancy": self.relevancy_evaluator,
-                "context_relevancy": self.context_relevancy_evaluator
-            },
-            workers=Config.WORKERS
+        self.batch_context_relevancy_evaluator = BatchContextRelevancyEvaluator(
+            llm=self.llm,
+            fallback_evaluator=self.context_relevancy_evaluator,
+            batched=Config.BATCH_CONTEXT_RELEVANCY
         )
+        self.judges = {
+            "faithfulness": self.faithfulness_evaluator,
+            "relevancy": self.relevancy_evaluator,
+            "context_relevancy": self.batch_context_relevancy_evaluator
+        }
+        
+        # Optional cascade: cheap judges first, the judges above only for uncertain cases
+        self.cascade = None
+        if Config.JUDGE_CASCADE_ENABLED:
+            cheap_llm = create_llm(
+                model=Config.CASCADE_CHEAP_MODEL,
+                temperature=Config.TEMPERATURE,
+                api_key=os.getenv("OPENAI_API_KEY")
+            )
+            self.cheap_judges = {
+                "faithfulness": FaithfulnessEvaluator(llm=cheap_llm),
+                "relevancy": RelevancyEvaluator(llm=cheap_llm),
+                "context_relevancy": BatchContextRelevancyEvaluator(
+                    llm=cheap_llm,
+                    fallback_evaluator=RelevancyEvaluator(llm=cheap_llm),
+                    batched=Config.BATCH_CONTEXT_RELEVANCY
+                )
+            }
+            self.cascade = JudgeCascade(Config.THRESHOLDS, Config.CASCADE_BANDS,
+                                        calibration_rate=Config.CASCADE_CALIBRATION_RATE)
+        
+        # Local answer-vs-reference metrics; recorded only, since faithfulness and
+        # answer relevancy do not depend on the reference answer
+        self.prefilter = None
+        if Config.PREFILTER_ENABLED:
+            embed_fn = None
+            if Config.PREFILTER_USE_EMBEDDINGS:
+                embed_fn = get_embed_model().get_text_embedding_batch
+            self.prefilter = LocalPrefilter(embed_fn=embed_fn)
             
     def load_qa_pairs(self, qa_file: str = "generated_qa_pairs.json") -> List[Dict[str, Any]]:
         """Load generated QA pairs from JSON file.
@@ -77,94 +150,420 @@ class BatchRagEvaluator:
         if not qa_path.exists():
             raise FileNotFoundError(f"QA pairs file not found: {qa_file}")
             
-        with open(qa_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return list(iter_records(str(qa_path)))
+    
+    def iter_qa_pairs(self, qa_file: str = "generated_qa_pairs.json",
+                      fields: Optional[Sequence[str]] = QA_EVAL_FIELDS,
+                      shard: Optional[Tuple[int, int]] = None) -> Iterator[Dict[str, Any]]:
+        """Lazily stream QA pairs from a JSON or JSONL file.
+        
+        Args:
+            qa_file: Path to the JSON or JSONL file containing QA pairs
+            fields: Keys to keep from each pair; None keeps all of them
+            shard: Optional (index, count) tuple to process a single shard
+            
+        Returns:
+            Iterator of QA pairs restricted to the requested fields
+        """
+        qa_path = Path(qa_file)
+        if not qa_path.exists():
+            raise FileNotFoundError(f"QA pairs file not found: {qa_file}")
             
-    async def query_rag(self, query: str) -> Dict[str, Any]:
-        """Send query to RAG application and get response.
+        return iter_records(str(qa_path), fields=fields, shard=shard)
+    
+    def sampled_qa_pairs(self, qa_file: str, shard: Optional[Tuple[int, int]] = None,
+                         stratify: bool = False, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Load QA pairs in random order for sequential sampling.
         
         Args:
-            query: Question to send to RAG
+            qa_file: Path to the JSON or JSONL file containing QA pairs
+            shard: Optional (index, count) tuple to process a single shard
+            stratify: Spread the pairs of each source document evenly over the order
+            seed: Seed for a reproducible order
             
         Returns:
-            RAG response containing answer and metadata
+            QA pairs restricted to QA_EVAL_FIELDS, in sampling order
         """
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.api_endpoint}/api/query",
-                    params={"query_text": query}
-                ) as response:
-                    response.raise_for_status()
-                    return await response.json()
-        except aiohttp.ClientError as e:
-            print(f"Error querying RAG endpoint: {e}")
-            return None
+        pairs = [
+            pair for pair in self.iter_qa_pairs(qa_file, fields=None, shard=shard)
+            if all(key in pair for key in QA_EVAL_FIELDS)
+        ]
+        ordered = sampling_order(pairs, stratum=source_document if stratify else None, seed=seed)
+        return [{key: pair[key] for key in QA_EVAL_FIELDS} for pair in ordered]
+            
+    async def _judge(self, metric: str, evaluate: Callable[[Any], Awaitable[Any]]) -> CascadeVerdict:
+        """Run a metric's judge, through the cascade when it is enabled.
+        
+        Args:
+            metric: Metric to judge
+            evaluate: Runs a judge of the metric on the case
+        """
+        judge = self.judges[metric]
+        if self.cascade is None:
+            return CascadeVerdict(await evaluate(judge), STRONG, None)
+        return await self.cascade.judge(
+            metric,
+            cheap=lambda: evaluate(self.cheap_judges[metric]),
+            strong=lambda: evaluate(judge),
+            score_of=lambda result: result['score'] if isinstance(result, dict) else result.score
+        )
 
     async def evaluate_query(self, query: str, response: str, contexts: List[str]) -> Dict[str, Any]:
         """Evaluate a single query using faithfulness, relevancy, and context relevancy metrics.
         
+        All three metrics are always judged: they grade the response against
+        the query and contexts, which the local pre-filter's comparison with
+        the reference answer says nothing about.
+        
         Args:
             query: The original query
             response: The RAG system's response
             contexts: List of context strings used to generate the response
             
         Returns:
-            Dictionary containing evaluation results from all evaluators
+            Dictionary containing evaluation results from all evaluators,
+            under "usage" the judge latency, tokens and cost of each metric
+            and under "verdicts" the tier that decided each judged metric
         """
+        usage: Dict[str, Usage] = {}
+        verdicts: Dict[str, CascadeVerdict] = {}
         try:
             # Evaluate faithfulness
-            faith_result = await self.faithfulness_evaluator.aevaluate(
-                query=query,
-                response=response,
-                contexts=contexts
-            )
+            with track_usage() as usage["faithfulness"]:
+                verdicts["faithfulness"] = await self._judge("faithfulness", lambda judge: judge.aevaluate(
+                    query=query,
+                    response=response,
+                    contexts=contexts
+                ))
+            faith_result = verdicts["faithfulness"].result
             
             # Evaluate answer relevancy
-            rel_result = await self.relevancy_evaluator.aevaluate(
-                query=query,
-                response=response,
-                contexts=contexts
-            )
-            
-            # Evaluate context relevancy for each context
-            context_rel_results = []
-            for context in contexts:
-                ctx_result = await self.context_relevancy_evaluator.aevaluate(
+            with track_usage() as usage["relevancy"]:
+                verdicts["relevancy"] = await self._judge("relevancy", lambda judge: judge.aevaluate(
                     query=query,
-                    response=context,  # Treat context as response to check relevancy
-                    contexts=[context]  # Pass context as its own context
-                )
-                context_rel_results.append(ctx_result)
+                    response=response,
+                    contexts=contexts
+                ))
+            rel_result = verdicts["relevancy"].result
             
-            # Calculate average context relevancy score
-            avg_context_score = sum(r.score for r in context_rel_results) / len(context_rel_results) if context_rel_results else 0
-            context_passing = all(r.passing for r in context_rel_results) if context_rel_results else False
+            # Evaluate context relevancy for all contexts in one judge call
+            # (falls back to one call per context if the batch cannot be parsed)
+            with track_usage() as usage["context_relevancy"]:
+                verdicts["context_relevancy"] = await self._judge("context_relevancy", lambda judge: judge.aevaluate(
+                    query=query,
+                    contexts=contexts
+                ))
+            context_relevancy = verdicts["context_relevancy"].result
             
             return {
                 "faithfulness": faith_result,
                 "relevancy": rel_result,
-                "context_relevancy": {
-                    "score": avg_context_score,
-                    "passing": context_passing,
-                    "individual_results": context_rel_results
-                }
+                "context_relevancy": context_relevancy,
+                "usage": usage,
+                "verdicts": verdicts
             }
         except Exception as e:
             print(f"Error during evaluation: {e}")
             return None
 
-async def main():
-    """Entry point for batch RAG evaluation."""
+    async def evaluate_pair(self, query: str, contexts: List[str],
+                            reference_answer: str = "") -> Optional[Dict[str, Any]]:
+        """Query the RAG application for one QA pair and evaluate the response.
+        
+        Args:
+            query: Question from the QA pair
+            contexts: Reference contexts of the QA pair
+            reference_answer: Reference answer used by the local pre-filter
+            
+        Returns:
+            Flat result row for the detailed results file, or None if the RAG
+            query or the evaluation failed
+        """
+        rows = await self.evaluate_pairs([{
+            'query': query,
+            'reference_answer': reference_answer,
+            'reference_contexts': contexts
+        }])
+        return rows[0]
+
+    async def evaluate_pairs(self, qa_pairs: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Query the RAG application for a batch of QA pairs and evaluate them.
+        
+        RAG queries go to the backend in one batch request and the local
+        pre-filter scores the whole batch against the reference answers at
+        once; its verdicts are recorded next to the judge scores.
+        
+        Args:
+            qa_pairs: QA pairs with query, reference_answer and reference_contexts
+            
+        Returns:
+            One result row per QA pair (None where the RAG query or evaluation failed)
+        """
+        rag_responses = await self.rag_client.query_many([pair['query'] for pair in qa_pairs])
+        answered = [i for i, response in enumerate(rag_responses) if response]
+        answers = {i: rag_responses[i].get("response", "") for i in answered}
+        
+        decisions: Dict[int, Optional[PrefilterDecision]] = {i: None for i in answered}
+        if self.prefilter and answered:
+            batch_decisions = self.prefilter.classify_batch(
+                [answers[i] for i in answered],
+                [qa_pairs[i].get('reference_answer', '') for i in answered]
+            )
+            decisions.update(zip(answered, batch_decisions))
+        
+        async def build_row(i: int) -> Optional[Dict[str, Any]]:
+            pair, decision = qa_pairs[i], decisions[i]
+            eval_results = await self.evaluate_query(
+                query=pair['query'],
+                response=answers[i],
+                contexts=pair['reference_contexts']
+            )
+            if not eval_results:
+                return None
+            return self._result_row(pair['query'], answers[i], pair['reference_contexts'],
+                                    eval_results, decision, rag_responses[i])
+        
+        rows: List[Optional[Dict[str, Any]]] = [None] * len(qa_pairs)
+        built = await asyncio.gather(*(build_row(i) for i in answered))
+        for i, row in zip(answered, built):
+            rows[i] = row
+        return rows
+
+    @staticmethod
+    def _result_row(query: str, response_text: str, contexts: List[str],
+                    eval_results: Dict[str, Any],
+                    decision: Optional[PrefilterDecision],
+                    rag_response: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Flatten evaluation results into a detailed results row.
+        
+        Besides scores, the row records the RAG request latency, the
+        backend's stage timings (server_*_ms), each metric's judge latency
+        (None if it did not run), the judge tier that decided
+        each metric with the cheap judge's score, and the judge token usage
+        and estimated cost.
+        """
+        rag_response = rag_response or {}
+        usage: Dict[str, Usage] = eval_results.get('usage', {})
+        verdicts: Dict[str, CascadeVerdict] = eval_results.get('verdicts', {})
+        row = {
+            'timestamp': datetime.now().isoformat(),
+            'query': query,
+            'response': response_text,
+            'context': contexts[0] if contexts else "",
+            'faithfulness_score': eval_results['faithfulness'].score,
+            'faithfulness_passing': eval_results['faithfulness'].passing,
+            'faithfulness_feedback': eval_results['faithfulness'].feedback,
+            'relevancy_score': eval_results['relevancy'].score,
+            'relevancy_passing': eval_results['relevancy'].passing,
+            'relevancy_feedback': eval_results['relevancy'].feedback,
+            'context_relevancy_score': eval_results['context_relevancy']['score'],
+            'context_relevancy_passing': eval_results['context_relevancy']['passing'],
+            'context_relevancy_scores': json.dumps(eval_results['context_relevancy']['scores']),
+            'context_relevancy_mode': eval_results['context_relevancy']['mode'],
+            'prefilter_verdict': decision.verdict if decision else JUDGE,
+            'token_f1': decision.token_f1 if decision else None,
+            'rouge_l': decision.rouge_l if decision else None,
+            'rag_latency_ms': rag_response.get('latency_ms')
+        }
+        timings = rag_response.get('timings') or {}
+        for stage in SERVER_STAGES:
+            row[f'server_{stage}'] = timings.get(stage)
+        for metric in JUDGE_METRICS:
+            row[f'{metric}_judge_ms'] = usage[metric].latency_ms if metric in usage else None
+        for metric in JUDGE_METRICS:
+            verdict = verdicts.get(metric)
+            row[f'{metric}_tier'] = verdict.tier if verdict else PREFILTER
+            row[f'{metric}_cheap_score'] = verdict.cheap_score if verdict else None
+            row[f'{metric}_calibration'] = verdict.calibration if verdict else False
+        row.update({
+            'judge_calls': sum(u.calls for u in usage.values()),
+            'judge_prompt_tokens': sum(u.prompt_tokens for u in usage.values()),
+            'judge_completion_tokens': sum(u.completion_tokens for u in usage.values()),
+            'judge_cost_usd': sum(u.cost_usd for u in usage.values())
+        })
+        return row
+
+def summarize_results(df: pd.DataFrame) -> Dict[str, Any]:
+    """Compute summary statistics over detailed evaluation results.
+    
+    Args:
+        df: Detailed results, one row per evaluated query
+        
+    Returns:
+        Dictionary of summary statistics
+    """
+    return {
+        'Total Queries': len(df),
+        'Average Faithfulness Score': df['faithfulness_score'].mean(),
+        'Average Answer Relevancy Score': df['relevancy_score'].mean(),
+        'Average Context Relevancy Score': df['context_relevancy_score'].mean(),
+        'Passing Faithfulness': df['faithfulness_passing'].sum(),
+        'Passing Answer Relevancy': df['relevancy_passing'].sum(),
+        'Passing Context Relevancy': df['context_relevancy_passing'].sum(),
+        'Pre-filter Reference Passes': (df['prefilter_verdict'] == PASS).sum(),
+        'Pre-filter Reference Fails': (df['prefilter_verdict'] == FAIL).sum(),
+        'Judge Calls Avoided': JUDGE_CALLS_AVOIDED,
+        'Judge Calls Avoided Reason': JUDGE_CALLS_AVOIDED_REASON,
+        **latency_summary(df),
+        **tier_summary(df),
+        **cascade_summary(df),
+        'Judge Calls': df['judge_calls'].sum() if 'judge_calls' in df else 0,
+        'Judge Prompt Tokens': df['judge_prompt_tokens'].sum() if 'judge_prompt_tokens' in df else 0,
+        'Judge Completion Tokens': df['judge_completion_tokens'].sum() if 'judge_completion_tokens' in df else 0,
+        'Judge Cost USD': df['judge_cost_usd'].sum() if 'judge_cost_usd' in df else 0.0
+    }
+
+def tier_summary(df: pd.DataFrame) -> Dict[str, int]:
+    """Metric verdicts decided by each judge tier (pre-filter, cheap, strong)."""
+    columns = [f'{metric}_tier' for metric in JUDGE_METRICS if f'{metric}_tier' in df]
+    if not columns:
+        return {}
+    counts = pd.concat([df[column] for column in columns]).value_counts()
+    return {f'{tier.title()} Tier Verdicts': int(counts.get(tier, 0)) for tier in (PREFILTER, CHEAP, STRONG)}
+
+def cascade_summary(df: pd.DataFrame) -> Dict[str, Any]:
+    """Escalation and tier agreement rates of the judge cascade, rebuilt from the result rows."""
+    if not Config.JUDGE_CASCADE_ENABLED or not any(f'{metric}_tier' in df for metric in JUDGE_METRICS):
+        return {}
+    cascade = JudgeCascade(Config.THRESHOLDS, Config.CASCADE_BANDS)
+    for row in df.to_dict('records'):
+        for metric in JUDGE_METRICS:
+            if f'{metric}_tier' in row:
+                cascade.observe(metric, row[f'{metric}_tier'], row[f'{metric}_cheap_score'],
+                                row[f'{metric}_score'], row[f'{metric}_calibration'])
+    return cascade.summary()
+
+def latency_summary(df: pd.DataFrame) -> Dict[str, float]:
+    """Mean, p50 and p95 of each latency column present in the results."""
+    stats = {}
+    for column, label in LATENCY_COLUMNS.items():
+        if column not in df or df[column].dropna().empty:
+            continue
+        values = df[column].dropna()
+        stats[f'Mean {label} (ms)'] = values.mean()
+        stats[f'P50 {label} (ms)'] = values.quantile(0.5)
+        stats[f'P95 {label} (ms)'] = values.quantile(0.95)
+    return stats
+
+def save_results(df: pd.DataFrame, results_dir: str = Config.RESULTS_DIR,
+                 timestamp: Optional[str] = None,
+                 dataset: Optional[str] = None,
+                 extra_summary: Optional[Dict[str, Any]] = None,
+                 corpus_dir: str = Config.CORPUS_DIR,
+                 corpus: Optional[Dict[str, str]] = None) -> Tuple[Path, Path, Dict[str, Any]]:
+    """Write detailed results and their summary to CSV files and the run store.
+    
+    Args:
+        df: Detailed results, one row per evaluated query
+        results_dir: Directory to write the CSV files into
+        timestamp: Suffix for the file names; defaults to the current time
+        dataset: QA pairs file the results were produced from
+        extra_summary: Additional summary statistics, e.g. of sequential sampling
+        corpus_dir: Document directory of the RAG backend
+        corpus: Corpus manifest taken when the run started, recorded next to
+            the detailed results for change-impact selection
+        
+    Returns:
+        Tuple of (detailed results path, summary path, summary statistics)
+    """
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_path = Path(results_dir)
+    results_path.mkdir(parents=True, exist_ok=True)
+    
+    # Save detailed results
+    results_file = results_path / f"evaluation_results_{timestamp}.csv"
+    df.to_csv(results_file, index=False)
+    write_corpus_manifest(results_file, corpus_dir, corpus)
+    
+    # Record the run in the results store for cross-run comparison
+    summary_stats = summarize_results(df)
+    summary_stats.update(extra_summary or {})
+    if Config.RESULTS_STORE_ENABLED:
+        backend_config = {'api_endpoint': Config.API_ENDPOINT, 'judge_model': Config.OPENAI_MODEL}
+        if Config.JUDGE_CASCADE_ENABLED:
+            backend_config['cheap_judge_model'] = Config.CASCADE_CHEAP_MODEL
+        summary_stats['Run ID'] = record_run(
+            "llama_eval", df.to_dict('records'), summary_stats, dataset, backend_config=backend_config
+        )
+    
+    # Save summary
+    summary_file = results_path / f"evaluation_summary_{timestamp}.csv"
+    pd.DataFrame([summary_stats]).to_csv(summary_file, index=False)
+    
+    return results_file, summary_file, summary_stats
+
+def impact_selector(baseline: Optional[str], corpus_dir: str) -> Optional[ImpactSelector]:
+    """Selector of the QA pairs affected by corpus changes since a previous run.
+    
+    Args:
+        baseline: Detailed results file of the previous run; defaults to the
+            latest one in Config.RESULTS_DIR with a corpus manifest
+        corpus_dir: Document directory of the RAG backend
+        
+    Returns:
+        ImpactSelector, or None if there is no previous run to compare with
+    """
+    baseline_file = Path(baseline) if baseline else find_baseline(Config.RESULTS_DIR, "evaluation_results_*.csv")
+    if baseline_file is None:
+        return None
+    documents = read_corpus_manifest(baseline_file)
+    if documents is None:
+        raise FileNotFoundError(f"No corpus manifest recorded with {baseline_file}")
+    print(f"Comparing the corpus with the run of {baseline_file}")
+    previous_rows = pd.read_csv(baseline_file).to_dict('records')
+    return ImpactSelector(corpus_dir, documents, previous_rows, 'query', 'reference_contexts')
+
+async def main(qa_file: str = Config.QA_OUTPUT_FILE,
+               shard: Optional[Tuple[int, int]] = None,
+               sequential: Optional[SequentialEvaluation] = None,
+               stratify: bool = False,
+               seed: Optional[int] = None,
+               impacted: bool = False,
+               baseline: Optional[str] = None,
+               corpus_dir: str = Config.CORPUS_DIR):
+    """Entry point for batch RAG evaluation.
+    
+    Args:
+        qa_file: Path to the QA pairs dataset
+        shard: Optional (index, count) tuple to evaluate a single dataset shard
+        sequential: Judge the pairs in random order and stop once the
+            decision of every metric in Config.THRESHOLDS is settled
+        stratify: Stratify the sequential sampling order by source document
+        seed: Seed of the sequential sampling order
+        impacted: Evaluate only the pairs affected by corpus changes since the
+            baseline run and carry its results over for the others
+        baseline: Detailed results file of the baseline run (default: latest)
+        corpus_dir: Document directory of the RAG backend
+    """
     try:
         # Initialize evaluator
         print("Initializing batch RAG evaluator...")
         evaluator = BatchRagEvaluator()
+        evaluator.rag_client.question_embeddings = load_question_embeddings(qa_file)
+        selector = impact_selector(baseline, corpus_dir) if impacted else None
+        if selector:
+            corpus = selector.documents
+        else:
+            corpus = corpus_manifest(corpus_dir) if Path(corpus_dir).is_dir() else None
         
-        # Load QA pairs
-        print("\nLoading generated QA pairs...")
-        qa_pairs = evaluator.load_qa_pairs(r"D:\RAGOps-Workspace\RAGOps-Suite\ragbench\llama_eval\generated_qa_pairs.json")
-        print(f"Loaded {len(qa_pairs)} QA pairs")
+        if sequential:
+            # A random order needs the whole (sharded) dataset up front
+            print(f"\nLoading QA pairs from {qa_file} in random order...")
+            sampled = evaluator.sampled_qa_pairs(qa_file, shard=shard, stratify=stratify, seed=seed)
+            qa_pairs = iter(sampled)
+        elif selector:
+            print(selector.describe())
+            print(f"\nStreaming the QA pairs from {qa_file} affected by the changes...")
+            qa_pairs = (
+                pair for _, pair in selector.select(enumerate(evaluator.iter_qa_pairs(qa_file, shard=shard)))
+            )
+        else:
+            if impacted:
+                print("No previous run with a corpus manifest; evaluating all QA pairs")
+            # Stream QA pairs lazily instead of loading the whole file
+            print(f"\nStreaming QA pairs from {qa_file}...")
+            qa_pairs = evaluator.iter_qa_pairs(qa_file, shard=shard)
+        drawn = 0
         
         # Create DataFrame to store results
         results_data = []
@@ -173,84 +572,67 @@ async def main():
         print("\nProcessing queries and running evaluations...")
         print("-" * 80)
         
-        for qa_pair in qa_pairs:
-            query = qa_pair['query']
-            contexts = qa_pair['reference_contexts']
+        while True:
+            batch = list(itertools.islice(qa_pairs, Config.EVAL_BATCH_SIZE))
+            if not batch:
+                break
+            drawn += len(batch)
             
             try:
-                # Get RAG response
-                rag_response = await evaluator.query_rag(query)
-                if rag_response:
-                    response_text = rag_response.get("response", "")
-                    
-                    # Run evaluation
-                    eval_results = await evaluator.evaluate_query(
-                        query=query,
-                        response=response_text,
-                        contexts=contexts
-                    )
-                    
-                    # Store results in DataFrame
-                    results_data.append({
-                        'timestamp': datetime.now().isoformat(),
-                        'query': query,
-                        'response': response_text,
-                        'context': contexts[0] if contexts else "",
-                        'faithfulness_score': eval_results['faithfulness'].score,
-                        'faithfulness_passing': eval_results['faithfulness'].passing,
-                        'faithfulness_feedback': eval_results['faithfulness'].feedback,
-                        'relevancy_score': eval_results['relevancy'].score,
-                        'relevancy_passing': eval_results['relevancy'].passing,
-                        'relevancy_feedback': eval_results['relevancy'].feedback,
-                        'context_relevancy_score': eval_results['context_relevancy']['score'],
-                        'context_relevancy_passing': eval_results['context_relevancy']['passing']
-                    })
-                    
-                    # Print results
-                    print(f"\nQuery: {query}")
-                    print(f"Response: {response_text[:200]}...")  # Show first 200 chars
-                    print("Contexts:")
-                    for ctx in contexts:
-                        print(f"- {ctx[:200]}...")  # Show first 200 chars
-                    print("\nEvaluation Results:")
-                    print(f"Faithfulness: {eval_results['faithfulness']}")
-                    print(f"Answer Relevancy: {eval_results['relevancy']}")
-                    print(f"Context Relevancy Score: {eval_results['context_relevancy']['score']:.2f} (Passing: {eval_results['context_relevancy']['passing']})")
-                    print("-" * 80)
-                    
+                # Get RAG responses and run evaluation for the batch
+                rows = await evaluator.evaluate_pairs(batch)
             except Exception as e:
-                print(f"Error processing query '{query}': {str(e)}")
+                print(f"Error processing batch: {str(e)}")
                 continue
+            
+            for qa_pair, row in zip(batch, rows):
+                if not row:
+                    print(f"Error processing query '{qa_pair['query']}'")
+                    continue
+                results_data.append(row)
+                
+                # Print results
+                print(f"\nQuery: {qa_pair['query']}")
+                print(f"Response: {row['response'][:200]}...")  # Show first 200 chars
+                print("Contexts:")
+                for ctx in qa_pair['reference_contexts']:
+                    print(f"- {ctx[:200]}...")  # Show first 200 chars
+                print("\nEvaluation Results:")
+                print(f"Pre-filter: {row['prefilter_verdict']}")
+                print(f"Faithfulness: {row['faithfulness_score']} (Passing: {row['faithfulness_passing']})")
+                print(f"Answer Relevancy: {row['relevancy_score']} (Passing: {row['relevancy_passing']})")
+                print(f"Context Relevancy Score: {row['context_relevancy_score']:.2f} (Passing: {row['context_relevancy_passing']})")
+                print("-" * 80)
+            
+            if sequential:
+                for row in filter(None, rows):
+                    sequential.add({metric: row[f'{metric}_score'] for metric in sequential.thresholds})
+                print(f"Sequential sampling after {sequential.items} pairs: {sequential.progress()}")
+                if sequential.resolved():
+                    print(f"All decisions settled; skipping the remaining {len(sampled) - drawn} pairs")
+                    break
         
-        # Create DataFrame and calculate statistics
-        df = pd.DataFrame(results_data)
-        
-        # Save results
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        results_dir = Path(Config.RESULTS_DIR)
-        results_dir.mkdir(exist_ok=True)
-        
-        # Save detailed results
-        results_file = results_dir / f"evaluation_results_{timestamp}.csv"
-        df.to_csv(results_file, index=False)
+        # Merge the carried-over results of unaffected pairs into the report
+        extra_summary = {}
+        if selector:
+            for row in results_data:
+                row['carried_over'] = False
+            results_data.extend({**row, 'carried_over': True} for _, row in selector.carried)
+            extra_summary.update(selector.summary())
         
-        # Save summary
-        summary_file = results_dir / f"evaluation_summary_{timestamp}.csv"
-        summary_stats = {
-            'Total Queries': len(df),
-            'Average Faithfulness Score': df['faithfulness_score'].mean(),
-            'Average Answer Relevancy Score': df['relevancy_score'].mean(),
-            'Average Context Relevancy Score': df['context_relevancy_score'].mean(),
-            'Passing Faithfulness': df['faithfulness_passing'].sum(),
-            'Passing Answer Relevancy': df['relevancy_passing'].sum(),
-            'Passing Context Relevancy': df['context_relevancy_passing'].sum()
-        }
-        pd.DataFrame([summary_stats]).to_csv(summary_file, index=False)
+        # Create DataFrame, calculate statistics and save results
+        df = pd.DataFrame(results_data)
+        if sequential:
+            judge_calls = df['judge_calls'].sum() if 'judge_calls' in df else 0
+            extra_summary.update(sequential.summary(len(sampled) - drawn, judge_calls))
+        results_file, summary_file, summary_stats = save_results(
+            df, dataset=qa_file, extra_summary=extra_summary, corpus_dir=corpus_dir, corpus=corpus
+        )
         
         # Print summary
         print("\nEvaluation Summary:")
         for metric, value in summary_stats.items():
-            print(f"{metric}: {value:.2f}")
+            print(f"{metric}: {value}" if isinstance(value, str) or value is None else f"{metric}: {value:.2f}")
         print(f"\nResults saved to:")
         print(f"Detailed results: {results_file}")
         print(f"Summary: {summary_file}")
@@ -259,4 +641,23 @@ async def main():
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Batch RAG evaluation")
+    parser.add_argument("--qa-file", default=Config.QA_OUTPUT_FILE,
+                        help="QA pairs dataset (JSON or JSONL)")
+    add_shard_argument(parser)
+    add_sequential_arguments(parser, confidence=Config.SEQUENTIAL_CONFIDENCE,
+                             min_items=Config.SEQUENTIAL_MIN_ITEMS, method=Config.SEQUENTIAL_CI_METHOD)
+    add_impact_arguments(parser, Config.CORPUS_DIR)
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    if args.impacted and args.sequential:
+        parser.error("--impacted cannot be combined with --sequential")
+    sequential = None
+    if args.sequential:
+        targets = {**Config.THRESHOLDS, **Config.SEQUENTIAL_TARGETS}
+        sequential = SequentialEvaluation(targets, confidence=args.confidence,
+                                          min_items=args.min_items, method=args.ci_method, seed=args.seed)
+    with profile_run(args.profile, "batch_evaluator", memory=not args.profile_no_memory):
+        asyncio.run(main(qa_file=args.qa_file, shard=args.shard, sequential=sequential,
+                         stratify=args.stratify, seed=args.seed, impacted=args.impacted,
+                         baseline=args.baseline, corpus_dir=args.corpus))
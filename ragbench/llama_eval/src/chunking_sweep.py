@@ -0,0 +1,261 @@
+"""
+Chunking Strategy Sweep
+
+Builds temporary in-memory indexes over the test documents for every
+combination of splitter, chunk size and chunk overlap, then measures
+ingestion time, index size, retrieval latency and offline retrieval quality
+(hit-rate, MRR and nDCG against the QA pairs' reference contexts, see
+retrieval_bench.py). No LLM is involved.
+
+A retrieved chunk counts as relevant when it contains at least half of the
+distinct tokens of a reference context (``reference_coverage``). The
+min-normalized overlap coefficient of retrieval_bench.py would let any
+small chunk match a large reference context, favouring small chunk sizes.
+
+All settings share one embedding cache keyed by model and text, so every
+distinct chunk and question is embedded only once per sweep (or once ever
+with --cache-file). Because of this, ``embed_ms`` only covers the chunks a
+setting embedded for the first time; ``embedded`` and ``cached`` show how
+many chunks that was.
+
+Usage:
+    python chunking_sweep.py --chunk-sizes 128 256 512 1024 --overlaps 0 20 64 \\
+        --splitters sentence token --top-k 5
+"""
+
+import argparse
+import hashlib
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.node_parser import SentenceSplitter, TokenTextSplitter
+from llama_index.core.schema import QueryBundle
+
+from config import Config
+
+# Add ragbench directory to Python path to enable shared imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from dataset_stream import iter_records
+from percentiles import percentile
+from providers import get_embed_model
+from retrieval_bench import reference_coverage, relevance_vector, score_rankings
+
+SPLITTERS = {
+    "sentence": SentenceSplitter,
+    "token": TokenTextSplitter
+}
+
+
+class CachedEmbedding(BaseEmbedding):
+    """Embedding model wrapper that embeds each distinct text only once.
+
+    Queries and documents are cached separately because some models embed
+    them differently. ``misses`` counts texts sent to the wrapped model.
+    """
+
+    _model: BaseEmbedding = PrivateAttr()
+    _cache: Dict[str, List[float]] = PrivateAttr(default_factory=dict)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, model: BaseEmbedding, **kwargs: Any):
+        super().__init__(model_name=model.model_name, embed_batch_size=model.embed_batch_size, **kwargs)
+        self._model = model
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha1(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+    def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("text", text) for text in texts]
+        missing = {key: text for key, text in zip(keys, texts) if key not in self._cache}
+        if missing:
+            embeddings = self._model.get_text_embedding_batch(list(missing.values()))
+            self._cache.update(zip(missing, embeddings))
+            self._misses += len(missing)
+        return [self._cache[key] for key in keys]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        key = self._key("query", query)
+        if key not in self._cache:
+            self._cache[key] = self._model.get_query_embedding(query)
+            self._misses += 1
+        return self._cache[key]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embed_texts([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_texts(texts)
+
+    def load(self, path: Path):
+        """Merge embeddings saved by ``save`` into the cache."""
+        if not path.exists():
+            return
+        data = np.load(path)
+        self._cache.update(zip(data["keys"].tolist(), data["embeddings"].tolist()))
+        print(f"Loaded {len(data['keys'])} cached embeddings from {path}")
+
+    def save(self, path: Path):
+        """Write the cache to an .npz file."""
+        if not self._cache:
+            return
+        keys = list(self._cache)
+        np.savez(path, keys=np.array(keys), embeddings=np.array([self._cache[k] for k in keys], dtype=np.float32))
+
+
+def sweep_settings(splitters: Sequence[str], chunk_sizes: Sequence[int],
+                   overlaps: Sequence[int]) -> List[Tuple[str, int, int]]:
+    """All (splitter, chunk_size, chunk_overlap) combinations with overlap < size."""
+    return [
+        (splitter, chunk_size, overlap)
+        for splitter in splitters
+        for chunk_size in chunk_sizes
+        for overlap in overlaps
+        if overlap < chunk_size
+    ]
+
+
+def run_setting(documents: List[Any], qa_pairs: List[Dict[str, Any]],
+                query_embeddings: List[List[float]], embed_model: CachedEmbedding,
+                splitter: str, chunk_size: int, chunk_overlap: int, top_k: int) -> Dict[str, Any]:
+    """Build an in-memory index with one chunking setting and benchmark it.
+
+    Args:
+        documents: Documents to index
+        qa_pairs: QA pairs with query and reference_contexts
+        query_embeddings: Precomputed embedding of each query
+        embed_model: Shared caching embedding model
+        splitter: Key of SPLITTERS
+        chunk_size: Chunk size in tokens
+        chunk_overlap: Chunk overlap in tokens
+        top_k: Nodes retrieved per query
+
+    Returns:
+        Dict[str, Any]: One result row
+    """
+    start = time.perf_counter()
+    nodes = SPLITTERS[splitter](chunk_size=chunk_size, chunk_overlap=chunk_overlap).get_nodes_from_documents(documents)
+    split_ms = (time.perf_counter() - start) * 1000
+
+    misses_before = embed_model.misses
+    start = time.perf_counter()
+    index = VectorStoreIndex(nodes, embed_model=embed_model)
+    embed_ms = (time.perf_counter() - start) * 1000
+    embedded = embed_model.misses - misses_before
+
+    retriever = index.as_retriever(similarity_top_k=top_k)
+    rankings, latencies = [], []
+    for pair, embedding in zip(qa_pairs, query_embeddings):
+        start = time.perf_counter()
+        results = retriever.retrieve(QueryBundle(query_str=pair['query'], embedding=embedding))
+        latencies.append((time.perf_counter() - start) * 1000)
+        rankings.append({
+            'relevance': relevance_vector([r.node.get_content() for r in results], pair['reference_contexts'],
+                                          similarity=reference_coverage),
+            'num_references': len(pair['reference_contexts'])
+        })
+    latencies.sort()
+
+    dimensions = len(query_embeddings[0]) if query_embeddings else 0
+    text_bytes = sum(len(node.get_content().encode("utf-8")) for node in nodes)
+    row = {
+        'splitter': splitter,
+        'chunk_size': chunk_size,
+        'chunk_overlap': chunk_overlap,
+        'nodes': len(nodes),
+        'avg_chunk_chars': statistics.mean(len(node.get_content()) for node in nodes) if nodes else 0,
+        'index_kb': (text_bytes + len(nodes) * dimensions * 4) / 1024,
+        'split_ms': split_ms,
+        'embed_ms': embed_ms,
+        'ingest_ms': split_ms + embed_ms,
+        'embedded': embedded,
+        'cached': len(nodes) - embedded,
+        'p50_retrieve_ms': percentile(latencies, 0.5),
+        'p95_retrieve_ms': percentile(latencies, 0.95)
+    }
+    row.update({k: v for k, v in score_rankings(rankings, [top_k])[0].items() if k != 'top_k'})
+    return row
+
+
+def rank_results(df: pd.DataFrame) -> pd.DataFrame:
+    """Rank settings by retrieval quality, then by smaller index and faster retrieval."""
+    df = df.sort_values(['ndcg', 'mrr', 'hit_rate', 'index_kb', 'p50_retrieve_ms'],
+                        ascending=[False, False, False, True, True]).reset_index(drop=True)
+    df.insert(0, 'rank', df.index + 1)
+    return df
+
+
+def main():
+    """Entry point for the chunking sweep."""
+    parser = argparse.ArgumentParser(description="Sweep chunking settings with in-memory indexes")
+    parser.add_argument("--docs-dir", default=Config.DOCUMENTS_DIR, help="Documents to index")
+    parser.add_argument("--qa-file", default=Config.QA_OUTPUT_FILE, help="QA pairs with reference_contexts (JSON or JSONL)")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+",
+                        default=[128, 256, 512, 1024], help="Chunk sizes in tokens")
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 20, 64],
+                        help="Chunk overlaps in tokens")
+    parser.add_argument("--splitters", nargs="+", choices=sorted(SPLITTERS), default=["sentence", "token"],
+                        help="Node parsers to compare")
+    parser.add_argument("--top-k", type=int, default=5, help="Nodes retrieved per query")
+    parser.add_argument("--embed-model", default=None, help="OpenAI embedding model (default: library default; ignored with RAGOPS_PROVIDER=fake)")
+    parser.add_argument("--cache-file", default=None, help="Persist the embedding cache to this .npz file")
+    parser.add_argument("--results-dir", default=Config.RESULTS_DIR, help="Directory for the CSV report")
+    args = parser.parse_args()
+
+    load_dotenv()
+    documents = SimpleDirectoryReader(args.docs_dir).load_data()
+    qa_pairs = list(iter_records(args.qa_file, fields=('query', 'reference_contexts')))
+    print(f"Loaded {len(documents)} documents and {len(qa_pairs)} QA pairs")
+
+    embed_model = CachedEmbedding(get_embed_model(**({"model": args.embed_model} if args.embed_model else {})))
+    cache_file = Path(args.cache_file) if args.cache_file else None
+    if cache_file:
+        embed_model.load(cache_file)
+    query_embeddings = [embed_model.get_query_embedding(pair['query']) for pair in qa_pairs]
+
+    rows = []
+    settings = sweep_settings(args.splitters, args.chunk_sizes, args.overlaps)
+    for splitter, chunk_size, chunk_overlap in settings:
+        print(f"Benchmarking {splitter} splitter, size {chunk_size}, overlap {chunk_overlap}...")
+        rows.append(run_setting(documents, qa_pairs, query_embeddings, embed_model,
+                                splitter, chunk_size, chunk_overlap, args.top_k))
+    if cache_file:
+        embed_model.save(cache_file)
+    print(f"Embedded {embed_model.misses} distinct texts for {len(settings)} settings")
+
+    df = rank_results(pd.DataFrame(rows))
+    print(f"\nChunking Sweep (quality at top_k={args.top_k}):")
+    print(df.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    best = df.iloc[0]
+    if best['splitter'] == 'sentence':
+        print(f"\nBest setting for the backend: CHUNK_SIZE={best['chunk_size']} CHUNK_OVERLAP={best['chunk_overlap']}")
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    results_file = results_dir / f"chunking_sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    df.to_csv(results_file, index=False)
+    print(f"\nResults saved to: {results_file}")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 """Configuration constants for the RAGOps evaluation framework."""
 
+from pathlib import Path
+
 class Config:
     # OpenAI Settings
     OPENAI_MODEL = "gpt-3.5-turbo"
     TEMPERATURE = 0.3
     
+    # LLM Rate Limits (shared by judges and generators, per process)
+    LLM_REQUESTS_PER_MINUTE = 500
+    LLM_TOKENS_PER_MINUTE = 200000
+    
     # RAG API Settings
     API_ENDPOINT = "http://localhost:8000"
     API_QUERY_PATH = "/api/query"
@@ -17,10 +23,44 @@ class Config:
         "context_relevancy": 0.7
     }
     RESULTS_DIR = "evaluation_results"
+    BATCH_CONTEXT_RELEVANCY = True  # Grade all contexts of a query in one judge call
+    EVAL_BATCH_SIZE = 8             # QA pairs queried and pre-filtered together
+    RESULTS_STORE_ENABLED = True    # Also record runs in the SQLite results store (ragbench/results_store.py)
+    
+    # Sequential sampling (--sequential): stop once every THRESHOLDS decision is settled
+    SEQUENTIAL_CONFIDENCE = 0.95    # Joint confidence over all metrics
+    SEQUENTIAL_MIN_ITEMS = 30       # Never stop before this many judged items
+    SEQUENTIAL_CI_METHOD = "auto"   # wilson, bootstrap, or auto (Wilson for 0/1 scores)
+    # Mean score each metric must reach, overriding THRESHOLDS; a target of 1.0 (faithfulness)
+    # can only be settled as a fail, e.g. {"faithfulness": 0.95} lets a passing run stop early too
+    SEQUENTIAL_TARGETS = {}
+    
+    # Change-impact selection (--impacted): re-evaluate only pairs grounded in changed documents
+    CORPUS_DIR = str(Path(__file__).resolve().parents[3] / "examples" / "ragstack" / "backend" / "data")
+    
+    # Judge cascade: CASCADE_CHEAP_MODEL judges first; OPENAI_MODEL only gets cases whose cheap
+    # score falls into the metric's [low, high) band. Binary judges (faithfulness, relevancy) score
+    # 0 or 1, so (0.0, 1.0) escalates every cheap fail and trusts cheap passes.
+    JUDGE_CASCADE_ENABLED = False
+    CASCADE_CHEAP_MODEL = "gpt-4o-mini"
+    CASCADE_BANDS = {
+        "faithfulness": (0.0, 1.0),
+        "relevancy": (0.0, 1.0),
+        "context_relevancy": (0.5, 0.85)
+    }
+    CASCADE_CALIBRATION_RATE = 0.1  # Cases judged by both tiers to measure their agreement
+    
+    # Local pre-filter (token F1 / ROUGE-L / embedding cosine vs. reference answer). Recorded per
+    # query only: faithfulness and relevancy are graded against the contexts and are always judged
+    PREFILTER_ENABLED = True
+    PREFILTER_USE_EMBEDDINGS = False
     
-    # QA Generation Settings
-    CHUNK_SIZE = 512  # Number of tokens per chunk
+    # QA Generation Settings (None keeps llama-index's SentenceSplitter defaults, 1024/200 tokens,
+    # which existing QA datasets were generated with; override with --chunk-size / --chunk-overlap)
+    CHUNK_SIZE = None  # Number of tokens per chunk
+    CHUNK_OVERLAP = None  # Tokens shared by consecutive chunks
     QUESTIONS_PER_CHUNK = 4
+    PRECOMPUTE_QUESTION_EMBEDDINGS = True  # Write <qa file>.embeddings.npz for the evaluators
     
     # Input/Output Settings
     DOCUMENTS_DIR = "./data/test_documents"
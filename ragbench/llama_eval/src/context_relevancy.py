@@ -0,0 +1,131 @@
+"""
+Batched Context Relevancy Evaluator
+
+Scores every retrieved context for a query in a single judge call instead of
+one RelevancyEvaluator call per context. The judge is asked for structured
+output (a ``ContextScores`` object, through the LLM's function calling where
+available); if the call fails or the scores do not match the contexts,
+evaluation falls back to the per-context RelevancyEvaluator.
+"""
+
+import asyncio
+import math
+from typing import Any, Dict, List, Optional
+
+from llama_index.core.bridge.pydantic import BaseModel, Field
+from llama_index.core.evaluation import RelevancyEvaluator
+from llama_index.core.llms import LLM
+from llama_index.core.prompts import PromptTemplate
+from config import Config
+
+BATCH_CONTEXT_RELEVANCY_PROMPT = PromptTemplate("""You are grading retrieved context passages for a search query.
+For each numbered passage, rate how relevant it is to answering the query
+on a scale from 0.0 (irrelevant) to 1.0 (fully relevant).
+
+Query: {query}
+
+Passages:
+{passages}
+
+Return exactly {count} scores in passage order.""")
+
+
+class ContextScores(BaseModel):
+    """Relevancy of each retrieved passage to the query."""
+    scores: List[float] = Field(
+        description="One score per passage, in passage order, from 0.0 (irrelevant) to 1.0 (fully relevant)"
+    )
+
+
+def validate_scores(scores: List[float], expected: int) -> Optional[List[float]]:
+    """Check a judge's score vector against the contexts it grades.
+
+    Args:
+        scores: Scores returned by the judge
+        expected: Number of contexts graded
+
+    Returns:
+        List of scores clamped to [0, 1], or None if the count is wrong or a
+        score is not a finite number
+    """
+    if len(scores) != expected or not all(math.isfinite(score) for score in scores):
+        return None
+    return [min(1.0, max(0.0, score)) for score in scores]
+
+
+class BatchContextRelevancyEvaluator:
+    """Evaluates the relevancy of all contexts for a query in one LLM call."""
+
+    def __init__(self, llm: LLM, fallback_evaluator: RelevancyEvaluator = None,
+                 threshold: float = Config.THRESHOLDS["context_relevancy"],
+                 batched: bool = True):
+        """Initialize the batched context relevancy evaluator.
+
+        Args:
+            llm: Judge LLM
+            fallback_evaluator: Per-context evaluator used when the batched
+                call fails or returns unusable scores
+            threshold: Minimum score for a context to count as relevant
+            batched: If False, always grade contexts one call at a time
+        """
+        self.llm = llm
+        self.fallback_evaluator = fallback_evaluator or RelevancyEvaluator(llm=llm)
+        self.threshold = threshold
+        self.batched = batched
+
+    async def aevaluate(self, query: str, contexts: List[str]) -> Dict[str, Any]:
+        """Score each context's relevancy to the query.
+
+        Args:
+            query: The original query
+            contexts: Context strings to grade
+
+        Returns:
+            Dictionary with the average score, overall passing flag, the
+            per-context score vector and the mode used ("batched" or "per_context")
+        """
+        if not contexts:
+            return {"score": 0, "passing": False, "scores": [], "mode": "batched"}
+
+        scores = await self._evaluate_batched(query, contexts) if self.batched else None
+
+        mode = "batched"
+        if scores is None:
+            scores = await self._evaluate_per_context(query, contexts)
+            mode = "per_context"
+
+        return {
+            "score": sum(scores) / len(scores),
+            "passing": all(score >= self.threshold for score in scores),
+            "scores": scores,
+            "mode": mode
+        }
+
+    async def _evaluate_batched(self, query: str, contexts: List[str]) -> Optional[List[float]]:
+        """Grade all contexts with one judge call; None if the output is unusable."""
+        passages = "\n\n".join(f"[{i}] {context}" for i, context in enumerate(contexts, 1))
+        try:
+            result = await self.llm.astructured_predict(
+                ContextScores, BATCH_CONTEXT_RELEVANCY_PROMPT,
+                query=query, passages=passages, count=len(contexts)
+            )
+        except Exception as e:
+            print(f"Batched context relevancy failed, falling back: {e}")
+            return None
+        scores = validate_scores(result.scores, len(contexts))
+        if scores is None:
+            print(f"Batched context relevancy returned unusable scores {result.scores} "
+                  f"for {len(contexts)} contexts, falling back")
+        return scores
+
+    async def _evaluate_per_context(self, query: str, contexts: List[str]) -> List[float]:
+        """Grade each context with its own RelevancyEvaluator call."""
+        results = await asyncio.gather(*(
+            self.fallback_evaluator.aevaluate(
+                query=query,
+                response=context,  # Treat context as response to check relevancy
+                contexts=[context]  # Pass context as its own context
+            )
+            for context in contexts
+        ))
+        return [result.score or 0.0 for result in results]
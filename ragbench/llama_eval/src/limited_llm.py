@@ -0,0 +1,83 @@
+"""
+Rate-limited OpenAI LLM
+
+OpenAI LLM for LlamaIndex whose chat and completion calls go through the
+shared ragbench ``RateLimiter``. The client's own retries are disabled so
+429s reach the limiter, which backs off and adapts concurrency. Token usage
+reported by the API is recorded for ``llm_usage`` tracking scopes.
+``create_llm`` returns the offline stub instead when RAGOPS_PROVIDER=fake.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Sequence
+
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse, CompletionResponse
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import LLM
+from llama_index.llms.openai import OpenAI
+from config import Config
+
+# Add ragbench directory to Python path to enable shared imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from llm_usage import record_usage
+from providers import StubLLM, is_fake
+from rate_limiter import RateLimiter, estimate_tokens, get_limiter
+
+
+def get_llm_limiter(name: str = "llm") -> RateLimiter:
+    """Shared limiter configured from the llama_eval rate limit settings."""
+    return get_limiter(
+        name,
+        requests_per_minute=Config.LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=Config.LLM_TOKENS_PER_MINUTE,
+        max_concurrency=Config.WORKERS
+    )
+
+
+def create_llm(**kwargs: Any) -> LLM:
+    """Rate-limited LLM of the selected provider; kwargs go to RateLimitedOpenAI."""
+    if is_fake():
+        return StubLLM(limiter=get_llm_limiter())
+    return RateLimitedOpenAI(**kwargs)
+
+
+class RateLimitedOpenAI(OpenAI):
+    """OpenAI LLM whose non-streaming calls are throttled and retried."""
+
+    _limiter: RateLimiter = PrivateAttr()
+
+    def __init__(self, limiter: RateLimiter = None, **kwargs: Any):
+        kwargs.setdefault("max_retries", 0)
+        super().__init__(**kwargs)
+        self._limiter = limiter or get_llm_limiter()
+
+    def _record(self, response: Any) -> Any:
+        """Record the token usage reported with a response."""
+        counts = response.additional_kwargs or {}
+        record_usage(counts.get("prompt_tokens", 0), counts.get("completion_tokens", 0), model=self.model)
+        return response
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._record(self._limiter.run_sync(
+            super().chat, messages,
+            estimated_tokens=estimate_tokens(*(m.content for m in messages)), **kwargs
+        ))
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._record(self._limiter.run_sync(
+            super().complete, prompt, formatted=formatted,
+            estimated_tokens=estimate_tokens(prompt), **kwargs
+        ))
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._record(await self._limiter.run(
+            super().achat, messages,
+            estimated_tokens=estimate_tokens(*(m.content for m in messages)), **kwargs
+        ))
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._record(await self._limiter.run(
+            super().acomplete, prompt, formatted=formatted,
+            estimated_tokens=estimate_tokens(prompt), **kwargs
+        ))
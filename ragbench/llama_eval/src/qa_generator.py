@@ -1,28 +1,36 @@
-from typing import List, Any, Dict
+import argparse
+from typing import List, Any, Dict, Optional
 from pathlib import Path
 from llama_index.core import SimpleDirectoryReader, Settings
-from llama_index.llms.openai import OpenAI
 from llama_index.core.llama_dataset.generator import RagDatasetGenerator
-import os
+from llama_index.core.constants import DEFAULT_CHUNK_SIZE
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.node_parser.text.sentence import SENTENCE_CHUNK_OVERLAP
 import json
+import sys
 from dotenv import load_dotenv
 from config import Config
+from limited_llm import create_llm
+
+# Add ragbench directory to Python path to enable shared imports
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from providers import require_api_key
+from question_embeddings import precompute_for_dataset
+from profiling import add_profile_argument, profile_run
 
 class QAGenerator:
     def __init__(self):
         """Initialize QA Generator using configuration settings."""
         self._init_openai()
-        self.llm = OpenAI(
+        self.llm = create_llm(
             model=Config.OPENAI_MODEL,
             temperature=Config.TEMPERATURE
         )
         
     def _init_openai(self) -> None:
-        """Initialize OpenAI credentials."""
+        """Initialize OpenAI credentials (not needed with RAGOPS_PROVIDER=fake)."""
         load_dotenv()
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OpenAI API key not found in environment variables")
+        require_api_key()
             
     def load_documents(self, docs_dir: str) -> List[Any]:
         """Load documents from directory.
@@ -41,19 +49,32 @@ class QAGenerator:
         print(f"Found documents: {[doc.metadata['file_name'] for doc in documents]}")
         return documents
         
-    def generate_questions(self, documents: List[Any]) -> List[Dict[str, Any]]:
+    def generate_questions(self, documents: List[Any], chunk_size: Optional[int] = None,
+                           chunk_overlap: Optional[int] = None) -> List[Dict[str, Any]]:
         """Generate questions from documents using LlamaIndex's RagDatasetGenerator.
         
         Args:
             documents: List of documents to generate questions from
+            chunk_size: Tokens per chunk (None: llama-index default)
+            chunk_overlap: Tokens shared by consecutive chunks (None: llama-index default)
             
         Returns:
             List of dictionaries containing questions, answers, and context
         """
         print("Initializing dataset generator...")
+        transformations = None
+        if chunk_size is not None or chunk_overlap is not None:
+            # Changes the reference contexts, so results are not comparable with other datasets
+            transformations = [SentenceSplitter(
+                chunk_size=DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size,
+                chunk_overlap=SENTENCE_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+            )]
+            print(f"Chunking with size {transformations[0].chunk_size}, "
+                  f"overlap {transformations[0].chunk_overlap} instead of the llama-index defaults")
         data_generator = RagDatasetGenerator.from_documents(
             documents,
             llm=self.llm,
+            transformations=transformations,
             num_questions_per_chunk=Config.QUESTIONS_PER_CHUNK,
             show_progress=True
         )
@@ -70,13 +91,26 @@ class QAGenerator:
                 'query_by': str(example.query_by) if example.query_by else "unknown",
                 'reference_answer': example.reference_answer,
                 'reference_answer_by': str(example.reference_answer_by) if example.reference_answer_by else "unknown",
-                'reference_contexts': example.reference_contexts
+                'reference_contexts': example.reference_contexts,
+                'source_file': self.source_file(example.reference_contexts, documents)
             }
             qa_pairs.append(qa_pair)
         
         return qa_pairs
+    
+    @staticmethod
+    def source_file(contexts: List[str], documents: List[Any]) -> Optional[str]:
+        """File name of the document the first reference context was chunked from.
+        
+        Used to stratify sequential-sampling evaluation by source document.
+        """
+        probe = contexts[0][:200].strip() if contexts else ""
+        for document in documents:
+            if probe and probe in document.text:
+                return document.metadata.get('file_name')
+        return None
 
-def main():
+def main(chunk_size: Optional[int] = Config.CHUNK_SIZE, chunk_overlap: Optional[int] = Config.CHUNK_OVERLAP):
     """Entry point of the QA Generator."""
     try:
         # Initialize generator
@@ -90,7 +124,7 @@ def main():
         
         # Generate questions
         print("\nGenerating questions...")
-        qa_pairs = generator.generate_questions(documents)
+        qa_pairs = generator.generate_questions(documents, chunk_size, chunk_overlap)
         print(f"Generated {len(qa_pairs)} question-answer pairs")
         
         # Print examples
@@ -114,9 +148,21 @@ def main():
             for qa in qa_pairs:
                 f.write(f"{qa['query']}\n")
         print(f"Saved questions to {Config.QUESTIONS_OUTPUT_FILE}")
+        
+        # 3. Precompute question embeddings so evaluation runs skip query embedding
+        if Config.PRECOMPUTE_QUESTION_EMBEDDINGS:
+            precompute_for_dataset(Config.QA_OUTPUT_FILE, 'query')
             
     except Exception as e:
         print(f"Error: {e}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate QA pairs from the test documents")
+    parser.add_argument("--chunk-size", type=int, default=Config.CHUNK_SIZE,
+                        help="Tokens per chunk (default: llama-index's 1024; changes the dataset)")
+    parser.add_argument("--chunk-overlap", type=int, default=Config.CHUNK_OVERLAP,
+                        help="Tokens shared by consecutive chunks (default: llama-index's 200)")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    with profile_run(args.profile, "qa_generator", memory=not args.profile_no_memory):
+        main(args.chunk_size, args.chunk_overlap)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# llama_eval modules use flat imports from src (and add the ragbench root themselves)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+from typing import Any, List
+
+from llama_index.core.llms import CompletionResponse, CustomLLM, LLMMetadata
+
+from context_relevancy import BatchContextRelevancyEvaluator, ContextScores, validate_scores
+
+CONTEXTS = ["Mars is the fourth planet.", "Bananas are yellow.", "Mars has two moons."]
+
+
+class ScriptedLLM(CustomLLM):
+    """Judge that answers every completion with a fixed text."""
+
+    reply: str = ""
+    prompts: List[str] = []
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="scripted")
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        self.prompts.append(prompt)
+        return CompletionResponse(text=self.reply)
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any):
+        raise NotImplementedError
+
+
+class StructuredJudge:
+    """Judge whose structured call returns fixed scores or raises."""
+
+    def __init__(self, scores=None, error=None):
+        self.scores = scores
+        self.error = error
+        self.calls = []
+
+    async def astructured_predict(self, output_cls, prompt, **prompt_args):
+        self.calls.append(prompt_args)
+        if self.error:
+            raise self.error
+        return output_cls(scores=self.scores)
+
+
+class PerContextEvaluator:
+    """Fallback that scores a context 1.0 if it mentions Mars."""
+
+    def __init__(self):
+        self.contexts = []
+
+    async def aevaluate(self, query, response, contexts):
+        self.contexts.append(response)
+        return SimpleNamespace(score=1.0 if "Mars" in response else None)
+
+
+def evaluate(judge, fallback=None, **kwargs):
+    evaluator = BatchContextRelevancyEvaluator(
+        judge, fallback_evaluator=fallback or PerContextEvaluator(), threshold=0.5, **kwargs
+    )
+    return asyncio.run(evaluator.aevaluate("Tell me about Mars", CONTEXTS))
+
+
+def test_one_structured_call_grades_every_context():
+    judge = StructuredJudge(scores=[0.9, 0.1, 0.8])
+    fallback = PerContextEvaluator()
+    result = evaluate(judge, fallback)
+
+    assert result["mode"] == "batched"
+    assert result["scores"] == [0.9, 0.1, 0.8]
+    assert result["score"] == 0.6
+    assert result["passing"] is False
+    assert len(judge.calls) == 1 and judge.calls[0]["count"] == 3
+    assert "[2] Bananas are yellow." in judge.calls[0]["passages"]
+    assert fallback.contexts == []
+
+
+def test_out_of_range_scores_are_clamped():
+    result = evaluate(StructuredJudge(scores=[1.7, -0.3, 1.0]))
+    assert result["mode"] == "batched"
+    assert result["scores"] == [1.0, 0.0, 1.0]
+
+
+def test_score_count_mismatch_falls_back_to_per_context():
+    fallback = PerContextEvaluator()
+    result = evaluate(StructuredJudge(scores=[0.9, 0.8]), fallback)
+
+    assert result["mode"] == "per_context"
+    assert result["scores"] == [1.0, 0.0, 1.0]  # Missing fallback scores count as 0
+    assert fallback.contexts == CONTEXTS
+
+
+def test_judge_errors_fall_back_to_per_context():
+    result = evaluate(StructuredJudge(error=ValueError("rate limited")))
+    assert result["mode"] == "per_context"
+    assert result["scores"] == [1.0, 0.0, 1.0]
+
+
+def test_unbatched_mode_never_calls_the_batch_judge():
+    judge = StructuredJudge(scores=[0.9, 0.1, 0.8])
+    result = evaluate(judge, batched=False)
+    assert result["mode"] == "per_context"
+    assert judge.calls == []
+
+
+def test_no_contexts_fail_without_a_judge_call():
+    judge = StructuredJudge(scores=[])
+    evaluator = BatchContextRelevancyEvaluator(judge, fallback_evaluator=PerContextEvaluator())
+    assert asyncio.run(evaluator.aevaluate("q", [])) == {
+        "score": 0, "passing": False, "scores": [], "mode": "batched"
+    }
+    assert judge.calls == []
+
+
+def test_validate_scores_rejects_wrong_counts_and_non_finite_values():
+    assert validate_scores([0.5, 2.0], 2) == [0.5, 1.0]
+    assert validate_scores([0.5], 2) is None
+    assert validate_scores([0.5, float("nan")], 2) is None
+    assert validate_scores([float("inf"), 0.5], 2) is None
+
+
+def test_structured_output_is_parsed_from_a_text_only_judge():
+    judge = ScriptedLLM(reply='Here you go:\n```json\n{"scores": [0.9, 0.2, 0.7]}\n```')
+    result = evaluate(judge)
+
+    assert result["mode"] == "batched"
+    assert result["scores"] == [0.9, 0.2, 0.7]
+    assert "Tell me about Mars" in judge.prompts[0]
+    assert "[3] Mars has two moons." in judge.prompts[0]
+
+
+def test_invalid_json_from_a_text_only_judge_falls_back():
+    replies = [
+        '{"scores": [0.9, 0.2,',
+        '{"scores": ["high", "low", "high"]}',
+        '{"scores": [0.9, 0.2, 0.7]} and {"scores": [0.1]}',
+        "All relevant."
+    ]
+    for reply in replies:
+        result = evaluate(ScriptedLLM(reply=reply))
+        assert result["mode"] == "per_context", reply
+        assert result["scores"] == [1.0, 0.0, 1.0]
+
+
+def test_context_scores_schema_describes_the_score_vector():
+    schema = ContextScores.model_json_schema()
+    assert schema["properties"]["scores"]["type"] == "array"
+    assert "passage order" in schema["properties"]["scores"]["description"]
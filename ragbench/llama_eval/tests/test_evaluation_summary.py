@@ -0,0 +1,29 @@
+import pandas as pd
+
+from batch_evaluator import JUDGE_CALLS_AVOIDED_REASON, summarize_results
+
+
+def result_row(verdict: str, faithful: bool) -> dict:
+    return {
+        'faithfulness_score': 1.0 if faithful else 0.0,
+        'faithfulness_passing': faithful,
+        'relevancy_score': 1.0,
+        'relevancy_passing': True,
+        'context_relevancy_score': 0.5,
+        'context_relevancy_passing': False,
+        'prefilter_verdict': verdict,
+        'judge_calls': 3
+    }
+
+
+def test_summary_reports_prefilter_verdicts_without_avoided_judge_calls():
+    df = pd.DataFrame([result_row('pass', True), result_row('fail', False), result_row('judge', True)])
+    summary = summarize_results(df)
+
+    assert summary['Pre-filter Reference Passes'] == 1
+    assert summary['Pre-filter Reference Fails'] == 1
+    # Decided cases are still judged: llama_eval's metrics do not use the reference answer
+    assert summary['Judge Calls'] == 9
+    assert summary['Judge Calls Avoided'] == 0
+    assert summary['Judge Calls Avoided Reason'] == JUDGE_CALLS_AVOIDED_REASON
+    assert summary['Passing Faithfulness'] == 2
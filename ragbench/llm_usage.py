@@ -0,0 +1,90 @@
+"""
+LLM Usage Tracking
+
+Attributes judge latency, token counts and estimated cost to the query and
+metric being evaluated. ``track_usage()`` opens a tracking scope in the
+current asyncio task through a context variable; the rate-limited LLM
+wrappers call ``record_usage`` after every call, which adds to all open
+scopes, so a per-metric scope nested inside a per-query scope updates both.
+Tasks started inside a scope (e.g. by ``asyncio.gather``) inherit it.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+# USD per million (input, output) tokens; model names are matched by longest prefix
+MODEL_PRICES_PER_1M_TOKENS: Dict[str, Tuple[float, float]] = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4": (30.00, 60.00),
+}
+
+
+@dataclass
+class Usage:
+    """LLM calls, tokens and cost accumulated within a tracking scope."""
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    latency_ms: float = 0.0     # Wall time of the scope, set when it closes
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+_scopes: ContextVar[Tuple[Usage, ...]] = ContextVar("llm_usage_scopes", default=())
+
+
+def estimate_cost(model: Optional[str], prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a call (0.0 for unknown models)."""
+    if not model:
+        return 0.0
+    matches = [name for name in MODEL_PRICES_PER_1M_TOKENS if model.startswith(name)]
+    if not matches:
+        return 0.0
+    input_price, output_price = MODEL_PRICES_PER_1M_TOKENS[max(matches, key=len)]
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+@contextmanager
+def track_usage() -> Iterator[Usage]:
+    """Collect the usage of all LLM calls made inside the ``with`` block."""
+    usage = Usage()
+    token = _scopes.set(_scopes.get() + (usage,))
+    start = time.perf_counter()
+    try:
+        yield usage
+    finally:
+        usage.latency_ms = (time.perf_counter() - start) * 1000
+        _scopes.reset(token)
+
+
+def record_usage(prompt_tokens: int, completion_tokens: int,
+                 model: Optional[str] = None, cost: Optional[float] = None):
+    """Add one LLM call to every open tracking scope.
+
+    Args:
+        prompt_tokens: Input tokens of the call
+        completion_tokens: Output tokens of the call
+        model: Model name used to estimate the cost when ``cost`` is not given
+        cost: Cost reported by the client library, if any
+    """
+    scopes = _scopes.get()
+    if not scopes:
+        return
+    if cost is None:
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    for usage in scopes:
+        usage.calls += 1
+        usage.prompt_tokens += prompt_tokens
+        usage.completion_tokens += completion_tokens
+        usage.cost_usd += cost
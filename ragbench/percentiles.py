@@ -0,0 +1,28 @@
+"""
+Percentiles
+
+Linear-interpolated percentiles shared by the evaluators, the results store
+and the benchmarks, so latency figures from every tool are comparable.
+"""
+
+import math
+from typing import Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of pre-sorted values.
+
+    Args:
+        sorted_values: Non-empty values in ascending order
+        q: Quantile between 0 and 1
+
+    Returns:
+        The percentile, interpolated between the two nearest values
+    """
+    if not sorted_values:
+        raise ValueError("Percentile of no values")
+    if not 0 <= q <= 1:
+        raise ValueError(f"Quantile must be between 0 and 1: {q}")
+    position = (len(sorted_values) - 1) * q
+    lower, upper = math.floor(position), math.ceil(position)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
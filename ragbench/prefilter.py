@@ -0,0 +1,201 @@
+"""
+Local Pre-filter Metrics
+
+Cheap, local metrics computed before any LLM judge runs:
+- Token F1 between the answer and the reference answer
+- ROUGE-L (longest common subsequence F-measure)
+- Embedding cosine similarity, when an embedding function is supplied
+
+Token F1 and cosine similarity are computed for a whole batch at once with
+NumPy. Configurable rules short-circuit obvious passes (near-verbatim
+matches) and obvious fails (empty answers, no lexical overlap), so only
+ambiguous cases are sent to the judge.
+
+The verdicts compare the answer with the reference answer, so they may only
+replace reference-based correctness judges (deep_eval's GEval correctness).
+Faithfulness and answer relevancy grade the answer against the retrieved
+contexts and the question; llama_eval records the verdicts next to those
+judge scores but always runs the judges.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+PASS = "pass"
+FAIL = "fail"
+JUDGE = "judge"
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase word tokens of a text."""
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+
+def _count_matrix(token_lists: Sequence[List[str]], vocab: Dict[str, int]) -> np.ndarray:
+    """Bag-of-words count matrix (rows: texts, columns: vocabulary)."""
+    matrix = np.zeros((len(token_lists), len(vocab)), dtype=np.float32)
+    for row, tokens in enumerate(token_lists):
+        if tokens:
+            np.add.at(matrix[row], [vocab[token] for token in tokens], 1)
+    return matrix
+
+
+def token_f1_batch(candidates: Sequence[str], references: Sequence[str]) -> np.ndarray:
+    """SQuAD-style token F1 for aligned candidate/reference pairs."""
+    cand_tokens = [tokenize(text) for text in candidates]
+    ref_tokens = [tokenize(text) for text in references]
+    vocab: Dict[str, int] = {}
+    for tokens in cand_tokens + ref_tokens:
+        for token in tokens:
+            vocab.setdefault(token, len(vocab))
+    if not vocab:
+        return np.zeros(len(candidates), dtype=np.float32)
+
+    cand = _count_matrix(cand_tokens, vocab)
+    ref = _count_matrix(ref_tokens, vocab)
+    overlap = np.minimum(cand, ref).sum(axis=1)
+    cand_len = cand.sum(axis=1)
+    ref_len = ref.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(cand_len > 0, overlap / cand_len, 0.0)
+        recall = np.where(ref_len > 0, overlap / ref_len, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return f1.astype(np.float32)
+
+
+def lcs_length(a: Sequence[str], b: Sequence[str]) -> int:
+    """Length of the longest common subsequence (bit-parallel, Allison-Dix)."""
+    if not a or not b:
+        return 0
+    masks: Dict[str, int] = {}
+    for i, token in enumerate(a):
+        masks[token] = masks.get(token, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for token in b:
+        u = v & masks.get(token, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(a) - bin(v).count("1")
+
+
+def rouge_l_batch(candidates: Sequence[str], references: Sequence[str]) -> np.ndarray:
+    """ROUGE-L F-measure for aligned candidate/reference pairs."""
+    scores = np.zeros(len(candidates), dtype=np.float32)
+    for i, (candidate, reference) in enumerate(zip(candidates, references)):
+        cand_tokens, ref_tokens = tokenize(candidate), tokenize(reference)
+        lcs = lcs_length(ref_tokens, cand_tokens)
+        if lcs:
+            precision = lcs / len(cand_tokens)
+            recall = lcs / len(ref_tokens)
+            scores[i] = 2 * precision * recall / (precision + recall)
+    return scores
+
+
+def cosine_similarity_batch(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity of two equally shaped embedding matrices."""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    norms = np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return np.einsum("ij,ij->i", a, b) / np.maximum(norms, 1e-12)
+
+
+@dataclass
+class PrefilterRules:
+    """Thresholds for short-circuiting the LLM judge."""
+    fail_on_empty: bool = True      # Empty answers fail without judging
+    fail_max_f1: float = 0.0        # Token F1 at or below this is an obvious fail...
+    fail_max_cosine: float = 0.3    # ...unless embeddings say the answer is on topic
+    pass_min_f1: float = 0.9        # Near-verbatim answers pass without judging
+    pass_min_rouge_l: float = 0.9
+    pass_min_cosine: float = 0.95
+
+
+@dataclass
+class PrefilterDecision:
+    """Outcome of the pre-filter for one answer."""
+    verdict: str                    # PASS, FAIL or JUDGE
+    reason: str
+    token_f1: Optional[float] = None
+    rouge_l: Optional[float] = None
+    cosine: Optional[float] = None
+
+
+class LocalPrefilter:
+    """Runs local metrics over a batch and decides which items need a judge."""
+
+    def __init__(self, rules: PrefilterRules = None, embed_fn: Optional[EmbedFn] = None):
+        """
+        Initialize the pre-filter.
+
+        Args:
+            rules: Short-circuit thresholds (defaults to PrefilterRules())
+            embed_fn: Optional batch embedding function enabling cosine similarity
+        """
+        self.rules = rules or PrefilterRules()
+        self.embed_fn = embed_fn
+        self.stats = {"evaluated": 0, "passed": 0, "failed": 0, "judged": 0}
+
+    def classify_batch(self, candidates: Sequence[Optional[str]],
+                       references: Sequence[Optional[str]]) -> List[PrefilterDecision]:
+        """Decide pass / fail / judge for aligned answers and reference answers.
+
+        Args:
+            candidates: Answers produced by the RAG system (None if the query failed)
+            references: Expected or reference answers (may be empty)
+
+        Returns:
+            One PrefilterDecision per candidate
+        """
+        rules = self.rules
+        decisions: List[Optional[PrefilterDecision]] = [None] * len(candidates)
+
+        # Items with both an answer and a reference get the full metric set
+        scored = []
+        for i, (candidate, reference) in enumerate(zip(candidates, references)):
+            if not (candidate or "").strip():
+                if rules.fail_on_empty:
+                    decisions[i] = PrefilterDecision(FAIL, "Pre-filter: empty answer")
+                else:
+                    decisions[i] = PrefilterDecision(JUDGE, "Pre-filter: empty answer")
+            elif not (reference or "").strip():
+                decisions[i] = PrefilterDecision(JUDGE, "Pre-filter: no reference answer")
+            else:
+                scored.append(i)
+
+        if scored:
+            cands = [candidates[i] for i in scored]
+            refs = [references[i] for i in scored]
+            f1 = token_f1_batch(cands, refs)
+            rouge = rouge_l_batch(cands, refs)
+            cosine = None
+            if self.embed_fn:
+                vectors = np.asarray(self.embed_fn(cands + refs), dtype=np.float32)
+                cosine = cosine_similarity_batch(vectors[:len(cands)], vectors[len(cands):])
+
+            for j, i in enumerate(scored):
+                cos = float(cosine[j]) if cosine is not None else None
+                decisions[i] = self._decide(float(f1[j]), float(rouge[j]), cos)
+
+        for decision in decisions:
+            self.stats["evaluated"] += 1
+            self.stats[{PASS: "passed", FAIL: "failed", JUDGE: "judged"}[decision.verdict]] += 1
+        return decisions
+
+    def _decide(self, f1: float, rouge: float, cosine: Optional[float]) -> PrefilterDecision:
+        rules = self.rules
+        metrics = f"token_f1={f1:.2f}, rouge_l={rouge:.2f}" + (
+            f", cosine={cosine:.2f}" if cosine is not None else ""
+        )
+        if (f1 >= rules.pass_min_f1 and rouge >= rules.pass_min_rouge_l
+                and (cosine is None or cosine >= rules.pass_min_cosine)):
+            return PrefilterDecision(PASS, f"Pre-filter: matches reference ({metrics})", f1, rouge, cosine)
+        if f1 <= rules.fail_max_f1 and (cosine is None or cosine <= rules.fail_max_cosine):
+            return PrefilterDecision(FAIL, f"Pre-filter: no overlap with reference ({metrics})", f1, rouge, cosine)
+        return PrefilterDecision(JUDGE, f"Pre-filter: ambiguous ({metrics})", f1, rouge, cosine)
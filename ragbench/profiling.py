@@ -0,0 +1,225 @@
+"""
+On-demand CPU and Memory Profiling
+
+Opt-in profiling shared by the RAG backend and the evaluators; nothing is
+sampled or traced unless a profile is requested.
+
+- ``SamplingProfiler`` samples the Python stacks of all threads from a
+  background thread at a fixed interval and writes them as collapsed stacks
+  (``frame;frame;frame count`` per line), the input format of flamegraph.pl,
+  speedscope and inferno. Worker threads (``asyncio.to_thread``, executors)
+  are included, each under a root frame with its thread name.
+- ``MemoryTrace`` takes tracemalloc snapshots around a block and reports the
+  allocation sites that grew the most.
+- ``profile_run`` combines both and writes ``<name>.collapsed`` and
+  ``<name>.tracemalloc.txt``; ``add_profile_argument`` registers the shared
+  ``--profile DIR`` CLI option.
+
+tracemalloc slows allocation-heavy code down noticeably, so memory tracing
+can be switched off where only CPU time matters.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_INTERVAL_S = 0.005
+DEFAULT_TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 1
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Statistical profiler over ``sys._current_frames()``.
+
+    Args:
+        interval: Seconds between samples
+        idle_threads: Also count threads blocked in the event loop selector
+            or waiting on a lock (mostly noise in a flamegraph)
+    """
+
+    IDLE_FRAMES = ("select", "poll", "epoll", "wait", "_worker", "accept")
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL_S, idle_threads: bool = False):
+        self.interval = interval
+        self.idle_threads = idle_threads
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.duration_s = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> "SamplingProfiler":
+        if self._thread is not None:
+            raise RuntimeError("Profiler is already running")
+        self._stop.clear()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        if self._thread is None:
+            return self
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.duration_s += time.perf_counter() - self.started_at
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(skip_thread=own_id)
+
+    def sample(self, skip_thread: Optional[int] = None):
+        """Record the current stack of every thread once"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread:
+                continue
+            if not self.idle_threads and frame.f_code.co_name in self.IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, one ``stack count`` line per distinct stack"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class MemoryTrace:
+    """tracemalloc snapshot diff around a ``with`` block.
+
+    Tracing is started on entry (and stopped on exit) unless it was already
+    running.
+    """
+
+    def __init__(self, top: int = DEFAULT_TOP_ALLOCATIONS):
+        self.top = top
+        self.stats: List[tracemalloc.StatisticDiff] = []
+        self.peak_bytes = 0
+        self._started = False
+        self._before: Optional[tracemalloc.Snapshot] = None
+
+    def __enter__(self) -> "MemoryTrace":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started = True
+        tracemalloc.reset_peak()
+        self._before = tracemalloc.take_snapshot()
+        return self
+
+    def __exit__(self, *exc_info):
+        after = tracemalloc.take_snapshot()
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        if self._started:
+            tracemalloc.stop()
+        # Leave out tracemalloc's and the sampling profiler's own allocations
+        snapshot_filter = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        self.stats = after.filter_traces(snapshot_filter).compare_to(
+            self._before.filter_traces(snapshot_filter), "lineno"
+        )
+        self._before = None
+
+    @property
+    def growth_bytes(self) -> int:
+        return sum(stat.size_diff for stat in self.stats)
+
+    def summary(self) -> Dict[str, int]:
+        return {"growth_bytes": self.growth_bytes, "peak_bytes": self.peak_bytes}
+
+    def report(self) -> str:
+        """Top allocation sites by growth, as text"""
+        lines = [
+            f"Net growth: {self.growth_bytes / 1024:.1f} KiB, peak traced: {self.peak_bytes / 1024:.1f} KiB",
+            f"Top {self.top} allocation sites by growth:"
+        ]
+        lines.extend(str(stat) for stat in self.stats[:self.top])
+        return "\n".join(lines) + "\n"
+
+
+def write_artifacts(output_dir: str, name: str, profiler: SamplingProfiler,
+                    memory: Optional[MemoryTrace] = None) -> Dict[str, str]:
+    """Write the collapsed stacks (and memory report) of a profile.
+
+    Returns:
+        Dict mapping artifact kind ("collapsed", "tracemalloc") to file path
+    """
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    paths = {"collapsed": str(Path(output_dir) / f"{name}.collapsed")}
+    Path(paths["collapsed"]).write_text(profiler.collapsed(), encoding="utf-8")
+    if memory is not None:
+        paths["tracemalloc"] = str(Path(output_dir) / f"{name}.tracemalloc.txt")
+        Path(paths["tracemalloc"]).write_text(memory.report(), encoding="utf-8")
+    return paths
+
+
+def profile_name(prefix: str) -> str:
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+@contextmanager
+def profile_run(output_dir: Optional[str], prefix: str, memory: bool = True,
+                interval: float = DEFAULT_INTERVAL_S) -> Iterator[Optional[SamplingProfiler]]:
+    """Profile the ``with`` block and write its artifacts to output_dir.
+
+    Does nothing when output_dir is None, so CLIs can pass ``args.profile``
+    unconditionally.
+    """
+    if output_dir is None:
+        yield None
+        return
+    profiler = SamplingProfiler(interval=interval)
+    trace = MemoryTrace() if memory else None
+    try:
+        with trace or nullcontext(), profiler:
+            yield profiler
+    finally:
+        paths = write_artifacts(output_dir, profile_name(prefix), profiler, trace)
+        print(f"\nProfile ({profiler.samples} samples, {profiler.duration_s:.1f}s) saved to:")
+        for path in paths.values():
+            print(path)
+
+
+def add_profile_argument(parser: argparse.ArgumentParser) -> None:
+    """Register the shared ``--profile DIR`` and ``--profile-no-memory`` options on a CLI parser."""
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        default=None,
+        help="Write a collapsed-stack CPU profile and a tracemalloc diff of the run to DIR"
+    )
+    parser.add_argument(
+        "--profile-no-memory",
+        action="store_true",
+        help="Skip tracemalloc with --profile (it slows allocation-heavy runs down)"
+    )
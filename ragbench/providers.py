@@ -0,0 +1,297 @@
+"""
+LLM and Embedding Providers
+
+Selects between the real OpenAI models and deterministic offline stubs with
+the RAGOPS_PROVIDER environment variable ("openai", the default, or "fake").
+The stubs need no API key or network, so the backend, generators and
+evaluators can be benchmarked reproducibly:
+
+- ``StubEmbedding`` sums a hash-seeded random vector per token, so equal
+  texts get equal vectors and texts sharing words stay similar.
+- ``StubLLM`` answers with a template (default) or an echo of the prompt and
+  sleeps to simulate a first-token latency plus a generation throughput.
+
+Stub settings (all optional):
+    RAGOPS_FAKE_EMBED_DIM            Embedding dimensions (256)
+    RAGOPS_FAKE_EMBED_LATENCY_MS     Delay per embedding request (0)
+    RAGOPS_FAKE_LLM_MODE             "template" or "echo" (template)
+    RAGOPS_FAKE_LLM_TEMPLATE         Response template; {echo}, {hash} and
+                                     {model} are substituted ("YES. {echo}")
+    RAGOPS_FAKE_LLM_MAX_TOKENS       Words kept in {echo} / echo mode (64)
+    RAGOPS_FAKE_LLM_LATENCY_MS       Delay before the first token (0)
+    RAGOPS_FAKE_LLM_TOKENS_PER_SECOND  Generation speed, 0 for instant (0)
+"""
+
+import asyncio
+import collections.abc
+import hashlib
+import os
+import re
+import time
+import types
+import typing
+from enum import Enum
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import (
+    ChatMessage, ChatResponse, CompletionResponse, CompletionResponseGen, LLMMetadata, MessageRole
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+from llama_index.core.settings import Settings
+from pydantic import BaseModel
+
+from llm_usage import record_usage
+from rate_limiter import RateLimiter, estimate_tokens
+
+PROVIDERS = ("openai", "fake")
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def get_provider() -> str:
+    """Provider selected with RAGOPS_PROVIDER."""
+    provider = os.getenv("RAGOPS_PROVIDER", "openai").lower()
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown RAGOPS_PROVIDER '{provider}', expected one of {PROVIDERS}")
+    return provider
+
+
+def is_fake() -> bool:
+    return get_provider() == "fake"
+
+
+def require_api_key(name: str = "OPENAI_API_KEY") -> Optional[str]:
+    """Return the API key, which is only mandatory for the real provider."""
+    api_key = os.getenv(name)
+    if not api_key and not is_fake():
+        raise ValueError(f"{name} not found in environment variables")
+    return api_key
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def unit_interval(text: str) -> float:
+    """Deterministic value in [0, 1) derived from a text."""
+    return int.from_bytes(_digest(text)[:8], "big") / 2 ** 64
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    seed = int.from_bytes(_digest(token)[:8], "big")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def hashed_embedding(text: str, dim: int) -> List[float]:
+    """Unit-length sum of hash-seeded token vectors."""
+    tokens = TOKEN_PATTERN.findall(text.lower()) or [text]
+    vector = np.sum([_token_vector(token, dim) for token in tokens], axis=0)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def stub_completion(prompt: str, mode: str = "template", template: str = "YES. {echo}",
+                    max_tokens: int = 64, model: str = "stub") -> str:
+    """Deterministic response text for a prompt."""
+    echo = " ".join(prompt.split()[:max_tokens])
+    if mode == "echo":
+        return echo
+    return template.format(echo=echo, hash=_digest(prompt).hex()[:8], model=model)
+
+
+def stub_structured(schema: Any, prompt: str, path: str = "") -> Any:
+    """Instance of a pydantic schema filled with prompt-seeded values.
+
+    Strings get a short echo of the prompt, numbers a value in [0, 10],
+    lists a single element and enums/literals their first choice.
+    """
+    origin = typing.get_origin(schema)
+    args = typing.get_args(schema)
+    seed = f"{path}\0{prompt}"
+    if origin in (typing.Union, types.UnionType):
+        return stub_structured(next(a for a in args if a is not type(None)), prompt, path)
+    if origin is typing.Literal:
+        return args[0]
+    if origin in (list, tuple, set, collections.abc.Sequence):
+        return [stub_structured(args[0] if args else str, prompt, path + "[0]")]
+    if origin is dict:
+        return {}
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        return schema(**{
+            name: stub_structured(field.annotation, prompt, f"{path}.{name}")
+            for name, field in schema.model_fields.items()
+        })
+    if isinstance(schema, type) and issubclass(schema, Enum):
+        return next(iter(schema))
+    if schema is bool:
+        return unit_interval(seed) >= 0.5
+    if schema is int:
+        return int(unit_interval(seed) * 11)
+    if schema is float:
+        return round(unit_interval(seed) * 10, 2)
+    return stub_completion(prompt, max_tokens=16)
+
+
+class StubEmbedding(BaseEmbedding):
+    """Offline embedding model with hash-seeded token vectors."""
+
+    dim: int = Field(default_factory=lambda: int(os.getenv("RAGOPS_FAKE_EMBED_DIM", "256")))
+    latency_ms: float = Field(default_factory=lambda: _env_float("RAGOPS_FAKE_EMBED_LATENCY_MS", 0))
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if "model_name" not in kwargs:
+            self.model_name = f"stub-embedding-{self.dim}"
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StubEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._get_text_embeddings([query])[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return (await self._aget_text_embeddings([query]))[0]
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_ms / 1000)
+        return [hashed_embedding(text, self.dim) for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return [hashed_embedding(text, self.dim) for text in texts]
+
+
+class StubLLM(CustomLLM):
+    """Offline LLM with deterministic responses and simulated timing.
+
+    Each call sleeps ``latency_ms`` plus completion tokens divided by
+    ``tokens_per_second``. Calls go through ``limiter`` when one is given
+    and are recorded for ``llm_usage`` tracking scopes at zero cost.
+    """
+
+    model: str = Field(default="stub")
+    mode: str = Field(default_factory=lambda: os.getenv("RAGOPS_FAKE_LLM_MODE", "template"))
+    template: str = Field(default_factory=lambda: os.getenv("RAGOPS_FAKE_LLM_TEMPLATE", "YES. {echo}"))
+    max_tokens: int = Field(default_factory=lambda: int(os.getenv("RAGOPS_FAKE_LLM_MAX_TOKENS", "64")))
+    latency_ms: float = Field(default_factory=lambda: _env_float("RAGOPS_FAKE_LLM_LATENCY_MS", 0))
+    tokens_per_second: float = Field(default_factory=lambda: _env_float("RAGOPS_FAKE_LLM_TOKENS_PER_SECOND", 0))
+    context_window: int = Field(default=16384)
+
+    _limiter: Optional[RateLimiter] = PrivateAttr(default=None)
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._limiter = limiter
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "StubLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.max_tokens,
+            model_name=self.model
+        )
+
+    def _respond(self, prompt: str) -> CompletionResponse:
+        text = stub_completion(prompt, self.mode, self.template, self.max_tokens, self.model)
+        counts = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text)}
+        return CompletionResponse(text=text, additional_kwargs=counts)
+
+    def _delay(self, response: CompletionResponse) -> float:
+        seconds = self.latency_ms / 1000
+        if self.tokens_per_second:
+            seconds += response.additional_kwargs["completion_tokens"] / self.tokens_per_second
+        return seconds
+
+    def _complete_once(self, prompt: str) -> CompletionResponse:
+        response = self._respond(prompt)
+        time.sleep(self._delay(response))
+        return response
+
+    async def _acomplete_once(self, prompt: str) -> CompletionResponse:
+        response = self._respond(prompt)
+        await asyncio.sleep(self._delay(response))
+        return response
+
+    def _record(self, response: CompletionResponse) -> CompletionResponse:
+        counts = response.additional_kwargs
+        record_usage(counts["prompt_tokens"], counts["completion_tokens"], model=self.model, cost=0.0)
+        return response
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        if self._limiter:
+            response = self._limiter.run_sync(self._complete_once, prompt,
+                                              estimated_tokens=estimate_tokens(prompt))
+        else:
+            response = self._complete_once(prompt)
+        return self._record(response)
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        if self._limiter:
+            response = await self._limiter.run(self._acomplete_once, prompt,
+                                               estimated_tokens=estimate_tokens(prompt))
+        else:
+            response = await self._acomplete_once(prompt)
+        return self._record(response)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        response = self.complete(prompt, formatted=formatted, **kwargs)
+        yield CompletionResponse(text=response.text, delta=response.text,
+                                 additional_kwargs=response.additional_kwargs)
+
+    @staticmethod
+    def _to_chat(response: CompletionResponse) -> ChatResponse:
+        return ChatResponse(
+            message=ChatMessage(role=MessageRole.ASSISTANT, content=response.text),
+            additional_kwargs=response.additional_kwargs
+        )
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._to_chat(self.complete(self.messages_to_prompt(messages), formatted=True))
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._to_chat(await self.acomplete(self.messages_to_prompt(messages), formatted=True))
+
+
+def get_embed_model(**kwargs: Any) -> BaseEmbedding:
+    """Embedding model of the selected provider; kwargs go to OpenAIEmbedding."""
+    if is_fake():
+        return StubEmbedding()
+    from llama_index.embeddings.openai import OpenAIEmbedding
+    return OpenAIEmbedding(**kwargs)
+
+
+def embedding_model_id(embed_model: BaseEmbedding) -> str:
+    """Identifier of an embedding model; vectors are interchangeable only between equal ids."""
+    return f"{embed_model.class_name()}:{embed_model.model_name}"
+
+
+def configure_settings():
+    """Point llama-index's global Settings at the stubs when the fake provider is selected.
+
+    With the real provider the library defaults (OpenAI) are left untouched.
+    """
+    if is_fake():
+        Settings.llm = StubLLM()
+        Settings.embed_model = StubEmbedding()
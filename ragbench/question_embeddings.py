@@ -0,0 +1,155 @@
+"""
+Precomputed Question Embeddings
+
+Evaluation suites ask the same questions on every run, so their embeddings
+can be computed once and stored in a sidecar next to the dataset
+(``generated_qa_pairs.json`` -> ``generated_qa_pairs.embeddings.npz``).
+RagClient sends them with /api/query/batch requests, and the backend then
+skips query embedding for those questions. Questions get query embeddings
+(``get_query_embedding``), exactly as the backend embeds them. The sidecar
+records the embedding model; the backend rejects vectors from a different
+model or of the wrong dimension. Sidecars written before query embeddings
+were used hold text embeddings and are ignored until recomputed.
+
+Usage:
+    python question_embeddings.py llama_eval/generated_qa_pairs.json
+    python question_embeddings.py deep_eval/synthetic_data/20250305_120256.json --field input
+"""
+
+import argparse
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from dataset_stream import iter_records
+
+SIDECAR_SUFFIX = ".embeddings.npz"
+EMBEDDING_KIND = "query"  # Recorded in sidecars; others hold text embeddings
+QUESTION_FIELDS = ("query", "input")  # llama_eval QA pairs, deep_eval goldens
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form of a question used as embedding cache key.
+
+    Unicode is NFKC-normalized and whitespace collapsed; case is kept
+    because it can change the embedding.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def sidecar_path(dataset: str) -> Path:
+    """Embedding sidecar file of a dataset."""
+    path = Path(dataset)
+    return path.with_name(path.stem + SIDECAR_SUFFIX)
+
+
+@dataclass
+class QuestionEmbeddings:
+    """Embeddings of a dataset's questions, keyed by normalized question."""
+    model: str
+    vectors: Dict[str, List[float]] = field(default_factory=dict)
+
+    def get(self, question: str) -> Optional[List[float]]:
+        return self.vectors.get(normalize_query(question))
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+
+def compute_question_embeddings(questions: Sequence[str], embed_model,
+                                concurrency: int = 8) -> QuestionEmbeddings:
+    """Embed distinct questions with query embeddings.
+
+    Args:
+        questions: Questions to embed (duplicates are embedded once)
+        embed_model: llama-index embedding model, as used by the backend
+        concurrency: Embedding requests in flight at a time
+
+    Returns:
+        QuestionEmbeddings tagged with the model id
+    """
+    from providers import embedding_model_id
+
+    distinct = list(dict.fromkeys(normalize_query(q) for q in questions))
+    result = QuestionEmbeddings(embedding_model_id(embed_model))
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        result.vectors.update(zip(distinct, pool.map(embed_model.get_query_embedding, distinct)))
+    return result
+
+
+def save_question_embeddings(embeddings: QuestionEmbeddings, dataset: str) -> Path:
+    """Write the sidecar of a dataset."""
+    path = sidecar_path(dataset)
+    questions = list(embeddings.vectors)
+    np.savez(
+        path,
+        model=np.array(embeddings.model),
+        kind=np.array(EMBEDDING_KIND),
+        questions=np.array(questions),
+        embeddings=np.array([embeddings.vectors[q] for q in questions], dtype=np.float32)
+    )
+    return path
+
+
+def load_question_embeddings(dataset: Optional[str]) -> Optional[QuestionEmbeddings]:
+    """Load the sidecar of a dataset, or None if there is none."""
+    if not dataset:
+        return None
+    path = sidecar_path(dataset)
+    if not path.exists():
+        return None
+    data = np.load(path)
+    if "kind" not in data or str(data["kind"]) != EMBEDDING_KIND:
+        print(f"Ignoring {path}: it holds text embeddings, recompute it with question_embeddings.py")
+        return None
+    embeddings = QuestionEmbeddings(
+        str(data["model"]),
+        dict(zip(data["questions"].tolist(), data["embeddings"].tolist()))
+    )
+    print(f"Loaded {len(embeddings)} precomputed question embeddings ({embeddings.model}) from {path}")
+    return embeddings
+
+
+def precompute_for_dataset(dataset: str, question_field: Optional[str] = None,
+                           embed_model=None) -> Path:
+    """Embed all questions of a QA or golden dataset and write its sidecar.
+
+    Args:
+        dataset: JSON or JSONL dataset
+        question_field: Record key holding the question (detected if None)
+        embed_model: Embedding model (default: the selected provider's)
+
+    Returns:
+        Path of the written sidecar
+    """
+    from providers import get_embed_model
+
+    fields = [question_field] if question_field else QUESTION_FIELDS
+    questions = [
+        next(record[key] for key in fields if key in record)
+        for record in iter_records(dataset)
+        if any(key in record for key in fields)
+    ]
+    embeddings = compute_question_embeddings(questions, embed_model or get_embed_model())
+    path = save_question_embeddings(embeddings, dataset)
+    print(f"Saved {len(embeddings)} question embeddings ({embeddings.model}) to {path}")
+    return path
+
+
+def main():
+    """Precompute question embeddings for an existing dataset."""
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Precompute question embeddings for a dataset")
+    parser.add_argument("dataset", help="QA pairs or golden dataset (JSON or JSONL)")
+    parser.add_argument("--field", default=None, help="Question field (default: query or input)")
+    args = parser.parse_args()
+    load_dotenv()
+    precompute_for_dataset(args.dataset, args.field)
+
+if __name__ == "__main__":
+    main()
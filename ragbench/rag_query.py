@@ -4,27 +4,130 @@ Simple RAG Query Client
 
 import aiohttp
 import asyncio
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional
+
+from question_embeddings import QuestionEmbeddings
+
+# Context fields the evaluators read; the backend then skips the full node metadata
+DEFAULT_CONTEXT_FIELDS = "file_name,score,text_preview"
 
 class RagClient:
-    def __init__(self, api_endpoint: str = "http://localhost:8000"):
+    def __init__(self, api_endpoint: str = "http://localhost:8000", batch_size: int = 32,
+                 question_embeddings: Optional[QuestionEmbeddings] = None,
+                 context_fields: Optional[str] = DEFAULT_CONTEXT_FIELDS):
         self.api_endpoint = api_endpoint.rstrip('/')
+        self.batch_size = batch_size
+        self.batch_supported = True  # Cleared if the backend has no /api/query/batch
+        # Precomputed embeddings sent with batch requests so the backend skips query embedding
+        self.question_embeddings = question_embeddings
+        # Comma-separated context fields requested from the backend (None for the full contexts)
+        self.context_fields = context_fields
 
     async def query(self, question: str) -> Optional[Dict[str, Any]]:
-        """Send query to RAG application and get response."""
+        """Send query to RAG application and get response.
+
+        The response gains ``latency_ms``, the client-observed request time.
+        Questions with a precomputed embedding go through the batch endpoint
+        so the embedding can be sent along.
+        """
+        if self.batch_supported and self.question_embeddings and self.question_embeddings.get(question):
+            batch = await self.query_batch([question])
+            if batch is not None:
+                return batch[0]
         try:
+            start = time.perf_counter()
             async with aiohttp.ClientSession() as session:
+                params = {"query_text": question}
+                if self.context_fields:
+                    params["fields"] = self.context_fields
                 async with session.get(
                     f"{self.api_endpoint}/api/query",
-                    params={"query_text": question}
+                    params=params
                 ) as response:
                     response.raise_for_status()
                     data = await response.json()
+                    data['latency_ms'] = (time.perf_counter() - start) * 1000
                     return data
         except aiohttp.ClientError as e:
             print(f"Error querying RAG endpoint: {e}")
             return None
 
+    async def query_many(self, questions: List[str], **options: Any) -> List[Optional[Dict[str, Any]]]:
+        """Send several queries, batched through /api/query/batch when available.
+
+        Falls back to one /api/query request per question when a batch request
+        fails or the backend has no batch endpoint.
+
+        Args:
+            questions: Questions to answer
+            **options: Retrieval options for the batch endpoint (similarity_top_k, rerank, ...)
+
+        Returns:
+            One response per question in input order (None where the query failed)
+        """
+        results: List[Optional[Dict[str, Any]]] = []
+        for start in range(0, len(questions), self.batch_size):
+            chunk = questions[start:start + self.batch_size]
+            batch = None
+            if len(chunk) > 1 and self.batch_supported:
+                batch = await self.query_batch(chunk, **options)
+            if batch is None:
+                batch = await asyncio.gather(*(self.query(question) for question in chunk))
+            results.extend(batch)
+        return results
+
+    async def query_batch(self, questions: List[str], **options: Any) -> Optional[List[Optional[Dict[str, Any]]]]:
+        """Send one request to /api/query/batch.
+
+        Precomputed embeddings of the questions, if any, are sent along.
+
+        Returns:
+            One response per question (None for per-item errors), or None if
+            the request failed as a whole. Each response's ``latency_ms`` is
+            the time of the whole batch request; per-item server time is in
+            its ``timings``.
+        """
+        payload = {"queries": questions, **options}
+        if self.context_fields:
+            payload.setdefault("fields", self.context_fields)
+        if self.question_embeddings:
+            embeddings = [self.question_embeddings.get(question) for question in questions]
+            if any(embedding is not None for embedding in embeddings):
+                payload["embeddings"] = embeddings
+                payload["embedding_model"] = self.question_embeddings.model
+        try:
+            start = time.perf_counter()
+            async with aiohttp.ClientSession() as session:
+                async with session.post(
+                    f"{self.api_endpoint}/api/query/batch",
+                    json=payload
+                ) as response:
+                    if response.status in (404, 405):
+                        print("Batch endpoint not available, falling back to single queries")
+                        self.batch_supported = False
+                        return None
+                    if response.status == 422 and "embeddings" in payload:
+                        print(f"Precomputed embeddings rejected ({await response.text()}), no longer sending them")
+                        self.question_embeddings = None
+                        return None
+                    response.raise_for_status()
+                    data = await response.json()
+        except aiohttp.ClientError as e:
+            print(f"Error querying RAG batch endpoint: {e}")
+            return None
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        results = []
+        for question, item in zip(questions, data["results"]):
+            if "error" in item:
+                print(f"Error querying RAG endpoint for '{question}': {item['error']}")
+                item = None
+            else:
+                item['latency_ms'] = latency_ms
+            results.append(item)
+        return results
+
 async def main():
     client = RagClient()
     question = "What is machine learning?"
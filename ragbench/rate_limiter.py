@@ -0,0 +1,360 @@
+"""
+Shared LLM Rate Limiter
+
+Every judge and generator LLM call in ragbench goes through a ``RateLimiter``:
+- Requests-per-minute and tokens-per-minute token buckets
+- AIMD adaptive concurrency that backs off multiplicatively on 429s and
+  latency spikes and grows additively while calls succeed
+- Retries of rate-limited calls with jittered exponential backoff
+
+A call first waits out its bucket reservation and only then queues for a
+concurrency slot, so calls waiting for their turn do not hold AIMD capacity.
+Queued calls sleep until a slot is released or the limit grows. Retries are
+logged as warnings (stderr by default), keeping stdout for reports.
+
+Limiters are shared per name within a process via ``get_limiter``. The
+``FakeLLM`` at the bottom injects rate-limit errors so the behaviour can be
+exercised offline (see ``tests/test_rate_limiter.py``).
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough token estimate used when no tokenizer is at hand
+
+
+def estimate_tokens(*texts: Any) -> int:
+    """Estimate the token count of prompt fragments."""
+    return sum(len(str(text)) for text in texts if text) // CHARS_PER_TOKEN + 1
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Detect provider rate-limit errors without importing provider SDKs.
+
+    Recognizes OpenAI/httpx style exceptions carrying a 429 status code and
+    exception classes named ``RateLimitError``.
+    """
+    for candidate in (exc, getattr(exc, "__cause__", None)):
+        if candidate is None:
+            continue
+        status = getattr(candidate, "status_code", None) or getattr(candidate, "status", None)
+        if status == 429:
+            return True
+        response = getattr(candidate, "response", None)
+        if getattr(response, "status_code", None) == 429:
+            return True
+        if type(candidate).__name__ == "RateLimitError":
+            return True
+    return False
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a fixed rate."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take ``amount`` tokens, returning how long to wait before using them.
+
+        The bucket may go negative; the debt is what the caller waits out.
+        Requests larger than the bucket are clamped to its capacity.
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit.
+
+    The limit grows by ``1 / limit`` per successful call (about one slot per
+    window of calls) and is multiplied by ``decrease_factor`` on a rate-limit
+    error or when a call's latency exceeds ``spike_factor`` times the running
+    average. Callers over the limit wait in a queue, from threads
+    (``acquire``) or event loops (``acquire_async``), and are woken when a
+    slot frees up.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 32,
+                 decrease_factor: float = 0.5, spike_factor: float = 3.0,
+                 warmup_calls: int = 5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.spike_factor = spike_factor
+        self.warmup_calls = warmup_calls
+        self.avg_latency: Optional[float] = None
+        self.calls = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        # Wake-up callbacks of queued callers, oldest first
+        self._waiters: Deque[Callable[[], None]] = deque()
+
+    @property
+    def current(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    def _take_slot(self) -> bool:
+        if self.in_flight < self.current:
+            self.in_flight += 1
+            return True
+        return False
+
+    def _wake_waiters(self) -> None:
+        """Wake one queued caller per free slot; the caller must hold the lock."""
+        free = self.current - self.in_flight
+        while free > 0 and self._waiters:
+            self._waiters.popleft()()
+            free -= 1
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            return self._take_slot()
+
+    def acquire(self) -> None:
+        """Block the calling thread until a slot is free and take it."""
+        while True:
+            with self._lock:
+                if self._take_slot():
+                    return
+                event = threading.Event()
+                self._waiters.append(event.set)
+            event.wait()
+
+    async def acquire_async(self) -> None:
+        """Wait without blocking the event loop until a slot is free and take it."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._take_slot():
+                    return
+                future = loop.create_future()
+
+                def wake(future=future):
+                    loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+                self._waiters.append(wake)
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if wake in self._waiters:
+                        self._waiters.remove(wake)
+                    else:
+                        self._wake_waiters()  # Pass the wake-up on
+                raise
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def _decrease(self) -> None:
+        self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+
+    def on_success(self, latency: float) -> None:
+        with self._lock:
+            self.calls += 1
+            spiked = (
+                self.avg_latency is not None
+                and self.calls > self.warmup_calls
+                and latency > self.spike_factor * self.avg_latency
+            )
+            self.avg_latency = latency if self.avg_latency is None else 0.9 * self.avg_latency + 0.1 * latency
+            if spiked:
+                self._decrease()
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+                self._wake_waiters()
+
+    def on_rate_limit(self) -> None:
+        with self._lock:
+            self._decrease()
+
+
+class RateLimiter:
+    """Token-bucket rate limiter with adaptive concurrency and retries."""
+
+    def __init__(self, name: str = "default",
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_concurrency: int = 8, min_concurrency: int = 1,
+                 max_retries: int = 6, base_delay: float = 1.0,
+                 max_delay: float = 60.0, spike_factor: float = 3.0):
+        """
+        Args:
+            name: Identifier used in log messages and stats
+            requests_per_minute: Request budget; None disables the request bucket
+            tokens_per_minute: Token budget; None disables the token bucket
+            max_concurrency: Upper bound (and starting point) for in-flight calls
+            min_concurrency: Lower bound for in-flight calls
+            max_retries: Retries of a rate-limited call before giving up
+            base_delay: First backoff delay in seconds
+            max_delay: Cap on a single backoff delay in seconds
+            spike_factor: Latency multiple over the average treated as a spike
+        """
+        self.name = name
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(
+            initial=max_concurrency, minimum=min_concurrency,
+            maximum=max_concurrency, spike_factor=spike_factor
+        )
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0}
+
+    def _bucket_wait(self, estimated_tokens: int) -> float:
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket and estimated_tokens:
+            wait = max(wait, self.token_bucket.reserve(estimated_tokens))
+        return wait
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for a retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _on_error(self, exc: Exception, attempt: int) -> Optional[float]:
+        """Record a failed call and return the retry delay, or None to re-raise."""
+        if not is_rate_limit_error(exc):
+            self.stats["failures"] += 1
+            return None
+        self.stats["rate_limited"] += 1
+        self.concurrency.on_rate_limit()
+        if attempt >= self.max_retries:
+            self.stats["failures"] += 1
+            return None
+        self.stats["retries"] += 1
+        return self.backoff(attempt)
+
+    def _log_retry(self, delay: float, attempt: int) -> None:
+        logger.warning("[%s] Rate limited, retrying in %.1fs (attempt %d/%d, concurrency %d)",
+                       self.name, delay, attempt + 1, self.max_retries, self.concurrency.current)
+
+    async def run(self, fn: Callable[..., Awaitable[Any]], *args: Any,
+                  estimated_tokens: int = 0, **kwargs: Any) -> Any:
+        """Await ``fn(*args, **kwargs)`` under the limiter, retrying on 429s."""
+        attempt = 0
+        while True:
+            wait = self._bucket_wait(estimated_tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            await self.concurrency.acquire_async()
+            try:
+                self.stats["calls"] += 1
+                start = time.monotonic()
+                result = await fn(*args, **kwargs)
+                self.concurrency.on_success(time.monotonic() - start)
+                return result
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            finally:
+                self.concurrency.release()
+            self._log_retry(delay, attempt)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def run_sync(self, fn: Callable[..., Any], *args: Any,
+                 estimated_tokens: int = 0, **kwargs: Any) -> Any:
+        """Blocking counterpart of ``run`` for synchronous LLM calls."""
+        attempt = 0
+        while True:
+            wait = self._bucket_wait(estimated_tokens)
+            if wait:
+                time.sleep(wait)
+            self.concurrency.acquire()
+            try:
+                self.stats["calls"] += 1
+                start = time.monotonic()
+                result = fn(*args, **kwargs)
+                self.concurrency.on_success(time.monotonic() - start)
+                return result
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                if delay is None:
+                    raise
+            finally:
+                self.concurrency.release()
+            self._log_retry(delay, attempt)
+            time.sleep(delay)
+            attempt += 1
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(name: str = "default", **kwargs: Any) -> RateLimiter:
+    """Return the process-wide limiter for ``name``, creating it on first use.
+
+    Keyword arguments are only applied when the limiter is created, so every
+    caller sharing a name shares one set of buckets.
+    """
+    with _registry_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(name=name, **kwargs)
+        return _limiters[name]
+
+
+class FakeRateLimitError(Exception):
+    """Rate-limit error raised by ``FakeLLM``."""
+    status_code = 429
+
+
+class FakeLLM:
+    """Offline LLM stand-in that enforces a provider-side request budget.
+
+    Calls beyond ``server_rpm`` within a sliding 60 second window, or beyond
+    ``server_concurrency`` simultaneous calls, raise ``FakeRateLimitError``.
+    ``error_rate`` additionally injects random 429s.
+    """
+
+    def __init__(self, server_rpm: float = 600, server_concurrency: int = 4,
+                 latency: float = 0.05, error_rate: float = 0.0, seed: int = 0):
+        self.server_rpm = server_rpm
+        self.server_concurrency = server_concurrency
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = []
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def acomplete(self, prompt: str) -> str:
+        now = time.monotonic()
+        self.calls = [t for t in self.calls if now - t < 60]
+        if (len(self.calls) >= self.server_rpm
+                or self.in_flight >= self.server_concurrency
+                or self.random.random() < self.error_rate):
+            self.rejected += 1
+            raise FakeRateLimitError("429 Too Many Requests")
+        self.calls.append(now)
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency)
+            return f"echo: {prompt}"
+        finally:
+            self.in_flight -= 1
+
@@ -0,0 +1,426 @@
+"""
+Evaluation Run Store
+
+Indexed SQLite store for evaluation results from both evaluators. Every
+run is keyed by run id, dataset version (a content hash of the dataset
+file) and backend configuration; per-query metric values are stored in a
+long (run, metric, query) table so runs with different result schemas can
+be compared directly.
+
+Metrics whose names end in _ms, _tokens or _usd are treated as
+lower-is-better; all other metrics are scores where higher is better.
+
+Usage:
+    python results_store.py --evaluator llama_eval runs
+    python results_store.py compare <run_a> <run_b>
+    python results_store.py --evaluator deep_eval regressions latest~1 latest --threshold 0.1
+    python results_store.py latency <run>
+    python results_store.py --evaluator llama_eval gate latest~1 latest --max-drop 0.05
+    python results_store.py import llama_eval llama_eval/evaluation_results/evaluation_results_20250305.csv
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import sys
+import uuid
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from percentiles import percentile
+
+DEFAULT_DB_PATH = Path(os.getenv("RAGBENCH_RESULTS_DB", Path(__file__).parent / "evaluation_runs.db"))
+
+# Query column and metric columns of each evaluator's detailed results
+EVALUATOR_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    "llama_eval": {
+        "query": "query",
+        "metrics": {
+            "faithfulness": "faithfulness_score",
+            "relevancy": "relevancy_score",
+            "context_relevancy": "context_relevancy_score",
+            "rag_latency_ms": "rag_latency_ms",
+            "server_total_ms": "server_total_ms",
+            "faithfulness_judge_ms": "faithfulness_judge_ms",
+            "relevancy_judge_ms": "relevancy_judge_ms",
+            "context_relevancy_judge_ms": "context_relevancy_judge_ms",
+            "judge_prompt_tokens": "judge_prompt_tokens",
+            "judge_completion_tokens": "judge_completion_tokens",
+            "judge_cost_usd": "judge_cost_usd"
+        }
+    },
+    "deep_eval": {
+        "query": "Input_Query",
+        "metrics": {
+            "correctness": "Score",
+            "rag_latency_ms": "RAG_Latency_ms",
+            "server_total_ms": "Server_Total_ms",
+            "correctness_judge_ms": "Judge_Latency_ms",
+            "judge_prompt_tokens": "Judge_Prompt_Tokens",
+            "judge_completion_tokens": "Judge_Completion_Tokens",
+            "judge_cost_usd": "Judge_Cost_USD"
+        }
+    }
+}
+
+LOWER_IS_BETTER_SUFFIXES = ("_ms", "_tokens", "_usd")
+LATENCY_SUFFIX = "_ms"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    evaluator TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    dataset TEXT,
+    dataset_version TEXT,
+    backend_config TEXT,
+    config_hash TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_evaluator ON runs (evaluator, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    query_key TEXT NOT NULL,
+    query TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, metric, query_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_results_query ON results (query_key, metric);
+"""
+
+
+def lower_is_better(metric: str) -> bool:
+    """Whether a smaller value of the metric is an improvement."""
+    return metric.endswith(LOWER_IS_BETTER_SUFFIXES)
+
+
+def query_key(query: str) -> str:
+    """Stable key for a query across runs."""
+    return hashlib.sha1(" ".join(query.split()).encode("utf-8")).hexdigest()
+
+
+def dataset_version(path: Optional[str]) -> Optional[str]:
+    """Content hash of a dataset file (None if it does not exist)."""
+    if not path or not Path(path).is_file():
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+class ResultsStore:
+    """SQLite-backed store of evaluation runs and per-query metric values."""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        """
+        Open (and create if needed) the results database.
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def create_run(self, evaluator: str, dataset: Optional[str] = None,
+                   backend_config: Optional[Dict[str, Any]] = None,
+                   run_id: Optional[str] = None) -> str:
+        """Register a new run and return its id."""
+        created_at = datetime.now()
+        run_id = run_id or f"{evaluator}-{created_at.strftime('%Y%m%d_%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        config_json = json.dumps(backend_config or {}, sort_keys=True, default=str)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (run_id, evaluator, created_at, dataset, dataset_version,"
+                " backend_config, config_hash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run_id, evaluator, created_at.isoformat(), str(dataset) if dataset else None,
+                 dataset_version(dataset), config_json,
+                 hashlib.sha1(config_json.encode("utf-8")).hexdigest()[:12])
+            )
+        return run_id
+
+    def add_results(self, run_id: str, rows: Iterable[Dict[str, Any]],
+                    query_column: str, metrics: Dict[str, str]) -> int:
+        """Store metric values from detailed result rows.
+
+        Args:
+            run_id: Run the rows belong to
+            rows: Detailed result rows
+            query_column: Column holding the query text
+            metrics: Metric name -> column mapping; missing or non-numeric values are skipped
+
+        Returns:
+            Number of metric values stored
+        """
+        values = []
+        for row in rows:
+            query = str(row.get(query_column) or "")
+            if not query:
+                continue
+            key = query_key(query)
+            for metric, column in metrics.items():
+                value = _to_float(row.get(column))
+                if value is not None:
+                    values.append((run_id, metric, key, query, value))
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (run_id, metric, query_key, query, value)"
+                " VALUES (?, ?, ?, ?, ?)",
+                values
+            )
+        return len(values)
+
+    def set_summary(self, run_id: str, summary: Dict[str, Any]):
+        """Attach summary statistics to a run."""
+        with self.conn:
+            self.conn.execute("UPDATE runs SET summary = ? WHERE run_id = ?",
+                              (json.dumps(summary, default=str), run_id))
+
+    def list_runs(self, evaluator: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent runs first."""
+        sql = "SELECT run_id, evaluator, created_at, dataset, dataset_version, config_hash FROM runs"
+        params: List[Any] = []
+        if evaluator:
+            sql += " WHERE evaluator = ?"
+            params.append(evaluator)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def resolve_run(self, ref: str, evaluator: Optional[str] = None) -> str:
+        """Resolve a run id, or "latest" / "latest~N" (N runs before the latest)."""
+        if not ref.startswith("latest"):
+            return ref
+        offset = int(ref.split("~", 1)[1]) if "~" in ref else 0
+        runs = self.list_runs(evaluator, limit=offset + 1)
+        if len(runs) <= offset:
+            raise ValueError(f"No run matches '{ref}'")
+        return runs[offset]["run_id"]
+
+    def compare(self, run_a: str, run_b: str) -> List[Dict[str, Any]]:
+        """Per-metric means over the queries both runs evaluated, and their delta (B - A)."""
+        rows = self.conn.execute(
+            """
+            SELECT a.metric AS metric, COUNT(*) AS queries,
+                   AVG(a.value) AS mean_a, AVG(b.value) AS mean_b,
+                   AVG(b.value) - AVG(a.value) AS delta
+            FROM results a
+            JOIN results b ON b.run_id = ? AND b.metric = a.metric AND b.query_key = a.query_key
+            WHERE a.run_id = ?
+            GROUP BY a.metric
+            ORDER BY a.metric
+            """,
+            (run_b, run_a)
+        )
+        return [dict(row) for row in rows]
+
+    def regressions(self, run_a: str, run_b: str, metric: Optional[str] = None,
+                    threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """Queries whose metric got worse from run A to run B by more than ``threshold``.
+
+        For lower-is-better metrics the threshold is relative (0.2 = 20% worse).
+        """
+        sql = """
+            SELECT a.metric AS metric, a.query AS query, a.value AS value_a, b.value AS value_b
+            FROM results a
+            JOIN results b ON b.run_id = ? AND b.metric = a.metric AND b.query_key = a.query_key
+            WHERE a.run_id = ? AND b.value != a.value
+        """
+        params: List[Any] = [run_b, run_a]
+        if metric:
+            sql += " AND a.metric = ?"
+            params.append(metric)
+
+        regressed = []
+        for row in self.conn.execute(sql, params):
+            row = dict(row)
+            if lower_is_better(row["metric"]):
+                worse_by = (row["value_b"] - row["value_a"]) / max(abs(row["value_a"]), 1e-9)
+            else:
+                worse_by = row["value_a"] - row["value_b"]
+            if worse_by > threshold:
+                row["worse_by"] = worse_by
+                regressed.append(row)
+        return sorted(regressed, key=lambda r: (r["metric"], -r["worse_by"]))
+
+    def latency_percentiles(self, run_id: str) -> List[Dict[str, Any]]:
+        """p50 / p90 / p95 / p99 of every latency metric (names ending in _ms) of a run."""
+        values: Dict[str, List[float]] = {}
+        rows = self.conn.execute(
+            "SELECT metric, value FROM results WHERE run_id = ? AND metric LIKE ? ESCAPE '\\'"
+            " ORDER BY metric, value",
+            (run_id, f"%\\{LATENCY_SUFFIX}")
+        )
+        for row in rows:
+            values.setdefault(row["metric"], []).append(row["value"])
+        return [
+            {
+                "metric": metric, "count": len(vals),
+                "p50": percentile(vals, 0.5), "p90": percentile(vals, 0.9),
+                "p95": percentile(vals, 0.95), "p99": percentile(vals, 0.99)
+            }
+            for metric, vals in values.items()
+        ]
+
+
+def record_run(evaluator: str, rows: List[Dict[str, Any]], summary: Dict[str, Any] = None,
+               dataset: Optional[str] = None, backend_config: Optional[Dict[str, Any]] = None,
+               db_path: Path = DEFAULT_DB_PATH) -> Optional[str]:
+    """Write one evaluator run into the store.
+
+    The backend configuration can be extended with a JSON object in the
+    RAGBENCH_BACKEND_CONFIG environment variable (e.g. chunk size or vector
+    backend settings of the system under test). Errors are reported and
+    swallowed so a store problem never loses the CSV results.
+
+    Returns:
+        The new run id, or None if the run could not be stored
+    """
+    schema = EVALUATOR_SCHEMAS[evaluator]
+    config = dict(backend_config or {})
+    if os.getenv("RAGOPS_PROVIDER"):
+        config.setdefault("provider", os.environ["RAGOPS_PROVIDER"])
+    if os.getenv("RAGBENCH_BACKEND_CONFIG"):
+        try:
+            config.update(json.loads(os.environ["RAGBENCH_BACKEND_CONFIG"]))
+        except json.JSONDecodeError as e:
+            print(f"Ignoring invalid RAGBENCH_BACKEND_CONFIG: {e}")
+    try:
+        with closing(ResultsStore(db_path)) as store:
+            run_id = store.create_run(evaluator, dataset, config)
+            store.add_results(run_id, rows, schema["query"], schema["metrics"])
+            if summary:
+                store.set_summary(run_id, summary)
+        return run_id
+    except sqlite3.Error as e:
+        print(f"Error writing run to results store: {e}")
+        return None
+
+
+def _print_table(rows: List[Dict[str, Any]]):
+    if not rows:
+        print("(no rows)")
+        return
+    columns = list(rows[0].keys())
+    cells = [[f"{v:.4f}" if isinstance(v, float) else str(v) for v in row.values()] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and gate stored evaluation runs")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="SQLite results database")
+    parser.add_argument("--evaluator", choices=sorted(EVALUATOR_SCHEMAS),
+                        help="Evaluator used to resolve latest / latest~N")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    runs_parser = sub.add_parser("runs", help="List recent runs")
+    runs_parser.add_argument("--limit", type=int, default=20)
+
+    compare_parser = sub.add_parser("compare", help="Per-metric delta between two runs")
+    compare_parser.add_argument("run_a")
+    compare_parser.add_argument("run_b")
+
+    regressions_parser = sub.add_parser("regressions", help="Queries that regressed from run A to run B")
+    regressions_parser.add_argument("run_a")
+    regressions_parser.add_argument("run_b")
+    regressions_parser.add_argument("--metric")
+    regressions_parser.add_argument("--threshold", type=float, default=0.0)
+
+    latency_parser = sub.add_parser("latency", help="Latency percentiles of a run")
+    latency_parser.add_argument("run")
+
+    gate_parser = sub.add_parser("gate", help="Exit non-zero if run B regressed against run A")
+    gate_parser.add_argument("run_a", help="Baseline run")
+    gate_parser.add_argument("run_b", help="Candidate run")
+    gate_parser.add_argument("--metric", nargs="+", help="Metrics to gate on (default: all shared metrics)")
+    gate_parser.add_argument("--max-drop", type=float, default=0.05,
+                             help="Largest allowed drop in a mean score")
+    gate_parser.add_argument("--max-increase", type=float, default=0.2,
+                             help="Largest allowed relative increase of a lower-is-better metric")
+
+    import_parser = sub.add_parser("import", help="Import a detailed results CSV as a run")
+    import_parser.add_argument("import_evaluator", choices=sorted(EVALUATOR_SCHEMAS))
+    import_parser.add_argument("csv_file")
+    import_parser.add_argument("--dataset", help="Dataset the results were produced from")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        with open(args.csv_file, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        run_id = record_run(args.import_evaluator, rows, dataset=args.dataset,
+                            backend_config={"imported_from": args.csv_file}, db_path=Path(args.db))
+        print(f"Imported {len(rows)} rows as run {run_id}")
+        return
+
+    with closing(ResultsStore(Path(args.db))) as store:
+        try:
+            if args.command == "runs":
+                _print_table(store.list_runs(args.evaluator, args.limit))
+            elif args.command == "latency":
+                _print_table(store.latency_percentiles(store.resolve_run(args.run, args.evaluator)))
+            else:
+                run_a = store.resolve_run(args.run_a, args.evaluator)
+                run_b = store.resolve_run(args.run_b, args.evaluator)
+                print(f"A: {run_a}\nB: {run_b}\n")
+                if args.command == "compare":
+                    _print_table(store.compare(run_a, run_b))
+                elif args.command == "regressions":
+                    _print_table(store.regressions(run_a, run_b, args.metric, args.threshold))
+                else:
+                    sys.exit(_gate(store.compare(run_a, run_b), args.metric,
+                                   args.max_drop, args.max_increase))
+        except ValueError as e:
+            parser.error(str(e))
+
+
+def _gate(comparison: List[Dict[str, Any]], metrics: Optional[Sequence[str]],
+          max_drop: float, max_increase: float) -> int:
+    """Print the gate verdict per metric and return the process exit code."""
+    compared = [row for row in comparison if not metrics or row["metric"] in metrics]
+    if not compared:
+        print("No shared metrics to compare")
+        return 2
+
+    failed = False
+    for row in compared:
+        if lower_is_better(row["metric"]):
+            change = row["delta"] / max(abs(row["mean_a"]), 1e-9)
+            ok = change <= max_increase
+            detail = f"{change:+.1%} (max +{max_increase:.0%})"
+        else:
+            ok = -row["delta"] <= max_drop
+            detail = f"{row['delta']:+.4f} (max drop {max_drop})"
+        failed |= not ok
+        print(f"{'PASS' if ok else 'FAIL'}  {row['metric']}: {row['mean_a']:.4f} -> {row['mean_b']:.4f}  {detail}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    main()
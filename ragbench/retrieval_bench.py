@@ -0,0 +1,237 @@
+"""
+Retrieval Benchmark
+
+Scores the backend's retrieval-only endpoint (/api/retrieve) against the
+reference contexts of generated QA pairs with offline IR metrics:
+hit-rate@k, MRR@k and nDCG@k. No LLM is involved; a retrieved node counts
+as relevant when its text overlaps a reference context.
+
+Each chunking setting is queried once per question at the largest k, and
+metrics for every smaller k are computed from the same ranked list, so a
+single run sweeps both similarity_top_k and chunk size.
+
+Usage:
+    python retrieval_bench.py --qa-file llama_eval/generated_qa_pairs.json \\
+        --top-k 1 2 5 10 --chunk-sizes default 256 512 1024
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+import pandas as pd
+
+from dataset_stream import iter_records
+from percentiles import percentile
+from prefilter import tokenize
+
+DEFAULT_ENDPOINT = "http://localhost:8000"
+MATCH_THRESHOLD = 0.5  # Minimum token overlap coefficient for a node to match a reference context
+
+
+def overlap_coefficient(a: str, b: str) -> float:
+    """Token-set overlap |A ∩ B| / min(|A|, |B|) between two texts."""
+    tokens_a, tokens_b = set(tokenize(a)), set(tokenize(b))
+    if not tokens_a or not tokens_b:
+        return 0.0
+    return len(tokens_a & tokens_b) / min(len(tokens_a), len(tokens_b))
+
+
+def reference_coverage(text: str, reference: str) -> float:
+    """Share of a reference context's distinct tokens that a text contains, |A ∩ B| / |B|."""
+    tokens, reference_tokens = set(tokenize(text)), set(tokenize(reference))
+    if not reference_tokens:
+        return 0.0
+    return len(tokens & reference_tokens) / len(reference_tokens)
+
+
+def relevance_vector(retrieved: Sequence[str], references: Sequence[str],
+                     threshold: float = MATCH_THRESHOLD,
+                     similarity: Callable[[str, str], float] = overlap_coefficient) -> List[int]:
+    """Binary relevance of each retrieved text against the reference contexts.
+
+    Args:
+        retrieved: Retrieved texts in rank order
+        references: Reference contexts
+        threshold: Minimum similarity for a match
+        similarity: Function of (retrieved text, reference context)
+
+    Returns:
+        1 or 0 per retrieved text
+    """
+    return [
+        int(any(similarity(text, reference) >= threshold for reference in references))
+        for text in retrieved
+    ]
+
+
+def hit_rate(relevance: Sequence[int], k: int) -> float:
+    """1 if any of the top-k results is relevant, else 0."""
+    return float(any(relevance[:k]))
+
+
+def reciprocal_rank(relevance: Sequence[int], k: int) -> float:
+    """Reciprocal rank of the first relevant result within the top k."""
+    for rank, relevant in enumerate(relevance[:k], 1):
+        if relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def ndcg(relevance: Sequence[int], k: int, num_relevant: int) -> float:
+    """Binary-gain nDCG@k with ``num_relevant`` relevant items in the ideal ranking.
+
+    Several retrieved chunks can match the same reference context, so the
+    ideal ranking holds at least as many relevant items as were retrieved.
+    """
+    num_relevant = max(num_relevant, sum(relevance[:k]))
+    dcg = sum(rel / math.log2(rank + 1) for rank, rel in enumerate(relevance[:k], 1))
+    ideal = sum(1 / math.log2(rank + 1) for rank in range(1, min(num_relevant, k) + 1))
+    return dcg / ideal if ideal else 0.0
+
+
+def score_rankings(rankings: List[Dict[str, Any]], top_ks: Sequence[int]) -> List[Dict[str, float]]:
+    """Aggregate IR metrics at each k over ranked results.
+
+    Args:
+        rankings: Items with ``relevance`` (binary list) and ``num_references``
+        top_ks: Cut-offs to report
+
+    Returns:
+        One row of averaged metrics per k
+    """
+    rows = []
+    for k in top_ks:
+        rows.append({
+            'top_k': k,
+            'hit_rate': statistics.mean(hit_rate(r['relevance'], k) for r in rankings),
+            'mrr': statistics.mean(reciprocal_rank(r['relevance'], k) for r in rankings),
+            'ndcg': statistics.mean(ndcg(r['relevance'], k, r['num_references']) for r in rankings)
+        })
+    return rows
+
+
+class RetrievalBenchmark:
+    """Runs QA pair queries against /api/retrieve and scores the rankings."""
+
+    def __init__(self, api_endpoint: str = DEFAULT_ENDPOINT, concurrency: int = 32):
+        self.api_endpoint = api_endpoint.rstrip('/')
+        self.concurrency = concurrency
+
+    async def _retrieve(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                        query: str, top_k: int, chunk_size: Optional[int]) -> Optional[Dict[str, Any]]:
+        params = {"query_text": query, "similarity_top_k": top_k}
+        if chunk_size:
+            params["chunk_size"] = chunk_size
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.get(f"{self.api_endpoint}/api/retrieve", params=params) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+            except aiohttp.ClientError as e:
+                print(f"Error retrieving for '{query}': {e}")
+                return None
+            data['latency_ms'] = (time.perf_counter() - start) * 1000
+            return data
+
+    async def run_setting(self, qa_pairs: List[Dict[str, Any]], top_ks: Sequence[int],
+                          chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Benchmark one chunking setting at every k.
+
+        Args:
+            qa_pairs: QA pairs with query and reference_contexts
+            top_ks: Cut-offs to report; retrieval runs once at the largest
+            chunk_size: Chunk size to retrieve with (None for the main index)
+
+        Returns:
+            One result row per k
+        """
+        max_k = max(top_ks)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            responses = await asyncio.gather(*(
+                self._retrieve(session, semaphore, pair['query'], max_k, chunk_size)
+                for pair in qa_pairs
+            ))
+        elapsed = time.perf_counter() - start
+
+        rankings, latencies = [], []
+        for pair, response in zip(qa_pairs, responses):
+            if response is None:
+                continue
+            texts = [node['text'] for node in response['nodes']]
+            rankings.append({
+                'relevance': relevance_vector(texts, pair['reference_contexts']),
+                'num_references': len(pair['reference_contexts'])
+            })
+            latencies.append(response['latency_ms'])
+        if not rankings:
+            return []
+
+        latencies.sort()
+        rows = score_rankings(rankings, top_ks)
+        for row in rows:
+            row.update({
+                'chunk_size': chunk_size or 'default',
+                'queries': len(rankings),
+                'queries_per_minute': len(rankings) / elapsed * 60,
+                'p50_latency_ms': percentile(latencies, 0.5),
+                'p95_latency_ms': percentile(latencies, 0.95)
+            })
+        return rows
+
+    async def sweep(self, qa_pairs: List[Dict[str, Any]], top_ks: Sequence[int],
+                    chunk_sizes: Sequence[Optional[int]]) -> pd.DataFrame:
+        """Benchmark every chunk size and k combination."""
+        rows = []
+        for chunk_size in chunk_sizes:
+            print(f"Benchmarking chunk size {chunk_size or 'default'}...")
+            rows.extend(await self.run_setting(qa_pairs, top_ks, chunk_size))
+        return pd.DataFrame(rows)
+
+
+def _parse_chunk_size(value: str) -> Optional[int]:
+    return None if value == "default" else int(value)
+
+
+async def main():
+    """Entry point for the retrieval benchmark."""
+    parser = argparse.ArgumentParser(description="Offline IR benchmark of /api/retrieve")
+    parser.add_argument("--qa-file", required=True, help="QA pairs with reference_contexts (JSON or JSONL)")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT, help="RAG backend base URL")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 2, 5, 10], help="Cut-offs to report")
+    parser.add_argument("--chunk-sizes", type=_parse_chunk_size, nargs="+", default=[None],
+                        help="Chunk sizes to sweep ('default' uses the main index)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent requests")
+    parser.add_argument("--results-dir", default="evaluation_results", help="Directory for the CSV report")
+    args = parser.parse_args()
+
+    qa_pairs = list(iter_records(args.qa_file, fields=('query', 'reference_contexts')))
+    print(f"Loaded {len(qa_pairs)} QA pairs")
+
+    benchmark = RetrievalBenchmark(args.endpoint, args.concurrency)
+    df = await benchmark.sweep(qa_pairs, sorted(args.top_k), args.chunk_sizes)
+    if df.empty:
+        print("No successful retrievals")
+        return
+
+    df = df.sort_values(['ndcg', 'mrr'], ascending=False)
+    print("\nRetrieval Benchmark:")
+    print(df.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+    results_dir = Path(args.results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    results_file = results_dir / f"retrieval_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    df.to_csv(results_file, index=False)
+    print(f"\nResults saved to: {results_file}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,246 @@
+"""
+Sequential-Sampling Evaluation
+
+Judges dataset items in random order and stops as soon as the pass/fail
+decision of every thresholded metric is statistically settled, instead of
+judging the whole dataset.
+
+- ``sampling_order`` shuffles the items, optionally stratified by source
+  document so every prefix of the order covers the documents in proportion.
+- ``SequentialEvaluation`` keeps a running mean per metric with a confidence
+  interval: Wilson for 0/1 scores, percentile bootstrap for continuous ones.
+  A metric passes once the interval's lower bound reaches its threshold and
+  fails once the upper bound drops below it. The confidence is split across
+  the metrics (Bonferroni) so that all decisions hold jointly.
+
+The decisions are re-checked after every batch, i.e. the data is looked at
+repeatedly. ``min_items`` guards against stopping on a lucky start; use a
+higher confidence (e.g. 0.99) when a wrong decision would be expensive.
+"""
+
+import argparse
+import random
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PASS = "pass"
+FAIL = "fail"
+UNRESOLVED = "unresolved"
+
+CI_METHODS = ("auto", "wilson", "bootstrap")
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MIN_ITEMS = 30
+BOOTSTRAP_RESAMPLES = 2000
+
+
+def wilson_interval(successes: float, n: int, confidence: float) -> Tuple[float, float]:
+    """Wilson score interval of a proportion"""
+    if n == 0:
+        return 0.0, 1.0
+    z = statistics.NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * ((p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5) / denominator
+    # All (or no) successes: the bound is exactly 1 (or 0), not off by rounding
+    low = 0.0 if successes <= 0 else max(0.0, center - margin)
+    high = 1.0 if successes >= n else min(1.0, center + margin)
+    return low, high
+
+
+def bootstrap_interval(values: Sequence[float], confidence: float,
+                       resamples: int = BOOTSTRAP_RESAMPLES,
+                       rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+    """Percentile bootstrap interval of a mean"""
+    if not values:
+        return float("-inf"), float("inf")
+    rng = rng or np.random.default_rng()
+    data = np.asarray(values, dtype=float)
+    means = data[rng.integers(0, len(data), size=(resamples, len(data)))].mean(axis=1)
+    alpha = 1 - confidence
+    low, high = np.quantile(means, [alpha / 2, 1 - alpha / 2])
+    return float(low), float(high)
+
+
+def source_document(record: Dict[str, Any]) -> str:
+    """Stratum of a dataset item: its source file, else its first reference context"""
+    if record.get("source_file"):
+        return str(record["source_file"])
+    for key in ("reference_contexts", "context"):
+        contexts = record.get(key)
+        if contexts:
+            return str(contexts[0])
+    return ""
+
+
+def sampling_order(records: Iterable[Any], stratum: Optional[Callable[[Any], str]] = None,
+                   seed: Optional[int] = None) -> List[Any]:
+    """Items in random order.
+
+    Args:
+        records: Dataset items
+        stratum: Optional key function; items of each stratum are spread
+            evenly over the order, at a random offset per stratum
+        seed: Seed for a reproducible order
+
+    Returns:
+        List of the items in sampling order
+    """
+    rng = random.Random(seed)
+    items = list(records)
+    if stratum is None:
+        rng.shuffle(items)
+        return items
+    groups: Dict[str, List[Any]] = defaultdict(list)
+    for item in items:
+        groups[stratum(item)].append(item)
+    keyed = []
+    for group in groups.values():
+        rng.shuffle(group)
+        offset = rng.random()
+        keyed.extend(((i + offset) / len(group), rng.random(), item) for i, item in enumerate(group))
+    keyed.sort(key=lambda entry: entry[:2])
+    return [item for _, _, item in keyed]
+
+
+@dataclass
+class MetricDecision:
+    """Running estimate and pass/fail decision of one metric."""
+    metric: str
+    threshold: float
+    n: int
+    mean: Optional[float]
+    low: float
+    high: float
+    method: str
+    decision: str
+
+
+class SequentialEvaluation:
+    """Running confidence intervals and stopping rule over thresholded metrics.
+
+    Args:
+        thresholds: Metric name to the minimum mean score that passes
+        confidence: Joint confidence of all decisions
+        min_items: Never stop before this many items were judged
+        method: "wilson", "bootstrap", or "auto" (Wilson for 0/1 scores)
+        seed: Seed of the bootstrap resampling
+    """
+
+    def __init__(self, thresholds: Dict[str, float], confidence: float = DEFAULT_CONFIDENCE,
+                 min_items: int = DEFAULT_MIN_ITEMS, method: str = "auto", seed: Optional[int] = None):
+        if method not in CI_METHODS:
+            raise ValueError(f"Unknown CI method '{method}', expected one of {CI_METHODS}")
+        if not 0 < confidence < 1:
+            raise ValueError(f"Confidence must be between 0 and 1, got {confidence}")
+        self.thresholds = dict(thresholds)
+        self.confidence = confidence
+        self.min_items = min_items
+        self.method = method
+        self.values: Dict[str, List[float]] = {metric: [] for metric in self.thresholds}
+        self.items = 0
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def metric_confidence(self) -> float:
+        """Confidence of each metric's interval (Bonferroni over the metrics)"""
+        return 1 - (1 - self.confidence) / max(len(self.thresholds), 1)
+
+    def add(self, scores: Dict[str, Optional[float]]):
+        """Record the scores of one judged item; None scores are left out"""
+        self.items += 1
+        for metric in self.thresholds:
+            score = scores.get(metric)
+            if score is not None and score == score:
+                self.values[metric].append(float(score))
+
+    def decide(self, metric: str) -> MetricDecision:
+        values, threshold = self.values[metric], self.thresholds[metric]
+        method = self.method
+        if method == "auto":
+            method = "wilson" if all(value in (0.0, 1.0) for value in values) else "bootstrap"
+        if method == "wilson":
+            low, high = wilson_interval(sum(values), len(values), self.metric_confidence)
+        else:
+            low, high = bootstrap_interval(values, self.metric_confidence, rng=self._rng)
+        decision = UNRESOLVED
+        if len(values) >= self.min_items:
+            if low >= threshold:
+                decision = PASS
+            elif high < threshold:
+                decision = FAIL
+        return MetricDecision(
+            metric=metric,
+            threshold=threshold,
+            n=len(values),
+            mean=statistics.mean(values) if values else None,
+            low=low,
+            high=high,
+            method=method,
+            decision=decision
+        )
+
+    def decisions(self) -> Dict[str, MetricDecision]:
+        return {metric: self.decide(metric) for metric in self.thresholds}
+
+    def resolved(self) -> bool:
+        """Whether every metric's decision is settled"""
+        return all(decision.decision != UNRESOLVED for decision in self.decisions().values())
+
+    def progress(self) -> str:
+        """One-line status of all metrics"""
+        return ", ".join(
+            f"{d.metric} {d.mean if d.mean is not None else float('nan'):.3f} "
+            f"[{d.low:.3f}, {d.high:.3f}] vs {d.threshold}: {d.decision}"
+            for d in self.decisions().values()
+        )
+
+    def summary(self, skipped: int, judge_calls: float, sep: str = " ") -> Dict[str, Any]:
+        """Summary statistics of a sequential run.
+
+        Args:
+            skipped: Dataset items never drawn because the run stopped early
+            judge_calls: Judge calls made for the judged items
+            sep: Word separator of the summary keys (" " or "_")
+
+        Returns:
+            Dict with the items judged and skipped, the estimated judge calls
+            saved and the decision and interval of every metric
+        """
+        def key(*words: str) -> str:
+            return sep.join(words)
+
+        calls_per_item = judge_calls / self.items if self.items else 0.0
+        summary = {
+            key("Sequential", "Confidence"): self.confidence,
+            key("Items", "Judged"): self.items,
+            key("Items", "Skipped"): skipped,
+            key("Stopped", "Early"): skipped > 0,
+            key("Judge", "Calls", "Saved"): round(skipped * calls_per_item, 1)
+        }
+        for decision in self.decisions().values():
+            name = decision.metric.replace("_", " ").title().replace(" ", sep)
+            summary[key(name, "Decision")] = decision.decision
+            summary[key(name, "CI", "Low")] = decision.low
+            summary[key(name, "CI", "High")] = decision.high
+        return summary
+
+
+def add_sequential_arguments(parser: argparse.ArgumentParser, confidence: float = DEFAULT_CONFIDENCE,
+                             min_items: int = DEFAULT_MIN_ITEMS, method: str = "auto") -> None:
+    """Register the shared sequential-sampling options on a CLI parser."""
+    parser.add_argument("--sequential", action="store_true",
+                        help="Judge items in random order and stop once every metric's decision is settled")
+    parser.add_argument("--confidence", type=float, default=confidence,
+                        help="Joint confidence of the sequential decisions")
+    parser.add_argument("--min-items", type=int, default=min_items,
+                        help="Judge at least this many items before stopping")
+    parser.add_argument("--ci-method", choices=CI_METHODS, default=method,
+                        help="Confidence interval: Wilson, bootstrap, or auto (Wilson for 0/1 scores)")
+    parser.add_argument("--stratify", action="store_true",
+                        help="Spread each source document's items evenly over the sampling order")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the sampling order")
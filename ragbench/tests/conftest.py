@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Shared ragbench modules use flat imports
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from change_impact import (CHANGED, NEW, NO_CONTEXT, UNMAPPED, ContextIndex, ImpactSelector,
+                           corpus_manifest, diff_manifests, read_corpus_manifest, write_corpus_manifest)
+
+SOLAR = ("The Sun is the star at the center of the Solar System. The planets orbit it "
+         "like a family of worlds held by gravity, and Jupiter is the largest of them.")
+MOON = ("Chandrayaan-3 landed near the lunar south pole in August 2023. The Vikram lander "
+        "and the Pragyan rover studied the soil of the Moon for one lunar day.")
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    corpus_dir = tmp_path / "data"
+    corpus_dir.mkdir()
+    (corpus_dir / "SolarSystem.txt").write_text(SOLAR, encoding="utf-8")
+    (corpus_dir / "Chandrayaan.txt").write_text(MOON, encoding="utf-8")
+    (corpus_dir / ".hidden").write_text("ignored", encoding="utf-8")
+    return corpus_dir
+
+
+def test_manifest_skips_hidden_files_and_diffs(corpus):
+    previous = corpus_manifest(str(corpus))
+    assert sorted(previous) == ["Chandrayaan.txt", "SolarSystem.txt"]
+    (corpus / "SolarSystem.txt").write_text(SOLAR + " Saturn has rings.", encoding="utf-8")
+    (corpus / "Mars.txt").write_text("Mars is red.", encoding="utf-8")
+    (corpus / "Chandrayaan.txt").unlink()
+    assert diff_manifests(previous, corpus_manifest(str(corpus))) == {
+        "added": ["Mars.txt"], "removed": ["Chandrayaan.txt"], "modified": ["SolarSystem.txt"]
+    }
+
+
+def test_manifest_round_trips_next_to_the_results_file(corpus, tmp_path):
+    results_file = tmp_path / "results_2026.csv"
+    path = write_corpus_manifest(results_file, str(corpus))
+    assert path.name == "results_2026.corpus.json"
+    assert read_corpus_manifest(results_file) == corpus_manifest(str(corpus))
+    assert json.loads(path.read_text())["corpus_dir"] == str(corpus.resolve())
+
+
+def test_contexts_map_despite_split_boundary_words_and_whitespace(corpus):
+    index = ContextIndex(str(corpus))
+    context = "un lunar   SOUTH pole in August 2023. The Vikram lander and the Pragyan rov"
+    assert index.sources(context) == {"Chandrayaan.txt"}
+    assert index.sources("Jupiter is the largest of them.") == {"SolarSystem.txt"}
+
+
+def test_short_contexts_must_match_as_a_whole(corpus):
+    index = ContextIndex(str(corpus))
+    assert index.sources("nothing like this") == set()
+    assert index.sources("like a family") == {"SolarSystem.txt"}
+
+
+def test_edited_contexts_are_unmapped(corpus):
+    index = ContextIndex(str(corpus))
+    assert index.sources("The Vikram lander and the Pragyan rover studied the rocks of Mars") == set()
+
+
+def test_selector_carries_over_unaffected_items(corpus):
+    previous_documents = corpus_manifest(str(corpus))
+    previous_rows = [{"query": q, "score": 1.0} for q in ("Sun?", "Moon?", "Gone?", "Empty?")]
+    (corpus / "SolarSystem.txt").write_text(SOLAR + " Saturn has rings.", encoding="utf-8")
+    items = [
+        {"query": "Sun?", "contexts": ["Jupiter is the largest of them."]},
+        {"query": "Moon?", "contexts": ["the Pragyan rover studied the soil of the Moon"]},
+        {"query": "Gone?", "contexts": ["Pluto is a dwarf planet far beyond Neptune in the Kuiper belt"]},
+        {"query": "Empty?", "contexts": [" "]},
+        {"query": "New?", "contexts": ["Jupiter is the largest of them."]},
+    ]
+    selector = ImpactSelector(str(corpus), previous_documents, previous_rows, "query", "contexts")
+    selected = [item["query"] for _, item in selector.select(enumerate(items))]
+    assert selected == ["Sun?", "Gone?", "Empty?", "New?"]
+    assert [row["query"] for _, row in selector.carried] == ["Moon?"]
+    assert selector.reasons == {CHANGED: 1, UNMAPPED: 1, NO_CONTEXT: 1, NEW: 1}
+    summary = selector.summary(sep="_")
+    assert summary["Changed_Documents"] == "SolarSystem.txt"
+    assert summary["Impacted_Items"] == 4 and summary["Carried_Over_Items"] == 1
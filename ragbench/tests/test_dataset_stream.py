@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+import dataset_stream
+from dataset_stream import convert_to_jsonl, iter_records, parse_shard
+
+RECORDS = [
+    {"query": f"Question {i}?", "reference_answer": f"Answer {i}", "reference_contexts": [f"ctx {i}, [x]"]}
+    for i in range(10)
+]
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(dataset_stream, "READ_CHUNK_SIZE", 7)
+
+
+def write_array(path, records, indent=None):
+    path.write_text(json.dumps(records, indent=indent), encoding="utf-8")
+    return str(path)
+
+
+def write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n\n" for record in records), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_array_elements_split_across_chunks(tmp_path, small_chunks, indent):
+    path = write_array(tmp_path / "qa.json", RECORDS, indent)
+    assert list(iter_records(path)) == RECORDS
+
+
+def test_numbers_split_across_chunks(tmp_path, small_chunks):
+    path = tmp_path / "numbers.json"
+    path.write_text("[1, 23456789, 3.25e10 , -40]", encoding="utf-8")
+    assert list(iter_records(str(path))) == [1, 23456789, 3.25e10, -40]
+
+
+def test_large_element_is_decoded_a_logarithmic_number_of_times(tmp_path, small_chunks, monkeypatch):
+    attempts = []
+
+    class CountingDecoder(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            attempts.append(len(s) - idx)
+            return super().raw_decode(s, idx)
+
+    monkeypatch.setattr(dataset_stream.json, "JSONDecoder", CountingDecoder)
+    large = {"query": "q", "reference_contexts": ["word " * 20_000]}
+    path = write_array(tmp_path / "large.json", [large, RECORDS[0]])
+    assert list(iter_records(path)) == [large, RECORDS[0]]
+    assert len(attempts) < 30
+    assert sum(attempts) < 8 * len(json.dumps(large))
+
+
+def test_truncated_array_raises(tmp_path, small_chunks):
+    path = tmp_path / "truncated.json"
+    path.write_text(json.dumps(RECORDS)[:-30], encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_records(str(path)))
+
+
+def test_jsonl_skips_blank_lines_and_matches_the_array(tmp_path):
+    array = write_array(tmp_path / "qa.json", RECORDS)
+    jsonl = write_jsonl(tmp_path / "qa.jsonl", RECORDS)
+    assert list(iter_records(jsonl)) == list(iter_records(array)) == RECORDS
+    assert convert_to_jsonl(array, str(tmp_path / "converted.jsonl")) == len(RECORDS)
+    assert list(iter_records(str(tmp_path / "converted.jsonl"))) == RECORDS
+
+
+def test_shards_partition_the_dataset(tmp_path):
+    path = write_jsonl(tmp_path / "qa.jsonl", RECORDS)
+    shards = [list(iter_records(path, shard=parse_shard(f"{i}/3"), with_index=True)) for i in range(3)]
+    positions = sorted(position for shard in shards for position, _ in shard)
+    assert positions == list(range(len(RECORDS)))
+    assert [position for position, _ in shards[1]] == [1, 4, 7]
+    assert all(record == RECORDS[position] for shard in shards for position, record in shard)
+
+
+@pytest.mark.parametrize("value", ["3/3", "-1/2", "1", "a/b", "0/0"])
+def test_invalid_shards_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_shard(value)
+
+
+def test_fields_keep_only_requested_keys_and_report_incomplete_records(tmp_path, capsys):
+    records = RECORDS[:3] + [{"query": "No answer?"}]
+    path = write_array(tmp_path / "qa.json", records)
+    selected = list(iter_records(path, fields=("query", "reference_answer")))
+    assert selected == [{"query": r["query"], "reference_answer": r["reference_answer"]} for r in RECORDS[:3]]
+    assert "Skipped 1 records" in capsys.readouterr().out
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(iter_records(str(tmp_path / "missing.json")))
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import eval_runner
+from eval_runner import FileWorkQueue, _run_worker
+
+
+class FakeAdapter:
+    """Scores items instantly, except those marked to hang like a stuck judge call"""
+
+    def __init__(self, output_dir, dataset=None):
+        pass
+
+    async def evaluate(self, index, record):
+        if record.get("hang"):
+            await asyncio.Event().wait()
+        await asyncio.sleep(record.get("seconds", 0))
+        return {"query": record["query"]}
+
+
+@pytest.fixture
+def run_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(eval_runner.ADAPTERS, "fake", FakeAdapter)
+    (tmp_path / "results").mkdir()
+    return tmp_path
+
+
+def test_worker_evaluates_all_chunks(run_dir):
+    queue = FileWorkQueue(run_dir / "queue")
+    queue.populate(((i, {"query": f"q{i}"}) for i in range(5)), chunk_size=2)
+    asyncio.run(_run_worker("fake", "w0", run_dir, concurrency=2, judge_rpm=None))
+    rows = [json.loads(line) for line in (run_dir / "results" / "w0.jsonl").read_text().splitlines()]
+    assert sorted(row["_index"] for row in rows) == list(range(5))
+    assert queue.counts() == {"pending": 0, "claimed": 0, "done": 3}
+
+
+def test_worker_finishing_items_keeps_heartbeating(run_dir):
+    queue = FileWorkQueue(run_dir / "queue")
+    queue.populate(((i, {"query": f"q{i}", "seconds": 0.1}) for i in range(8)), chunk_size=4)
+
+    async def run():
+        worker = asyncio.create_task(_run_worker("fake", "w0", run_dir, concurrency=1, judge_rpm=None))
+        stale = []
+        while not worker.done():
+            await asyncio.sleep(0.05)
+            stale += queue.stale_workers(timeout=0.3)
+        return stale
+
+    assert asyncio.run(run()) == []
+
+
+def test_worker_stuck_on_an_item_stops_heartbeating(run_dir):
+    queue = FileWorkQueue(run_dir / "queue")
+    queue.populate([(0, {"query": "q0"}), (1, {"query": "q1", "hang": True})], chunk_size=2)
+
+    async def run():
+        worker = asyncio.create_task(_run_worker("fake", "w0", run_dir, concurrency=1, judge_rpm=None))
+        await asyncio.sleep(0.1)
+        assert queue.stale_workers(timeout=0.3) == []
+        # The event loop keeps running, but no item finishes
+        await asyncio.sleep(0.5)
+        stale = queue.stale_workers(timeout=0.3)
+        worker.cancel()
+        return stale
+
+    start = time.time()
+    assert asyncio.run(run()) == ["w0"]
+    assert time.time() - start < 5
+    assert queue.release_worker("w0") == 1
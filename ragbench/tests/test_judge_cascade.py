@@ -0,0 +1,80 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+
+from judge_cascade import CHEAP, PREFILTER, STRONG, JudgeCascade
+
+
+def judge(cascade: JudgeCascade, metric: str, cheap_score: Optional[float], strong_score: float = 0.9):
+    calls: List[str] = []
+
+    async def cheap():
+        calls.append(CHEAP)
+        return cheap_score
+
+    async def strong():
+        calls.append(STRONG)
+        return strong_score
+
+    verdict = asyncio.run(cascade.judge(metric, cheap, strong, lambda score: score))
+    return verdict, calls
+
+
+@pytest.fixture
+def cascade() -> JudgeCascade:
+    return JudgeCascade({"correctness": 0.7}, {"correctness": (0.5, 0.85)})
+
+
+def test_confident_cheap_scores_decide(cascade):
+    for score in (0.2, 0.85, 1.0):
+        verdict, calls = judge(cascade, "correctness", score)
+        assert (verdict.tier, verdict.result, calls) == (CHEAP, score, [CHEAP])
+
+
+def test_uncertain_or_missing_cheap_scores_escalate(cascade):
+    for score in (0.5, 0.7, None, float("nan")):
+        verdict, calls = judge(cascade, "correctness", score)
+        assert (verdict.tier, verdict.result, calls) == (STRONG, 0.9, [CHEAP, STRONG])
+
+
+def test_metrics_without_a_band_skip_the_cheap_judge(cascade):
+    verdict, calls = judge(cascade, "faithfulness", 1.0)
+    assert (verdict.tier, verdict.cheap_score, calls) == (STRONG, None, [STRONG])
+
+
+def test_calibration_cases_are_scored_by_both_judges():
+    cascade = JudgeCascade({"correctness": 0.7}, {"correctness": (0.5, 0.85)}, calibration_rate=1.0)
+    verdict, calls = judge(cascade, "correctness", 0.95)
+    assert verdict.tier == STRONG and verdict.calibration
+    assert verdict.cheap_score == 0.95
+    assert calls == [CHEAP, STRONG]
+
+
+def test_calibration_rate_is_validated():
+    with pytest.raises(ValueError):
+        JudgeCascade({}, {}, calibration_rate=1.5)
+
+
+def test_summary_reports_escalation_and_agreement(cascade):
+    cascade.observe("correctness", CHEAP, 0.9, 0.9)
+    cascade.observe("correctness", CHEAP, 0.1, 0.1)
+    cascade.observe("correctness", STRONG, 0.6, 0.8)                    # Escalated, tiers disagree
+    cascade.observe("correctness", STRONG, 0.95, 0.4, calibration=True)  # Confident but wrong
+    cascade.observe("correctness", STRONG, 0.75, 0.9, calibration=True)  # Escalated calibration case
+    cascade.observe("correctness", PREFILTER, None, 0.0)
+    cascade.observe("faithfulness", STRONG, None, 1.0)
+    summary = cascade.summary(sep="_")
+    assert summary["Correctness_Escalation_Rate"] == pytest.approx(2 / 5)
+    assert summary["Correctness_Calibration_Cases"] == 2
+    assert summary["Correctness_Tier_Agreement"] == 0.5
+    assert summary["Correctness_Confident_Agreement"] == 0.0
+    assert summary["Correctness_Escalated_Agreement"] == 0.5
+    assert not any(key.startswith("Faithfulness") for key in summary)
+
+
+def test_binary_band_escalates_only_failures():
+    cascade = JudgeCascade({"correct": 1.0}, {"correct": (0.0, 1.0)})
+    assert cascade.in_band("correct", 0.0)
+    assert not cascade.in_band("correct", 1.0)
+    assert cascade.agreement("correct", []) is None
@@ -0,0 +1,22 @@
+import pytest
+
+from percentiles import percentile
+
+
+def test_percentile_interpolates_between_neighbours():
+    values = [10.0, 20.0, 30.0, 40.0]
+    assert percentile(values, 0.0) == 10.0
+    assert percentile(values, 0.5) == 25.0
+    assert percentile(values, 1.0) == 40.0
+    assert percentile(values, 0.9) == pytest.approx(37.0)
+
+
+def test_percentile_of_one_value():
+    assert percentile([7.0], 0.95) == 7.0
+
+
+def test_percentile_rejects_empty_values_and_bad_quantiles():
+    with pytest.raises(ValueError):
+        percentile([], 0.5)
+    with pytest.raises(ValueError):
+        percentile([1.0], 95)
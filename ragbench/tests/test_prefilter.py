@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from prefilter import (FAIL, JUDGE, PASS, LocalPrefilter, PrefilterRules, cosine_similarity_batch,
+                       lcs_length, rouge_l_batch, token_f1_batch, tokenize)
+
+REFERENCE = "the sun is a star at the centre of the solar system"  # 12 tokens
+
+
+def test_tokenize_lowercases_and_drops_punctuation():
+    assert tokenize("The Sun, a STAR!") == ["the", "sun", "a", "star"]
+    assert tokenize(None) == []
+
+
+def test_token_f1_batch_known_scores():
+    scores = token_f1_batch(
+        ["the cat sat", "The cat sat on the mat.", "a b", "", "x"],
+        ["the cat sat on the mat", "the cat sat on the mat", "c d", "x", ""]
+    )
+    # "the cat sat": precision 3/3, recall 3/6
+    assert scores == pytest.approx([2 / 3, 1.0, 0.0, 0.0, 0.0])
+
+
+def test_token_f1_batch_clips_repeated_tokens():
+    # Only one "the" of the candidate matches: precision 1/3, recall 1/1
+    assert token_f1_batch(["the the the"], ["the"]) == pytest.approx([0.5])
+
+
+def test_token_f1_batch_without_any_tokens():
+    assert token_f1_batch(["", "!"], ["", "?"]).tolist() == [0.0, 0.0]
+
+
+def test_lcs_length_known_values():
+    assert lcs_length(list("abcbdab"), list("bdcaba")) == 4
+    assert lcs_length(["a", "b"], []) == 0
+    assert lcs_length(["a"] * 70, ["a"] * 80) == 70  # Wider than a machine word
+
+
+def test_rouge_l_batch_known_scores():
+    scores = rouge_l_batch(
+        ["the cat sat on mat", "mat on the cat", "", "dog"],
+        ["the cat sat on the mat"] * 3 + ["cat"]
+    )
+    # LCS 5 of 5/6 tokens; LCS 2 ("on the") of 4/6 tokens
+    assert scores == pytest.approx([10 / 11, 0.4, 0.0, 0.0])
+
+
+def test_cosine_similarity_batch_known_values():
+    a = np.array([[1.0, 0.0], [1.0, 1.0], [0.0, 0.0]])
+    b = np.array([[0.0, 2.0], [2.0, 2.0], [1.0, 0.0]])
+    assert cosine_similarity_batch(a, b) == pytest.approx([0.0, 1.0, 0.0])
+
+
+def verdicts(prefilter, candidates, references=None):
+    references = references if references is not None else [REFERENCE] * len(candidates)
+    return [decision.verdict for decision in prefilter.classify_batch(candidates, references)]
+
+
+def test_default_rules_pass_near_verbatim_and_fail_disjoint_answers():
+    decisions = LocalPrefilter().classify_batch(
+        [REFERENCE.upper() + ".", "Bananas are yellow.", "The sun is a star."], [REFERENCE] * 3
+    )
+    assert [d.verdict for d in decisions] == [PASS, FAIL, JUDGE]
+    assert decisions[0].token_f1 == pytest.approx(1.0) and decisions[0].rouge_l == pytest.approx(1.0)
+    assert decisions[1].token_f1 == 0.0
+    assert decisions[2].cosine is None
+    assert decisions[0].reason.startswith("Pre-filter: matches reference (token_f1=1.00, rouge_l=1.00")
+    assert decisions[1].reason.startswith("Pre-filter: no overlap with reference")
+    assert decisions[2].reason.startswith("Pre-filter: ambiguous")
+
+
+def test_pass_threshold_boundary():
+    tokens = REFERENCE.split()
+    eleven = " ".join(tokens[:11])  # F1 = ROUGE-L = 22/23 ≈ 0.957
+    ten = " ".join(tokens[:10])     # F1 = ROUGE-L = 20/22 ≈ 0.909
+    nine = " ".join(tokens[:9])     # F1 = ROUGE-L = 18/21 ≈ 0.857
+    assert verdicts(LocalPrefilter(), [eleven, ten, nine]) == [PASS, PASS, JUDGE]
+    # Same tokens out of order keep F1 but lose ROUGE-L
+    assert verdicts(LocalPrefilter(), [" ".join(reversed(tokens))]) == [JUDGE]
+
+
+def test_any_shared_token_escapes_the_fail_rule():
+    answer = "Bananas orbit the moon."  # Shares "the": F1 = 2 * (1/4) * (1/12) / (1/3) = 0.125
+    assert verdicts(LocalPrefilter(), [answer]) == [JUDGE]
+    assert verdicts(LocalPrefilter(PrefilterRules(fail_max_f1=0.125)), [answer]) == [FAIL]
+    assert verdicts(LocalPrefilter(PrefilterRules(fail_max_f1=0.1)), [answer]) == [JUDGE]
+
+
+def test_missing_answers_and_references():
+    prefilter = LocalPrefilter()
+    assert verdicts(prefilter, [None, "  ", "The sun."], [REFERENCE, REFERENCE, ""]) == [FAIL, FAIL, JUDGE]
+    lenient = LocalPrefilter(PrefilterRules(fail_on_empty=False))
+    assert verdicts(lenient, [None, REFERENCE], [REFERENCE, None]) == [JUDGE, JUDGE]
+
+
+def test_embeddings_guard_both_short_circuits():
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        # Candidates first, then references; pairs get a fixed cosine per row
+        vectors = {"bananas are yellow": [1.0, 0.0], "apples are red": [0.0, 1.0]}
+        return [vectors.get(text, [1.0, 0.0]) for text in texts]
+
+    prefilter = LocalPrefilter(embed_fn=embed)
+    decisions = prefilter.classify_batch(
+        ["bananas are yellow", "apples are red", REFERENCE, ""], [REFERENCE, REFERENCE, REFERENCE, REFERENCE]
+    )
+    # No overlap but on topic -> judge; no overlap and off topic -> fail; verbatim and on topic -> pass
+    assert [d.verdict for d in decisions] == [JUDGE, FAIL, PASS, FAIL]
+    assert [d.cosine for d in decisions[:3]] == pytest.approx([1.0, 0.0, 1.0])
+    assert "cosine=0.00" in decisions[1].reason
+    # Empty answers are decided before embedding
+    assert calls == [["bananas are yellow", "apples are red", REFERENCE] + [REFERENCE] * 3]
+
+
+def test_verbatim_answers_need_embedding_agreement_to_pass():
+    prefilter = LocalPrefilter(embed_fn=lambda texts: [[1.0, 0.0]] + [[1.0, 1.0]] * (len(texts) - 1))
+    assert verdicts(prefilter, [REFERENCE]) == [JUDGE]  # Cosine ≈ 0.71 < 0.95
+
+
+def test_stats_count_every_verdict():
+    prefilter = LocalPrefilter()
+    verdicts(prefilter, [REFERENCE, "Bananas.", "The sun is a star.", None])
+    verdicts(prefilter, [REFERENCE])
+    assert prefilter.stats == {"evaluated": 5, "passed": 2, "failed": 2, "judged": 1}
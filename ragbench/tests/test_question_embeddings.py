@@ -0,0 +1,33 @@
+import numpy as np
+
+from providers import StubEmbedding, hashed_embedding
+from question_embeddings import (compute_question_embeddings, load_question_embeddings,
+                                 save_question_embeddings, sidecar_path)
+
+
+class QueryPrefixEmbedding(StubEmbedding):
+    """Stub whose query embeddings differ from its text embeddings"""
+
+    def _get_query_embedding(self, query):
+        return hashed_embedding(f"query: {query}", self.dim)
+
+
+def test_questions_get_query_embeddings_and_round_trip(tmp_path):
+    model = QueryPrefixEmbedding(dim=8)
+    embeddings = compute_question_embeddings(["What is Jupiter?", " What is  Jupiter?", "Moons?"], model)
+
+    assert len(embeddings) == 2
+    assert embeddings.get("What is Jupiter?") == model.get_query_embedding("What is Jupiter?")
+
+    dataset = tmp_path / "qa.json"
+    save_question_embeddings(embeddings, str(dataset))
+    loaded = load_question_embeddings(str(dataset))
+    assert loaded.model == embeddings.model
+    np.testing.assert_allclose(loaded.get("Moons?"), embeddings.get("Moons?"), rtol=1e-6)
+
+
+def test_sidecars_without_query_embeddings_are_ignored(tmp_path):
+    dataset = tmp_path / "qa.json"
+    np.savez(sidecar_path(str(dataset)), model=np.array("StubEmbedding:stub"),
+             questions=np.array(["Moons?"]), embeddings=np.ones((1, 8), dtype=np.float32))
+    assert load_question_embeddings(str(dataset)) is None
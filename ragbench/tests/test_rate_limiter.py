@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import threading
+import time
+
+from rate_limiter import AdaptiveConcurrency, FakeLLM, FakeRateLimitError, RateLimiter, estimate_tokens
+
+
+def drained_limiter(requests_per_minute: float, **kwargs) -> RateLimiter:
+    """Limiter whose request bucket has no burst left, so every call waits its turn."""
+    limiter = RateLimiter("test", requests_per_minute=requests_per_minute, **kwargs)
+    limiter.request_bucket.tokens = 0
+    limiter.request_bucket.updated = time.monotonic()
+    return limiter
+
+
+def test_request_bucket_throttles_async_calls():
+    limiter = drained_limiter(600)  # One call per 0.1s
+    llm = FakeLLM(latency=0)
+
+    async def run():
+        return await asyncio.gather(*(limiter.run(llm.acomplete, f"q{i}") for i in range(5)))
+
+    start = time.monotonic()
+    results = asyncio.run(run())
+    assert time.monotonic() - start >= 0.45
+    assert results == [f"echo: q{i}" for i in range(5)]
+    assert limiter.stats["calls"] == 5
+
+
+def test_request_bucket_throttles_sync_calls():
+    limiter = drained_limiter(1200)  # One call per 0.05s
+    start = time.monotonic()
+    for i in range(4):
+        limiter.run_sync(lambda prompt: prompt, f"q{i}")
+    assert time.monotonic() - start >= 0.18
+
+
+def test_token_bucket_waits_for_large_prompts():
+    limiter = RateLimiter("test", tokens_per_minute=6000)  # 100 tokens per second
+    limiter.token_bucket.tokens = 0
+    limiter.token_bucket.updated = time.monotonic()
+    start = time.monotonic()
+    limiter.run_sync(lambda: None, estimated_tokens=30)
+    assert time.monotonic() - start >= 0.28
+
+
+def test_rate_limited_calls_are_retried_and_reduce_concurrency():
+    llm = FakeLLM(server_rpm=10_000, server_concurrency=2, latency=0.01, error_rate=0.1, seed=3)
+    limiter = RateLimiter("test", max_concurrency=8, base_delay=0.01, max_delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(
+            limiter.run(llm.acomplete, prompt, estimated_tokens=estimate_tokens(prompt))
+            for prompt in (f"question {i}" for i in range(40))
+        ))
+
+    results = asyncio.run(run())
+    assert len(results) == 40
+    assert llm.rejected > 0
+    assert limiter.stats["retries"] == llm.rejected
+    assert limiter.stats["failures"] == 0
+    assert limiter.concurrency.current < 8
+
+
+def test_other_errors_are_not_retried():
+    limiter = RateLimiter("test")
+
+    def fail():
+        raise ValueError("bad request")
+
+    try:
+        limiter.run_sync(fail)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected the error to propagate")
+    assert limiter.stats == {"calls": 1, "retries": 0, "rate_limited": 0, "failures": 1}
+
+
+def test_bucket_wait_does_not_hold_a_concurrency_slot():
+    limiter = drained_limiter(600, max_concurrency=1)  # Next request token in 0.1s
+    in_flight = []
+
+    async def run():
+        call = asyncio.ensure_future(limiter.run(FakeLLM(latency=0).acomplete, "q"))
+        await asyncio.sleep(0.05)
+        in_flight.append(limiter.concurrency.in_flight)
+        return await call
+
+    assert asyncio.run(run()) == "echo: q"
+    assert in_flight == [0]
+
+
+def test_queued_calls_wait_for_a_released_slot():
+    limiter = RateLimiter("test", max_concurrency=2, min_concurrency=2)
+    llm = FakeLLM(server_concurrency=2, latency=0.02)
+
+    async def run():
+        return await asyncio.gather(*(limiter.run(llm.acomplete, f"q{i}") for i in range(10)))
+
+    start = time.monotonic()
+    assert asyncio.run(run()) == [f"echo: q{i}" for i in range(10)]
+    assert llm.rejected == 0
+    assert time.monotonic() - start >= 0.09  # Five rounds of two calls
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_sync_callers_wait_for_a_released_slot():
+    limiter = RateLimiter("test", max_concurrency=1)
+    active, peak = [0], [0]
+
+    def call():
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        active[0] -= 1
+
+    threads = [threading.Thread(target=limiter.run_sync, args=(call,)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert peak == [1] and limiter.stats["calls"] == 5
+
+
+def test_cancelled_waiter_passes_its_slot_on():
+    concurrency = AdaptiveConcurrency(initial=1, maximum=1)
+
+    async def run():
+        concurrency.try_acquire()
+        cancelled = asyncio.ensure_future(concurrency.acquire_async())
+        waiting = asyncio.ensure_future(concurrency.acquire_async())
+        await asyncio.sleep(0.01)
+        concurrency.release()  # Wakes the first waiter, which is cancelled before it runs
+        cancelled.cancel()
+        await asyncio.wait_for(waiting, timeout=1)
+
+    asyncio.run(run())
+    assert concurrency.in_flight == 1
+
+
+def test_growing_limit_wakes_waiters():
+    concurrency = AdaptiveConcurrency(initial=1, maximum=2)
+
+    async def run():
+        concurrency.try_acquire()
+        waiting = asyncio.ensure_future(concurrency.acquire_async())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        concurrency.on_success(0.01)  # Limit 1 -> 2
+        await asyncio.wait_for(waiting, timeout=1)
+
+    asyncio.run(run())
+    assert concurrency.in_flight == 2
+
+
+def test_retries_are_logged_off_stdout(capsys, caplog):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FakeRateLimitError("429")
+        return "ok"
+
+    limiter = RateLimiter("test", base_delay=0.01)
+    with caplog.at_level(logging.WARNING, logger="rate_limiter"):
+        assert limiter.run_sync(flaky) == "ok"
+    assert capsys.readouterr().out == ""
+    assert "Rate limited, retrying" in caplog.text
@@ -0,0 +1,103 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from sequential_sampling import (FAIL, PASS, UNRESOLVED, SequentialEvaluation, bootstrap_interval,
+                                 sampling_order, source_document, wilson_interval)
+
+
+def test_wilson_interval_contains_the_proportion():
+    low, high = wilson_interval(40, 50, 0.95)
+    assert low < 0.8 < high
+    assert (low, high) == pytest.approx((0.670, 0.888), abs=0.001)
+
+
+def test_wilson_interval_is_exact_at_the_bounds():
+    assert wilson_interval(20, 20, 0.95)[1] == 1.0
+    assert wilson_interval(0, 20, 0.95)[0] == 0.0
+    assert wilson_interval(0, 0, 0.95) == (0.0, 1.0)
+
+
+def test_bootstrap_interval_narrows_with_more_values():
+    few = bootstrap_interval([0.2, 0.9, 0.5, 0.7], 0.95, rng=np.random.default_rng(0))
+    many = bootstrap_interval([0.2, 0.9, 0.5, 0.7] * 25, 0.95, rng=np.random.default_rng(0))
+    assert few[0] <= 0.575 <= few[1]
+    assert many[1] - many[0] < few[1] - few[0]
+
+
+def test_sampling_order_is_a_reproducible_permutation():
+    items = list(range(50))
+    order = sampling_order(items, seed=1)
+    assert sorted(order) == items
+    assert order == sampling_order(items, seed=1)
+    assert order != items
+
+
+def test_stratified_order_spreads_each_stratum():
+    records = [{"source_file": "a.txt", "i": i} for i in range(30)]
+    records += [{"source_file": "b.txt", "i": i} for i in range(10)]
+    order = sampling_order(records, stratum=source_document, seed=3)
+    assert len(order) == 40
+    # Every prefix covers the documents in proportion (3:1), up to one item
+    for size in (4, 8, 20):
+        counts = Counter(source_document(record) for record in order[:size])
+        assert abs(counts["b.txt"] - size / 4) <= 1
+
+
+def test_source_document_falls_back_to_the_first_context():
+    assert source_document({"reference_contexts": ["first", "second"]}) == "first"
+    assert source_document({}) == ""
+
+
+def test_decisions_wait_for_min_items():
+    evaluation = SequentialEvaluation({"correct": 0.5}, min_items=10)
+    for _ in range(9):
+        evaluation.add({"correct": 1.0})
+    assert evaluation.decide("correct").decision == UNRESOLVED
+    evaluation.add({"correct": 1.0})
+    assert evaluation.decide("correct").decision == PASS
+    assert evaluation.resolved()
+
+
+def test_metrics_pass_and_fail_independently():
+    evaluation = SequentialEvaluation({"correct": 0.5, "faithful": 0.9}, min_items=5, seed=0)
+    for i in range(40):
+        evaluation.add({"correct": 1.0 if i % 10 else 0.0, "faithful": 0.5 + (i % 3) * 0.1})
+    decisions = evaluation.decisions()
+    assert decisions["correct"].method == "wilson"
+    assert decisions["correct"].decision == PASS
+    assert decisions["faithful"].method == "bootstrap"
+    assert decisions["faithful"].decision == FAIL
+
+
+def test_missing_scores_are_left_out():
+    evaluation = SequentialEvaluation({"correct": 0.5})
+    evaluation.add({"correct": None})
+    evaluation.add({"correct": float("nan")})
+    evaluation.add({"correct": 1.0})
+    assert evaluation.items == 3
+    assert evaluation.decide("correct").n == 1
+
+
+def test_confidence_is_split_across_metrics():
+    evaluation = SequentialEvaluation({"a": 0.5, "b": 0.5, "c": 0.5, "d": 0.5}, confidence=0.9)
+    assert evaluation.metric_confidence == pytest.approx(0.975)
+
+
+def test_summary_estimates_the_judge_calls_saved():
+    evaluation = SequentialEvaluation({"correct": 0.5}, min_items=1)
+    for _ in range(10):
+        evaluation.add({"correct": 1.0})
+    summary = evaluation.summary(skipped=30, judge_calls=20, sep="_")
+    assert summary["Items_Judged"] == 10
+    assert summary["Stopped_Early"] is True
+    assert summary["Judge_Calls_Saved"] == 60.0
+    assert summary["Correct_Decision"] == PASS
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        SequentialEvaluation({"correct": 0.5}, method="normal")
+    with pytest.raises(ValueError):
+        SequentialEvaluation({"correct": 0.5}, confidence=1.0)